@@ -3,18 +3,39 @@
 from __future__ import annotations
 
 import logging
+from threading import Lock
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
 
 from ..errors import internal_server_error_response
 from ..schemas import CatalogProductSchema
-from ...services import fetch_sheet_or_local_products, list_catalog_products
+from ...services import fetch_sheet_or_local_products, get_catalog_snapshot
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_PRODUCTS_ADAPTER = TypeAdapter(list[CatalogProductSchema])
+_ENCODED_LOCK = Lock()
+# (versao do snapshot, corpo JSON): a lista so e validada e serializada uma vez por versao.
+_ENCODED_PRODUCTS: tuple[int, bytes] | None = None
+
+
+def _encoded_products(snapshot) -> bytes:
+    global _ENCODED_PRODUCTS
+    with _ENCODED_LOCK:
+        cached = _ENCODED_PRODUCTS
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
+    products = _PRODUCTS_ADAPTER.validate_python(list(snapshot.products))
+    body = JSONResponse(content=_PRODUCTS_ADAPTER.dump_python(products, mode="json")).body
+    with _ENCODED_LOCK:
+        if _ENCODED_PRODUCTS is None or _ENCODED_PRODUCTS[0] < snapshot.version:
+            _ENCODED_PRODUCTS = (snapshot.version, body)
+    return body
+
 
 @router.get("/items", response_model=list[CatalogProductSchema])
 async def list_items():
@@ -34,10 +55,17 @@ async def sheet_data(url: str | None = None):
 
 
 @router.get("/local/produtos", response_model=list[CatalogProductSchema])
-async def local_products():
-    """Retorna produtos encontrados na pasta local do OneDrive."""
+def local_products(request: Request):
+    """Retorna produtos encontrados na pasta local do OneDrive.
+
+    Serve o catalogo materializado; `ETag` muda junto com a versao do snapshot.
+    """
     try:
-        return list_catalog_products()
+        snapshot = get_catalog_snapshot()
+        headers = {"ETag": f'"catalog-{snapshot.version}"', "X-Catalog-Version": str(snapshot.version)}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(content=_encoded_products(snapshot), media_type="application/json", headers=headers)
     except Exception as exc:
         logger.exception("Error loading local products: %s", exc)
         return internal_server_error_response()
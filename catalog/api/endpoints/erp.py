@@ -6,6 +6,7 @@ import logging
 
 from fastapi import APIRouter, Body, Depends, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from ..errors import internal_server_error_response
 from ..security import require_erp_admin
@@ -21,7 +22,7 @@ async def import_erp_products(payload: dict | list = Body(...)):
     try:
         from ...erp_catalog import import_erp_payload
 
-        return import_erp_payload(payload)
+        return await run_in_threadpool(import_erp_payload, payload)
     except ValueError as exc:
         return JSONResponse(status_code=400, content={"error": str(exc)})
     except Exception as exc:
@@ -29,25 +30,40 @@ async def import_erp_products(payload: dict | list = Body(...)):
         return internal_server_error_response()
 
 
+@router.post("/erp/delta")
+async def apply_erp_products_delta(payload: dict = Body(...)):
+    """Aplica upserts e remocoes por codigo sem reimportar o catalogo ERP inteiro."""
+    try:
+        from ...erp_catalog import apply_erp_delta
+
+        return await run_in_threadpool(apply_erp_delta, payload)
+    except ValueError as exc:
+        return JSONResponse(status_code=400, content={"error": str(exc)})
+    except Exception as exc:
+        logger.exception("Error applying ERP delta: %s", exc)
+        return internal_server_error_response()
+
+
 @router.post("/erp/upload")
 async def upload_erp_file(request: Request, filename: str | None = None):
-    """Recebe um arquivo JSON bruto no corpo da requisicao e importa para o catalogo."""
+    """Recebe um arquivo JSON bruto no corpo da requisicao e importa para o catalogo.
+
+    O corpo e gravado na caixa de entrada em blocos e importado em fluxo, sem
+    manter o payload inteiro em memoria.
+    """
     try:
-        from ...erp_catalog import get_max_upload_size_bytes, receive_erp_file
+        from ...erp_catalog import get_max_upload_size_bytes, import_received_erp_file, reserve_erp_upload_path
 
+        max_size = get_max_upload_size_bytes()
         content_length = request.headers.get("content-length")
         if content_length:
             try:
                 declared_length = int(content_length)
             except ValueError:
                 declared_length = 0
-            if declared_length > get_max_upload_size_bytes():
+            if declared_length > max_size:
                 return JSONResponse(status_code=413, content={"error": "ERP upload too large"})
 
-        body = await request.body()
-        if not body:
-            return JSONResponse(status_code=400, content={"error": "empty request body"})
-
         selected_name = (
             filename
             or request.headers.get("x-file-name")
@@ -55,7 +71,28 @@ async def upload_erp_file(request: Request, filename: str | None = None):
             or "erp_upload.json"
         )
 
-        return receive_erp_file(filename=selected_name, content=body)
+        target = reserve_erp_upload_path(selected_name)
+        received = 0
+        try:
+            with target.open("wb") as handle:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > max_size:
+                        break
+                    handle.write(chunk)
+        except BaseException:
+            target.unlink(missing_ok=True)
+            raise
+
+        if received > max_size:
+            target.unlink(missing_ok=True)
+            return JSONResponse(status_code=413, content={"error": "ERP upload too large"})
+        if not received:
+            target.unlink(missing_ok=True)
+            return JSONResponse(status_code=400, content={"error": "empty request body"})
+
+        # Leitura e gravacao do espelho sao sincronas; saem do loop de eventos.
+        return await run_in_threadpool(import_received_erp_file, target)
     except ValueError as exc:
         return JSONResponse(status_code=400, content={"error": str(exc)})
     except Exception as exc:
@@ -73,7 +110,7 @@ async def import_erp_file_from_backend(payload: dict = Body(...)):
 
         from ...erp_catalog import import_erp_file
 
-        return import_erp_file(file_path)
+        return await run_in_threadpool(import_erp_file, file_path)
     except ValueError as exc:
         return JSONResponse(status_code=400, content={"error": str(exc)})
     except Exception as exc:
@@ -3,9 +3,11 @@
 from __future__ import annotations
 
 import logging
+import os
 
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 from ..errors import internal_server_error_response
 
@@ -14,31 +16,48 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _remove_spooled_export(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError as exc:
+        logger.warning("Failed to remove spooled export %s: %s", path, exc)
+
+
 @router.get("/export")
-async def export_catalog(
+def export_catalog(
     format: str = "csv",
     query: str | None = None,
     category: str | None = None,
     code: str | None = None,
 ):
-    """Gera uma exportacao do catalogo em CSV, Excel, JSON, PDF ou ZIP."""
+    """Gera uma exportacao do catalogo em CSV, Excel, JSON, PDF ou ZIP.
+
+    O ZIP e enviado enquanto e gerado ou, com `CATALOG_EXPORT_ZIP_DELIVERY=spool`,
+    gravado num arquivo temporario e servido com tamanho conhecido.
+    """
     try:
-        from ...exporter import build_catalog_export
+        from ...exporter import prepare_catalog_export
 
-        payload, media_type, filename = build_catalog_export(
+        export = prepare_catalog_export(
             format_name=format,
             query=str(query or "").strip(),
             category=str(category or "").strip(),
             code=str(code or "").strip(),
         )
-        return Response(
-            content=payload,
-            media_type=media_type,
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "Cache-Control": "no-store",
-            },
-        )
+        headers = {
+            "Content-Disposition": f'attachment; filename="{export.filename}"',
+            "Cache-Control": "no-store",
+        }
+        if export.path is not None:
+            return FileResponse(
+                export.path,
+                media_type=export.media_type,
+                headers=headers,
+                background=BackgroundTask(_remove_spooled_export, str(export.path)),
+            )
+        if export.chunks is not None:
+            return StreamingResponse(export.chunks, media_type=export.media_type, headers=headers)
+        return Response(content=export.payload, media_type=export.media_type, headers=headers)
     except ValueError as exc:
         return JSONResponse(status_code=400, content={"error": str(exc)})
     except Exception as exc:
@@ -4,13 +4,14 @@ from __future__ import annotations
 
 import logging
 import sys
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
 from catalog.api import register_api_routes, register_frontend_routes
-from catalog.core import configure_logging, load_settings
+from catalog.core import Settings, configure_logging, load_settings
 
 
 logger = logging.getLogger(__name__)
@@ -66,6 +67,48 @@ def _register_disabled_docs_routes(app: FastAPI) -> None:
         return JSONResponse(status_code=404, content={"error": "API docs disabled"})
 
 
+def _build_lifespan(settings: Settings):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if settings.index_snapshot_enabled:
+            from catalog.index_snapshot import load_snapshot
+
+            try:
+                logger.info("Restored %s indexes from snapshot", load_snapshot())
+            except Exception as exc:
+                logger.warning("Index snapshot not loaded: %s", exc)
+
+        watcher = None
+        if settings.photo_watcher_enabled:
+            from catalog.photo_watcher import start_photo_watcher
+
+            try:
+                watcher = start_photo_watcher()
+            except Exception as exc:
+                logger.warning("Photo watcher disabled: %s", exc)
+
+        from catalog.services.catalog_service import refresh_catalog_products, schedule_catalog_refresh
+
+        if settings.index_snapshot_enabled:
+            from catalog.index_snapshot import save_snapshot, verify_snapshot_in_background
+
+            # A conferencia remonta o catalogo materializado com os indices ja revalidados.
+            verify_snapshot_in_background(refresh_catalog_products)
+            if watcher is not None:
+                watcher.add_listener(lambda indexes: save_snapshot())
+        else:
+            schedule_catalog_refresh()
+        if watcher is not None:
+            watcher.add_listener(lambda indexes: schedule_catalog_refresh())
+        try:
+            yield
+        finally:
+            if watcher is not None:
+                watcher.stop()
+
+    return lifespan
+
+
 def create_app() -> FastAPI:
     # Carrega o .env antes de importar modulos que dependem do ambiente.
     load_dotenv()
@@ -80,6 +123,7 @@ def create_app() -> FastAPI:
         docs_url="/docs" if settings.api_docs_enabled else None,
         redoc_url="/redoc" if settings.api_docs_enabled else None,
         openapi_url="/openapi.json" if settings.api_docs_enabled else None,
+        lifespan=_build_lifespan(settings),
     )
     _configure_cors(
         app,
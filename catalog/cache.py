@@ -1,3 +1,5 @@
+import os
+from pathlib import Path
 import time
 from typing import Any, Callable, Dict, Tuple
 
@@ -42,3 +44,11 @@ def cached(func: Callable) -> Callable:
         return result
 
     return wrapper
+
+
+def resolve_cache_dir() -> Path:
+    """Pasta dos caches persistentes em disco (snapshots de indices, espelhos binarios)."""
+    explicit = os.getenv("CATALOG_CACHE_DIR", "").strip()
+    if explicit:
+        return Path(explicit)
+    return Path(__file__).resolve().parent.parent / ".catalog_cache"
@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import os
 import re
-import unicodedata
 from pathlib import Path
 from threading import Lock
 from typing import Dict
 
+from .text_normalize import fold_accents
+
 
 _CODE_PATTERN = re.compile(r"\b(?P<code>\d{3,8})\b")
 _CACHE_LOCK = Lock()
@@ -67,9 +68,7 @@ def _clean_cell(value: str) -> str:
 
 
 def _normalize_header(value: str) -> str:
-    normalized = unicodedata.normalize("NFD", _clean_cell(value))
-    normalized = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
-    return normalized.upper()
+    return fold_accents(_clean_cell(value)).upper()
 
 
 def _first_nonempty(*values: str) -> str:
@@ -201,3 +200,44 @@ def load_cadastro_index(path_override: str | None = None) -> Dict[str, Dict[str,
         _CACHE["mtime"] = mtime
         _CACHE["records"] = parsed
         return dict(parsed)
+
+
+def cadastro_stamp(path_override: str | None = None) -> tuple:
+    """Caminho, mtime e tamanho do cadastro ativo; vazio sem arquivo."""
+    resolved_path = resolve_cadastro_path(path_override)
+    if not resolved_path:
+        return ()
+    try:
+        stat = os.stat(resolved_path)
+    except OSError:
+        return ()
+    return resolved_path, stat.st_mtime_ns, stat.st_size
+
+
+def export_cadastro_cache() -> Dict[str, object] | None:
+    """Copia o cache atual para o snapshot de inicializacao."""
+    with _CACHE_LOCK:
+        if not _CACHE.get("path"):
+            return None
+        return {"path": _CACHE["path"], "mtime": _CACHE["mtime"], "records": _CACHE["records"]}
+
+
+def restore_cadastro_cache(state: Dict[str, object]) -> bool:
+    """Reaproveita registros do snapshot se o arquivo ainda tem o mesmo mtime."""
+    path = str(state.get("path", ""))
+    records = state.get("records")
+    if not path or not isinstance(records, dict):
+        return False
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+    if mtime != state.get("mtime"):
+        return False
+    with _CACHE_LOCK:
+        if _CACHE.get("path"):
+            return False
+        _CACHE["path"] = path
+        _CACHE["mtime"] = mtime
+        _CACHE["records"] = records
+    return True
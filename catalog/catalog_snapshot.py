@@ -0,0 +1,259 @@
+"""Catalogo mesclado materializado, reconstruido so quando as fontes mudam.
+
+A listagem completa (indice de fotos, cadastro, ERP, categorias, ordenacao e
+fotos do estoque) vira um snapshot imutavel com versao crescente. As requisicoes
+so leem o snapshot atual: quando a ultima conferencia passa da idade maxima, a
+conferencia das fontes e a remontagem rodam numa thread de fundo e os leitores
+seguem com a versao anterior ate a nova ser publicada. So a primeira leitura,
+sem snapshot algum, monta o catalogo na requisicao. Gravacoes do proprio app no
+ERP remesclam o catalogo logo depois de gravar, no caminho da gravacao; quando
+so o ERP mudou, as pastas de fotos nao sao revalidadas e, com deltas, apenas
+os codigos alterados sao remesclados.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import count
+import logging
+import os
+import threading
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from .cadastro import cadastro_stamp
+from .erp_catalog import erp_changes_since, get_erp_fingerprint, get_erp_version, load_erp_index
+from .photo_index import IncrementalPhotoIndex, iter_photo_indexes
+from .stock_catalog import get_stock_report_version
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_SECONDS = 5.0
+
+BuildProducts = Callable[[], List[Dict[str, Any]]]
+SourceStamps = Callable[[], Any]
+# Catalogo anterior e codigos alterados no ERP -> catalogo remesclado, ou None para montar tudo.
+PatchProducts = Callable[[Sequence[Dict[str, Any]], set[str]], List[Dict[str, Any]] | None]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    fingerprint: Any
+    # Compartilhados entre as requisicoes: quem precisar alterar um produto copia antes.
+    products: Tuple[Dict[str, Any], ...]
+    built_at: float
+    # Versao do ERP mesclada; None quando o indice ERP estava vazio.
+    erp_version: int | None = None
+
+
+_SNAPSHOT_LOCK = Lock()
+_BUILD_LOCK = Lock()
+# Nunca reiniciado, nem por `clear_catalog_snapshot`: versao identifica um snapshot no processo.
+_VERSIONS = count(1)
+_SNAPSHOT: CatalogSnapshot | None = None
+_CHECKED_AT = float("-inf")
+_EPOCH = 0
+# Incrementado a cada invalidacao: conferencias iniciadas antes nao marcam o snapshot como conferido.
+_INVALIDATIONS = 0
+_REFRESH_THREAD: threading.Thread | None = None
+# Fontes da ultima montagem; gravacoes no ERP remontam o catalogo com elas.
+_SOURCES: tuple[BuildProducts, SourceStamps, PatchProducts | None] | None = None
+
+
+def max_age_seconds() -> float:
+    raw_value = os.getenv("CATALOG_PRODUCTS_MAX_AGE_SECONDS", "").strip()
+    try:
+        parsed = float(raw_value) if raw_value else DEFAULT_MAX_AGE_SECONDS
+    except ValueError:
+        return DEFAULT_MAX_AGE_SECONDS
+    return max(parsed, 0.0)
+
+
+def source_stamps(local_roots: Sequence[str]) -> tuple:
+    """Raizes de fotos e carimbos dos arquivos de cadastro e estoque (o ERP e conferido a parte)."""
+    return (
+        tuple(local_roots),
+        cadastro_stamp(os.getenv("CATALOG_CADASTRO_HTML")),
+        get_stock_report_version(),
+    )
+
+
+def _index_key(index: IncrementalPhotoIndex) -> tuple:
+    return index.root, index.extensions
+
+
+def _revalidated_generations() -> Dict[tuple, int]:
+    """Geracao de cada indice de fotos ja montado, depois de revalida-lo no disco."""
+    generations: Dict[tuple, int] = {}
+    for index in iter_photo_indexes():
+        index.sync()
+        generations[_index_key(index)] = index.generation
+    return generations
+
+
+def _fingerprint(stamps: Any, erp: Any, generations: Dict[tuple, int]) -> tuple:
+    return stamps, erp, tuple(sorted(generations.items()))
+
+
+def _erp_version() -> int | None:
+    version = get_erp_version()
+    return version if load_erp_index() else None
+
+
+def _patched_products(
+    current: CatalogSnapshot,
+    fingerprint: tuple,
+    patch: PatchProducts | None,
+) -> List[Dict[str, Any]] | None:
+    """Catalogo atual com so os codigos alterados no ERP remesclados, quando so o ERP mudou."""
+    if patch is None or current.erp_version is None:
+        return None
+    stamps, _, generations = fingerprint
+    previous_stamps, _, previous_generations = current.fingerprint
+    if stamps != previous_stamps or generations != previous_generations:
+        return None
+    # None: o indice ERP foi substituido (importacao completa) desde a montagem.
+    codes = erp_changes_since(current.erp_version)
+    if codes is None:
+        return None
+    return patch(current.products, codes)
+
+
+def refresh_catalog_snapshot(
+    build: BuildProducts,
+    stamps: SourceStamps,
+    force: bool = False,
+    patch: PatchProducts | None = None,
+) -> CatalogSnapshot:
+    """Confere as fontes e remonta o catalogo se o carimbo mudou (ou com `force`).
+
+    Com `patch`, uma mudanca so no ERP remescla os codigos alterados sobre o
+    catalogo atual em vez de montar tudo de novo.
+    """
+    global _SNAPSHOT, _CHECKED_AT, _SOURCES
+    with _BUILD_LOCK:
+        with _SNAPSHOT_LOCK:
+            _SOURCES = (build, stamps, patch)
+            epoch, invalidations, current = _EPOCH, _INVALIDATIONS, _SNAPSHOT
+        checked_at = time.monotonic()
+        # Carimbo tirado antes da montagem: mudanca durante ela gera nova remontagem depois.
+        erp_version = _erp_version()
+        source = stamps()
+        erp = get_erp_fingerprint()
+        # So o ERP mudou: a remescla nao depende das pastas de fotos, que ficam
+        # para a proxima conferencia (o snapshot segue marcado como nao conferido).
+        erp_only = (
+            current is not None
+            and not force
+            and patch is not None
+            and source == current.fingerprint[0]
+            and erp != current.fingerprint[1]
+        )
+        generations = dict(current.fingerprint[2]) if erp_only else _revalidated_generations()
+        fingerprint = _fingerprint(source, erp, generations)
+        if current is not None and not force and fingerprint == current.fingerprint:
+            with _SNAPSHOT_LOCK:
+                if epoch == _EPOCH and invalidations == _INVALIDATIONS:
+                    _CHECKED_AT = checked_at
+            return current
+
+        patched = None if current is None or force else _patched_products(current, fingerprint, patch)
+        products = tuple(build() if patched is None else patched)
+        # Indices criados pela propria montagem entram com a geracao que ela usou.
+        for index in iter_photo_indexes():
+            generations.setdefault(_index_key(index), index.generation)
+        snapshot = CatalogSnapshot(
+            next(_VERSIONS),
+            _fingerprint(source, fingerprint[1], generations),
+            products,
+            time.time(),
+            erp_version,
+        )
+        with _SNAPSHOT_LOCK:
+            if epoch == _EPOCH:
+                _SNAPSHOT = snapshot
+                if invalidations == _INVALIDATIONS and not erp_only:
+                    _CHECKED_AT = checked_at
+        return snapshot
+
+
+def schedule_catalog_refresh(
+    build: BuildProducts,
+    stamps: SourceStamps,
+    patch: PatchProducts | None = None,
+) -> None:
+    """Dispara a conferencia em segundo plano, no maximo uma por vez."""
+    global _REFRESH_THREAD
+    with _SNAPSHOT_LOCK:
+        if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+            return
+
+        def run() -> None:
+            try:
+                refresh_catalog_snapshot(build, stamps, patch=patch)
+            except Exception as exc:
+                logger.warning("Catalog snapshot refresh failed: %s", exc, exc_info=True)
+
+        _REFRESH_THREAD = threading.Thread(target=run, name="catalog-snapshot", daemon=True)
+        _REFRESH_THREAD.start()
+
+
+def get_catalog_snapshot(
+    build: BuildProducts,
+    stamps: SourceStamps,
+    patch: PatchProducts | None = None,
+) -> CatalogSnapshot:
+    """Snapshot atual; so a primeira leitura, sem snapshot, monta o catalogo na requisicao.
+
+    Dentro da idade maxima nada e conferido. Depois dela, a conferencia das
+    fontes (carimbos, ERP e pastas de fotos) e a eventual remontagem rodam em
+    segundo plano, e a requisicao responde com a versao atual.
+    """
+    with _SNAPSHOT_LOCK:
+        snapshot, checked_at = _SNAPSHOT, _CHECKED_AT
+    if snapshot is None:
+        return refresh_catalog_snapshot(build, stamps, patch=patch)
+    if time.monotonic() - checked_at > max_age_seconds():
+        schedule_catalog_refresh(build, stamps, patch)
+    return snapshot
+
+
+def invalidate_catalog_snapshot() -> None:
+    """Faz a proxima leitura disparar a conferencia das fontes, mesmo dentro da idade maxima."""
+    global _CHECKED_AT, _INVALIDATIONS
+    with _SNAPSHOT_LOCK:
+        _CHECKED_AT = float("-inf")
+        _INVALIDATIONS += 1
+
+
+def refresh_after_erp_write() -> None:
+    """Remescla o catalogo logo depois de uma gravacao no ERP, fora das leituras.
+
+    Roda no caminho da gravacao: quando ela retorna, os leitores ja recebem a
+    versao nova. Sem snapshot montado nao ha o que remesclar; a primeira
+    leitura monta o catalogo com o ERP gravado.
+    """
+    invalidate_catalog_snapshot()
+    with _SNAPSHOT_LOCK:
+        sources, current = _SOURCES, _SNAPSHOT
+    if sources is None or current is None:
+        return
+    build, stamps, patch = sources
+    try:
+        refresh_catalog_snapshot(build, stamps, patch=patch)
+    except Exception as exc:
+        # A gravacao do ERP ja foi feita; a proxima conferencia tenta de novo.
+        logger.warning("Catalog snapshot refresh after ERP write failed: %s", exc, exc_info=True)
+
+
+def clear_catalog_snapshot() -> None:
+    global _SNAPSHOT, _CHECKED_AT, _EPOCH, _SOURCES
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT = None
+        _SOURCES = None
+        _CHECKED_AT = float("-inf")
+        # Conferencias ja em andamento nao publicam o resultado.
+        _EPOCH += 1
@@ -0,0 +1,332 @@
+"""Classificacao de categorias de produtos compartilhada pelo ERP, pastas locais e estoque.
+
+Os textos sao quebrados em tokens uma unica vez (com cache) e cada token e
+resolvido por tabelas pre-montadas, sem percorrer as listas de palavras-chave.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from .text_normalize import normalize_for_match
+
+
+TOKEN_CACHE_SIZE = 1 << 17
+CATEGORY_CACHE_SIZE = 1 << 16
+NUMERIC_TEXT_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Em textos ASCII, uma unica passada poe em minusculas e troca separadores por espaco.
+_ASCII_TOKEN_TABLE = bytes(
+    ord(char.lower()) if char.isascii() and char.isalnum() else 32 for char in map(chr, range(256))
+)
+
+DEPT_SECTION_CATEGORY_MAP: Dict[tuple[str, str], str] = {
+    ("101", "107"): "MANGUEIRAS E DECORATIVOS LED",
+    ("102", "105"): "ACESSORIOS ELETRICOS",
+    ("102", "108"): "CONECTORES E EMENDAS",
+    ("102", "120"): "RELES E SENSORES",
+    ("103", "112"): "LAMPADAS BULBO",
+    ("103", "115"): "ILUMINACAO PUBLICA",
+    ("104", "116"): "TARTARUGAS LED",
+    ("104", "121"): "SPOTS EXTERNOS",
+    ("105", "117"): "MOVEIS E UTILIDADES",
+    ("106", "122"): "RODIZIOS E MOVIMENTACAO",
+    ("107", "123"): "SUPRIMENTOS E OPERACAO",
+}
+DEPT_CATEGORY_MAP: Dict[str, str] = {
+    "101": "ILUMINACAO INTERNA",
+    "102": "ACESSORIOS ELETRICOS",
+    "103": "LAMPADAS E ILUMINACAO PUBLICA",
+    "104": "ILUMINACAO EXTERNA",
+    "105": "MOVEIS E UTILIDADES",
+    "106": "RODIZIOS E MOVIMENTACAO",
+    "107": "SUPRIMENTOS E OPERACAO",
+}
+BUSINESS_CATEGORY_MAP: Dict[str, str] = {
+    "iluminacao decorativa": "ILUMINACAO DECORATIVA",
+    "iluminacao tecnica": "ILUMINACAO TECNICA",
+    "iluminacao externa e publica": "ILUMINACAO EXTERNA E PUBLICA",
+    "lampadas e fitas": "LAMPADAS E FITAS",
+    "componentes e acessorios": "COMPONENTES E ACESSORIOS",
+    "utilidades e operacao": "UTILIDADES E OPERACAO",
+    "outros itens erp": "OUTROS ITENS ERP",
+    "abajur": "ILUMINACAO DECORATIVA",
+    "arandela": "ILUMINACAO DECORATIVA",
+    "espelho": "ILUMINACAO DECORATIVA",
+    "lustre": "ILUMINACAO DECORATIVA",
+    "pendente": "ILUMINACAO DECORATIVA",
+    "painel": "ILUMINACAO TECNICA",
+    "plafon": "ILUMINACAO TECNICA",
+    "perfil": "ILUMINACAO TECNICA",
+    "trilho": "ILUMINACAO TECNICA",
+    "luminaria": "ILUMINACAO TECNICA",
+    "balizador": "ILUMINACAO EXTERNA E PUBLICA",
+    "espeto": "ILUMINACAO EXTERNA E PUBLICA",
+    "spots externos": "ILUMINACAO EXTERNA E PUBLICA",
+    "tartarugas led": "ILUMINACAO EXTERNA E PUBLICA",
+    "iluminacao publica": "ILUMINACAO EXTERNA E PUBLICA",
+    "refletor": "ILUMINACAO EXTERNA E PUBLICA",
+    "lampadas bulbo": "LAMPADAS E FITAS",
+    "lampada": "LAMPADAS E FITAS",
+    "fita led": "LAMPADAS E FITAS",
+    "mangueiras e decorativos led": "LAMPADAS E FITAS",
+    "componentes eletricos": "COMPONENTES E ACESSORIOS",
+    "acessorios eletricos": "COMPONENTES E ACESSORIOS",
+    "conectores e emendas": "COMPONENTES E ACESSORIOS",
+    "reles e sensores": "COMPONENTES E ACESSORIOS",
+    "driver/fonte": "COMPONENTES E ACESSORIOS",
+    "utilidades e operacao": "UTILIDADES E OPERACAO",
+    "moveis e utilidades": "UTILIDADES E OPERACAO",
+    "rodizios e movimentacao": "UTILIDADES E OPERACAO",
+    "suprimentos e operacao": "UTILIDADES E OPERACAO",
+}
+NAME_KEYWORD_PRIORITY: List[tuple[str, set[str]]] = [
+    (
+        "ILUMINACAO DECORATIVA",
+        {"pendente", "pendentes", "lustre", "lustres", "arandela", "arandelas", "abajur", "espelho"},
+    ),
+    (
+        "ILUMINACAO EXTERNA E PUBLICA",
+        {
+            "refletor",
+            "refletores",
+            "publica",
+            "publico",
+            "balizador",
+            "balizadores",
+            "espeto",
+            "espeto",
+            "tartaruga",
+            "tartarugas",
+        },
+    ),
+    (
+        "ILUMINACAO TECNICA",
+        {"luminaria", "luminarias", "plafon", "plafons", "trilho", "trilhos", "perfil", "perfis", "painel", "paineis", "spot", "spots"},
+    ),
+    (
+        "LAMPADAS E FITAS",
+        {"lampada", "lampadas", "fita", "fitas", "mangueira", "mangueiras", "bulbo", "bulbos"},
+    ),
+    (
+        "COMPONENTES E ACESSORIOS",
+        {
+            "rele",
+            "reles",
+            "sensor",
+            "sensores",
+            "conector",
+            "conectores",
+            "emenda",
+            "emendas",
+            "driver",
+            "drivers",
+            "fonte",
+            "fontes",
+            "bocal",
+            "bocais",
+            "rabicho",
+            "rabichos",
+            "base",
+            "bases",
+            "fotocelula",
+            "fotocelulas",
+        },
+    ),
+    (
+        "UTILIDADES E OPERACAO",
+        {
+            "rodizio",
+            "rodizios",
+            "cadeira",
+            "cadeiras",
+            "paleteira",
+            "paleteiras",
+            "suprimento",
+            "suprimentos",
+            "operacao",
+            "operacoes",
+        },
+    ),
+]
+
+# Token -> posicao do primeiro grupo de NAME_KEYWORD_PRIORITY que o contem.
+_KEYWORD_RANK: Dict[str, int] = {}
+for _rank, (_, _keywords) in enumerate(NAME_KEYWORD_PRIORITY):
+    for _keyword in _keywords:
+        _KEYWORD_RANK.setdefault(_keyword, _rank)
+_KEYWORD_TOKENS = frozenset(_KEYWORD_RANK)
+
+# Tokens reconhecidos por igualdade: token -> (categoria, apenas para pastas/estoque).
+_TOKEN_EXACT_RULES: Dict[str, Tuple[str, bool]] = {
+    "arandeda": ("ARANDELA", True),
+    "drive": ("DRIVER/FONTE", True),
+    "fita": ("FITA LED", False),
+    "lumi": ("LUMINARIA", False),
+    "lum": ("LUMINARIA", False),
+    "lumin": ("LUMINARIA", False),
+}
+# Prefixos na ordem de prioridade: (prefixo, categoria, apenas para pastas/estoque).
+_TOKEN_PREFIX_RULES: Tuple[Tuple[str, str, bool], ...] = (
+    ("arandel", "ARANDELA", False),
+    ("abajur", "ABAJUR", False),
+    ("pendente", "PENDENTE", False),
+    ("lustre", "LUSTRE", False),
+    ("painel", "PAINEL", False),
+    ("plafon", "PLAFON", False),
+    ("trilho", "TRILHO", False),
+    ("perfil", "PERFIL", False),
+    ("sensor", "SENSOR", False),
+    ("bocal", "BOCAL", False),
+    ("espeto", "ESPETO", False),
+    ("balizador", "BALIZADOR", False),
+    ("espelho", "ESPELHO", False),
+    ("rele", "RELE", True),
+    ("reflet", "REFLETOR", False),
+    ("holofote", "REFLETOR", False),
+    ("lamp", "LAMPADA", False),
+    ("driver", "DRIVER/FONTE", False),
+    ("fonte", "DRIVER/FONTE", False),
+    ("luminaria", "LUMINARIA", False),
+)
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _tokens(text: str, media: bool = False) -> Tuple[str, ...]:
+    text = text or ""
+    if not text.isascii():
+        text = normalize_for_match(text)
+        if media and not text.isascii():
+            # Pastas e estoque sempre compararam em maiusculas ("ß" vira "SS").
+            text = text.upper().lower()
+        if not text.isascii():
+            return tuple(TOKEN_PATTERN.findall(text))
+    return tuple(text.encode("ascii").translate(_ASCII_TOKEN_TABLE).decode("ascii").split())
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _token_category(token: str, media: bool) -> str | None:
+    exact = _TOKEN_EXACT_RULES.get(token)
+    if exact and (media or not exact[1]):
+        return exact[0]
+    for prefix, category, media_only in _TOKEN_PREFIX_RULES:
+        if token.startswith(prefix) and (media or not media_only):
+            return category
+    return None
+
+
+def _category_at(tokens: Tuple[str, ...], position: int, media: bool) -> str | None:
+    # "MINI TRILHO" e o unico caso que depende do token seguinte.
+    if tokens[position] == "mini" and position + 1 < len(tokens) and tokens[position + 1].startswith("trilho"):
+        return "TRILHO"
+    return _token_category(tokens[position], media)
+
+
+def _keyword_category(tokens: Tuple[str, ...]) -> str | None:
+    hits = _KEYWORD_TOKENS.intersection(tokens)
+    if not hits:
+        return None
+    return NAME_KEYWORD_PRIORITY[min(_KEYWORD_RANK[token] for token in hits)][0]
+
+
+def _build_dept_category(dept_code: str, sec_code: str) -> str:
+    dept = str(dept_code or "").strip()
+    sec = str(sec_code or "").strip()
+    mapped_pair = DEPT_SECTION_CATEGORY_MAP.get((dept, sec))
+    if mapped_pair:
+        return mapped_pair
+    mapped_dept = DEPT_CATEGORY_MAP.get(dept)
+    if mapped_dept:
+        return mapped_dept
+    if dept and sec:
+        return f"DEPTO {dept} / SEC {sec}"
+    if dept:
+        return f"DEPTO {dept}"
+    if sec:
+        return f"SEC {sec}"
+    return "Sem categoria"
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def infer_erp_category(
+    name: str,
+    description: str,
+    fallback_category: str,
+    dept_code: str,
+    sec_code: str,
+) -> str:
+    """Categoria de um registro do ERP: a informada, o tipo no nome/descricao ou depto/secao."""
+    fallback = str(fallback_category or "").strip()
+    if fallback and fallback.lower() != "sem categoria" and not NUMERIC_TEXT_PATTERN.fullmatch(fallback):
+        return fallback
+
+    for candidate in (name, description):
+        tokens = _tokens(candidate)
+        if not tokens:
+            continue
+        if "iluminacao" in tokens and "publica" in tokens:
+            return "ILUMINACAO PUBLICA"
+        if "fita" in tokens and "led" in tokens:
+            return "FITA LED"
+
+        for position in range(len(tokens)):
+            mapped = _category_at(tokens, position, media=False)
+            if mapped:
+                return mapped
+
+    return _build_dept_category(dept_code, sec_code)
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def business_category(category: str, name: str = "", description: str = "") -> str:
+    """Uma das categorias de negocio do catalogo para o produto."""
+    # Prioriza termos explicitos do nome/descricao para evitar itens "fora" da categoria esperada.
+    mapped = _keyword_category(_tokens(name) + _tokens(description))
+    if mapped:
+        return mapped
+
+    normalized = normalize_for_match(category).strip()
+    if normalized in BUSINESS_CATEGORY_MAP and normalized != "sem categoria":
+        return BUSINESS_CATEGORY_MAP[normalized]
+
+    return _keyword_category(_tokens(category)) or "OUTROS ITENS ERP"
+
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
+def canonical_category(category: str, product_name: str = "") -> str:
+    """Tipo de produto (ABAJUR, PENDENTE...) a partir da pasta/categoria ou do nome."""
+    for candidate in (category, product_name):
+        tokens = _tokens(candidate, media=True)
+        if not tokens:
+            continue
+
+        if "publica" in tokens and ("iluminacao" in tokens or "lum" in tokens or "lumin" in tokens):
+            return "ILUMINACAO PUBLICA"
+
+        mapped = [_category_at(tokens, position, media=True) for position in range(len(tokens))]
+        if mapped[0]:
+            return mapped[0]
+        for category_name in mapped[1:]:
+            if category_name and category_name != "LUMINARIA":
+                return category_name
+        if "LUMINARIA" in mapped:
+            return "LUMINARIA"
+
+        if "fita" in tokens and "led" in tokens:
+            return "FITA LED"
+
+    return "Sem categoria"
+
+
+def classify_many(rows: Iterable[Tuple[str, str, str]]) -> List[str]:
+    """Categoria de negocio de cada (categoria, nome, descricao), na ordem recebida."""
+    resolved: Dict[Tuple[str, str, str], str] = {}
+    categories: List[str] = []
+    for row in rows:
+        category = resolved.get(row)
+        if category is None:
+            category = resolved[row] = business_category(*row)
+        categories.append(category)
+    return categories
@@ -66,6 +66,8 @@ class Settings:
     cors_allow_origins: list[str]
     cors_allow_credentials: bool
     erp_admin_token: str | None
+    photo_watcher_enabled: bool
+    index_snapshot_enabled: bool
 
 
 def load_settings() -> Settings:
@@ -87,4 +89,12 @@ def load_settings() -> Settings:
             default=True,
         ),
         erp_admin_token=_optional_env(os.getenv("CATALOG_ERP_ADMIN_TOKEN")),
+        photo_watcher_enabled=_parse_bool_env(
+            os.getenv("CATALOG_PHOTO_WATCHER_ENABLED"),
+            default=True,
+        ),
+        index_snapshot_enabled=_parse_bool_env(
+            os.getenv("CATALOG_INDEX_SNAPSHOT_ENABLED"),
+            default=True,
+        ),
     )
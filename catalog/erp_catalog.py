@@ -2,14 +2,30 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
+from functools import lru_cache
 import json
+import logging
 import os
 from pathlib import Path
 import re
-import unicodedata
+from stat import S_ISDIR, S_ISREG
+import tempfile
+import threading
+from threading import Lock
+import time
 from urllib.parse import quote
-from typing import Any, Dict, List
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Mapping
+
+from .category_classifier import classify_many, infer_erp_category
+from .erp_store import ErpIndex, open_store, write_store
+from .json_stream import UnsupportedJsonShape, iter_json_records
+from .photo_index import RACY_MTIME_WINDOW_NS
+from .text_normalize import normalize_for_match
+
+
+logger = logging.getLogger(__name__)
 
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -26,7 +42,6 @@ PRODUCT_CONTAINER_KEYS = (
     "data",
 )
 CODE_PATTERN = re.compile(r"\d{3,12}")
-NUMERIC_TEXT_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
 DISCOVERY_PATTERNS = (
     "erp*.json",
     "pcprodut*.json",
@@ -35,6 +50,7 @@ DISCOVERY_PATTERNS = (
     "*catalog*.json",
 )
 JSON_TEXT_ENCODINGS = ("utf-8-sig", "utf-16", "latin-1")
+DEFAULT_COMPACT_AFTER_CHANGES = 200
 
 CODE_ALIASES = (
     "Codigo",
@@ -85,135 +101,26 @@ COVER_IMAGE_ALIASES = (
 )
 DEPT_ALIASES = ("CODEPTO", "CODDEPTO", "DEPTO", "DEPARTAMENTO")
 SECTION_ALIASES = ("CODSEC", "CODSECAO", "SEC", "SECAO")
-DEPT_SECTION_CATEGORY_MAP: Dict[tuple[str, str], str] = {
-    ("101", "107"): "MANGUEIRAS E DECORATIVOS LED",
-    ("102", "105"): "ACESSORIOS ELETRICOS",
-    ("102", "108"): "CONECTORES E EMENDAS",
-    ("102", "120"): "RELES E SENSORES",
-    ("103", "112"): "LAMPADAS BULBO",
-    ("103", "115"): "ILUMINACAO PUBLICA",
-    ("104", "116"): "TARTARUGAS LED",
-    ("104", "121"): "SPOTS EXTERNOS",
-    ("105", "117"): "MOVEIS E UTILIDADES",
-    ("106", "122"): "RODIZIOS E MOVIMENTACAO",
-    ("107", "123"): "SUPRIMENTOS E OPERACAO",
-}
-DEPT_CATEGORY_MAP: Dict[str, str] = {
-    "101": "ILUMINACAO INTERNA",
-    "102": "ACESSORIOS ELETRICOS",
-    "103": "LAMPADAS E ILUMINACAO PUBLICA",
-    "104": "ILUMINACAO EXTERNA",
-    "105": "MOVEIS E UTILIDADES",
-    "106": "RODIZIOS E MOVIMENTACAO",
-    "107": "SUPRIMENTOS E OPERACAO",
-}
-BUSINESS_CATEGORY_MAP: Dict[str, str] = {
-    "iluminacao decorativa": "ILUMINACAO DECORATIVA",
-    "iluminacao tecnica": "ILUMINACAO TECNICA",
-    "iluminacao externa e publica": "ILUMINACAO EXTERNA E PUBLICA",
-    "lampadas e fitas": "LAMPADAS E FITAS",
-    "componentes e acessorios": "COMPONENTES E ACESSORIOS",
-    "utilidades e operacao": "UTILIDADES E OPERACAO",
-    "outros itens erp": "OUTROS ITENS ERP",
-    "abajur": "ILUMINACAO DECORATIVA",
-    "arandela": "ILUMINACAO DECORATIVA",
-    "espelho": "ILUMINACAO DECORATIVA",
-    "lustre": "ILUMINACAO DECORATIVA",
-    "pendente": "ILUMINACAO DECORATIVA",
-    "painel": "ILUMINACAO TECNICA",
-    "plafon": "ILUMINACAO TECNICA",
-    "perfil": "ILUMINACAO TECNICA",
-    "trilho": "ILUMINACAO TECNICA",
-    "luminaria": "ILUMINACAO TECNICA",
-    "balizador": "ILUMINACAO EXTERNA E PUBLICA",
-    "espeto": "ILUMINACAO EXTERNA E PUBLICA",
-    "spots externos": "ILUMINACAO EXTERNA E PUBLICA",
-    "tartarugas led": "ILUMINACAO EXTERNA E PUBLICA",
-    "iluminacao publica": "ILUMINACAO EXTERNA E PUBLICA",
-    "refletor": "ILUMINACAO EXTERNA E PUBLICA",
-    "lampadas bulbo": "LAMPADAS E FITAS",
-    "lampada": "LAMPADAS E FITAS",
-    "fita led": "LAMPADAS E FITAS",
-    "mangueiras e decorativos led": "LAMPADAS E FITAS",
-    "componentes eletricos": "COMPONENTES E ACESSORIOS",
-    "acessorios eletricos": "COMPONENTES E ACESSORIOS",
-    "conectores e emendas": "COMPONENTES E ACESSORIOS",
-    "reles e sensores": "COMPONENTES E ACESSORIOS",
-    "driver/fonte": "COMPONENTES E ACESSORIOS",
-    "utilidades e operacao": "UTILIDADES E OPERACAO",
-    "moveis e utilidades": "UTILIDADES E OPERACAO",
-    "rodizios e movimentacao": "UTILIDADES E OPERACAO",
-    "suprimentos e operacao": "UTILIDADES E OPERACAO",
-}
-NAME_KEYWORD_PRIORITY: List[tuple[str, set[str]]] = [
-    (
-        "ILUMINACAO DECORATIVA",
-        {"pendente", "pendentes", "lustre", "lustres", "arandela", "arandelas", "abajur", "espelho"},
-    ),
-    (
-        "ILUMINACAO EXTERNA E PUBLICA",
-        {
-            "refletor",
-            "refletores",
-            "publica",
-            "publico",
-            "balizador",
-            "balizadores",
-            "espeto",
-            "espeto",
-            "tartaruga",
-            "tartarugas",
-        },
-    ),
-    (
-        "ILUMINACAO TECNICA",
-        {"luminaria", "luminarias", "plafon", "plafons", "trilho", "trilhos", "perfil", "perfis", "painel", "paineis", "spot", "spots"},
-    ),
-    (
-        "LAMPADAS E FITAS",
-        {"lampada", "lampadas", "fita", "fitas", "mangueira", "mangueiras", "bulbo", "bulbos"},
-    ),
-    (
-        "COMPONENTES E ACESSORIOS",
-        {
-            "rele",
-            "reles",
-            "sensor",
-            "sensores",
-            "conector",
-            "conectores",
-            "emenda",
-            "emendas",
-            "driver",
-            "drivers",
-            "fonte",
-            "fontes",
-            "bocal",
-            "bocais",
-            "rabicho",
-            "rabichos",
-            "base",
-            "bases",
-            "fotocelula",
-            "fotocelulas",
-        },
-    ),
-    (
-        "UTILIDADES E OPERACAO",
-        {
-            "rodizio",
-            "rodizios",
-            "cadeira",
-            "cadeiras",
-            "paleteira",
-            "paleteiras",
-            "suprimento",
-            "suprimentos",
-            "operacao",
-            "operacoes",
-        },
-    ),
-]
+@dataclass(frozen=True)
+class _ErpState:
+    index: Mapping[str, Dict[str, Any]]
+    version: int = 0
+    imported_at: str | None = None
+    # Versao da ultima alteracao incremental de cada codigo desde `tracked_since`.
+    changes: Dict[str, int] = field(default_factory=dict)
+    tracked_since: int = 0
+    log_entries: int = 0
+
+
+_EMPTY_ERP_STATE = _ErpState({})
+_ERP_INDEX_LOCK = Lock()
+# Caminho -> (mtime/tamanho do espelho, mtime/tamanho do log, offset lido do log, estado).
+_ERP_INDEX_CACHE: Dict[str, tuple[tuple[int, int], tuple[int, int] | None, int, _ErpState]] = {}
+_ERP_WRITE_LOCK = Lock()
+_COMPACTION_LOCK = Lock()
+_COMPACTION_THREAD: threading.Thread | None = None
+_DISCOVERY_LOCK = Lock()
+_DISCOVERY_CACHE: Dict[str, tuple[int, tuple[tuple[Path, Path], ...]]] = {}
 
 
 def _env_flag(name: str, default: bool = True) -> bool:
@@ -223,6 +130,15 @@ def _env_flag(name: str, default: bool = True) -> bool:
     return value.strip().lower() not in {"0", "false", "no", "off"}
 
 
+def _compact_after_changes() -> int:
+    raw_value = os.getenv("CATALOG_ERP_COMPACT_AFTER_CHANGES", "").strip()
+    try:
+        parsed = int(raw_value) if raw_value else DEFAULT_COMPACT_AFTER_CHANGES
+    except ValueError:
+        return DEFAULT_COMPACT_AFTER_CHANGES
+    return max(parsed, 1)
+
+
 def get_max_upload_size_bytes() -> int:
     value = os.getenv("CATALOG_ERP_MAX_UPLOAD_BYTES", "").strip()
     if not value:
@@ -236,139 +152,10 @@ def get_max_upload_size_bytes() -> int:
     return parsed
 
 
-def _normalized_tokens(text: str) -> List[str]:
-    normalized = re.sub(r"[^a-z0-9\s]", " ", _normalize_text(text or ""))
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return normalized.split() if normalized else []
-
-
-def _token_to_category(token: str, next_token: str = "") -> str | None:
-    token_upper = (token or "").upper()
-    next_upper = (next_token or "").upper()
-    if not token_upper:
-        return None
-
-    if token_upper.startswith("ARANDEL"):
-        return "ARANDELA"
-    if token_upper.startswith("ABAJUR"):
-        return "ABAJUR"
-    if token_upper.startswith("PENDENTE"):
-        return "PENDENTE"
-    if token_upper.startswith("LUSTRE"):
-        return "LUSTRE"
-    if token_upper.startswith("PAINEL"):
-        return "PAINEL"
-    if token_upper.startswith("PLAFON"):
-        return "PLAFON"
-    if token_upper == "MINI" and next_upper.startswith("TRILHO"):
-        return "TRILHO"
-    if token_upper.startswith("TRILHO"):
-        return "TRILHO"
-    if token_upper.startswith("PERFIL"):
-        return "PERFIL"
-    if token_upper.startswith("SENSOR"):
-        return "SENSOR"
-    if token_upper.startswith("BOCAL"):
-        return "BOCAL"
-    if token_upper.startswith("ESPETO"):
-        return "ESPETO"
-    if token_upper.startswith("BALIZADOR"):
-        return "BALIZADOR"
-    if token_upper.startswith("ESPELHO"):
-        return "ESPELHO"
-    if token_upper.startswith("REFLET") or token_upper.startswith("HOLOFOTE"):
-        return "REFLETOR"
-    if token_upper.startswith("LAMP"):
-        return "LAMPADA"
-    if token_upper.startswith("DRIVER") or token_upper.startswith("FONTE"):
-        return "DRIVER/FONTE"
-    if token_upper == "FITA":
-        return "FITA LED"
-    if token_upper.startswith("LUMINARIA") or token_upper in {"LUMI", "LUM", "LUMIN"}:
-        return "LUMINARIA"
-    return None
-
-
-def _is_numeric_text(value: str) -> bool:
-    return bool(NUMERIC_TEXT_PATTERN.fullmatch(value or ""))
-
-
-def _build_dept_category(dept_code: str, sec_code: str) -> str:
-    dept = str(dept_code or "").strip()
-    sec = str(sec_code or "").strip()
-    mapped_pair = DEPT_SECTION_CATEGORY_MAP.get((dept, sec))
-    if mapped_pair:
-        return mapped_pair
-    mapped_dept = DEPT_CATEGORY_MAP.get(dept)
-    if mapped_dept:
-        return mapped_dept
-    if dept and sec:
-        return f"DEPTO {dept} / SEC {sec}"
-    if dept:
-        return f"DEPTO {dept}"
-    if sec:
-        return f"SEC {sec}"
-    return "Sem categoria"
-
-
-def _infer_category(
-    name: str,
-    description: str,
-    fallback_category: str,
-    dept_code: str,
-    sec_code: str,
-) -> str:
-    fallback = str(fallback_category or "").strip()
-    if fallback and fallback.lower() != "sem categoria" and not _is_numeric_text(fallback):
-        return fallback
-
-    for candidate in (name, description):
-        tokens = _normalized_tokens(candidate)
-        if not tokens:
-            continue
-        if "iluminacao" in tokens and "publica" in tokens:
-            return "ILUMINACAO PUBLICA"
-        if "fita" in tokens and "led" in tokens:
-            return "FITA LED"
-
-        for idx, token in enumerate(tokens):
-            mapped = _token_to_category(token, tokens[idx + 1] if idx + 1 < len(tokens) else "")
-            if mapped:
-                return mapped
-
-    return _build_dept_category(dept_code, sec_code)
-
-
-def _to_business_category(category: str, name: str = "", description: str = "") -> str:
-    normalized = _normalize_text(category).strip()
-    name_desc_tokens = set(_normalized_tokens(f"{name} {description}"))
-
-    # Prioriza termos explicitos do nome/descricao para evitar itens "fora" da categoria esperada.
-    for mapped_category, keywords in NAME_KEYWORD_PRIORITY:
-        if any(token in name_desc_tokens for token in keywords):
-            return mapped_category
-
-    if normalized in BUSINESS_CATEGORY_MAP and normalized != "sem categoria":
-        return BUSINESS_CATEGORY_MAP[normalized]
-
-    tokens = set(_normalized_tokens(f"{category} {name} {description}"))
-    for mapped_category, keywords in NAME_KEYWORD_PRIORITY:
-        if any(token in tokens for token in keywords):
-            return mapped_category
-
-    return "OUTROS ITENS ERP"
-
-
-def _normalize_text(value: str) -> str:
-    normalized = unicodedata.normalize("NFD", value or "")
-    without_accents = "".join(
-        char for char in normalized if unicodedata.category(char) != "Mn"
-    )
-    return without_accents.lower()
-
-
+@lru_cache(maxsize=4096)
 def _normalize_key(value: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "", _normalize_text(value or ""))
+    # As mesmas chaves e aliases se repetem em todos os registros de uma carga.
+    return re.sub(r"[^a-z0-9]+", "", normalize_for_match(value or ""))
 
 
 def _stringify(value: Any) -> str:
@@ -421,6 +208,53 @@ def _resolve_json_target_path() -> Path:
     return DEFAULT_ERP_JSON_PATH
 
 
+def _discover_in_dir(root: Path) -> tuple[tuple[Path, Path], ...]:
+    """Pares (resolvido, original) dos JSON candidatos de uma pasta.
+
+    A listagem com os padroes de descoberta so e refeita quando o mtime da pasta muda.
+    """
+    try:
+        stat = root.stat()
+    except OSError:
+        return ()
+    if not S_ISDIR(stat.st_mode):
+        return ()
+
+    key = os.path.normcase(os.path.abspath(root))
+    with _DISCOVERY_LOCK:
+        cached = _DISCOVERY_CACHE.get(key)
+    if cached is not None and cached[0] == stat.st_mtime_ns:
+        return cached[1]
+
+    found: dict[Path, Path] = {}
+    for pattern in DISCOVERY_PATTERNS:
+        for item in root.glob(pattern):
+            if item.is_file():
+                found[item.resolve(strict=False)] = item
+    discovered = tuple(found.items())
+    # Pasta alterada ha pouco nao tem a listagem guardada: uma segunda alteracao
+    # no mesmo tick de mtime passaria despercebida.
+    if time.time_ns() - stat.st_mtime_ns > RACY_MTIME_WINDOW_NS:
+        with _DISCOVERY_LOCK:
+            _DISCOVERY_CACHE[key] = (stat.st_mtime_ns, discovered)
+    return discovered
+
+
+def _discover_json_files() -> dict[Path, Path]:
+    found: dict[Path, Path] = {}
+    for root in _resolve_erp_source_dirs():
+        for resolved, item in _discover_in_dir(root):
+            found[resolved] = item
+    return found
+
+
+def _modified_at(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return float("-inf")
+
+
 def _resolve_json_path() -> Path:
     target = _resolve_json_target_path()
     configured = os.getenv("CATALOG_ERP_JSON_PATH", "").strip()
@@ -433,25 +267,9 @@ def _resolve_json_path() -> Path:
     if not _env_flag("CATALOG_ERP_AUTO_DISCOVERY", default=True):
         return target
 
-    candidates: List[Path] = []
-    for root in _resolve_erp_source_dirs():
-        if not root.is_dir():
-            continue
-        for pattern in DISCOVERY_PATTERNS:
-            candidates.extend(
-                item
-                for item in root.glob(pattern)
-                if item.is_file()
-            )
-
+    candidates = _discover_json_files()
     if candidates:
-        unique_candidates = {item.resolve(): item for item in candidates}
-        ordered = sorted(
-            unique_candidates.values(),
-            key=lambda item: item.stat().st_mtime,
-            reverse=True,
-        )
-        return ordered[0]
+        return max(candidates.values(), key=_modified_at)
 
     return target
 
@@ -527,7 +345,7 @@ def _normalize_erp_record(record: Dict[str, Any]) -> Dict[str, Any] | None:
     description = _stringify(_pick_value(lookup, DESCRIPTION_ALIASES))
     dept_code = _stringify(_pick_value(lookup, DEPT_ALIASES))
     sec_code = _stringify(_pick_value(lookup, SECTION_ALIASES))
-    category = _infer_category(
+    category = infer_erp_category(
         name=name,
         description=description,
         fallback_category=_stringify(_pick_value(lookup, CATEGORY_ALIASES)),
@@ -644,44 +462,159 @@ def _resolve_candidate_file_path(file_path: str) -> Path:
     raise ValueError("ERP file not found")
 
 
+def _cache_key(path: Path) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _change_log_path(mirror: Path) -> Path:
+    return mirror.with_name(f"{mirror.stem}.changes.jsonl")
+
+
+def _write_erp_mirror(
+    target: Path,
+    products: Iterable[Dict[str, Any]],
+    imported_at: str,
+    version: int,
+) -> None:
+    """Grava o espelho um produto por vez, no mesmo formato de `json.dumps(..., indent=2)`.
+
+    O espelho novo ja contem tudo o que estava no log de alteracoes, que e descartado.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        with temp_path.open("w", encoding="utf-8") as handle:
+            handle.write(
+                '{\n  "imported_at": '
+                + json.dumps(imported_at)
+                + ',\n  "version": '
+                + json.dumps(version)
+                + ',\n  "products": ['
+            )
+            separator = "\n"
+            for product in products:
+                handle.write(separator)
+                # Quebras de linha dentro de textos saem escapadas, entao so a estrutura e reindentada.
+                handle.write("    " + json.dumps(product, ensure_ascii=False, indent=2).replace("\n", "\n    "))
+                separator = ",\n"
+            handle.write("]\n}" if separator == "\n" else "\n  ]\n}")
+        os.replace(temp_path, target)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    _change_log_path(target).unlink(missing_ok=True)
+    # Uma regravacao no mesmo tick de mtime e com o mesmo tamanho nao seria notada pelo cache.
+    with _ERP_INDEX_LOCK:
+        _ERP_INDEX_CACHE.pop(_cache_key(target), None)
+
+
+def _spool_erp_records(records: Iterable[Any], spool: BinaryIO) -> Dict[str, int]:
+    """Normaliza os registros um a um e grava cada um como uma linha JSON no spool.
+
+    Retorna o offset da ultima versao de cada codigo, na ordem da primeira
+    aparicao (a mesma regra de `_build_index`).
+    """
+    spool.seek(0)
+    spool.truncate()
+    offsets: Dict[str, int] = {}
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        normalized = _normalize_erp_record(record)
+        if not normalized:
+            continue
+        offsets[str(normalized["Codigo"])] = spool.tell()
+        spool.write(json.dumps(normalized, ensure_ascii=False).encode("utf-8") + b"\n")
+    return offsets
+
+
+def _spool_erp_source(source: Path, spool: BinaryIO) -> Dict[str, int]:
+    parse_error: Exception | None = None
+    for encoding in JSON_TEXT_ENCODINGS:
+        try:
+            with source.open("r", encoding=encoding) as handle:
+                return _spool_erp_records(iter_json_records(handle, PRODUCT_CONTAINER_KEYS), spool)
+        except UnsupportedJsonShape:
+            # Sem lista de registros (ex.: objeto codigo -> produto) o arquivo e lido inteiro.
+            return _spool_erp_records(_build_index(_load_json_file(source)).values(), spool)
+        except OSError as exc:
+            raise ValueError(f"unable to read ERP file: {exc}") from exc
+        except (UnicodeDecodeError, ValueError) as exc:
+            parse_error = exc
+    raise ValueError(f"invalid ERP JSON content: {parse_error}")
+
+
+def _read_spooled(spool: BinaryIO, offsets: Iterable[int]) -> Iterator[Dict[str, Any]]:
+    for offset in offsets:
+        spool.seek(offset)
+        yield json.loads(spool.readline())
+
+
+def _invalidate_derived_catalogs() -> None:
+    # Import tardio: o snapshot do catalogo depende deste modulo.
+    from .catalog_snapshot import refresh_after_erp_write
+
+    refresh_after_erp_write()
+
+
+def _import_erp_source(source: Path) -> Dict[str, Any]:
+    """Importa um arquivo JSON do ERP em fluxo, com memoria limitada ao indice de codigos."""
+    try:
+        if not source.stat().st_size:
+            raise ValueError("empty ERP JSON content")
+    except OSError as exc:
+        raise ValueError(f"unable to read ERP file: {exc}") from exc
+
+    target = _resolve_json_target_path()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryFile(dir=target.parent) as spool:
+        offsets = _spool_erp_source(source, spool)
+        if not offsets:
+            raise ValueError("no valid product records with code found in ERP payload")
+        imported_at = datetime.now(timezone.utc).isoformat()
+        with _ERP_WRITE_LOCK:
+            version = _load_erp_state(target).version + 1
+            _write_erp_mirror(target, _read_spooled(spool, offsets.values()), imported_at, version)
+    _invalidate_derived_catalogs()
+
+    return {
+        "path": str(target),
+        "products_imported": len(offsets),
+        "imported_at": imported_at,
+        "version": version,
+    }
+
+
 def import_erp_payload(payload: Any) -> Dict[str, Any]:
     index = _build_index(payload)
     if not index:
         raise ValueError("no valid product records with code found in ERP payload")
 
     imported_at = datetime.now(timezone.utc).isoformat()
-    stored_payload = {
-        "imported_at": imported_at,
-        "products": list(index.values()),
-    }
-
     target = _resolve_json_target_path()
-    target.parent.mkdir(parents=True, exist_ok=True)
-    target.write_text(
-        json.dumps(stored_payload, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+    with _ERP_WRITE_LOCK:
+        version = _load_erp_state(target).version + 1
+        _write_erp_mirror(target, index.values(), imported_at, version)
+    _invalidate_derived_catalogs()
 
     return {
         "path": str(target),
         "products_imported": len(index),
         "imported_at": imported_at,
+        "version": version,
     }
 
 
 def import_erp_file(file_path: str) -> Dict[str, Any]:
     source = _resolve_candidate_file_path(file_path)
-    payload = _load_json_file(source)
-    result = import_erp_payload(payload)
+    result = _import_erp_source(source)
     result["source_path"] = str(source)
     result["source_size_bytes"] = source.stat().st_size
     return result
 
 
-def receive_erp_file(filename: str, content: bytes) -> Dict[str, Any]:
-    if len(content) > get_max_upload_size_bytes():
-        raise ValueError("ERP upload too large")
-    payload = _parse_json_bytes(content)
+def reserve_erp_upload_path(filename: str) -> Path:
+    """Caminho livre na caixa de entrada para gravar um arquivo recebido."""
     safe_filename = _sanitize_json_filename(filename)
     inbox_dir = resolve_erp_inbox_dir()
     inbox_dir.mkdir(parents=True, exist_ok=True)
@@ -690,28 +623,35 @@ def receive_erp_file(filename: str, content: bytes) -> Dict[str, Any]:
     if target.exists():
         stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
         target = inbox_dir / f"{target.stem}_{stamp}{target.suffix}"
+    return target
 
-    target.write_bytes(content)
 
-    result = import_erp_payload(payload)
-    result["uploaded_path"] = str(target)
-    result["uploaded_size_bytes"] = target.stat().st_size
+def import_received_erp_file(path: Path) -> Dict[str, Any]:
+    """Importa um arquivo ja gravado na caixa de entrada; se ele for invalido, e removido."""
+    try:
+        result = _import_erp_source(path)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    result["uploaded_path"] = str(path)
+    result["uploaded_size_bytes"] = path.stat().st_size
     return result
 
 
+def receive_erp_file(filename: str, content: bytes) -> Dict[str, Any]:
+    if len(content) > get_max_upload_size_bytes():
+        raise ValueError("ERP upload too large")
+    if not content:
+        raise ValueError("empty ERP JSON content")
+    target = reserve_erp_upload_path(filename)
+    target.write_bytes(content)
+    return import_received_erp_file(target)
+
+
 def list_erp_files() -> List[Dict[str, Any]]:
     active_path = _resolve_json_path()
     active = active_path.resolve(strict=False)
-    seen: dict[Path, Path] = {}
-
-    for root in _resolve_erp_source_dirs():
-        if not root.is_dir():
-            continue
-        for pattern in DISCOVERY_PATTERNS:
-            for item in root.glob(pattern):
-                if not item.is_file():
-                    continue
-                seen[item.resolve(strict=False)] = item
+    seen = _discover_json_files()
 
     if active_path.is_file():
         seen[active] = active_path
@@ -733,29 +673,315 @@ def list_erp_files() -> List[Dict[str, Any]]:
     return files
 
 
-def load_erp_index() -> Dict[str, Dict[str, Any]]:
-    source = _resolve_json_path()
-    if not source.is_file():
-        return {}
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if not S_ISREG(stat.st_mode):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_mirror_state(source: Path, stamp: tuple[int, int]) -> _ErpState:
+    """Estado do JSON em `source`, lido do espelho binario quando ele corresponde ao carimbo.
+
+    Sem espelho binario valido, o JSON e decodificado uma vez e o binario e gravado
+    para as proximas cargas (inclusive em outros processos).
+    """
+    store = open_store(source, stamp)
+    if store is not None:
+        return _ErpState(ErpIndex(store), store.version, store.imported_at, {}, store.version, 0)
 
     try:
         payload = _load_json_file(source)
     except Exception:
-        return {}
+        return _EMPTY_ERP_STATE
 
     try:
-        return _build_index(payload)
+        index = _build_index(payload)
     except ValueError:
-        return {}
+        return _EMPTY_ERP_STATE
+
+    version = 0
+    imported_at = None
+    if isinstance(payload, dict):
+        try:
+            version = int(payload.get("version") or 0)
+        except (TypeError, ValueError):
+            version = 0
+        imported_at = payload.get("imported_at") if isinstance(payload.get("imported_at"), str) else None
+
+    # Um JSON regravado no mesmo tick de mtime e com o mesmo tamanho teria o mesmo carimbo.
+    if index and time.time_ns() - stamp[0] > RACY_MTIME_WINDOW_NS:
+        store = write_store(source, stamp, index, version, imported_at)
+        if store is not None:
+            return _ErpState(ErpIndex(store), version, imported_at, {}, version, 0)
+    return _ErpState(index, version, imported_at, {}, version, 0)
+
+
+def _read_change_log(path: Path, offset: int) -> tuple[List[Dict[str, Any]], int]:
+    """Entradas completas do log a partir de `offset` e o offset logo depois da ultima."""
+    try:
+        with path.open("rb") as handle:
+            handle.seek(offset)
+            data = handle.read()
+    except OSError:
+        return [], offset
+
+    # Uma linha sem quebra no fim ainda esta sendo gravada.
+    complete = data.rfind(b"\n") + 1
+    entries: List[Dict[str, Any]] = []
+    for line in data[:complete].splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as exc:
+            logger.warning("Skipping unreadable ERP change log entry in '%s': %s", path, exc)
+            continue
+        if isinstance(entry, dict):
+            entries.append(entry)
+    return entries, offset + complete
+
+
+def _patched_index(
+    index: Mapping[str, Dict[str, Any]],
+    changes: Dict[str, Dict[str, Any] | None],
+) -> Mapping[str, Dict[str, Any]]:
+    if isinstance(index, ErpIndex):
+        # Os registros do espelho binario continuam sem decodificar.
+        return index.patched(changes)
+    # Copia rasa: leitores do estado anterior continuam com um dict estavel.
+    patched = dict(index)
+    for code, record in changes.items():
+        if record is None:
+            patched.pop(code, None)
+        else:
+            patched[code] = record
+    return patched
+
+
+def _apply_changes(state: _ErpState, entries: List[Dict[str, Any]]) -> _ErpState:
+    if not entries:
+        return state
+    # Codigo -> registro novo, ou None quando removido.
+    pending: Dict[str, Dict[str, Any] | None] = {}
+    changes = dict(state.changes)
+    version = state.version
+    for entry in entries:
+        try:
+            entry_version = int(entry.get("version") or 0)
+        except (TypeError, ValueError):
+            continue
+        if entry_version <= version:
+            # Ja incorporada ao espelho (compactacao interrompida antes de apagar o log).
+            continue
+        for record in entry.get("upserts") or ():
+            code = str(record.get("Codigo") or "") if isinstance(record, dict) else ""
+            if code:
+                pending[code] = record
+                changes[code] = entry_version
+        for code in entry.get("deletes") or ():
+            pending[str(code)] = None
+            changes[str(code)] = entry_version
+        version = entry_version
+
+    if version == state.version:
+        return replace(state, log_entries=state.log_entries + len(entries))
+    return replace(
+        state,
+        index=_patched_index(state.index, pending),
+        version=version,
+        changes=changes,
+        log_entries=state.log_entries + len(entries),
+    )
+
+
+def _load_erp_state(source: Path) -> _ErpState:
+    """Espelho com o log de alteracoes aplicado; so relê o que mudou desde a ultima leitura.
+
+    Com o espelho intacto e o log apenas crescido, so as entradas novas do log sao aplicadas.
+    """
+    mirror = _file_stamp(source)
+    if mirror is None:
+        return _EMPTY_ERP_STATE
+    log_path = _change_log_path(source)
+    log = _file_stamp(log_path)
+
+    key = _cache_key(source)
+    with _ERP_INDEX_LOCK:
+        cached = _ERP_INDEX_CACHE.get(key)
+    if cached is not None and cached[0] == mirror:
+        if cached[1] == log:
+            return cached[3]
+        if log is not None and log[1] >= cached[2]:
+            entries, offset = _read_change_log(log_path, cached[2])
+            state = _apply_changes(cached[3], entries)
+            with _ERP_INDEX_LOCK:
+                _ERP_INDEX_CACHE[key] = (mirror, log, offset, state)
+            return state
+
+    state = _read_mirror_state(source, mirror)
+    offset = 0
+    if log is not None:
+        entries, offset = _read_change_log(log_path, 0)
+        state = _apply_changes(state, entries)
+    with _ERP_INDEX_LOCK:
+        _ERP_INDEX_CACHE[key] = (mirror, log, offset, state)
+    return state
+
+
+def load_erp_index() -> Mapping[str, Dict[str, Any]]:
+    """Indice normalizado do JSON ativo; so e relido quando caminho, tamanho ou mtime mudam.
+
+    Normalmente e um `ErpIndex` sobre o espelho binario, que decodifica cada produto
+    no primeiro acesso. O indice e compartilhado com o cache e nao deve ser alterado.
+    """
+    return _load_erp_state(_resolve_json_path()).index
+
+
+def get_erp_version() -> int:
+    """Versao do catalogo ERP; aumenta a cada importacao completa ou delta aplicado."""
+    return _load_erp_state(_resolve_json_path()).version
+
+
+def get_erp_fingerprint() -> tuple:
+    """Caminho do JSON ativo com o carimbo do espelho e do log, para caches derivados."""
+    source = _resolve_json_path()
+    return str(source), _file_stamp(source), _file_stamp(_change_log_path(source))
+
+
+def erp_changes_since(version: int) -> set[str] | None:
+    """Codigos alterados por deltas depois de `version`.
+
+    None indica que o indice foi substituido por inteiro desde entao (importacao
+    completa ou reinicio do processo) e todo cache derivado deve ser descartado.
+    """
+    state = _load_erp_state(_resolve_json_path())
+    if version < state.tracked_since:
+        return None
+    return {code for code, changed in state.changes.items() if changed > version}
+
+
+def _parse_erp_delta(payload: Any) -> tuple[List[Dict[str, Any]], List[str], int]:
+    if not isinstance(payload, dict):
+        raise ValueError("invalid ERP delta: expected object with upserts and/or deletes")
+    raw_upserts = payload.get("upserts") or []
+    raw_deletes = payload.get("deletes") or []
+    if not isinstance(raw_upserts, list) or not isinstance(raw_deletes, list):
+        raise ValueError("invalid ERP delta: upserts and deletes must be lists")
+
+    ignored = 0
+    upserts: Dict[str, Dict[str, Any]] = {}
+    for record in raw_upserts:
+        normalized = _normalize_erp_record(record) if isinstance(record, dict) else None
+        if not normalized:
+            ignored += 1
+            continue
+        upserts[str(normalized["Codigo"])] = normalized
+
+    deletes: Dict[str, None] = {}
+    for raw in raw_deletes:
+        value = _pick_value(_build_lookup(raw), CODE_ALIASES) if isinstance(raw, dict) else raw
+        code = _normalize_code(value)
+        if not code:
+            ignored += 1
+            continue
+        deletes[code] = None
+    return list(upserts.values()), list(deletes), ignored
+
+
+def _schedule_compaction() -> None:
+    global _COMPACTION_THREAD
+    with _COMPACTION_LOCK:
+        if _COMPACTION_THREAD is not None and _COMPACTION_THREAD.is_alive():
+            return
+
+        def run() -> None:
+            try:
+                compact_erp_changes()
+            except Exception as exc:
+                logger.warning("ERP change log compaction failed: %s", exc)
+
+        _COMPACTION_THREAD = threading.Thread(target=run, name="erp-compaction", daemon=True)
+        _COMPACTION_THREAD.start()
+
+
+def apply_erp_delta(payload: Any) -> Dict[str, Any]:
+    """Aplica upserts e remocoes por codigo ao indice gravado, sem reimportar o espelho.
+
+    Cada delta vira uma linha do log de alteracoes ao lado do espelho e incrementa
+    a versao do catalogo. Um codigo presente nas duas listas termina removido.
+    Depois de `CATALOG_ERP_COMPACT_AFTER_CHANGES` deltas o log e incorporado ao
+    espelho em segundo plano.
+    """
+    upserts, deletes, ignored = _parse_erp_delta(payload)
+    if not upserts and not deletes:
+        raise ValueError("no valid upserts or deletes with code found in ERP delta")
+
+    target = _resolve_json_target_path()
+    applied_at = datetime.now(timezone.utc).isoformat()
+    with _ERP_WRITE_LOCK:
+        if _file_stamp(target) is None:
+            # Sem espelho proprio: parte da carga ativa (ex.: descoberta automatica).
+            base = _load_erp_state(_resolve_json_path())
+            _write_erp_mirror(target, base.index.values(), base.imported_at or applied_at, base.version)
+
+        version = _load_erp_state(target).version + 1
+        entry = {"version": version, "applied_at": applied_at, "upserts": upserts, "deletes": deletes}
+        with _change_log_path(target).open("ab") as handle:
+            handle.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        # Le so a linha recem-gravada e publica o indice novo no cache.
+        state = _load_erp_state(target)
+    _invalidate_derived_catalogs()
+
+    if state.log_entries >= _compact_after_changes():
+        _schedule_compaction()
+
+    return {
+        "path": str(target),
+        "version": state.version,
+        "upserted": len(upserts),
+        "deleted": len(deletes),
+        "ignored": ignored,
+        "applied_at": applied_at,
+    }
+
+
+def compact_erp_changes() -> bool:
+    """Incorpora o log de alteracoes ao espelho; False quando nao ha nada a compactar."""
+    target = _resolve_json_target_path()
+    with _ERP_WRITE_LOCK:
+        state = _load_erp_state(target)
+        if not state.log_entries:
+            return False
+        imported_at = state.imported_at or datetime.now(timezone.utc).isoformat()
+        _write_erp_mirror(target, state.index.values(), imported_at, state.version)
+        mirror = _file_stamp(target)
+        if mirror is not None:
+            # Mesmo conteudo e versao: o historico de codigos alterados continua valendo.
+            with _ERP_INDEX_LOCK:
+                _ERP_INDEX_CACHE[_cache_key(target)] = (mirror, None, 0, replace(state, log_entries=0))
+    return True
+
+
+def clear_erp_cache() -> None:
+    with _ERP_INDEX_LOCK:
+        _ERP_INDEX_CACHE.clear()
+    with _DISCOVERY_LOCK:
+        _DISCOVERY_CACHE.clear()
 
 
 def get_erp_status() -> Dict[str, Any]:
     source = _resolve_json_path()
-    index = load_erp_index()
+    state = _load_erp_state(source)
     return {
         "path": str(source),
         "exists": source.is_file(),
-        "products_loaded": len(index),
+        "products_loaded": len(state.index),
+        "version": state.version,
+        "pending_changes": state.log_entries,
         "updated_at": datetime.fromtimestamp(source.stat().st_mtime, tz=timezone.utc).isoformat()
         if source.is_file()
         else None,
@@ -778,8 +1004,9 @@ def _merge_single_product(base: Dict[str, Any], erp: Dict[str, Any]) -> Dict[str
         if value:
             merged[field] = value
 
+    # A categoria de negocio e resolvida em lote por `merge_products_with_erp`.
     base_category = _stringify(merged.get("Categoria"))
-    erp_category = _infer_category(
+    erp_category = infer_erp_category(
         name=_stringify(erp.get("Nome")),
         description=_stringify(erp.get("Descricao")),
         fallback_category=_stringify(erp.get("Categoria")),
@@ -788,17 +1015,9 @@ def _merge_single_product(base: Dict[str, Any], erp: Dict[str, Any]) -> Dict[str
     )
     if base_category and base_category.lower() != "sem categoria":
         if erp_category and not erp_category.startswith("DEPTO "):
-            merged["Categoria"] = _to_business_category(
-                erp_category,
-                _stringify(merged.get("Nome")),
-                _stringify(merged.get("Descricao")),
-            )
+            merged["Categoria"] = erp_category
     else:
-        merged["Categoria"] = _to_business_category(
-            erp_category or "Sem categoria",
-            _stringify(merged.get("Nome")),
-            _stringify(merged.get("Descricao")),
-        )
+        merged["Categoria"] = erp_category or "Sem categoria"
 
     for field in ("URLFoto", "FotoBranco", "FotoAmbient", "FotoMedidas"):
         value = _stringify(erp.get(field))
@@ -820,7 +1039,7 @@ def _create_product_from_erp(erp: Dict[str, Any]) -> Dict[str, Any]:
         return {}
 
     cover_url, thumb_url = _placeholder_urls(code)
-    inferred_category = _infer_category(
+    inferred_category = infer_erp_category(
         name=_stringify(erp.get("Nome")),
         description=_stringify(erp.get("Descricao")),
         fallback_category=_stringify(erp.get("Categoria")),
@@ -831,11 +1050,7 @@ def _create_product_from_erp(erp: Dict[str, Any]) -> Dict[str, Any]:
         "Codigo": code,
         "Nome": _stringify(erp.get("Nome")) or f"Produto {code}",
         "Descricao": _stringify(erp.get("Descricao")),
-        "Categoria": _to_business_category(
-            inferred_category,
-            _stringify(erp.get("Nome")),
-            _stringify(erp.get("Descricao")),
-        ),
+        "Categoria": inferred_category,
         "Especificacoes": _stringify(erp.get("Especificacoes")),
         "URLFoto": _stringify(erp.get("URLFoto")) or cover_url,
         "FotoBranco": _stringify(erp.get("FotoBranco")) or _stringify(erp.get("URLFoto")) or thumb_url,
@@ -857,14 +1072,14 @@ def _code_sort_key(code: str) -> tuple[int, Any]:
 
 def _product_sort_key(product: Dict[str, Any]) -> tuple[Any, ...]:
     category = _stringify(product.get("Categoria")) or "Sem categoria"
-    sem_categoria = _normalize_text(category) == "sem categoria"
+    sem_categoria = normalize_for_match(category) == "sem categoria"
     name = _stringify(product.get("Nome"))
     code = _normalize_code(product.get("Codigo")) or _stringify(product.get("Codigo"))
     return (
         sem_categoria,
-        _normalize_text(category),
+        normalize_for_match(category),
         _code_sort_key(code),
-        _normalize_text(name),
+        normalize_for_match(name),
     )
 
 
@@ -872,12 +1087,37 @@ def sort_products_by_category(products: List[Dict[str, Any]]) -> List[Dict[str,
     return sorted(products, key=_product_sort_key)
 
 
-def merge_products_with_erp(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    erp_index = load_erp_index()
+def _strict_mode() -> bool:
+    return os.getenv("CATALOG_ERP_STRICT_MODE", "true").strip().lower() not in {"0", "false", "no"}
+
+
+def _with_business_categories(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    categories = classify_many(
+        (
+            _stringify(item.get("Categoria")),
+            _stringify(item.get("Nome")),
+            _stringify(item.get("Descricao")),
+        )
+        for item in products
+    )
+    normalized_categories: List[Dict[str, Any]] = []
+    for item, category in zip(products, categories):
+        normalized = dict(item)
+        normalized["Categoria"] = category
+        normalized_categories.append(normalized)
+    return normalized_categories
+
+
+def merge_products_with_erp(
+    products: List[Dict[str, Any]],
+    erp_index: Mapping[str, Dict[str, Any]] | None = None,
+) -> List[Dict[str, Any]]:
+    if erp_index is None:
+        erp_index = load_erp_index()
     if not erp_index:
         return products
 
-    strict_mode = os.getenv("CATALOG_ERP_STRICT_MODE", "true").strip().lower() not in {"0", "false", "no"}
+    strict_mode = _strict_mode()
     merged_products: List[Dict[str, Any]] = []
     seen_codes: set[str] = set()
 
@@ -898,14 +1138,42 @@ def merge_products_with_erp(products: List[Dict[str, Any]]) -> List[Dict[str, An
         if created:
             merged_products.append(created)
 
-    normalized_categories: List[Dict[str, Any]] = []
-    for item in merged_products:
-        normalized = dict(item)
-        normalized["Categoria"] = _to_business_category(
-            _stringify(normalized.get("Categoria")),
-            _stringify(normalized.get("Nome")),
-            _stringify(normalized.get("Descricao")),
-        )
-        normalized_categories.append(normalized)
+    return sort_products_by_category(_with_business_categories(merged_products))
+
+
+def merge_changed_products_with_erp(
+    products: List[Dict[str, Any]],
+    codes: Iterable[str],
+    erp_index: Mapping[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Mesma mescla de `merge_products_with_erp`, restrita a `codes` e sem ordenar.
+
+    `products` sao os produtos desses codigos antes da mescla. O resultado
+    substitui, na lista ja mesclada, todo produto com um desses codigos.
+    """
+    strict_mode = _strict_mode()
+    by_code: Dict[str, List[Dict[str, Any]]] = {}
+    for product in products:
+        code = _normalize_code(product.get("Codigo"))
+        if code:
+            by_code.setdefault(code, []).append(product)
+
+    merged_products: List[Dict[str, Any]] = []
+    for code in sorted(set(codes), key=_code_sort_key):
+        erp = erp_index.get(code)
+        if code not in by_code:
+            created = _create_product_from_erp(erp) if erp else {}
+            if created:
+                merged_products.append(created)
+            continue
+        for product in by_code[code]:
+            if erp:
+                merged_products.append(_merge_single_product(product, erp))
+            elif not strict_mode:
+                merged_products.append(product)
+    return _with_business_categories(merged_products)
+
 
-    return sort_products_by_category(normalized_categories)
+def product_code(product: Mapping[str, Any]) -> str | None:
+    """Codigo normalizado usado para casar um produto com o ERP."""
+    return _normalize_code(product.get("Codigo"))
@@ -0,0 +1,210 @@
+"""Espelho binario do indice ERP, com registros ordenados por codigo e lidos sob demanda.
+
+O arquivo e mapeado em memoria e cada produto so e decodificado quando acessado.
+Layout (inteiros little-endian):
+
+    MAGIC | tamanho u32 + cabecalho marshal | tamanho u32 + codigos separados por "\\n" |
+    N x (offset u64, tamanho u32) | registros marshal
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import Any, Dict, Iterator, Mapping
+
+from .cache import resolve_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+STORE_MAGIC = b"CATERP"
+STORE_FORMAT = 1
+STORE_DIRNAME = "erp"
+_SIZE = struct.Struct("<I")
+_ENTRY = struct.Struct("<QI")
+
+
+def _store_prefix(source: Path) -> str:
+    key = os.path.normcase(os.path.abspath(source)).encode("utf-8")
+    return hashlib.sha1(key).hexdigest()[:16]
+
+
+def store_path(source: Path, stamp: tuple[int, int]) -> Path:
+    # O carimbo no nome evita sobrescrever um arquivo ainda mapeado (no Windows, falharia).
+    return resolve_cache_dir() / STORE_DIRNAME / f"{_store_prefix(source)}-{stamp[0]}-{stamp[1]}.bin"
+
+
+def _header(stamp: tuple[int, int], version: int, imported_at: str | None, count: int) -> tuple:
+    # O formato do marshal muda entre versoes do Python.
+    return (STORE_FORMAT, tuple(sys.version_info[:2]), tuple(stamp), version, imported_at, count)
+
+
+class ErpRecordStore:
+    """Arquivo binario aberto; `record(i)` decodifica so o produto pedido."""
+
+    def __init__(self, path: Path, stamp: tuple[int, int]):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._map
+        if data[: len(STORE_MAGIC)] != STORE_MAGIC:
+            raise ValueError("not an ERP record store")
+        position = len(STORE_MAGIC)
+        (size,) = _SIZE.unpack_from(data, position)
+        position += _SIZE.size
+        header = marshal.loads(data[position : position + size])
+        position += size
+        if not isinstance(header, tuple) or header[:3] != _header(stamp, 0, None, 0)[:3]:
+            raise ValueError("stale ERP record store")
+        _, _, _, self.version, self.imported_at, count = header
+
+        (size,) = _SIZE.unpack_from(data, position)
+        position += _SIZE.size
+        self.codes = data[position : position + size].decode("utf-8").split("\n") if count else []
+        position += size
+        if len(self.codes) != count:
+            raise ValueError("corrupted ERP record store")
+        self._entries_at = position
+        self._decoded: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def position(self, code: str) -> int:
+        position = bisect_left(self.codes, code)
+        if position < len(self.codes) and self.codes[position] == code:
+            return position
+        return -1
+
+    def record(self, position: int) -> Dict[str, Any]:
+        record = self._decoded.get(position)
+        if record is None:
+            offset, size = _ENTRY.unpack_from(self._map, self._entries_at + position * _ENTRY.size)
+            record = marshal.loads(self._map[offset : offset + size])
+            self._decoded[position] = record
+        return record
+
+
+class ErpIndex(Mapping):
+    """Indice somente leitura sobre o arquivo, com as alteracoes dos deltas por cima.
+
+    No `overlay`, None marca um codigo removido.
+    """
+
+    def __init__(
+        self,
+        store: ErpRecordStore,
+        overlay: Dict[str, Dict[str, Any] | None] | None = None,
+        length: int | None = None,
+    ):
+        self._store = store
+        self._overlay = overlay or {}
+        self._length = len(store) if length is None else length
+
+    def __getitem__(self, code: str) -> Dict[str, Any]:
+        if code in self._overlay:
+            record = self._overlay[code]
+            if record is None:
+                raise KeyError(code)
+            return record
+        position = self._store.position(code)
+        if position < 0:
+            raise KeyError(code)
+        return self._store.record(position)
+
+    def __contains__(self, code: object) -> bool:
+        if code in self._overlay:
+            return self._overlay[code] is not None
+        return isinstance(code, str) and self._store.position(code) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        overlay = self._overlay
+        for code in self._store.codes:
+            if code not in overlay or overlay[code] is not None:
+                yield code
+        for code, record in overlay.items():
+            if record is not None and self._store.position(code) < 0:
+                yield code
+
+    def __len__(self) -> int:
+        return self._length
+
+    def patched(self, changes: Dict[str, Dict[str, Any] | None]) -> "ErpIndex":
+        """Novo indice com `changes` aplicadas; o arquivo e compartilhado."""
+        length = self._length
+        for code, record in changes.items():
+            length += (record is not None) - (code in self)
+        return ErpIndex(self._store, {**self._overlay, **changes}, length)
+
+
+def open_store(source: Path, stamp: tuple[int, int]) -> ErpRecordStore | None:
+    path = store_path(source, stamp)
+    try:
+        return ErpRecordStore(path, stamp)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError, struct.error) as exc:
+        logger.warning("Ignoring unreadable ERP record store %s: %s", path, exc)
+        return None
+
+
+def write_store(
+    source: Path,
+    stamp: tuple[int, int],
+    index: Mapping[str, Dict[str, Any]],
+    version: int,
+    imported_at: str | None,
+) -> ErpRecordStore | None:
+    """Grava o arquivo binario de `source` e remove os de carimbos anteriores."""
+    target = store_path(source, stamp)
+    codes = sorted(index)
+    header = marshal.dumps(_header(stamp, version, imported_at, len(codes)))
+    code_blob = "\n".join(codes).encode("utf-8")
+    records_at = len(STORE_MAGIC) + 2 * _SIZE.size + len(header) + len(code_blob) + len(codes) * _ENTRY.size
+
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, "wb") as handle:
+            handle.write(STORE_MAGIC)
+            handle.write(_SIZE.pack(len(header)))
+            handle.write(header)
+            handle.write(_SIZE.pack(len(code_blob)))
+            handle.write(code_blob)
+            # Tabela reservada agora e preenchida depois dos registros.
+            table_at = handle.tell()
+            handle.write(bytes(len(codes) * _ENTRY.size))
+            table = bytearray()
+            offset = records_at
+            for code in codes:
+                payload = marshal.dumps(index[code])
+                handle.write(payload)
+                table += _ENTRY.pack(offset, len(payload))
+                offset += len(payload)
+            handle.seek(table_at)
+            handle.write(table)
+        os.replace(temp_path, target)
+    except (OSError, ValueError) as exc:
+        logger.warning("Failed to write ERP record store %s: %s", target, exc)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return None
+
+    prefix = f"{_store_prefix(source)}-"
+    for stale in target.parent.glob(f"{prefix}*.bin"):
+        if stale != target:
+            try:
+                stale.unlink()
+            except OSError:
+                # Ainda mapeado por outro processo; sai na proxima gravacao.
+                pass
+    return open_store(source, stamp)
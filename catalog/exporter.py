@@ -3,28 +3,34 @@
 from __future__ import annotations
 
 import csv
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from io import BytesIO, StringIO
-import ipaddress
 import json
+import logging
 import mimetypes
 import os
 from pathlib import Path
 import re
-import socket
+import tempfile
 import textwrap
-from typing import Any, Dict, Iterable, List, Sequence
-import unicodedata
+import time
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Sequence
 from urllib.parse import parse_qs, unquote, urlparse
-from zipfile import ZIP_DEFLATED, ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont, ImageOps
-import requests
 
 from . import onedrive
+from .image_cache import RemoteImage, cached_remote_image
+from .photo_fetch import fetch_in_order, host_slot, http_session
+from .remote_hosts import host_verdict
+from .text_normalize import normalize_for_match
 
 
+logger = logging.getLogger(__name__)
+
 SUPPORTED_EXPORT_FORMATS = {"csv", "json", "xlsx", "xls", "pdf", "zip"}
 PREFERRED_COLUMNS = (
     "Codigo",
@@ -47,6 +53,12 @@ PHOTO_FIELDS: tuple[tuple[str, str], ...] = (
     ("Ambientada", "FotoAmbient"),
     ("Medidas", "FotoMedidas"),
 )
+# Formatos ja comprimidos: deflate gastaria CPU sem reduzir o tamanho.
+STORED_PHOTO_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+ZIP_CHUNK_BYTES = 64 * 1024
+# Fotos locais ate esse tamanho sao lidas inteiras antes de abrir a entrada no ZIP.
+LOCAL_PHOTO_BUFFER_BYTES = 16 * 1024 * 1024
+ZIP_DELIVERY_MODES = {"stream", "spool"}
 PAGE_SIZE = (1240, 1754)
 PAGE_MARGIN = 80
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -87,9 +99,7 @@ FEATURED_ATTRIBUTE_KEYS = (
 
 
 def _normalize_text(value: Any) -> str:
-    normalized = unicodedata.normalize("NFD", str(value or ""))
-    without_accents = "".join(char for char in normalized if unicodedata.category(char) != "Mn")
-    return without_accents.lower().strip()
+    return normalize_for_match(str(value or "")).strip()
 
 
 def _stringify(value: Any) -> str:
@@ -108,8 +118,13 @@ def _slugify(value: str, fallback: str = "catalogo") -> str:
     return slug or fallback
 
 
-def _load_products() -> List[Dict[str, Any]]:
-    return onedrive.list_local_products()
+# Codigo -> imagens locais, resolvidas sobre um unico estado dos indices de fotos.
+FindImages = Callable[[str], List[Dict[str, Any]]]
+
+
+def _load_products() -> Sequence[Dict[str, Any]]:
+    # Catalogo materializado: a exportacao inteira le uma unica versao.
+    return onedrive.get_catalog_snapshot().products
 
 
 def _max_remote_image_bytes() -> int:
@@ -123,21 +138,6 @@ def _max_remote_image_bytes() -> int:
     return parsed if parsed > 0 else 5 * 1024 * 1024
 
 
-def _is_public_ip_address(value: str) -> bool:
-    try:
-        address = ipaddress.ip_address(value)
-    except ValueError:
-        return False
-    return not (
-        address.is_private
-        or address.is_loopback
-        or address.is_link_local
-        or address.is_multicast
-        or address.is_reserved
-        or address.is_unspecified
-    )
-
-
 def _is_permitted_remote_image_url(url: str) -> bool:
     parsed = urlparse(url or "")
     if parsed.scheme not in {"http", "https"}:
@@ -149,55 +149,54 @@ def _is_permitted_remote_image_url(url: str) -> bool:
     if not hostname or hostname == "localhost" or hostname.endswith(".localhost"):
         return False
 
-    if _is_public_ip_address(hostname):
-        return True
-
     try:
-        resolved = socket.getaddrinfo(
-            hostname,
-            parsed.port or (443 if parsed.scheme == "https" else 80),
-            type=socket.SOCK_STREAM,
-        )
-    except socket.gaierror:
-        return False
-    except OSError:
-        return False
-
-    addresses = {item[4][0] for item in resolved if item and len(item) >= 5 and item[4]}
-    if not addresses:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
         return False
-    return all(_is_public_ip_address(address) for address in addresses)
+    # Veredito em cache por host; a sessao de fotos conecta nos mesmos enderecos conferidos.
+    return host_verdict(hostname, port).permitted
 
 
 def _download_remote_image_bytes(url: str) -> tuple[bytes | None, str]:
+    # Repeticoes saem do cache em disco; a checagem de destino vale para todo acesso a rede.
+    return cached_remote_image(url, _max_remote_image_bytes(), _fetch_permitted_image)
+
+
+def _fetch_permitted_image(url: str, max_bytes: int, validators: Dict[str, str]) -> RemoteImage | None:
     if not _is_permitted_remote_image_url(url):
-        return None, ""
+        return None
+    with host_slot(url):
+        return _fetch_remote_image(url, max_bytes, validators)
 
-    max_bytes = _max_remote_image_bytes()
 
+def _fetch_remote_image(url: str, max_bytes: int, validators: Dict[str, str]) -> RemoteImage:
     try:
-        response = requests.get(
+        response = http_session().get(
             url,
             timeout=8,
             stream=True,
             allow_redirects=False,
-            headers={"Accept": "image/*"},
+            headers={"Accept": "image/*", **validators},
         )
         response.raise_for_status()
     except Exception:
-        return None, ""
+        return RemoteImage(None)
+
+    if response.status_code == 304:
+        response.close()
+        return RemoteImage(None, not_modified=True)
 
     content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
     if content_type and not content_type.startswith("image/"):
         response.close()
-        return None, ""
+        return RemoteImage(None)
 
     declared_length = response.headers.get("content-length", "").strip()
     if declared_length:
         try:
             if int(declared_length) > max_bytes:
                 response.close()
-                return None, ""
+                return RemoteImage(None)
         except ValueError:
             pass
 
@@ -208,14 +207,19 @@ def _download_remote_image_bytes(url: str) -> tuple[bytes | None, str]:
                 continue
             payload.extend(chunk)
             if len(payload) > max_bytes:
-                return None, ""
+                return RemoteImage(None)
     finally:
         response.close()
 
     extension = Path(urlparse(url).path).suffix.lower()
     if not extension and content_type:
         extension = mimetypes.guess_extension(content_type) or ""
-    return bytes(payload), extension
+    return RemoteImage(
+        bytes(payload),
+        extension,
+        etag=response.headers.get("etag", ""),
+        last_modified=response.headers.get("last-modified", ""),
+    )
 
 
 def _filter_products(
@@ -521,7 +525,7 @@ def _product_attributes(product: Dict[str, Any]) -> List[tuple[str, str]]:
     return attributes
 
 
-def _photo_references(product: Dict[str, Any]) -> List[Dict[str, str]]:
+def _photo_references(product: Dict[str, Any], find_images: FindImages) -> List[Dict[str, str]]:
     code = _stringify(product.get("Codigo"))
     references: List[Dict[str, str]] = []
     seen: set[str] = set()
@@ -534,7 +538,7 @@ def _photo_references(product: Dict[str, Any]) -> List[Dict[str, str]]:
 
     if code:
         try:
-            for index, image in enumerate(onedrive.find_local_images_for_code(code), start=1):
+            for index, image in enumerate(find_images(code), start=1):
                 url = _stringify(image.get("url"))
                 if not url or url in seen:
                     continue
@@ -547,12 +551,19 @@ def _photo_references(product: Dict[str, Any]) -> List[Dict[str, str]]:
     return references
 
 
-def _resolve_photo_bytes(url: str) -> tuple[bytes | None, str]:
+def _local_asset_reference(url: str) -> str | None:
+    """Caminho relativo de uma URL `/catalog/local/asset?path=...`; None para outras URLs."""
     parsed = urlparse(url or "")
     path_value = parse_qs(parsed.query).get("path", [""])[0]
-
     if parsed.path.endswith("/catalog/local/asset") and path_value:
-        asset_path = onedrive.resolve_local_asset_path(unquote(path_value))
+        return unquote(path_value)
+    return None
+
+
+def _resolve_photo_bytes(url: str) -> tuple[bytes | None, str]:
+    rel_path = _local_asset_reference(url)
+    if rel_path is not None:
+        asset_path = onedrive.resolve_local_asset_path(rel_path)
         if not asset_path:
             return None, ""
         local_path = Path(asset_path)
@@ -561,14 +572,17 @@ def _resolve_photo_bytes(url: str) -> tuple[bytes | None, str]:
         except OSError:
             return None, local_path.suffix.lower()
 
-    if parsed.scheme not in {"http", "https"}:
+    if urlparse(url or "").scheme not in {"http", "https"}:
         return None, ""
 
     return _download_remote_image_bytes(url)
 
 
-def _open_image_for_export(url: str) -> Image.Image | None:
-    payload, _ = _resolve_photo_bytes(url)
+def _is_remote_photo(url: str) -> bool:
+    return _local_asset_reference(url) is None and urlparse(url or "").scheme in {"http", "https"}
+
+
+def _open_image_for_export(payload: bytes | None) -> Image.Image | None:
     if not payload:
         return None
 
@@ -585,7 +599,7 @@ def _open_image_for_export(url: str) -> Image.Image | None:
         return None
 
 
-def _build_product_pdf_pages(product: Dict[str, Any]) -> List[Image.Image]:
+def _build_product_pdf_pages(product: Dict[str, Any], find_images: FindImages) -> List[Image.Image]:
     brand_font = _load_font(68, bold=True)
     title_font = _load_font(28, bold=True)
     product_font = _load_font(36, bold=True)
@@ -600,7 +614,11 @@ def _build_product_pdf_pages(product: Dict[str, Any]) -> List[Image.Image]:
     specs = _stringify(product.get("Especificacoes")) or "Sem especificacoes cadastradas."
     attributes = _product_attributes(product)
     banner = _load_brand_banner()
-    images = [image for image in (_open_image_for_export(item["url"]) for item in _photo_references(product)[:4]) if image is not None]
+    fetched = fetch_in_order(
+        (item["url"] for item in _photo_references(product, find_images)[:4]),
+        _resolve_photo_bytes,
+    )
+    images = [image for image in (_open_image_for_export(result[0]) for _, result in fetched) if image is not None]
 
     featured_metrics = [
         ("Codigo", code),
@@ -809,7 +827,7 @@ def _build_pdf_bytes(
     code: str,
 ) -> bytes:
     pages = (
-        _build_product_pdf_pages(products[0])
+        _build_product_pdf_pages(products[0], onedrive.snapshot_local_images())
         if len(products) == 1
         else _build_catalog_pdf_pages(products, query=query, category=category, code=code)
     )
@@ -820,11 +838,12 @@ def _build_pdf_bytes(
 
 
 def _build_photo_manifest_rows(products: Sequence[Dict[str, Any]]) -> List[Dict[str, str]]:
+    find_images = onedrive.snapshot_local_images()
     rows: List[Dict[str, str]] = []
     for product in products:
         code = _stringify(product.get("Codigo"))
         name = _stringify(product.get("Nome"))
-        for reference in _photo_references(product):
+        for reference in _photo_references(product, find_images):
             rows.append(
                 {
                     "Codigo": code,
@@ -844,59 +863,212 @@ def _csv_from_rows(rows: Sequence[Dict[str, str]], columns: Sequence[str]) -> by
     return buffer.getvalue().encode("utf-8-sig")
 
 
-def _build_zip_bytes(
+class _ZipSink:
+    """Destino sem `seek` para o ZipFile: guarda o que foi escrito ate ser drenado.
+
+    Sem posicionamento, o ZipFile grava tamanhos e CRC de cada entrada num
+    descritor de dados depois do conteudo, em vez de voltar ao cabecalho.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _entry_compression(extension: str) -> int:
+    return ZIP_STORED if extension in STORED_PHOTO_EXTENSIONS else ZIP_DEFLATED
+
+
+def _read_error(exc: OSError) -> str:
+    # Sem o caminho: o manifesto vai para fora do servidor.
+    return f"falha ao ler a foto local: {exc.strerror or type(exc).__name__}"
+
+
+def _drop_zip_entry(zip_file: ZipFile, info: ZipInfo) -> None:
+    """Tira do diretorio central uma entrada que nao foi gravada por inteiro.
+
+    Os bytes ja enviados ficam no fluxo, mas leitores do ZIP nao listam a entrada.
+    """
+    if info in zip_file.filelist:
+        zip_file.filelist.remove(info)
+    if zip_file.NameToInfo.get(info.filename) is info:
+        del zip_file.NameToInfo[info.filename]
+
+
+def _write_local_photo_entry(
+    zip_file: ZipFile,
+    sink: _ZipSink,
+    entry_name: str,
+    local_path: Path,
+) -> Generator[bytes, None, tuple[str, str]]:
+    extension = local_path.suffix.lower()
+    try:
+        source = local_path.open("rb")
+    except OSError as exc:
+        return "", _read_error(exc)
+    with source:
+        try:
+            info = ZipInfo.from_file(local_path, f"{entry_name}{extension or '.bin'}", strict_timestamps=False)
+        except OSError as exc:
+            return "", _read_error(exc)
+        if not info.file_size:
+            return "", "foto local vazia"
+        info.compress_type = _entry_compression(extension)
+
+        if info.file_size <= LOCAL_PHOTO_BUFFER_BYTES:
+            # Leitura completa antes da entrada: uma falha nao deixa membro truncado.
+            try:
+                payload = source.read()
+            except OSError as exc:
+                return "", _read_error(exc)
+            zip_file.writestr(info, payload)
+            yield sink.drain()
+            return info.filename, ""
+
+        try:
+            with zip_file.open(info, "w") as entry:
+                while chunk := source.read(ZIP_CHUNK_BYTES):
+                    entry.write(chunk)
+                    yield sink.drain()
+        except OSError as exc:
+            logger.warning("Photo %s truncated in export: %s", local_path, exc)
+            _drop_zip_entry(zip_file, info)
+            return "", _read_error(exc)
+    return info.filename, ""
+
+
+def _write_photo_entry(
+    zip_file: ZipFile,
+    sink: _ZipSink,
+    entry_name: str,
+    url: str,
+    downloaded: tuple[bytes | None, str] | None,
+) -> Generator[bytes, None, tuple[str, str]]:
+    """Grava a foto como `entry_name` + extensao; devolve o nome no ZIP e o motivo da falha.
+
+    Fotos locais pequenas sao lidas inteiras e as grandes copiadas em blocos;
+    remotas chegam ja baixadas em `downloaded`. Sem imagem, o nome vem vazio.
+    """
+    rel_path = _local_asset_reference(url)
+    if rel_path is not None:
+        asset_path = onedrive.resolve_local_asset_path(rel_path)
+        if not asset_path:
+            return "", "foto local nao encontrada"
+        return (yield from _write_local_photo_entry(zip_file, sink, entry_name, Path(asset_path)))
+
+    if downloaded is None:
+        return "", "foto remota nao baixada"
+    payload, extension = downloaded
+    if not payload:
+        return "", "foto remota nao baixada"
+    info = ZipInfo(f"{entry_name}{extension or '.bin'}", date_time=time.localtime()[:6])
+    info.compress_type = _entry_compression(extension)
+    zip_file.writestr(info, payload)
+    yield sink.drain()
+    return info.filename, ""
+
+
+def _iter_photo_jobs(
+    products: Sequence[Dict[str, Any]],
+    find_images: FindImages,
+) -> Iterator[tuple[Dict[str, Any], int, Dict[str, str]]]:
+    for product in products:
+        for index, reference in enumerate(_photo_references(product, find_images), start=1):
+            yield product, index, reference
+
+
+def _iter_zip_chunks(
     products: Sequence[Dict[str, Any]],
     *,
     query: str,
     category: str,
     code: str,
     base_name: str,
-) -> bytes:
-    output = BytesIO()
+) -> Iterator[bytes]:
+    """Gera o ZIP em blocos, sem montar o arquivo inteiro nem voltar a posicoes ja enviadas."""
+    sink = _ZipSink()
     photo_manifest: List[Dict[str, str]] = []
+    find_images = onedrive.snapshot_local_images()
 
-    with ZipFile(output, mode="w", compression=ZIP_DEFLATED) as zip_file:
+    with ZipFile(sink, mode="w", compression=ZIP_DEFLATED) as zip_file:
         zip_file.writestr(f"{base_name}.csv", _build_csv_bytes(products))
+        yield sink.drain()
         zip_file.writestr(f"{base_name}.json", _build_json_bytes(products, query=query, category=category, code=code))
+        yield sink.drain()
         zip_file.writestr(
             "README.txt",
             (
                 "Pacote de exportacao do catalogo.\n"
                 "- Arquivos CSV/JSON contem os dados exportados.\n"
                 "- A pasta fotos/ contem imagens locais ou remotas que puderam ser baixadas.\n"
-                "- O manifesto_fotos.csv lista todas as referencias encontradas, mesmo quando a imagem nao foi baixada.\n"
+                "- O manifesto_fotos.csv lista todas as referencias encontradas, mesmo quando a imagem nao foi baixada;\n"
+                "  a coluna Erro diz por que a foto ficou fora do pacote.\n"
             ).encode("utf-8"),
         )
+        yield sink.drain()
 
-        for product in products:
+        # Fotos remotas sao baixadas em paralelo a frente da gravacao, que segue a ordem dos produtos.
+        fetched = fetch_in_order(
+            _iter_photo_jobs(products, find_images),
+            lambda job: _download_remote_image_bytes(job[2]["url"]),
+            should_fetch=lambda job: _is_remote_photo(job[2]["url"]),
+        )
+        for (product, index, reference), downloaded in fetched:
             product_code = _stringify(product.get("Codigo")) or "sem-codigo"
-            for index, reference in enumerate(_photo_references(product), start=1):
-                photo_label = reference["label"]
-                photo_url = reference["url"]
-                file_in_zip = ""
-                payload, extension = _resolve_photo_bytes(photo_url)
-                if payload:
-                    safe_label = _slugify(photo_label, fallback=f"imagem-{index}")
-                    resolved_extension = extension or ".bin"
-                    file_in_zip = f"fotos/{product_code}/{index:02d}_{safe_label}{resolved_extension}"
-                    zip_file.writestr(file_in_zip, payload)
-
-                photo_manifest.append(
-                    {
-                        "Codigo": product_code,
-                        "Nome": _stringify(product.get("Nome")),
-                        "Foto": photo_label,
-                        "URL": photo_url,
-                        "ArquivoZip": file_in_zip,
-                    }
-                )
+            photo_label = reference["label"]
+            photo_url = reference["url"]
+            safe_label = _slugify(photo_label, fallback=f"imagem-{index}")
+            file_in_zip, error = yield from _write_photo_entry(
+                zip_file,
+                sink,
+                f"fotos/{product_code}/{index:02d}_{safe_label}",
+                photo_url,
+                downloaded,
+            )
+            photo_manifest.append(
+                {
+                    "Codigo": product_code,
+                    "Nome": _stringify(product.get("Nome")),
+                    "Foto": photo_label,
+                    "URL": photo_url,
+                    "ArquivoZip": file_in_zip,
+                    "Erro": error,
+                }
+            )
 
         zip_file.writestr(
             "manifesto_fotos.csv",
-            _csv_from_rows(photo_manifest, ("Codigo", "Nome", "Foto", "URL", "ArquivoZip")),
+            _csv_from_rows(photo_manifest, ("Codigo", "Nome", "Foto", "URL", "ArquivoZip", "Erro")),
         )
+    yield sink.drain()
 
-    return output.getvalue()
+
+def _spool_chunks(chunks: Iterable[bytes], suffix: str) -> Path:
+    handle, name = tempfile.mkstemp(prefix="catalog-export-", suffix=suffix)
+    try:
+        with os.fdopen(handle, "wb") as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+    except BaseException:
+        os.remove(name)
+        raise
+    return Path(name)
+
+
+def _zip_delivery_mode() -> str:
+    value = os.getenv("CATALOG_EXPORT_ZIP_DELIVERY", "").strip().lower()
+    return value if value in ZIP_DELIVERY_MODES else "stream"
 
 
 def _response_metadata(format_name: str, *, base_name: str) -> tuple[str, str]:
@@ -917,13 +1089,35 @@ def _response_metadata(format_name: str, *, base_name: str) -> tuple[str, str]:
     raise ValueError("unsupported export format")
 
 
-def build_catalog_export(
+@dataclass(frozen=True)
+class CatalogExport:
+    """Exportacao pronta para envio.
+
+    Conforme o formato, o conteudo vem em `payload`, em `chunks` (gerados
+    durante o envio) ou em `path`, arquivo temporario que o chamador remove.
+    """
+
+    media_type: str
+    filename: str
+    payload: bytes = b""
+    chunks: Iterable[bytes] | None = None
+    path: Path | None = None
+
+
+def prepare_catalog_export(
     *,
     format_name: str,
     query: str = "",
     category: str = "",
     code: str = "",
-) -> tuple[bytes, str, str]:
+    zip_delivery: str | None = None,
+) -> CatalogExport:
+    """Valida os filtros e prepara a exportacao.
+
+    O ZIP e gerado em blocos (`CATALOG_EXPORT_ZIP_DELIVERY=stream`) ou gravado
+    antes num arquivo temporario (`spool`); os demais formatos vem em memoria.
+    Erros de formato ou filtro sem produtos geram ValueError antes de qualquer envio.
+    """
     normalized_format = format_name.lower().strip()
     if normalized_format not in SUPPORTED_EXPORT_FORMATS:
         raise ValueError("unsupported export format")
@@ -938,6 +1132,13 @@ def build_catalog_export(
         base_name = f"catalogo-{_slugify(category)}"
     else:
         base_name = "catalogo-produtos"
+    media_type, filename = _response_metadata(normalized_format, base_name=base_name)
+
+    if normalized_format == "zip":
+        chunks = _iter_zip_chunks(products, query=query, category=category, code=code, base_name=base_name)
+        if (zip_delivery or _zip_delivery_mode()) == "spool":
+            return CatalogExport(media_type, filename, path=_spool_chunks(chunks, ".zip"))
+        return CatalogExport(media_type, filename, chunks=chunks)
 
     if normalized_format == "csv":
         payload = _build_csv_bytes(products)
@@ -945,10 +1146,25 @@ def build_catalog_export(
         payload = _build_xlsx_bytes(products)
     elif normalized_format == "json":
         payload = _build_json_bytes(products, query=query, category=category, code=code)
-    elif normalized_format == "pdf":
-        payload = _build_pdf_bytes(products, query=query, category=category, code=code)
     else:
-        payload = _build_zip_bytes(products, query=query, category=category, code=code, base_name=base_name)
+        payload = _build_pdf_bytes(products, query=query, category=category, code=code)
+    return CatalogExport(media_type, filename, payload=payload)
 
-    media_type, filename = _response_metadata(normalized_format, base_name=base_name)
-    return payload, media_type, filename
+
+def build_catalog_export(
+    *,
+    format_name: str,
+    query: str = "",
+    category: str = "",
+    code: str = "",
+) -> tuple[bytes, str, str]:
+    """Exportacao inteira em memoria; para ZIPs grandes use `prepare_catalog_export`."""
+    export = prepare_catalog_export(
+        format_name=format_name,
+        query=query,
+        category=category,
+        code=code,
+        zip_delivery="stream",
+    )
+    payload = b"".join(export.chunks) if export.chunks is not None else export.payload
+    return payload, export.media_type, export.filename
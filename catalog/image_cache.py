@@ -0,0 +1,314 @@
+"""Cache em disco das imagens remotas baixadas pelas exportacoes.
+
+Cada URL tem um registro JSON (`urls/<sha256 da URL>.json`) que aponta para o
+conteudo gravado pelo proprio hash (`blobs/<xx>/<sha256>`); URLs com a mesma
+imagem dividem o arquivo. Registros novos sao servidos sem rede; depois de
+`CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS` a URL e conferida com
+ETag/Last-Modified. URLs bloqueadas ou com falha viram registros negativos por
+`CATALOG_EXPORT_IMAGE_CACHE_NEGATIVE_SECONDS`. O mtime do registro marca o
+ultimo uso: registros parados ha mais de `CATALOG_EXPORT_IMAGE_CACHE_MAX_AGE_SECONDS`
+ou alem de `CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES` saem do mais antigo ao mais novo.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+from threading import Lock
+import time
+from typing import Any, Callable, Dict, List
+
+from .cache import resolve_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = "images"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_REVALIDATE_SECONDS = 24 * 3600
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 3600
+DEFAULT_NEGATIVE_SECONDS = 15 * 60
+# Intervalo minimo entre varreduras por idade quando o limite de tamanho nao foi atingido.
+SWEEP_INTERVAL_SECONDS = 3600
+
+_SWEEP_LOCK = Lock()
+_USAGE_LOCK = Lock()
+# Bytes em blobs (None ate a primeira varredura) e horario da ultima varredura.
+_USAGE: int | None = None
+_SWEPT_AT = float("-inf")
+
+
+@dataclass(frozen=True)
+class RemoteImage:
+    """Resposta de um download: `payload` None indica falha, bloqueio ou imagem acima do limite."""
+
+    payload: bytes | None
+    extension: str = ""
+    etag: str = ""
+    last_modified: str = ""
+    not_modified: bool = False
+
+
+FetchImage = Callable[[str, int, Dict[str, str]], RemoteImage | None]
+
+
+def _env_int(name: str, default: int) -> int:
+    raw_value = os.getenv(name, "").strip()
+    try:
+        parsed = int(raw_value) if raw_value else default
+    except ValueError:
+        return default
+    return max(parsed, 0)
+
+
+def max_cache_bytes() -> int:
+    return _env_int("CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+
+
+def _cache_root() -> Path:
+    return resolve_cache_dir() / CACHE_DIRNAME
+
+
+def _entry_path(root: Path, url: str) -> Path:
+    return root / "urls" / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+
+def _blob_path(root: Path, digest: str) -> Path:
+    return root / "blobs" / digest[:2] / digest
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.{id(data)}.tmp")
+    try:
+        temp_path.write_bytes(data)
+        os.replace(temp_path, target)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_entry(path: Path) -> Dict[str, Any] | None:
+    try:
+        entry = json.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable image cache entry %s: %s", path, exc)
+        return None
+    return entry if isinstance(entry, dict) else None
+
+
+def _write_entry(path: Path, entry: Dict[str, Any]) -> None:
+    try:
+        _write_atomic(path, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+    except OSError as exc:
+        logger.warning("Failed to write image cache entry %s: %s", path, exc)
+
+
+def _read_blob(root: Path, entry: Dict[str, Any]) -> bytes | None:
+    try:
+        payload = _blob_path(root, str(entry.get("digest", ""))).read_bytes()
+    except OSError:
+        return None
+    # Blob truncado ou trocado no disco: trata como ausente.
+    if hashlib.sha256(payload).hexdigest() != entry.get("digest"):
+        return None
+    return payload
+
+
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _store(root: Path, url: str, image: RemoteImage) -> None:
+    global _USAGE
+    payload = image.payload or b""
+    digest = hashlib.sha256(payload).hexdigest()
+    blob = _blob_path(root, digest)
+    added = 0
+    if not blob.is_file():
+        try:
+            _write_atomic(blob, payload)
+        except OSError as exc:
+            logger.warning("Failed to write image cache blob %s: %s", blob, exc)
+            return
+        added = len(payload)
+    _write_entry(
+        _entry_path(root, url),
+        {
+            "url": url,
+            "status": "ok",
+            "digest": digest,
+            "size": len(payload),
+            "extension": image.extension,
+            "etag": image.etag,
+            "last_modified": image.last_modified,
+            "validated_at": time.time(),
+        },
+    )
+    with _USAGE_LOCK:
+        if _USAGE is not None:
+            _USAGE += added
+
+
+def _store_negative(path: Path, url: str, max_bytes: int) -> None:
+    _write_entry(path, {"url": url, "status": "negative", "max_bytes": max_bytes, "validated_at": time.time()})
+
+
+def cached_remote_image(url: str, max_bytes: int, fetch: FetchImage) -> tuple[bytes | None, str]:
+    """Imagem de `url` pelo cache em disco; `fetch` so e chamado quando o registro nao basta.
+
+    `fetch(url, max_bytes, cabecalhos condicionais)` retorna None quando a URL e
+    bloqueada. Imagens guardadas acima do `max_bytes` atual nao sao entregues.
+    """
+    limit = max_cache_bytes()
+    if not limit:
+        image = fetch(url, max_bytes, {})
+        if image is None or not image.payload:
+            return None, ""
+        return image.payload, image.extension
+
+    root = _cache_root()
+    entry_path = _entry_path(root, url)
+    entry = _read_entry(entry_path)
+    now = time.time()
+    validators: Dict[str, str] = {}
+    cached_payload: bytes | None = None
+
+    if entry is not None and entry.get("url") == url:
+        age = now - float(entry.get("validated_at", 0))
+        if entry.get("status") == "negative":
+            # Com o limite aumentado desde a falha, a URL merece nova tentativa.
+            negative_seconds = _env_int("CATALOG_EXPORT_IMAGE_CACHE_NEGATIVE_SECONDS", DEFAULT_NEGATIVE_SECONDS)
+            if age < negative_seconds and int(entry.get("max_bytes", 0)) >= max_bytes:
+                return None, ""
+        elif entry.get("status") == "ok":
+            if int(entry.get("size", 0)) > max_bytes:
+                return None, ""
+            cached_payload = _read_blob(root, entry)
+            if cached_payload is not None:
+                revalidate_seconds = _env_int("CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS", DEFAULT_REVALIDATE_SECONDS)
+                if age < revalidate_seconds:
+                    _touch(entry_path)
+                    return cached_payload, str(entry.get("extension", ""))
+                if entry.get("etag"):
+                    validators["If-None-Match"] = str(entry["etag"])
+                if entry.get("last_modified"):
+                    validators["If-Modified-Since"] = str(entry["last_modified"])
+
+    image = fetch(url, max_bytes, validators)
+    if image is not None and image.not_modified and cached_payload is not None:
+        _write_entry(entry_path, {**entry, "validated_at": now})
+        return cached_payload, str(entry.get("extension", ""))
+    if image is None or not image.payload:
+        if image is not None and cached_payload is not None:
+            # Falha ao revalidar: a copia guardada continua valendo ate a proxima tentativa.
+            _touch(entry_path)
+            return cached_payload, str(entry.get("extension", ""))
+        _store_negative(entry_path, url, max_bytes)
+        return None, ""
+
+    _store(root, url, image)
+    _maybe_sweep(root, limit)
+    return image.payload, image.extension
+
+
+def _maybe_sweep(root: Path, limit: int) -> None:
+    with _USAGE_LOCK:
+        due = _USAGE is None or _USAGE > limit or time.monotonic() - _SWEPT_AT > SWEEP_INTERVAL_SECONDS
+    # Uma varredura por vez; quem chega durante ela segue sem esperar.
+    if due and _SWEEP_LOCK.acquire(blocking=False):
+        try:
+            sweep_image_cache(locked=True)
+        finally:
+            _SWEEP_LOCK.release()
+
+
+def sweep_image_cache(locked: bool = False) -> int:
+    """Remove registros velhos e, acima do limite de tamanho, os menos usados; retorna bytes livres."""
+    if not locked:
+        with _SWEEP_LOCK:
+            return sweep_image_cache(locked=True)
+    global _USAGE, _SWEPT_AT
+    root = _cache_root()
+    limit = max_cache_bytes()
+    max_age = _env_int("CATALOG_EXPORT_IMAGE_CACHE_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)
+    now = time.time()
+
+    entries: List[tuple[float, Path, str]] = []
+    references: Dict[str, int] = {}
+    for path in (root / "urls").glob("*.json"):
+        entry = _read_entry(path)
+        try:
+            used_at = path.stat().st_mtime
+        except OSError:
+            continue
+        digest = str(entry.get("digest", "")) if entry and entry.get("status") == "ok" else ""
+        if entry is None or now - used_at > max_age:
+            _remove(path)
+            continue
+        entries.append((used_at, path, digest))
+        if digest:
+            references[digest] = references.get(digest, 0) + 1
+
+    sizes: Dict[str, int] = {}
+    freed = 0
+    for blob in (root / "blobs").glob("*/*"):
+        if blob.name.startswith("."):
+            continue
+        try:
+            size = blob.stat().st_size
+        except OSError:
+            continue
+        if blob.name not in references:
+            # Sem registro apontando (inclusive gravacao interrompida entre blob e registro).
+            _remove(blob)
+            freed += size
+            continue
+        sizes[blob.name] = size
+
+    usage = sum(sizes.values())
+    entries.sort()
+    for _, path, digest in entries:
+        if usage <= limit:
+            break
+        _remove(path)
+        if not digest:
+            continue
+        references[digest] -= 1
+        if not references[digest] and digest in sizes:
+            _remove(_blob_path(root, digest))
+            usage -= sizes[digest]
+            freed += sizes[digest]
+
+    with _USAGE_LOCK:
+        _USAGE = usage
+        _SWEPT_AT = time.monotonic()
+    return freed
+
+
+def _remove(path: Path) -> None:
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def clear_image_cache() -> None:
+    global _USAGE, _SWEPT_AT
+    shutil.rmtree(_cache_root(), ignore_errors=True)
+    with _USAGE_LOCK:
+        _USAGE = None
+        _SWEPT_AT = float("-inf")
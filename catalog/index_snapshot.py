@@ -0,0 +1,199 @@
+"""Snapshot em disco dos indices para partida rapida do servidor."""
+
+from __future__ import annotations
+
+import ast
+from contextlib import contextmanager
+from functools import lru_cache
+import gc
+import logging
+import marshal
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator
+
+from . import photo_index
+from .cache import resolve_cache_dir
+from .cadastro import export_cadastro_cache, restore_cadastro_cache
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"CATIDX"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_FILENAME = "index_snapshot.bin"
+# Modulos que classificam os arquivos dos indices. Mudancas neles ou em qualquer
+# modulo do pacote que importem (direta ou indiretamente) invalidam o snapshot.
+_CLASSIFIER_ENTRY_MODULES = (
+    "photo_index.py",
+    "local_catalog.py",
+    "stock_catalog.py",
+    "category_classifier.py",
+    "cadastro.py",
+)
+_SAVE_LOCK = threading.Lock()
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    # Os indices criam centenas de milhares de objetos de uma vez; coletas
+    # intermediarias so repassariam objetos que continuam vivos.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def snapshot_path() -> Path:
+    return resolve_cache_dir() / SNAPSHOT_FILENAME
+
+
+def _package_imports(path: Path) -> set[str]:
+    try:
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    names: set[str] = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom) or node.level != 1:
+            continue
+        if node.module:
+            names.add(node.module.split(".")[0] + ".py")
+        else:
+            names.update(alias.name + ".py" for alias in node.names)
+    return names
+
+
+@lru_cache(maxsize=1)
+def _classifier_modules() -> tuple[str, ...]:
+    """Modulos de classificacao e tudo que eles importam de dentro do pacote."""
+    package_dir = Path(__file__).resolve().parent
+    found: set[str] = set()
+    pending = list(_CLASSIFIER_ENTRY_MODULES)
+    while pending:
+        name = pending.pop()
+        path = package_dir / name
+        if name in found or not path.is_file():
+            continue
+        found.add(name)
+        pending.extend(_package_imports(path))
+    return tuple(sorted(found))
+
+
+def _snapshot_header() -> tuple:
+    package_dir = Path(__file__).resolve().parent
+    modules = []
+    for name in _classifier_modules():
+        try:
+            stat = (package_dir / name).stat()
+        except OSError:
+            continue
+        modules.append((name, stat.st_size, stat.st_mtime_ns))
+    # O formato do marshal muda entre versoes do Python.
+    return (SNAPSHOT_VERSION, tuple(sys.version_info[:2]), tuple(modules))
+
+
+def build_snapshot() -> Dict[str, Any]:
+    indexes = [state for state in (index.export_state() for index in photo_index.iter_photo_indexes()) if state]
+    return {"photo_indexes": indexes, "cadastro": export_cadastro_cache()}
+
+
+def save_snapshot(path: Path | None = None) -> bool:
+    """Grava o snapshot de forma atomica; processos concorrentes nunca leem arquivo parcial."""
+    target = path or snapshot_path()
+    try:
+        with _gc_paused():
+            payload = marshal.dumps((_snapshot_header(), build_snapshot()))
+    except ValueError as exc:
+        logger.warning("Index snapshot skipped, unsupported value: %s", exc)
+        return False
+
+    with _SAVE_LOCK:
+        temp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "wb") as handle:
+                handle.write(SNAPSHOT_MAGIC)
+                handle.write(payload)
+            os.replace(temp_path, target)
+        except OSError as exc:
+            logger.warning("Failed to write index snapshot %s: %s", target, exc)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+    return True
+
+
+def load_snapshot(path: Path | None = None) -> int:
+    """Restaura os indices do snapshot e retorna quantos foram carregados."""
+    target = path or snapshot_path()
+    try:
+        with open(target, "rb") as handle:
+            content = handle.read()
+    except OSError:
+        return 0
+    if not content.startswith(SNAPSHOT_MAGIC):
+        return 0
+
+    with _gc_paused():
+        return _restore_snapshot(target, content)
+
+
+def _restore_snapshot(target: Path, content: bytes) -> int:
+    try:
+        header, snapshot = marshal.loads(content[len(SNAPSHOT_MAGIC) :])
+    except Exception as exc:
+        logger.warning("Ignoring unreadable index snapshot %s: %s", target, exc)
+        return 0
+    if header != _snapshot_header():
+        return 0
+
+    restored = 0
+    for state in snapshot.get("photo_indexes", []):
+        if not os.path.isdir(state["root"]):
+            continue
+        index = photo_index.get_photo_index(state["root"], tuple(state["extensions"]))
+        if index.restore_state(state):
+            restored += 1
+    cadastro_state = snapshot.get("cadastro")
+    if cadastro_state and restore_cadastro_cache(cadastro_state):
+        restored += 1
+    return restored
+
+
+def verify_snapshot_in_background(
+    warmup: Callable[[], object],
+    save: bool = True,
+) -> threading.Thread:
+    """Confere os indices restaurados com o disco e grava um snapshot novo ao final.
+
+    `warmup` deve percorrer os mesmos caminhos das requisicoes (por exemplo, a
+    listagem de produtos) para que cada indice seja revalidado com o seu contexto.
+    """
+
+    def run() -> None:
+        started = time.perf_counter()
+        try:
+            with photo_index.verification():
+                warmup()
+        except Exception as exc:
+            logger.warning("Index warmup failed: %s", exc, exc_info=True)
+        finally:
+            for index in photo_index.iter_photo_indexes():
+                if index.restored:
+                    index.expire_restored()
+        logger.info("Indexes verified in %.2fs", time.perf_counter() - started)
+        if save:
+            save_snapshot()
+
+    thread = threading.Thread(target=run, name="index-snapshot", daemon=True)
+    thread.start()
+    return thread
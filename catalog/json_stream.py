@@ -0,0 +1,132 @@
+"""Leitura incremental dos registros de um JSON grande sem montar a arvore inteira.
+
+Cada elemento da lista de registros e decodificado com `raw_decode` sobre um
+buffer que so guarda o trecho ainda nao consumido do arquivo.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Iterator, TextIO
+
+
+READ_CHUNK_CHARS = 1 << 16
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+_DECODER = json.JSONDecoder()
+
+
+class UnsupportedJsonShape(Exception):
+    """O documento nao e uma lista nem um objeto com lista de registros conhecida."""
+
+
+class _JsonReader:
+    def __init__(self, handle: TextIO):
+        self.handle = handle
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.handle.read(READ_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        # Descarta o que ja foi consumido antes de crescer o buffer.
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Proximo caractere relevante (sem consumir), ou "" no fim do arquivo."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                decoded, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Um numero no fim do buffer pode continuar no proximo bloco ("12" de "12.5e3").
+            tail = end
+            while tail < len(self.buffer) and self.buffer[tail] in _NUMBER_CHARS:
+                tail += 1
+            if tail == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return decoded
+
+
+def _iter_array(reader: _JsonReader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or ']' at offset {reader.pos - 1}")
+
+
+def iter_json_records(handle: TextIO, container_keys: Iterable[str]) -> Iterator[Any]:
+    """Elementos da lista de registros, um por vez.
+
+    Aceita uma lista no topo ou um objeto; no objeto vale a primeira chave de
+    `container_keys` (na ordem do documento) cujo valor e uma lista, e os demais
+    valores sao lidos e descartados. Sem essa lista, gera `UnsupportedJsonShape`
+    depois de percorrer o objeto. JSON invalido gera ValueError.
+    """
+    keys = set(container_keys)
+    reader = _JsonReader(handle)
+    first = reader.peek()
+    if first == "[":
+        yield from _iter_array(reader)
+    elif first == "{":
+        reader.pos += 1
+        found = False
+        if reader.peek() == "}":
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise ValueError("object keys must be strings")
+                reader.expect(":")
+                if not found and key in keys and reader.peek() == "[":
+                    found = True
+                    yield from _iter_array(reader)
+                else:
+                    reader.value()
+                separator = reader.peek()
+                reader.pos += 1
+                if separator == "}":
+                    break
+                if separator != ",":
+                    raise ValueError(f"expected ',' or '}}' at offset {reader.pos - 1}")
+        if not found:
+            raise UnsupportedJsonShape()
+    else:
+        raise UnsupportedJsonShape()
+
+    if reader.peek():
+        raise ValueError("extra data after JSON document")
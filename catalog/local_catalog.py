@@ -2,27 +2,38 @@
 
 from __future__ import annotations
 
-import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import os
 from pathlib import Path
 import re
-import subprocess
-from typing import Callable, Dict, List
+from threading import Lock
+from typing import Callable, Dict, List, Mapping
 
+from .category_classifier import canonical_category
+from .photo_index import IncrementalPhotoIndex, get_photo_index, lookup_max_age_seconds
+from .photo_records import PhotoFile, PhotoRecord
 from .product_media import (
-    _canonical_category,
     _classify_variant,
-    _local_file_sort_key,
-    _pick_distinct_fallback,
+    _finalize_photo_record,
 )
+from .shell_link import resolve_link_target
 
 
 IMG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
 INDEX_EXTENSIONS = IMG_EXTENSIONS + (".lnk",)
 SEGMENT_PREFIX_CODE_PATTERN = re.compile(r"^\s*(?P<code>\d{3,8})(?=\D|$)")
 GENERIC_CODE_PATTERN = re.compile(r"\b(?P<code>\d{4,8})\b")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+VARIANT_SUFFIX_PATTERN = re.compile(r"\s*\(\d{1,3}\)\s*$")
+SHORTCUT_SUFFIX_PATTERN = re.compile(r"\s*-\s*(atalho|shortcut)\s*$", re.IGNORECASE)
+LEADING_SEPARATORS_PATTERN = re.compile(r"^[\s\-_]+")
 CATEGORY_STOP_TOKENS = {"C", "COM"}
 CATEGORY_TRIM_TAIL_TOKENS = {"C", "COM", "DE", "DA", "DO", "DOS", "DAS", "E"}
+# Milhares de arquivos compartilham poucas centenas de nomes de pasta.
+SEGMENT_CACHE_SIZE = 65536
+DIRECTORY_CACHE_SIZE = 16384
+MAX_ROOT_WORKERS = 4
 
 
 def _env_flag(name: str, default: bool = True) -> bool:
@@ -32,6 +43,10 @@ def _env_flag(name: str, default: bool = True) -> bool:
     return value.strip().lower() not in {"0", "false", "no", "off"}
 
 
+def merged_roots_enabled() -> bool:
+    return _env_flag("CATALOG_LOCAL_MERGE_ROOTS", default=False)
+
+
 def _local_products_paths(base_dir: str) -> List[str]:
     return [
         os.path.join(base_dir, "FOTOS_PRODUTOS"),
@@ -88,15 +103,13 @@ def resolve_local_products_root(path_override: str | None = None) -> str | None:
 
 
 def _clean_product_name(candidate: str) -> str:
-    cleaned = re.sub(r"\s+", " ", (candidate or "").strip(" -_"))
-    cleaned = re.sub(r"\s*\(\d{1,3}\)\s*$", "", cleaned)
-    cleaned = re.sub(r"\s*-\s*(atalho|shortcut)\s*$", "", cleaned, flags=re.IGNORECASE)
+    cleaned = WHITESPACE_PATTERN.sub(" ", (candidate or "").strip(" -_"))
+    cleaned = VARIANT_SUFFIX_PATTERN.sub("", cleaned)
+    cleaned = SHORTCUT_SUFFIX_PATTERN.sub("", cleaned)
     cleaned = cleaned.strip(" -_")
     if not cleaned:
         return ""
-    if re.fullmatch(r"[1-4]", cleaned):
-        return ""
-    if re.fullmatch(r"\d+", cleaned):
+    if cleaned.isdecimal():
         return ""
     return cleaned
 
@@ -135,37 +148,72 @@ def _extract_code_and_name_from_segment(segment: str) -> tuple[str | None, str]:
 
     code = pref.group("code")
     remainder = (segment[pref.end() :] if segment else "").strip()
-    remainder = re.sub(r"^[\s\-_]+", "", remainder)
+    remainder = LEADING_SEPARATORS_PATTERN.sub("", remainder)
     return code, _clean_product_name(remainder)
 
 
-def _extract_code_from_parts(parts: List[str]) -> tuple[str | None, str, str]:
-    raw_category = parts[0].strip() if len(parts) > 1 else ""
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _parse_segment(segment: str) -> tuple[str | None, str, str | None]:
+    """Codigo de prefixo, nome limpo e codigo generico de um segmento do caminho."""
+    code, product_name = _extract_code_and_name_from_segment(segment)
+    generic = GENERIC_CODE_PATTERN.search(segment)
+    return code, product_name, generic.group("code") if generic else None
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _category_for_product(category: str, product_name: str) -> str:
+    if category == "Sem categoria" and product_name:
+        category = _derive_category_from_product_name(product_name)
+    return canonical_category(category, product_name)
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _category_for_segment(category: str, segment: str) -> str:
+    return canonical_category(category, segment)
+
+
+@lru_cache(maxsize=DIRECTORY_CACHE_SIZE)
+def _parse_directory_parts(dir_parts: tuple[str, ...]) -> tuple[str, tuple | None, tuple | None]:
+    """Avalia as pastas de um caminho uma unica vez para todos os arquivos nelas.
+
+    Retorna a categoria bruta, o primeiro (codigo, nome) de prefixo e o primeiro
+    (codigo, segmento) generico, percorrendo da pasta mais interna para a raiz.
+    """
+    raw_category = dir_parts[0].strip() if dir_parts else ""
     if raw_category and not SEGMENT_PREFIX_CODE_PATTERN.search(raw_category):
         category = raw_category
     else:
         category = "Sem categoria"
 
-    filename_stem = Path(parts[-1]).stem if parts else ""
-    ordered_segments = [filename_stem]
-    ordered_segments.extend(reversed(parts[:-1]))
+    prefix_match = None
+    generic_match = None
+    for segment in reversed(dir_parts):
+        code, product_name, generic_code = _parse_segment(segment)
+        if code and prefix_match is None:
+            prefix_match = (code, product_name)
+        if generic_code and generic_match is None:
+            generic_match = (generic_code, segment)
+    return category, prefix_match, generic_match
+
+
+def _extract_code_from_parts(parts: List[str]) -> tuple[str | None, str, str]:
+    if not parts:
+        return None, "", canonical_category("Sem categoria", "")
 
-    for segment in ordered_segments:
-        code, product_name = _extract_code_and_name_from_segment(segment)
-        if code:
-            resolved_category = category
-            if resolved_category == "Sem categoria" and product_name:
-                resolved_category = _derive_category_from_product_name(product_name)
-            resolved_category = _canonical_category(resolved_category, product_name)
-            return code, product_name or f"Produto {code}", resolved_category
+    category, dir_prefix, dir_generic = _parse_directory_parts(tuple(parts[:-1]))
+    filename_stem = os.path.splitext(parts[-1])[0]
+    code, product_name, generic_code = _parse_segment(filename_stem)
 
-    for segment in ordered_segments:
-        generic = GENERIC_CODE_PATTERN.search(segment)
-        if generic:
-            code = generic.group("code")
-            return code, f"Produto {code}", _canonical_category(category, segment)
+    if not code and dir_prefix:
+        code, product_name = dir_prefix
+    if code:
+        return code, product_name or f"Produto {code}", _category_for_product(category, product_name)
 
-    return None, "", _canonical_category(category, "")
+    if generic_code:
+        return generic_code, f"Produto {generic_code}", _category_for_segment(category, filename_stem)
+    if dir_generic:
+        return dir_generic[0], f"Produto {dir_generic[0]}", _category_for_segment(category, dir_generic[1])
+    return None, "", _category_for_segment(category, "")
 
 
 def _rel_path_in_allowed_roots(abs_path: str, roots: List[str]) -> str | None:
@@ -185,160 +233,156 @@ def _rel_path_in_allowed_roots(abs_path: str, roots: List[str]) -> str | None:
     return None
 
 
-def resolve_shortcut_targets(scan_root: str) -> Dict[str, str]:
-    """Resolve arquivos .lnk em scan_root para caminhos absolutos de destino."""
-    if os.name != "nt":
-        return {}
-    if not scan_root or not os.path.isdir(scan_root):
-        return {}
+class ShortcutTargets(Mapping):
+    """Mapa link .lnk -> destino que le cada atalho sob demanda, com cache por arquivo."""
 
-    safe_root = scan_root.replace("'", "''")
-    script = (
-        f"$root = '{safe_root}'; "
-        "$shell = New-Object -ComObject WScript.Shell; "
-        "Get-ChildItem -Path $root -Recurse -File -Filter *.lnk | ForEach-Object { "
-        "  $target = ''; "
-        "  try { $target = $shell.CreateShortcut($_.FullName).TargetPath } catch {} "
-        "  [PSCustomObject]@{ link = $_.FullName; target = $target } "
-        "} | ConvertTo-Json -Compress"
-    )
+    def __init__(self, scan_root: str):
+        self.scan_root = os.path.abspath(scan_root)
 
-    try:
-        result = subprocess.run(
-            ["powershell", "-NoProfile", "-Command", script],
-            capture_output=True,
-            text=True,
-            check=False,
-            timeout=30,
-        )
-    except Exception:
+    def _contains_path(self, link_path: str) -> bool:
+        try:
+            return os.path.commonpath([self.scan_root, link_path]) == self.scan_root
+        except ValueError:
+            return False
+
+    def __getitem__(self, link_path: str) -> str:
+        absolute = os.path.abspath(link_path)
+        if not absolute.lower().endswith(".lnk") or not self._contains_path(absolute):
+            raise KeyError(link_path)
+        target = resolve_link_target(absolute)
+        if not target:
+            raise KeyError(link_path)
+        return target
+
+    def __iter__(self):
+        for dirpath, _, filenames in os.walk(self.scan_root):
+            for filename in filenames:
+                if filename.lower().endswith(".lnk"):
+                    link_path = os.path.join(dirpath, filename)
+                    if resolve_link_target(link_path):
+                        yield link_path
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def resolve_shortcut_targets(scan_root: str) -> Mapping[str, str]:
+    """Resolve arquivos .lnk em scan_root para caminhos absolutos de destino."""
+    if not scan_root or not os.path.isdir(scan_root):
         return {}
+    return ShortcutTargets(scan_root)
+
+
+def _local_file_classifier(
+    normalized_roots: List[str],
+    shortcut_targets: Callable[[], Mapping[str, str]],
+) -> Callable[[List[str], str], tuple | None]:
+    def classify(parts: List[str], full_path: str) -> tuple | None:
+        filename = parts[-1]
+        code, product_name, category = _extract_code_from_parts(parts)
+        if not code:
+            return None
+
+        if filename.lower().endswith(IMG_EXTENSIONS):
+            return code, product_name, category, PhotoFile(filename, full_path, os.sep.join(parts))
+
+        # Atalhos sem destino valido ainda registram o produto, mas sem arquivo.
+        target_path = shortcut_targets().get(os.path.abspath(full_path))
+        target_ext = os.path.splitext(target_path or "")[1].lower()
+        if target_ext not in IMG_EXTENSIONS:
+            return code, product_name, category, None
+        target_rel_path = _rel_path_in_allowed_roots(target_path, normalized_roots)
+        if not target_rel_path:
+            return code, product_name, category, None
+
+        link_name = filename[:-4] if filename.lower().endswith(".lnk") else filename
+        return code, product_name, category, PhotoFile(link_name, target_path, target_rel_path)
+
+    return classify
+
+
+def _build_local_record(code: str, entries: List[tuple]) -> PhotoRecord | None:
+    record: Dict | None = None
+    for _, product_name, category, file_info in entries:
+        if record is None:
+            record = {
+                "code": code,
+                "name": product_name or f"Produto {code}",
+                "category": category or "Sem categoria",
+                "files": [],
+                "variants": {"white_background": None, "ambient": None, "measures": None},
+            }
+        if product_name and record["name"].startswith("Produto "):
+            record["name"] = product_name
+        if category and record["category"] == "Sem categoria":
+            record["category"] = category
 
-    if result.returncode != 0:
-        return {}
+        if file_info is None:
+            continue
+        record["files"].append(file_info)
+        variant = _classify_variant(file_info["name"])
+        if variant in record["variants"] and record["variants"][variant] is None:
+            record["variants"][variant] = file_info
 
-    payload = (result.stdout or "").strip()
-    if not payload:
-        return {}
+    if record is None:
+        return None
+    return PhotoRecord.from_dict(_finalize_photo_record(record, code))
 
-    try:
-        decoded = json.loads(payload)
-    except Exception:
-        return {}
 
-    rows = decoded if isinstance(decoded, list) else [decoded]
-    mapping: Dict[str, str] = {}
-    for row in rows:
-        if not isinstance(row, dict):
-            continue
-        link = str(row.get("link") or "")
-        target = str(row.get("target") or "")
-        if link and target:
-            mapping[os.path.abspath(link)] = os.path.abspath(target)
-    return mapping
+def _normalized_allowed_roots(root_abs: str, allowed_roots: List[str] | None) -> List[str]:
+    normalized_roots = [os.path.abspath(item) for item in (allowed_roots or existing_local_roots())]
+    if root_abs not in normalized_roots:
+        normalized_roots = [root_abs, *normalized_roots]
+    return normalized_roots
 
 
 def scan_local_photo_index(
     root: str,
     allowed_roots: List[str] | None = None,
-    shortcut_targets: Dict[str, str] | None = None,
+    shortcut_targets: Mapping[str, str] | None = None,
+    workers: int | None = None,
 ) -> Dict[str, Dict]:
-    index: Dict[str, Dict] = {}
     root_abs = os.path.abspath(root)
-    normalized_roots = [os.path.abspath(item) for item in (allowed_roots or existing_local_roots())]
-    if root_abs not in normalized_roots:
-        normalized_roots = [root_abs, *normalized_roots]
-    shortcut_targets = shortcut_targets or {}
-
-    for dirpath, _, filenames in os.walk(root):
-        for filename in filenames:
-            lowered_name = filename.lower()
-            if not lowered_name.endswith(INDEX_EXTENSIONS):
-                continue
-
-            full_path = os.path.join(dirpath, filename)
-            rel_path = os.path.relpath(full_path, root)
-            parts = rel_path.split(os.sep)
-            code, product_name, category = _extract_code_from_parts(parts)
-            if not code:
-                continue
-
-            record = index.setdefault(
-                code,
-                {
-                    "code": code,
-                    "name": product_name or f"Produto {code}",
-                    "category": category or "Sem categoria",
-                    "files": [],
-                    "variants": {"white_background": None, "ambient": None, "measures": None},
-                },
-            )
-            if product_name and record["name"].startswith("Produto "):
-                record["name"] = product_name
-            if category and record["category"] == "Sem categoria":
-                record["category"] = category
-
-            if lowered_name.endswith(IMG_EXTENSIONS):
-                file_info = {"name": filename, "full_path": full_path, "rel_path": rel_path}
-                record["files"].append(file_info)
-                variant = _classify_variant(filename)
-                if variant in record["variants"] and record["variants"][variant] is None:
-                    record["variants"][variant] = file_info
-                continue
-
-            target_path = shortcut_targets.get(os.path.abspath(full_path))
-            target_ext = os.path.splitext(target_path or "")[1].lower()
-            if target_ext not in IMG_EXTENSIONS:
-                continue
-            target_rel_path = _rel_path_in_allowed_roots(target_path, normalized_roots)
-            if not target_rel_path:
-                continue
-
-            link_name = filename[:-4] if filename.lower().endswith(".lnk") else filename
-            file_info = {
-                "name": link_name,
-                "full_path": target_path,
-                "rel_path": target_rel_path,
-            }
-            record["files"].append(file_info)
-            variant = _classify_variant(link_name)
-            if variant in record["variants"] and record["variants"][variant] is None:
-                record["variants"][variant] = file_info
-
-    for record in index.values():
-        record["files"].sort(key=lambda item: _local_file_sort_key(item, record.get("code", "")))
-        chosen = set()
-
-        white = record["variants"]["white_background"]
-        if white is None and record["files"]:
-            white = record["files"][0]
-            record["variants"]["white_background"] = white
-        if white:
-            chosen.add(white["rel_path"])
-
-        ambient = record["variants"]["ambient"]
-        if ambient:
-            chosen.add(ambient["rel_path"])
-        else:
-            fallback = _pick_distinct_fallback(record["files"], chosen)
-            if fallback:
-                record["variants"]["ambient"] = fallback
-                chosen.add(fallback["rel_path"])
+    normalized_roots = _normalized_allowed_roots(root_abs, allowed_roots)
+    targets = shortcut_targets if shortcut_targets is not None else {}
+    return IncrementalPhotoIndex(root_abs, INDEX_EXTENSIONS, workers=workers).refresh(
+        _local_file_classifier(normalized_roots, lambda: targets),
+        _build_local_record,
+    )
 
-        measures = record["variants"]["measures"]
-        if not measures:
-            fallback = _pick_distinct_fallback(record["files"], chosen)
-            if fallback:
-                record["variants"]["measures"] = fallback
 
-    return index
+def refresh_local_photo_index(
+    root: str,
+    allowed_roots: List[str] | None = None,
+    shortcut_target_resolver: Callable[[str], Mapping[str, str]] = resolve_shortcut_targets,
+) -> Dict[str, Dict]:
+    """Atualiza o indice persistente da raiz relistando apenas pastas alteradas."""
+    root_abs = os.path.abspath(root)
+    normalized_roots = _normalized_allowed_roots(root_abs, allowed_roots)
+    resolved_targets: Mapping[str, str] = {}
+    resolved = False
+
+    def shortcut_targets() -> Mapping[str, str]:
+        # O resolvedor so roda quando uma pasta alterada contem atalhos.
+        nonlocal resolved_targets, resolved
+        if not resolved:
+            targets = shortcut_target_resolver(root_abs)
+            resolved_targets = targets if targets is not None else {}
+            resolved = True
+        return resolved_targets
+
+    return get_photo_index(root_abs, INDEX_EXTENSIONS).refresh(
+        _local_file_classifier(normalized_roots, shortcut_targets),
+        _build_local_record,
+        context_key=tuple(normalized_roots),
+    )
 
 
 def build_local_photo_index(
     root_path: str | None = None,
     resolve_root: Callable[[str | None], str | None] = resolve_local_products_root,
     existing_roots_resolver: Callable[[str | None], List[str]] = existing_local_roots,
-    shortcut_target_resolver: Callable[[str], Dict[str, str]] = resolve_shortcut_targets,
+    shortcut_target_resolver: Callable[[str], Mapping[str, str]] = resolve_shortcut_targets,
 ) -> Dict[str, Dict]:
     root = resolve_root(root_path)
     if not root:
@@ -350,21 +394,109 @@ def build_local_photo_index(
     )
 
 
+def merge_photo_records(sources: List[Mapping[str, Dict]]) -> Dict[str, Dict]:
+    """Junta os indices de varias raizes; cada codigo vem da primeira raiz que o contem.
+
+    O registro e usado inteiro (sem misturar arquivos), pois raizes aninhadas
+    como `01_PRODUTOS` e `01_PRODUTOS/BACKUP PRODUTOS` enxergam as mesmas fotos.
+    """
+    merged: Dict[str, Dict] = {}
+    for records in reversed(sources):
+        merged.update(records)
+    return merged
+
+
+_MERGE_LOCK = Lock()
+_MERGED_INDEXES: Dict[tuple[str, ...], tuple[tuple[Mapping[str, Dict], ...], Dict[str, Dict]]] = {}
+
+
+def _merged_local_index(roots: List[str], sources: List[Mapping[str, Dict]]) -> Dict[str, Dict]:
+    # Cada indice troca o mapa de registros quando muda; se nenhum trocou, a juncao anterior vale.
+    key = tuple(roots)
+    with _MERGE_LOCK:
+        cached = _MERGED_INDEXES.get(key)
+    if cached is not None and len(cached[0]) == len(sources):
+        if all(previous is current for previous, current in zip(cached[0], sources)):
+            return cached[1]
+    merged = merge_photo_records(sources)
+    with _MERGE_LOCK:
+        _MERGED_INDEXES[key] = (tuple(sources), merged)
+    return merged
+
+
+def _refresh_local_roots(
+    roots: List[str],
+    allowed_roots: List[str],
+    shortcut_target_resolver: Callable[[str], Mapping[str, str]],
+) -> List[Dict[str, Dict]]:
+    def refresh(root: str) -> Dict[str, Dict]:
+        return refresh_local_photo_index(
+            root,
+            allowed_roots=allowed_roots,
+            shortcut_target_resolver=shortcut_target_resolver,
+        )
+
+    if len(roots) == 1:
+        return [refresh(roots[0])]
+    with ThreadPoolExecutor(max_workers=min(len(roots), MAX_ROOT_WORKERS)) as pool:
+        return list(pool.map(refresh, roots))
+
+
 def get_local_index(
     path_override: str | None = None,
     existing_roots_resolver: Callable[[str | None], List[str]] = existing_local_roots,
-    shortcut_target_resolver: Callable[[str], Dict[str, str]] = resolve_shortcut_targets,
+    shortcut_target_resolver: Callable[[str], Mapping[str, str]] = resolve_shortcut_targets,
 ) -> Dict[str, Dict]:
+    """Indice da primeira raiz com fotos ou, com `CATALOG_LOCAL_MERGE_ROOTS`, de todas juntas."""
     roots = existing_roots_resolver(path_override)
     if not roots:
         return {}
 
+    allowed_roots = existing_roots_resolver(None)
+    if merged_roots_enabled():
+        roots = [os.path.abspath(root) for root in roots]
+        sources = _refresh_local_roots(roots, allowed_roots, shortcut_target_resolver)
+        return _merged_local_index(roots, sources)
+
     for root in roots:
-        rebuilt = scan_local_photo_index(
+        rebuilt = refresh_local_photo_index(
             root,
-            allowed_roots=existing_roots_resolver(None),
-            shortcut_targets=shortcut_target_resolver(os.path.abspath(root)),
+            allowed_roots=allowed_roots,
+            shortcut_target_resolver=shortcut_target_resolver,
         )
         if rebuilt:
             return rebuilt
     return {}
+
+
+def lookup_local_photo_record(
+    code: str,
+    path_override: str | None = None,
+    existing_roots_resolver: Callable[[str | None], List[str]] = existing_local_roots,
+    shortcut_target_resolver: Callable[[str], Mapping[str, str]] = resolve_shortcut_targets,
+) -> Dict | None:
+    """Consulta um codigo no indice persistente; so revalida o disco se o indice estiver velho."""
+    roots = existing_roots_resolver(path_override)
+    if not roots:
+        return None
+
+    max_age = lookup_max_age_seconds()
+    merged = merged_roots_enabled()
+    allowed_roots: List[str] | None = None
+    for root in roots:
+        records = get_photo_index(os.path.abspath(root), INDEX_EXTENSIONS).current_records(max_age)
+        if records is None:
+            if allowed_roots is None:
+                allowed_roots = existing_roots_resolver(None)
+            records = refresh_local_photo_index(
+                root,
+                allowed_roots=allowed_roots,
+                shortcut_target_resolver=shortcut_target_resolver,
+            )
+        if not records:
+            continue
+        record = records.get(str(code))
+        # No modo combinado, o codigo ausente numa raiz ainda pode estar nas seguintes.
+        if record is not None or not merged:
+            return record
+    return None
@@ -2,23 +2,25 @@
 
 import os
 import re
-from typing import List, Dict
+from typing import Callable, List, Dict, Mapping
 
+from . import catalog_snapshot as _catalog_snapshot
 from . import graph_catalog as _graph_catalog
 from . import local_catalog as _local_catalog
 from . import product_catalog as _product_catalog
 from .graph_client import get_share_info, list_children
 from .cache import cached
 from .local_catalog import IMG_EXTENSIONS
+from .category_classifier import canonical_category
 from .product_media import (
     _asset_url,
-    _canonical_category,
     _code_sort_key,
     _local_file_sort_key,
     _match_filename,
 )
 from .stock_catalog import (
     _enrich_stock_products_with_photos,
+    _get_stock_photo_index,
     _get_stock_photo_records_for_codes,
     _get_stock_photo_record_for_code,
     _load_products_from_available_stock_report,
@@ -69,7 +71,7 @@ def _normalize_category_label(value: str) -> str:
     return cleaned
 
 
-def _resolve_shortcut_targets(scan_root: str) -> Dict[str, str]:
+def _resolve_shortcut_targets(scan_root: str) -> Mapping[str, str]:
     return _local_catalog.resolve_shortcut_targets(scan_root)
 
 
@@ -92,7 +94,7 @@ def build_local_photo_index(root_path: str | None = None) -> Dict[str, Dict]:
 
 
 def _get_local_index(path_override: str | None = None) -> Dict[str, Dict]:
-    """Carrega o indice local do disco para refletir alteracoes de pasta imediatamente."""
+    """Revalida o indice local persistente, relistando so as pastas alteradas no disco."""
     return _local_catalog.get_local_index(
         path_override,
         existing_roots_resolver=_existing_local_roots,
@@ -100,6 +102,25 @@ def _get_local_index(path_override: str | None = None) -> Dict[str, Dict]:
     )
 
 
+def _lookup_local_photo_record(code: str, path_override: str | None = None) -> Dict | None:
+    return _local_catalog.lookup_local_photo_record(
+        code,
+        path_override,
+        existing_roots_resolver=_existing_local_roots,
+        shortcut_target_resolver=_resolve_shortcut_targets,
+    )
+
+
+def lookup_photo_record(code: str, path_override: str | None = None) -> Dict | None:
+    """Consulta as fotos de um unico codigo sem montar o catalogo nem revarrer as pastas."""
+    return _product_catalog.lookup_photo_record(
+        code,
+        path_override,
+        lookup_local_record=_lookup_local_photo_record,
+        lookup_stock_record=_get_stock_photo_record_for_code,
+    )
+
+
 def list_local_products(path_override: str | None = None) -> List[Dict]:
     return _product_catalog.list_local_products(
         path_override,
@@ -108,17 +129,51 @@ def list_local_products(path_override: str | None = None) -> List[Dict]:
         enrich_stock_products_with_photos=_enrich_stock_products_with_photos,
         get_stock_photo_records_for_codes=_get_stock_photo_records_for_codes,
         asset_url=_asset_url,
-        canonical_category=_canonical_category,
+        canonical_category=canonical_category,
         code_sort_key=_code_sort_key,
     )
 
 
+def _patch_local_products(products, codes: set[str]) -> List[Dict] | None:
+    return _product_catalog.patch_local_products(
+        products,
+        codes,
+        get_local_index=_get_local_index,
+        load_stock_products=_load_products_from_available_stock_report,
+        enrich_stock_products_with_photos=_enrich_stock_products_with_photos,
+        get_stock_photo_records_for_codes=_get_stock_photo_records_for_codes,
+        asset_url=_asset_url,
+        canonical_category=canonical_category,
+    )
+
+
+def _catalog_source_stamps() -> tuple:
+    return _catalog_snapshot.source_stamps(_existing_local_roots())
+
+
+def get_catalog_snapshot() -> _catalog_snapshot.CatalogSnapshot:
+    """Catalogo local materializado; a conferencia das fontes roda em segundo plano."""
+    return _catalog_snapshot.get_catalog_snapshot(list_local_products, _catalog_source_stamps, _patch_local_products)
+
+
+def refresh_catalog_snapshot(force: bool = False) -> _catalog_snapshot.CatalogSnapshot:
+    return _catalog_snapshot.refresh_catalog_snapshot(
+        list_local_products,
+        _catalog_source_stamps,
+        force=force,
+        patch=_patch_local_products,
+    )
+
+
+def schedule_catalog_refresh() -> None:
+    _catalog_snapshot.schedule_catalog_refresh(list_local_products, _catalog_source_stamps, _patch_local_products)
+
+
 def categorize_local_photos(code: str, path_override: str | None = None) -> Dict[str, str | None]:
     return _product_catalog.categorize_local_photos(
         code,
         path_override,
-        get_local_index=_get_local_index,
-        get_stock_photo_record_for_code=_get_stock_photo_record_for_code,
+        lookup_photo_record=lookup_photo_record,
         asset_url=_asset_url,
     )
 
@@ -127,13 +182,42 @@ def find_local_images_for_code(code: str, path_override: str | None = None) -> L
     return _product_catalog.find_local_images_for_code(
         code,
         path_override,
-        get_local_index=_get_local_index,
-        get_stock_photo_record_for_code=_get_stock_photo_record_for_code,
+        lookup_photo_record=lookup_photo_record,
         local_file_sort_key=_local_file_sort_key,
         asset_url=_asset_url,
     )
 
 
+def snapshot_local_images() -> Callable[[str], List[Dict]]:
+    """`find_local_images_for_code` sobre um unico estado dos indices de fotos.
+
+    Para exportacoes: os indices sao revalidados uma vez, na primeira consulta,
+    e cada produto e resolvido em memoria.
+    """
+    lookup: Callable[[str], Dict | None] | None = None
+
+    def lookup_record(code: str, path_override: str | None) -> Dict | None:
+        nonlocal lookup
+        if lookup is None:
+            lookup = _product_catalog.photo_lookup_snapshot(
+                path_override,
+                get_local_index=_get_local_index,
+                get_stock_photo_index=_get_stock_photo_index,
+            )
+        return lookup(code)
+
+    def find(code: str) -> List[Dict]:
+        return _product_catalog.find_local_images_for_code(
+            code,
+            None,
+            lookup_photo_record=lookup_record,
+            local_file_sort_key=_local_file_sort_key,
+            asset_url=_asset_url,
+        )
+
+    return find
+
+
 def resolve_local_asset_path(rel_path: str, path_override: str | None = None) -> str | None:
     return _product_catalog.resolve_local_asset_path(
         rel_path,
@@ -0,0 +1,164 @@
+"""Busca concorrente das fotos de uma exportacao.
+
+Um pool limitado de threads resolve as fotos a frente de quem grava o arquivo,
+com limite de conexoes simultaneas por host e uma sessao HTTP compartilhada
+que reaproveita conexoes. Os resultados saem na mesma ordem das entradas.
+Sem proxy, a sessao conecta no endereco fixado pelo veredito do host
+(`remote_hosts`), nunca numa resolucao de DNS propria.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+import os
+from threading import BoundedSemaphore, Lock
+from typing import Callable, Deque, Dict, Iterable, Iterator, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import InvalidURL
+from requests.utils import select_proxy
+
+from .remote_hosts import pinned_address
+
+
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 4
+# Itens (buscados ou nao) a frente do consumidor, por worker.
+LOOKAHEAD_PER_WORKER = 2
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+_SESSION_LOCK = Lock()
+_SESSION: requests.Session | None = None
+_HOST_LOCK = Lock()
+_HOST_SLOTS: Dict[str, BoundedSemaphore] = {}
+
+
+def _positive_env_int(name: str, default: int) -> int:
+    raw_value = os.getenv(name, "").strip()
+    try:
+        parsed = int(raw_value) if raw_value else default
+    except ValueError:
+        return default
+    return parsed if parsed > 0 else default
+
+
+def fetch_workers() -> int:
+    return _positive_env_int("CATALOG_EXPORT_FETCH_WORKERS", DEFAULT_FETCH_WORKERS)
+
+
+def per_host_limit() -> int:
+    return _positive_env_int("CATALOG_EXPORT_FETCH_PER_HOST", DEFAULT_PER_HOST_LIMIT)
+
+
+class _PinnedAddressAdapter(HTTPAdapter):
+    """Abre a conexao no endereco conferido para o host, mantendo Host, SNI e certificado pelo nome."""
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # Com proxy, quem resolve o destino e o proxy.
+        if select_proxy(request.url, proxies):
+            return super().get_connection_with_tls_context(request, verify, proxies, cert)
+        try:
+            host_params, pool_kwargs = self.build_connection_pool_key_attributes(request, verify, cert)
+        except ValueError as exc:
+            raise InvalidURL(exc, request=request)
+
+        hostname = host_params["host"]
+        port = host_params["port"] or (443 if host_params["scheme"] == "https" else 80)
+        address = pinned_address(hostname, port)
+        if address is None:
+            raise InvalidURL(f"host not permitted: {hostname}", request=request)
+        if host_params["scheme"] == "https":
+            pool_kwargs = {**pool_kwargs, "server_hostname": hostname, "assert_hostname": hostname}
+        return self.poolmanager.connection_from_host(**{**host_params, "host": address}, pool_kwargs=pool_kwargs)
+
+    def get_connection(self, url, proxies=None):
+        # So requests < 2.32.2 chega aqui, sem o gancho acima: recusa em vez de resolver o nome de novo.
+        if select_proxy(url, proxies):
+            return super().get_connection(url, proxies)
+        raise InvalidURL("address pinning requires requests>=2.32.2")
+
+    def add_headers(self, request, **kwargs):
+        # Sem isto o Host enviado seria o endereco do pool.
+        netloc = urlparse(request.url).netloc.rpartition("@")[2]
+        request.headers.setdefault("Host", netloc)
+
+
+def http_session() -> requests.Session:
+    """Sessao compartilhada entre exportacoes; nao guarda cookies entre requisicoes."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = _PinnedAddressAdapter(pool_connections=32, pool_maxsize=max(fetch_workers(), per_host_limit()))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
+
+
+@contextmanager
+def host_slot(url: str) -> Iterator[None]:
+    """Reserva uma das conexoes permitidas para o host de `url`, em todo o processo."""
+    host = (urlparse(url).hostname or "").lower()
+    with _HOST_LOCK:
+        slot = _HOST_SLOTS.get(host)
+        if slot is None:
+            slot = BoundedSemaphore(per_host_limit())
+            _HOST_SLOTS[host] = slot
+    with slot:
+        yield
+
+
+def fetch_in_order(
+    items: Iterable[Item],
+    fetch: Callable[[Item], Result],
+    *,
+    should_fetch: Callable[[Item], bool] = lambda item: True,
+) -> Iterator[Tuple[Item, Result | None]]:
+    """Pares (item, resultado) na ordem de `items`, com `fetch` rodando em paralelo.
+
+    Itens recusados por `should_fetch` saem com None para quem consome tratar.
+    So `fetch_workers() * LOOKAHEAD_PER_WORKER` itens ficam a frente do
+    consumidor, o que limita a memoria retida. Excecoes de `fetch` sao
+    repassadas ao consumidor no item correspondente.
+    """
+    workers = fetch_workers()
+    window = workers * LOOKAHEAD_PER_WORKER
+    pending: Deque[Tuple[Item, Future | None]] = deque()
+    source = iter(items)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-fetch")
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, pool.submit(fetch, item) if should_fetch(item) else None))
+            if not pending:
+                return
+            item, future = pending.popleft()
+            yield item, None if future is None else future.result()
+    finally:
+        # Consumidor interrompido (ex.: cliente desconectou): descarta o que nao comecou.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def reset_photo_fetch() -> None:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+        _SESSION = None
+    with _HOST_LOCK:
+        _HOST_SLOTS.clear()
@@ -0,0 +1,607 @@
+"""Indice incremental de fotos que relista apenas diretorios alterados."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import os
+from threading import Lock, local
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from .photo_records import pack_photo_value, unpack_photo_record, unpack_photo_value
+
+
+# Diretorios modificados ha menos tempo que isso sao relistados na proxima
+# atualizacao, pois uma segunda alteracao no mesmo tick de mtime passaria despercebida.
+RACY_MTIME_WINDOW_NS = 2_000_000_000
+DEFAULT_WALK_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+DEFAULT_LOOKUP_MAX_AGE_SECONDS = 5.0
+
+_VERIFICATION = local()
+
+ClassifyFile = Callable[[List[str], str], Any]
+BuildRecord = Callable[[str, List[Any]], Dict | None]
+
+
+@dataclass
+class _DirectoryState:
+    mtime_ns: int
+    racy: bool
+    subdirs: tuple[str, ...] = ()
+    entries: Dict[str, Any] = field(default_factory=dict)
+    codes: set[str] = field(default_factory=set)
+
+
+def _entry_code(entry: Any) -> str | None:
+    # Entradas sem codigo principal podem guardar dados extras do classificador.
+    if entry is None or entry[0] is None:
+        return None
+    return str(entry[0])
+
+
+def _walk_workers() -> int:
+    raw_value = os.getenv("CATALOG_PHOTO_INDEX_WORKERS", "").strip()
+    try:
+        parsed = int(raw_value) if raw_value else DEFAULT_WALK_WORKERS
+    except ValueError:
+        return DEFAULT_WALK_WORKERS
+    return max(parsed, 1)
+
+
+def lookup_max_age_seconds() -> float:
+    """Idade maxima de uma revalidacao para consultas por codigo sem observador ativo."""
+    raw_value = os.getenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "").strip()
+    try:
+        parsed = float(raw_value) if raw_value else DEFAULT_LOOKUP_MAX_AGE_SECONDS
+    except ValueError:
+        return DEFAULT_LOOKUP_MAX_AGE_SECONDS
+    return max(parsed, 0.0)
+
+
+def _in_verification() -> bool:
+    return bool(getattr(_VERIFICATION, "active", False))
+
+
+@contextmanager
+def verification() -> Iterator[None]:
+    """Na thread atual, forca a revalidacao de indices restaurados de snapshot."""
+    previous = _in_verification()
+    _VERIFICATION.active = True
+    try:
+        yield
+    finally:
+        _VERIFICATION.active = previous
+
+
+def _is_within(path: str, root: str) -> bool:
+    try:
+        return os.path.commonpath([root, path]) == root
+    except ValueError:
+        return False
+
+
+class DirectoryInventory:
+    """Listagens de pastas compartilhadas entre indices cujas raizes se sobrepoem.
+
+    Cada pasta fisica e lida uma vez por mtime; os indices aplicam sobre a mesma
+    listagem as proprias extensoes e classificadores, com resultados separados.
+    So nomes de arquivos e subpastas sao compartilhados: o mtime de uma subpasta
+    muda sem alterar o da pasta mae, entao listagens em cache voltam sem os mtimes
+    das filhas e quem chama faz o proprio `stat`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._listings: Dict[str, tuple[int, tuple[str, ...], tuple[str, ...]]] = {}
+
+    def list_directory(
+        self,
+        abs_dir: str,
+        mtime_ns: int,
+    ) -> tuple[tuple[str, ...], tuple[str, ...], Dict[str, int]]:
+        key = os.path.normcase(abs_dir)
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1], cached[2], {}
+
+        listed_at = time.time_ns()
+        filenames: List[str] = []
+        subdirs: List[str] = []
+        child_mtimes: Dict[str, int] = {}
+        try:
+            with os.scandir(abs_dir) as iterator:
+                for item in iterator:
+                    try:
+                        is_dir = item.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # Igual ao os.walk padrao: links simbolicos para pastas nao sao seguidos.
+                        if item.is_symlink():
+                            continue
+                        subdirs.append(item.name)
+                        try:
+                            # No Windows o DirEntry ja traz o mtime; evita um stat extra na descida.
+                            child_mtimes[item.name] = item.stat(follow_symlinks=False).st_mtime_ns
+                        except OSError:
+                            pass
+                    else:
+                        filenames.append(item.name)
+        except OSError:
+            pass
+
+        listing = (tuple(filenames), tuple(sorted(subdirs)))
+        with self._lock:
+            if listed_at - mtime_ns >= RACY_MTIME_WINDOW_NS:
+                self._listings[key] = (mtime_ns, *listing)
+            else:
+                # Mtime recente ainda pode mudar no mesmo tick; nao compartilha a listagem.
+                self._listings.pop(key, None)
+        return (*listing, child_mtimes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._listings.clear()
+
+
+_INVENTORY = DirectoryInventory()
+
+
+class IncrementalPhotoIndex:
+    """Mantem os registros por codigo de uma raiz e relista so diretorios com mtime novo.
+
+    Em modo vivo (`set_live(True)`), um observador externo informa as pastas
+    alteradas via `mark_dirty` e as consultas deixam de revalidar a arvore.
+    A varredura completa distribui a listagem das pastas de primeiro nivel entre
+    `workers` threads e aplica os resultados numa ordem fixa.
+    """
+
+    def __init__(self, root: str, extensions: tuple[str, ...], workers: int | None = None):
+        self.root = os.path.abspath(root)
+        self.extensions = tuple(extensions)
+        self.workers = workers if workers is not None else _walk_workers()
+        self.generation = 0
+        # Muda a cada pasta relistada ou reclassificada, mesmo sem codigo afetado.
+        self.entries_version = 0
+        self._lock = Lock()
+        self._dirs: Dict[str, _DirectoryState] = {}
+        self._code_dirs: Dict[str, set[str]] = {}
+        self._records: Dict[str, Dict] = {}
+        self._context_key: Any = None
+        self._last_refresh: tuple[ClassifyFile, BuildRecord, Any] | None = None
+        self._live = False
+        self._dirty: set[str] = set()
+        self._needs_full = True
+        self._restored = False
+        self._validated_at = float("-inf")
+
+    @property
+    def records(self) -> Dict[str, Dict]:
+        return self._records
+
+    @property
+    def live(self) -> bool:
+        return self._live
+
+    @property
+    def context_key(self) -> Any:
+        return self._context_key
+
+    @property
+    def restored(self) -> bool:
+        """Indica que os registros vieram de um snapshot ainda nao conferido com o disco."""
+        return self._restored
+
+    def set_live(self, live: bool) -> None:
+        with self._lock:
+            self._live = live
+            if not live:
+                self._needs_full = True
+
+    def mark_dirty(self, rel_dirs: Iterable[str] | None = None) -> None:
+        """Registra pastas alteradas; `None` exige nova revalidacao completa."""
+        with self._lock:
+            if rel_dirs is None:
+                self._needs_full = True
+            else:
+                self._dirty.update(rel_dirs)
+
+    def refresh(
+        self,
+        classify_file: ClassifyFile,
+        build_record: BuildRecord,
+        context_key: Any = None,
+    ) -> Dict[str, Dict]:
+        """Revalida a arvore e retorna o mapa codigo -> registro atualizado.
+
+        `classify_file` recebe as partes do caminho relativo e o caminho absoluto
+        e devolve uma tupla iniciada pelo codigo (ou None). Quando `context_key`
+        muda, os arquivos ja listados sao reclassificados sem novo acesso ao disco.
+        """
+        if self._restored and context_key == self._context_key and not _in_verification():
+            # Snapshot restaurado: responde de imediato enquanto a conferencia roda em segundo plano.
+            return self._records
+        with self._lock:
+            return self._refresh_locked(classify_file, build_record, context_key)
+
+    def sync(self) -> Dict[str, Dict]:
+        """Aplica alteracoes pendentes com o ultimo classificador usado."""
+        with self._lock:
+            if self._last_refresh is None:
+                return self._records
+            return self._refresh_locked(*self._last_refresh)
+
+    def current_records(self, max_age_seconds: float) -> Dict[str, Dict] | None:
+        """Registros confiaveis sem revarrer a arvore, ou None quando e preciso revalidar.
+
+        Vale para indices restaurados de snapshot, indices vivos (aplicando os
+        eventos pendentes do observador) e indices revalidados ha ate `max_age_seconds`.
+        """
+        if self._restored:
+            return self._records
+        if self._last_refresh is None:
+            return None
+        if self._live and not self._needs_full:
+            return self.sync() if self._dirty else self._records
+        if time.monotonic() - self._validated_at <= max_age_seconds:
+            return self._records
+        return None
+
+    def entries(self) -> List[tuple[str, str, Any]]:
+        """Entradas classificadas de todas as pastas, inclusive as sem codigo principal."""
+        with self._lock:
+            return [
+                (rel_dir, filename, entry)
+                for rel_dir, state in sorted(self._dirs.items())
+                for filename, entry in sorted(state.entries.items())
+                if entry is not None
+            ]
+
+    def export_state(self) -> Dict[str, Any] | None:
+        """Estado serializavel (tipos nativos) para o snapshot em disco."""
+        with self._lock:
+            if not self.generation:
+                return None
+            memo: Dict[int, Any] = {}
+            return {
+                "root": self.root,
+                "extensions": self.extensions,
+                "context_key": self._context_key,
+                "dirs": {
+                    rel_dir: (
+                        state.mtime_ns,
+                        state.racy,
+                        state.subdirs,
+                        {name: pack_photo_value(entry, memo) for name, entry in state.entries.items()},
+                    )
+                    for rel_dir, state in self._dirs.items()
+                },
+                "records": {code: pack_photo_value(record, memo) for code, record in self._records.items()},
+            }
+
+    def restore_state(self, state: Dict[str, Any]) -> bool:
+        """Carrega um estado exportado; so vale para indices ainda nao construidos."""
+        with self._lock:
+            if self.generation:
+                return False
+            self._dirs = {}
+            self._code_dirs = {}
+            memo: Dict[int, Any] = {}
+            for rel_dir, (mtime_ns, racy, subdirs, packed) in state["dirs"].items():
+                entries = {name: unpack_photo_value(entry, memo) for name, entry in packed.items()}
+                codes = {code for code in map(_entry_code, entries.values()) if code}
+                self._dirs[rel_dir] = _DirectoryState(mtime_ns, racy, tuple(subdirs), entries, codes)
+                for code in codes:
+                    self._code_dirs.setdefault(code, set()).add(rel_dir)
+            self._records = {code: unpack_photo_record(record, memo) for code, record in state["records"].items()}
+            self._context_key = state["context_key"]
+            self._needs_full = True
+            self._restored = True
+            self.generation += 1
+            self.entries_version += 1
+            return True
+
+    def expire_restored(self) -> None:
+        """Deixa de servir o snapshot sem conferencia; a proxima consulta revalida o disco."""
+        self._restored = False
+
+    def _refresh_locked(
+        self,
+        classify_file: ClassifyFile,
+        build_record: BuildRecord,
+        context_key: Any,
+    ) -> Dict[str, Dict]:
+        self._last_refresh = (classify_file, build_record, context_key)
+        entries_version = self.entries_version
+        affected: set[str] = set()
+        if context_key != self._context_key:
+            self._context_key = context_key
+            affected.update(self._reclassify_all(classify_file))
+
+        if self._live and not self._needs_full:
+            dirty, self._dirty = self._dirty, set()
+            affected.update(self._revalidate_dirty(dirty, classify_file))
+        else:
+            self._dirty.clear()
+            self._needs_full = False
+            affected.update(self._revalidate_all(classify_file))
+            self._restored = False
+        self._validated_at = time.monotonic()
+
+        if affected:
+            self._rebuild_records(affected, build_record)
+        elif self.entries_version != entries_version:
+            # Entradas sem codigo mudaram; quem le os dados extras precisa saber.
+            self.generation += 1
+        return self._records
+
+    def _reclassify_all(self, classify_file: ClassifyFile) -> set[str]:
+        affected = set(self._records)
+        self.entries_version += 1
+        self._code_dirs.clear()
+        for rel_dir, state in self._dirs.items():
+            abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            rel_prefix = rel_dir.split(os.sep) if rel_dir else []
+            state.entries = {
+                filename: classify_file([*rel_prefix, filename], os.path.join(abs_dir, filename))
+                for filename in state.entries
+            }
+            state.codes = {code for code in map(_entry_code, state.entries.values()) if code}
+            for code in state.codes:
+                self._code_dirs.setdefault(code, set()).add(rel_dir)
+            affected.update(state.codes)
+        return affected
+
+    def _revalidate_all(self, classify_file: ClassifyFile) -> set[str]:
+        affected: set[str] = set()
+        now_ns = time.time_ns()
+        root_listing = self._walk_subtree("", None, recursive=False)
+        if not root_listing:
+            for rel_dir in list(self._dirs):
+                self._drop_directory(rel_dir, affected)
+            return affected
+
+        root_scan = root_listing[0][2]
+        subdirs, child_mtimes = (root_scan[1], root_scan[2]) if root_scan else (self._dirs[""].subdirs, {})
+        tasks = [(name, child_mtimes.get(name)) for name in subdirs]
+        workers = min(self.workers, len(tasks))
+        if workers > 1:
+            # So a listagem (E/S) roda nas threads; a classificacao fica no merge, em ordem.
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photo-index") as executor:
+                partials = list(executor.map(lambda task: self._walk_subtree(*task), tasks))
+        else:
+            partials = [self._walk_subtree(*task) for task in tasks]
+
+        seen: set[str] = set()
+        for rel_dir, mtime_ns, scan in root_listing + [item for part in partials for item in part]:
+            seen.add(rel_dir)
+            if scan is None:
+                continue
+            previous = self._dirs.get(rel_dir)
+            state = self._build_state(rel_dir, mtime_ns, now_ns, previous, scan[0], scan[1], classify_file)
+            self._store(rel_dir, state, previous, affected)
+
+        for rel_dir in [item for item in self._dirs if item not in seen]:
+            self._drop_directory(rel_dir, affected)
+        return affected
+
+    def _walk_subtree(
+        self,
+        rel_dir: str,
+        mtime_ns: int | None,
+        recursive: bool = True,
+    ) -> List[tuple[str, int, tuple[List[str], tuple[str, ...], Dict[str, int]] | None]]:
+        """Lista a subarvore sem alterar o indice; pastas com mtime inalterado nao sao relidas."""
+        results: List[tuple[str, int, tuple[List[str], tuple[str, ...], Dict[str, int]] | None]] = []
+        pending: List[tuple[str, int | None]] = [(rel_dir, mtime_ns)]
+        while pending:
+            current, current_mtime = pending.pop()
+            abs_dir = os.path.join(self.root, current) if current else self.root
+            if current_mtime is None:
+                try:
+                    current_mtime = os.stat(abs_dir).st_mtime_ns
+                except OSError:
+                    continue
+            previous = self._dirs.get(current)
+            if previous is not None and not previous.racy and previous.mtime_ns == current_mtime:
+                scan = None
+                subdirs, child_mtimes = previous.subdirs, {}
+            else:
+                scan = self._scan_directory(abs_dir, current_mtime)
+                subdirs, child_mtimes = scan[1], scan[2]
+            results.append((current, current_mtime, scan))
+            if recursive:
+                pending.extend(
+                    (os.path.join(current, name), child_mtimes.get(name)) for name in reversed(subdirs)
+                )
+        return results
+
+    def _revalidate_dirty(self, dirty: set[str], classify_file: ClassifyFile) -> set[str]:
+        affected: set[str] = set()
+        now_ns = time.time_ns()
+        pending = sorted(dirty, key=lambda item: item.count(os.sep) if item else -1)
+        processed: set[str] = set()
+
+        while pending:
+            rel_dir = pending.pop(0)
+            if rel_dir in processed:
+                continue
+            processed.add(rel_dir)
+            previous = self._dirs.get(rel_dir)
+            parent = os.path.dirname(rel_dir)
+            if previous is None and rel_dir and parent not in self._dirs:
+                # Sera descoberta quando a pasta mae for relistada.
+                continue
+
+            abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            try:
+                mtime_ns = os.stat(abs_dir).st_mtime_ns
+            except OSError:
+                self._drop_subtree(rel_dir, affected)
+                continue
+
+            filenames, subdirs, _ = self._scan_directory(abs_dir, mtime_ns)
+            state = self._build_state(rel_dir, mtime_ns, now_ns, previous, filenames, subdirs, classify_file)
+            self._store(rel_dir, state, previous, affected)
+            current = set(state.subdirs)
+            for name in previous.subdirs if previous else ():
+                if name not in current:
+                    self._drop_subtree(os.path.join(rel_dir, name) if rel_dir else name, affected)
+            for name in state.subdirs:
+                child = os.path.join(rel_dir, name) if rel_dir else name
+                if child not in self._dirs:
+                    pending.append(child)
+        return affected
+
+    def _scan_directory(self, abs_dir: str, mtime_ns: int) -> tuple[List[str], tuple[str, ...], Dict[str, int]]:
+        filenames, subdirs, child_mtimes = _INVENTORY.list_directory(abs_dir, mtime_ns)
+        return [name for name in filenames if name.lower().endswith(self.extensions)], subdirs, child_mtimes
+
+    def _build_state(
+        self,
+        rel_dir: str,
+        mtime_ns: int,
+        now_ns: int,
+        previous: _DirectoryState | None,
+        filenames: List[str],
+        subdirs: tuple[str, ...],
+        classify_file: ClassifyFile,
+    ) -> _DirectoryState:
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        previous_entries = previous.entries if previous else {}
+        rel_prefix = rel_dir.split(os.sep) if rel_dir else []
+        entries: Dict[str, Any] = {}
+        for filename in filenames:
+            if filename in previous_entries and not filename.lower().endswith(".lnk"):
+                entries[filename] = previous_entries[filename]
+                continue
+            entries[filename] = classify_file([*rel_prefix, filename], os.path.join(abs_dir, filename))
+
+        return _DirectoryState(
+            mtime_ns=mtime_ns,
+            racy=now_ns - mtime_ns < RACY_MTIME_WINDOW_NS,
+            subdirs=subdirs,
+            entries=entries,
+            codes={code for code in map(_entry_code, entries.values()) if code},
+        )
+
+    def _store(
+        self,
+        rel_dir: str,
+        state: _DirectoryState,
+        previous: _DirectoryState | None,
+        affected: set[str],
+    ) -> None:
+        if previous:
+            self._forget_codes(rel_dir, previous.codes)
+            affected.update(previous.codes)
+        for code in state.codes:
+            self._code_dirs.setdefault(code, set()).add(rel_dir)
+        affected.update(state.codes)
+        self._dirs[rel_dir] = state
+        self.entries_version += 1
+
+    def _drop_directory(self, rel_dir: str, affected: set[str]) -> None:
+        removed = self._dirs.pop(rel_dir, None)
+        if removed is None:
+            return
+        self._forget_codes(rel_dir, removed.codes)
+        affected.update(removed.codes)
+        self.entries_version += 1
+
+    def _drop_subtree(self, rel_dir: str, affected: set[str]) -> None:
+        prefix = rel_dir + os.sep if rel_dir else ""
+        for item in [key for key in self._dirs if key == rel_dir or key.startswith(prefix)]:
+            self._drop_directory(item, affected)
+
+    def _forget_codes(self, rel_dir: str, codes: set[str]) -> None:
+        for code in codes:
+            dirs = self._code_dirs.get(code)
+            if not dirs:
+                continue
+            dirs.discard(rel_dir)
+            if not dirs:
+                self._code_dirs.pop(code, None)
+
+    def _rebuild_records(self, affected: set[str], build_record: BuildRecord) -> None:
+        # Copia ao escrever: leitores que ja receberam o mapa anterior nao o veem mudar.
+        records = dict(self._records)
+        for code in affected:
+            ordered: List[tuple[tuple[str, ...], str, Any]] = []
+            for rel_dir in self._code_dirs.get(code, ()):
+                state = self._dirs[rel_dir]
+                dir_key = tuple(rel_dir.split(os.sep)) if rel_dir else ()
+                for filename, entry in state.entries.items():
+                    if _entry_code(entry) == code:
+                        ordered.append((dir_key, filename, entry))
+            ordered.sort(key=lambda item: (item[0], item[1]))
+            record = build_record(code, [item[2] for item in ordered]) if ordered else None
+            if record:
+                records[code] = record
+            else:
+                records.pop(code, None)
+        self._records = records
+        self.generation += 1
+
+
+_REGISTRY_LOCK = Lock()
+_INDEXES: Dict[tuple[str, tuple[str, ...]], IncrementalPhotoIndex] = {}
+_LIVE_ROOTS: set[str] = set()
+
+
+def get_photo_index(root: str, extensions: tuple[str, ...]) -> IncrementalPhotoIndex:
+    """Retorna o indice de longa duracao associado a raiz informada."""
+    key = (os.path.normcase(os.path.abspath(root)), tuple(extensions))
+    with _REGISTRY_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = IncrementalPhotoIndex(root, extensions)
+            index.set_live(any(_is_within(key[0], live_root) for live_root in _LIVE_ROOTS))
+            _INDEXES[key] = index
+        return index
+
+
+def iter_photo_indexes() -> List[IncrementalPhotoIndex]:
+    with _REGISTRY_LOCK:
+        return list(_INDEXES.values())
+
+
+def set_live_root(root: str, live: bool) -> None:
+    """Marca a raiz como observada: indices contidos nela deixam de revalidar o disco."""
+    normalized = os.path.normcase(os.path.abspath(root))
+    with _REGISTRY_LOCK:
+        if live:
+            _LIVE_ROOTS.add(normalized)
+        else:
+            _LIVE_ROOTS.discard(normalized)
+        live_roots = set(_LIVE_ROOTS)
+        indexes = list(_INDEXES.items())
+    for (index_root, _), index in indexes:
+        if _is_within(index_root, normalized):
+            index.set_live(any(_is_within(index_root, item) for item in live_roots))
+
+
+def mark_path_dirty(path: str | None = None) -> List[IncrementalPhotoIndex]:
+    """Marca a pasta alterada em todos os indices que a contem; `None` invalida todos."""
+    touched: List[IncrementalPhotoIndex] = []
+    absolute = os.path.abspath(path) if path else None
+    for index in iter_photo_indexes():
+        if absolute is None:
+            index.mark_dirty(None)
+        elif _is_within(os.path.normcase(absolute), os.path.normcase(index.root)):
+            rel_dir = os.path.relpath(absolute, index.root)
+            index.mark_dirty(["" if rel_dir == os.curdir else rel_dir])
+        else:
+            continue
+        touched.append(index)
+    return touched
+
+
+def reset_photo_indexes() -> None:
+    with _REGISTRY_LOCK:
+        _INDEXES.clear()
+        _LIVE_ROOTS.clear()
+    _INVENTORY.clear()
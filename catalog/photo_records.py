@@ -0,0 +1,204 @@
+"""Representacao compacta dos registros de fotos mantidos nos indices.
+
+Os indices guardam dezenas de milhares de arquivos; em vez de um dict por
+arquivo, cada um vira um objeto com `__slots__` que guarda a pasta (interned,
+compartilhada entre os arquivos dela) e o nome. O acesso no formato de dict
+(`item["rel_path"]`, `record.get("variants", {})`) continua funcionando.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+import os
+import sys
+from typing import Any, Dict, Iterator, List
+
+
+VARIANT_NAMES = ("white_background", "ambient", "measures")
+_FILE_KEYS = ("name", "full_path", "rel_path")
+_RECORD_KEYS = ("code", "name", "category", "files", "variants")
+_NO_VARIANT = -1
+_VARIANT_SLOTS: Dict[tuple[int, ...], tuple[int, ...]] = {}
+
+
+def _split_path(path: str) -> tuple[str, str]:
+    head, tail = os.path.split(path)
+    if os.path.join(head, tail) != path:
+        # Caminhos fora do formato normalizado ficam inteiros no nome.
+        return "", path
+    return sys.intern(head), tail
+
+
+class PhotoFile(Mapping):
+    """Arquivo de foto com chaves `name`, `full_path` e `rel_path`."""
+
+    __slots__ = ("name", "_full_dir", "_full_name", "_rel_dir", "_rel_name")
+
+    def __init__(self, name: str, full_path: str, rel_path: str):
+        full_dir, full_name = _split_path(full_path)
+        rel_dir, rel_name = _split_path(rel_path)
+        self.name = name
+        self._full_dir = full_dir
+        # Nomes iguais ao anterior nao sao guardados de novo.
+        self._full_name = None if full_name == name else full_name
+        self._rel_dir = rel_dir
+        self._rel_name = None if rel_name == (self._full_name or name) else rel_name
+
+    @classmethod
+    def coerce(cls, value: Mapping) -> "PhotoFile":
+        if isinstance(value, PhotoFile):
+            return value
+        return cls(value["name"], value["full_path"], value["rel_path"])
+
+    @property
+    def full_path(self) -> str:
+        return os.path.join(self._full_dir, self._full_name or self.name)
+
+    @property
+    def rel_path(self) -> str:
+        return os.path.join(self._rel_dir, self._rel_name or self._full_name or self.name)
+
+    def __getitem__(self, key: str) -> str:
+        if key == "name":
+            return self.name
+        if key == "rel_path":
+            return self.rel_path
+        if key == "full_path":
+            return self.full_path
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_FILE_KEYS)
+
+    def __len__(self) -> int:
+        return len(_FILE_KEYS)
+
+    def __repr__(self) -> str:
+        return f"PhotoFile({self.name!r}, {self.full_path!r}, {self.rel_path!r})"
+
+    def to_state(self) -> List[str | None]:
+        return [self.name, self._full_dir, self._full_name, self._rel_dir, self._rel_name]
+
+    @classmethod
+    def from_state(cls, state: List[str | None]) -> "PhotoFile":
+        item = cls.__new__(cls)
+        name, full_dir, full_name, rel_dir, rel_name = state
+        item.name = name
+        item._full_dir = sys.intern(full_dir)
+        item._full_name = full_name
+        item._rel_dir = sys.intern(rel_dir)
+        item._rel_name = rel_name
+        return item
+
+
+class PhotoRecord(Mapping):
+    """Registro de um codigo: dados do produto, arquivos ordenados e variantes.
+
+    As variantes sao posicoes em `files` (-1 quando ausentes); o dict
+    `variants` e montado apenas quando lido.
+    """
+
+    __slots__ = ("code", "name", "category", "files", "_variant_slots")
+
+    def __init__(
+        self,
+        code: str,
+        name: str,
+        category: str,
+        files: tuple[PhotoFile, ...],
+        variant_slots: tuple[int, ...],
+    ):
+        self.code = code
+        self.name = name
+        self.category = category
+        self.files = files
+        self._variant_slots = _VARIANT_SLOTS.setdefault(variant_slots, variant_slots)
+
+    @classmethod
+    def from_dict(cls, record: Mapping) -> "PhotoRecord":
+        """Converte o dict montado pelos classificadores, mantendo as variantes apontando para `files`."""
+        raw_files = list(record.get("files", []))
+        files = tuple(PhotoFile.coerce(item) for item in raw_files)
+        positions = {id(item): position for position, item in enumerate(raw_files)}
+        variants = record.get("variants", {})
+        slots = []
+        for variant in VARIANT_NAMES:
+            chosen = variants.get(variant)
+            slot = positions.get(id(chosen), _NO_VARIANT) if chosen is not None else _NO_VARIANT
+            if chosen is not None and slot == _NO_VARIANT:
+                files += (PhotoFile.coerce(chosen),)
+                slot = len(files) - 1
+            slots.append(slot)
+        return cls(record["code"], record["name"], record["category"], files, tuple(slots))
+
+    @property
+    def variants(self) -> Dict[str, PhotoFile | None]:
+        return {
+            variant: self.files[slot] if slot != _NO_VARIANT else None
+            for variant, slot in zip(VARIANT_NAMES, self._variant_slots)
+        }
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "code":
+            return self.code
+        if key == "name":
+            return self.name
+        if key == "category":
+            return self.category
+        if key == "files":
+            return self.files
+        if key == "variants":
+            return self.variants
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_RECORD_KEYS)
+
+    def __len__(self) -> int:
+        return len(_RECORD_KEYS)
+
+    def __repr__(self) -> str:
+        return f"PhotoRecord({self.code!r}, {self.name!r}, files={len(self.files)})"
+
+
+def _pack_file(item: PhotoFile, memo: Dict[int, Any]) -> List[str | None]:
+    packed = memo.get(id(item))
+    if packed is None:
+        packed = memo[id(item)] = item.to_state()
+    return packed
+
+
+def _unpack_file(state: List[str | None], memo: Dict[int, Any]) -> PhotoFile:
+    item = memo.get(id(state))
+    if item is None:
+        item = memo[id(state)] = PhotoFile.from_state(state)
+    return item
+
+
+def pack_photo_value(value: Any, memo: Dict[int, Any]) -> Any:
+    """Converte registros e entradas do indice para tipos nativos aceitos pelo marshal.
+
+    `memo` garante que um arquivo presente na entrada e no registro seja
+    gravado uma vez so (o marshal preserva referencias repetidas).
+    """
+    if isinstance(value, tuple):
+        return tuple([_pack_file(item, memo) if type(item) is PhotoFile else item for item in value])
+    if isinstance(value, PhotoRecord):
+        files = tuple([_pack_file(item, memo) for item in value.files])
+        return (value.code, value.name, value.category, files, value._variant_slots)
+    return value
+
+
+def unpack_photo_value(value: Any, memo: Dict[int, Any]) -> Any:
+    """Inverso de `pack_photo_value` para entradas; listas voltam a ser arquivos."""
+    if type(value) is tuple:
+        return tuple([_unpack_file(item, memo) if type(item) is list else item for item in value])
+    return value
+
+
+def unpack_photo_record(value: Any, memo: Dict[int, Any]) -> Any:
+    """Inverso de `pack_photo_value` para registros; outros formatos voltam como estao."""
+    if type(value) is not tuple:
+        return value
+    code, name, category, files, slots = value
+    return PhotoRecord(code, name, category, tuple([_unpack_file(item, memo) for item in files]), slots)
@@ -0,0 +1,409 @@
+"""Observador das pastas de fotos que mantem os indices incrementais vivos."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List
+
+from . import photo_index
+
+
+logger = logging.getLogger(__name__)
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+EVENT_HEADER = struct.Struct("iIII")
+DEFAULT_DEBOUNCE_SECONDS = 0.25
+DEFAULT_MAX_DELAY_SECONDS = 1.0
+DEFAULT_POLL_SECONDS = 5.0
+
+
+def _env_seconds(name: str, default: float) -> float:
+    raw_value = os.getenv(name, "").strip()
+    if not raw_value:
+        return default
+    try:
+        parsed = float(raw_value)
+    except ValueError:
+        return default
+    return parsed if parsed > 0 else default
+
+
+class _InotifyBackend:
+    """Acesso minimo ao inotify do Linux via ctypes, sem dependencias externas."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._paths: Dict[int, str] = {}
+        self._watches: Dict[str, int] = {}
+
+    def add_tree(self, root: str) -> bool:
+        """Observa a pasta e todas as subpastas; False quando o limite do kernel estoura."""
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            watch = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if watch < 0:
+                code = ctypes.get_errno()
+                if code == errno.ENOSPC:
+                    return False
+                continue
+            self._paths[watch] = directory
+            self._watches[directory] = watch
+            try:
+                with os.scandir(directory) as iterator:
+                    pending.extend(
+                        item.path for item in iterator if item.is_dir(follow_symlinks=False)
+                    )
+            except OSError:
+                continue
+        return True
+
+    def remove_tree(self, root: str) -> None:
+        prefix = root + os.sep
+        for directory in [item for item in self._watches if item == root or item.startswith(prefix)]:
+            watch = self._watches.pop(directory)
+            self._paths.pop(watch, None)
+            self._rm_watch(self.fd, watch)
+
+    def read_events(self, timeout: float) -> List[tuple[str | None, int, str]]:
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0.0))
+        if not readable:
+            return []
+        try:
+            payload = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events: List[tuple[str | None, int, str]] = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(payload):
+            watch, mask, _, name_length = EVENT_HEADER.unpack_from(payload, offset)
+            offset += EVENT_HEADER.size
+            raw_name = payload[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            directory = self._paths.get(watch)
+            if mask & IN_IGNORED:
+                if directory is not None:
+                    self._paths.pop(watch, None)
+                    self._watches.pop(directory, None)
+                continue
+            events.append((directory, mask, os.fsdecode(raw_name)))
+        return events
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def _create_inotify_backend() -> _InotifyBackend | None:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return _InotifyBackend()
+    except Exception as exc:
+        logger.warning("inotify unavailable, photo watcher will poll: %s", exc)
+        return None
+
+
+class PhotoTreeWatcher:
+    """Converte eventos de criacao, remocao e renomeacao em atualizacoes pontuais dos indices.
+
+    Rajadas de eventos (por exemplo, uma sincronizacao do OneDrive) sao agrupadas:
+    a atualizacao roda quando a pasta fica quieta por `debounce_seconds` ou, no
+    maximo, `max_delay_seconds` apos o primeiro evento pendente.
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[str],
+        *,
+        debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+        max_delay_seconds: float = DEFAULT_MAX_DELAY_SECONDS,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        use_inotify: bool = True,
+    ):
+        self.roots = _outermost_roots(roots)
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.poll_seconds = poll_seconds
+        self.use_inotify = use_inotify
+        self.polled_roots: List[str] = []
+        # Raiz varrida -> (instante da varredura, mtime de cada pasta da arvore).
+        self._polled_mtimes: Dict[str, tuple[int, Dict[str, int]]] = {}
+        self._listeners: List[Callable[[List[photo_index.IncrementalPhotoIndex]], None]] = []
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_listener(self, callback: Callable[[List[photo_index.IncrementalPhotoIndex]], None]) -> None:
+        """Registra uma funcao chamada com os indices atualizados apos cada lote."""
+        self._listeners.append(callback)
+
+    def start(self) -> "PhotoTreeWatcher":
+        self._thread = threading.Thread(target=self._run, name="photo-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        backend = _create_inotify_backend() if self.use_inotify else None
+        try:
+            for root in self.roots:
+                if backend is None or not backend.add_tree(root):
+                    if backend is not None:
+                        logger.warning("inotify watch limit reached for %s; polling instead", root)
+                        backend.remove_tree(root)
+                    self.polled_roots.append(root)
+                photo_index.set_live_root(root, True)
+            self._ready.set()
+            self._loop(backend)
+        except Exception as exc:
+            logger.exception("Photo watcher stopped unexpectedly: %s", exc)
+        finally:
+            self._ready.set()
+            for root in self.roots:
+                photo_index.set_live_root(root, False)
+            if backend is not None:
+                backend.close()
+
+    def _loop(self, backend: _InotifyBackend | None) -> None:
+        pending: set[str] = set()
+        overflow = False
+        first_event_at: float | None = None
+        last_event_at = 0.0
+        next_poll_at = time.monotonic() + self.poll_seconds
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            deadline = next_poll_at if self.polled_roots else now + self.poll_seconds
+            if first_event_at is not None:
+                deadline = min(
+                    deadline,
+                    last_event_at + self.debounce_seconds,
+                    first_event_at + self.max_delay_seconds,
+                )
+            timeout = max(deadline - now, 0.0)
+
+            if backend is not None and len(self.polled_roots) < len(self.roots):
+                events = backend.read_events(timeout)
+            else:
+                self._stop.wait(timeout)
+                events = []
+
+            for directory, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif directory is not None:
+                    pending.add(directory)
+                    self._track_directory_change(backend, directory, mask, name)
+            if events:
+                last_event_at = time.monotonic()
+                if first_event_at is None:
+                    first_event_at = last_event_at
+
+            now = time.monotonic()
+            if first_event_at is not None and (
+                now - last_event_at >= self.debounce_seconds
+                or now - first_event_at >= self.max_delay_seconds
+            ):
+                self._flush(pending, overflow)
+                pending = set()
+                overflow = False
+                first_event_at = None
+
+            if self.polled_roots and now >= next_poll_at:
+                self._poll()
+                next_poll_at = time.monotonic() + self.poll_seconds
+
+    def _track_directory_change(
+        self,
+        backend: _InotifyBackend | None,
+        directory: str,
+        mask: int,
+        name: str,
+    ) -> None:
+        if backend is None or not mask & IN_ISDIR or not name:
+            return
+        path = os.path.join(directory, name)
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            backend.add_tree(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            backend.remove_tree(path)
+
+    def _flush(self, directories: set[str], overflow: bool) -> None:
+        touched: Dict[int, photo_index.IncrementalPhotoIndex] = {}
+        if overflow:
+            for root in self.roots:
+                for index in _indexes_within(root):
+                    index.mark_dirty(None)
+                    touched[id(index)] = index
+        for directory in directories:
+            for index in photo_index.mark_path_dirty(directory):
+                touched[id(index)] = index
+        self._sync(list(touched.values()))
+
+    def _poll(self) -> None:
+        """Sem inotify, compara o mtime das pastas e marca so as que mudaram.
+
+        A primeira varredura de cada raiz revalida os indices por completo; as
+        seguintes fazem so um `stat` por pasta. Pastas com mtime ainda no
+        intervalo ambiguo sao remarcadas na proxima varredura.
+        """
+        directories: set[str] = set()
+        indexes: Dict[int, photo_index.IncrementalPhotoIndex] = {}
+        for root in self.polled_roots:
+            scanned_at = time.time_ns()
+            current = _directory_mtimes(root)
+            previous = self._polled_mtimes.get(root)
+            self._polled_mtimes[root] = (scanned_at, current)
+            if previous is None:
+                for index in _indexes_within(root):
+                    index.mark_dirty(None)
+                    indexes[id(index)] = index
+                continue
+            previous_at, previous_mtimes = previous
+            for directory, mtime_ns in current.items():
+                before = previous_mtimes.get(directory)
+                if before != mtime_ns or previous_at - mtime_ns < photo_index.RACY_MTIME_WINDOW_NS:
+                    directories.add(directory)
+            directories.update(item for item in previous_mtimes if item not in current)
+        for directory in directories:
+            for index in photo_index.mark_path_dirty(directory):
+                indexes[id(index)] = index
+        self._sync(list(indexes.values()))
+
+    def _sync(self, indexes: List[photo_index.IncrementalPhotoIndex]) -> None:
+        changed: List[photo_index.IncrementalPhotoIndex] = []
+        for index in indexes:
+            generation = index.generation
+            try:
+                index.sync()
+            except Exception as exc:
+                logger.warning("Failed to update photo index for %s: %s", index.root, exc, exc_info=True)
+                continue
+            if index.generation != generation:
+                changed.append(index)
+        if not changed:
+            return
+        for listener in list(self._listeners):
+            try:
+                listener(changed)
+            except Exception as exc:
+                logger.warning("Photo watcher listener failed: %s", exc, exc_info=True)
+
+
+def _outermost_roots(roots: Iterable[str]) -> List[str]:
+    ordered: List[str] = []
+    for root in sorted({os.path.abspath(item) for item in roots if item}, key=len):
+        normalized = os.path.normcase(root)
+        if any(photo_index._is_within(normalized, os.path.normcase(item)) for item in ordered):
+            continue
+        ordered.append(root)
+    return ordered
+
+
+def _directory_mtimes(root: str) -> Dict[str, int]:
+    mtimes: Dict[str, int] = {}
+    try:
+        mtimes[root] = os.stat(root).st_mtime_ns
+    except OSError:
+        return mtimes
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                for item in iterator:
+                    if not item.is_dir(follow_symlinks=False):
+                        continue
+                    try:
+                        # No Windows o DirEntry ja traz o mtime, sem stat extra.
+                        mtimes[item.path] = item.stat(follow_symlinks=False).st_mtime_ns
+                    except OSError:
+                        continue
+                    pending.append(item.path)
+        except OSError:
+            continue
+    return mtimes
+
+
+def _indexes_within(root: str) -> List[photo_index.IncrementalPhotoIndex]:
+    normalized = os.path.normcase(root)
+    return [
+        index
+        for index in photo_index.iter_photo_indexes()
+        if photo_index._is_within(os.path.normcase(index.root), normalized)
+    ]
+
+
+def watched_photo_roots() -> List[str]:
+    """Raizes de fotos locais e de estoque que existem no disco."""
+    from .local_catalog import existing_local_roots
+    from .stock_catalog import _resolve_stock_photos_root
+
+    roots = list(existing_local_roots())
+    stock_root = _resolve_stock_photos_root()
+    if stock_root:
+        roots.append(stock_root)
+    return _outermost_roots(roots)
+
+
+def start_photo_watcher(roots: Iterable[str] | None = None) -> PhotoTreeWatcher | None:
+    """Inicia o observador em segundo plano para as raizes de fotos configuradas."""
+    resolved_roots = _outermost_roots(roots) if roots is not None else watched_photo_roots()
+    if not resolved_roots:
+        return None
+    watcher = PhotoTreeWatcher(
+        resolved_roots,
+        debounce_seconds=_env_seconds("CATALOG_PHOTO_WATCHER_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS),
+        poll_seconds=_env_seconds("CATALOG_PHOTO_WATCHER_POLL_SECONDS", DEFAULT_POLL_SECONDS),
+    )
+    logger.info("Watching photo roots: %s", ", ".join(resolved_roots))
+    return watcher.start()
@@ -5,7 +5,7 @@ from __future__ import annotations
 import logging
 import os
 import re
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Sequence
 
 
 logger = logging.getLogger(__name__)
@@ -132,16 +132,87 @@ def _enrich_products_with_resolved_photos(
     return enriched
 
 
-def _resolve_product_record(
+def lookup_photo_record(
     code: str,
     path_override: str | None,
-    get_local_index: Callable[[str | None], Dict[str, Dict]],
-    get_stock_photo_record_for_code: Callable[[str], Dict | None],
+    *,
+    lookup_local_record: Callable[[str, str | None], Dict | None],
+    lookup_stock_record: Callable[[str], Dict | None],
 ) -> Dict | None:
-    record = get_local_index(path_override).get(str(code))
+    """Registro de fotos de um codigo: pasta local primeiro, depois fotos do estoque."""
+    record = lookup_local_record(str(code), path_override)
     if record:
         return record
-    return get_stock_photo_record_for_code(str(code))
+    return lookup_stock_record(str(code))
+
+
+def photo_lookup_snapshot(
+    path_override: str | None,
+    *,
+    get_local_index: Callable[[str | None], Dict[str, Dict]],
+    get_stock_photo_index: Callable[[], Dict[str, Dict]],
+) -> Callable[[str], Dict | None]:
+    """Consulta por codigo sobre os mapas de fotos atuais, lidos uma unica vez.
+
+    Os indices trocam o mapa inteiro quando mudam, entao todas as consultas
+    veem o mesmo estado sem novo acesso ao disco. As fotos do estoque so sao
+    carregadas no primeiro codigo ausente da pasta local.
+    """
+    local_records = get_local_index(path_override)
+    stock_records: Dict[str, Dict] | None = None
+
+    def lookup(code: str) -> Dict | None:
+        nonlocal stock_records
+        record = local_records.get(str(code))
+        if record:
+            return record
+        if stock_records is None:
+            stock_records = get_stock_photo_index()
+        return stock_records.get(str(code))
+
+    return lookup
+
+
+def _local_base_product(
+    code: str,
+    record: Dict,
+    cadastro: Dict[str, str],
+    asset_url: Callable[[str], str],
+    canonical_category: Callable[[str, str], str],
+) -> Dict:
+    """Produto de uma pasta local com o cadastro, antes da mescla com o ERP."""
+    variants = record.get("variants", {})
+    white = variants.get("white_background")
+    ambient = variants.get("ambient")
+    measures = variants.get("measures")
+
+    white_url = asset_url(white["rel_path"]) if white else ""
+    ambient_url = asset_url(ambient["rel_path"]) if ambient else ""
+    measures_url = asset_url(measures["rel_path"]) if measures else ""
+
+    merged_name = str(cadastro.get("name") or record.get("name") or f"Produto {code}").strip()
+    merged_description = str(cadastro.get("description") or "").strip()
+    merged_specs = str(cadastro.get("specs") or "").strip()
+    cadastro_category = _normalize_category_label(str(cadastro.get("category") or ""))
+    if cadastro_category:
+        merged_category = cadastro_category
+    else:
+        merged_category_source = _normalize_category_label(
+            str(record.get("category") or "Sem categoria")
+        )
+        merged_category = canonical_category(merged_category_source, merged_name)
+
+    return {
+        "Codigo": code,
+        "Nome": merged_name,
+        "Descricao": merged_description,
+        "Categoria": merged_category,
+        "URLFoto": white_url,
+        "Especificacoes": merged_specs,
+        "FotoBranco": white_url,
+        "FotoAmbient": ambient_url,
+        "FotoMedidas": measures_url,
+    }
 
 
 def list_local_products(
@@ -165,43 +236,10 @@ def list_local_products(
             return merge_products_with_erp(enriched_stock_products)
 
     cadastro_records = load_cadastro_records(path_override)
-    products: List[Dict] = []
-    for code, record in sorted(index.items(), key=lambda item: code_sort_key(item[0])):
-        variants = record.get("variants", {})
-        white = variants.get("white_background")
-        ambient = variants.get("ambient")
-        measures = variants.get("measures")
-
-        white_url = asset_url(white["rel_path"]) if white else ""
-        ambient_url = asset_url(ambient["rel_path"]) if ambient else ""
-        measures_url = asset_url(measures["rel_path"]) if measures else ""
-
-        cadastro = cadastro_records.get(str(code), {})
-        merged_name = str(cadastro.get("name") or record.get("name") or f"Produto {code}").strip()
-        merged_description = str(cadastro.get("description") or "").strip()
-        merged_specs = str(cadastro.get("specs") or "").strip()
-        cadastro_category = _normalize_category_label(str(cadastro.get("category") or ""))
-        if cadastro_category:
-            merged_category = cadastro_category
-        else:
-            merged_category_source = _normalize_category_label(
-                str(record.get("category") or "Sem categoria")
-            )
-            merged_category = canonical_category(merged_category_source, merged_name)
-
-        products.append(
-            {
-                "Codigo": code,
-                "Nome": merged_name,
-                "Descricao": merged_description,
-                "Categoria": merged_category,
-                "URLFoto": white_url,
-                "Especificacoes": merged_specs,
-                "FotoBranco": white_url,
-                "FotoAmbient": ambient_url,
-                "FotoMedidas": measures_url,
-            }
-        )
+    products = [
+        _local_base_product(code, record, cadastro_records.get(str(code), {}), asset_url, canonical_category)
+        for code, record in sorted(index.items(), key=lambda item: code_sort_key(item[0]))
+    ]
 
     merged_products = merge_products_with_erp(products)
     if path_override is not None:
@@ -215,20 +253,69 @@ def list_local_products(
     )
 
 
+def patch_local_products(
+    products: Sequence[Dict],
+    codes: set[str],
+    *,
+    get_local_index: Callable[[str | None], Dict[str, Dict]],
+    load_stock_products: Callable[[], List[Dict]],
+    enrich_stock_products_with_photos: Callable[[List[Dict]], List[Dict]],
+    get_stock_photo_records_for_codes: Callable[[set[str]], Dict[str, Dict]],
+    asset_url: Callable[[str], str],
+    canonical_category: Callable[[str, str], str],
+) -> List[Dict] | None:
+    """Catalogo de `list_local_products(None)` com so os `codes` remesclados ao ERP atual.
+
+    `products` e o catalogo montado com as mesmas pastas, cadastro e planilha de
+    estoque; so o ERP mudou desde entao. None pede a montagem completa.
+    """
+    from .erp_catalog import (
+        load_erp_index,
+        merge_changed_products_with_erp,
+        product_code,
+        sort_products_by_category,
+    )
+
+    erp_index = load_erp_index()
+    # Sem ERP a lista inteira muda de forma (sem mescla, categorias de negocio nem ordenacao).
+    if not erp_index:
+        return None
+    if not codes:
+        return list(products)
+
+    index = get_local_index(None)
+    stock_products = [] if index else load_stock_products()
+    if stock_products:
+        bases = enrich_stock_products_with_photos(
+            [product for product in stock_products if product_code(product) in codes]
+        )
+        changed = merge_changed_products_with_erp(bases, codes, erp_index)
+    else:
+        cadastro_records = load_cadastro_records(None)
+        bases = [
+            _local_base_product(code, record, cadastro_records.get(str(code), {}), asset_url, canonical_category)
+            for code, record in index.items()
+            if product_code({"Codigo": code}) in codes
+        ]
+        changed = _enrich_products_with_resolved_photos(
+            merge_changed_products_with_erp(bases, codes, erp_index),
+            local_index=index,
+            get_stock_photo_records_for_codes=get_stock_photo_records_for_codes,
+            asset_url=asset_url,
+        )
+
+    kept = [product for product in products if product_code(product) not in codes]
+    return sort_products_by_category(kept + changed)
+
+
 def categorize_local_photos(
     code: str,
     path_override: str | None,
     *,
-    get_local_index: Callable[[str | None], Dict[str, Dict]],
-    get_stock_photo_record_for_code: Callable[[str], Dict | None],
+    lookup_photo_record: Callable[[str, str | None], Dict | None],
     asset_url: Callable[[str], str],
 ) -> Dict[str, str | None]:
-    record = _resolve_product_record(
-        str(code),
-        path_override,
-        get_local_index,
-        get_stock_photo_record_for_code,
-    )
+    record = lookup_photo_record(str(code), path_override)
     if not record:
         return {"white_background": None, "ambient": None, "measures": None}
 
@@ -246,17 +333,11 @@ def find_local_images_for_code(
     code: str,
     path_override: str | None,
     *,
-    get_local_index: Callable[[str | None], Dict[str, Dict]],
-    get_stock_photo_record_for_code: Callable[[str], Dict | None],
+    lookup_photo_record: Callable[[str, str | None], Dict | None],
     local_file_sort_key: Callable[[Dict, str], tuple],
     asset_url: Callable[[str], str],
 ) -> List[Dict]:
-    record = _resolve_product_record(
-        str(code),
-        path_override,
-        get_local_index,
-        get_stock_photo_record_for_code,
-    )
+    record = lookup_photo_record(str(code), path_override)
     if not record:
         return []
 
@@ -5,9 +5,10 @@ from __future__ import annotations
 from pathlib import Path
 import re
 from typing import Dict, List
-import unicodedata
 from urllib.parse import quote
 
+from .text_normalize import normalize_for_match
+
 
 SEGMENT_PREFIX_CODE_PATTERN = re.compile(r"^\s*(?P<code>\d{3,8})(?=\D|$)")
 PARENTHESIZED_VARIANT_SUFFIX_PATTERN = re.compile(r"\((?P<variant>\d{1,3})\)\s*$")
@@ -47,104 +48,8 @@ def _classify_variant(name: str) -> str:
     return "other"
 
 
-def _normalize_name_for_match(name: str) -> str:
-    normalized = unicodedata.normalize("NFD", name or "")
-    without_accents = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
-    return without_accents.lower()
-
-
-def _token_to_category(token: str, next_token: str = "") -> str | None:
-    token = (token or "").upper()
-    next_token = (next_token or "").upper()
-    if not token:
-        return None
-
-    if token in {"ARANDELA", "ARANDELAS", "ARANDEDA"} or token.startswith("ARANDEL"):
-        return "ARANDELA"
-    if token.startswith("ABAJUR"):
-        return "ABAJUR"
-    if token.startswith("PENDENTE"):
-        return "PENDENTE"
-    if token.startswith("LUSTRE"):
-        return "LUSTRE"
-    if token.startswith("PAINEL"):
-        return "PAINEL"
-    if token.startswith("PLAFON"):
-        return "PLAFON"
-    if token in {"MINI"} and next_token.startswith("TRILHO"):
-        return "TRILHO"
-    if token.startswith("TRILHO"):
-        return "TRILHO"
-    if token.startswith("PERFIL"):
-        return "PERFIL"
-    if token.startswith("SENSOR"):
-        return "SENSOR"
-    if token.startswith("BOCAL"):
-        return "BOCAL"
-    if token.startswith("ESPETO"):
-        return "ESPETO"
-    if token.startswith("BALIZADOR"):
-        return "BALIZADOR"
-    if token.startswith("ESPELHO"):
-        return "ESPELHO"
-    if token.startswith("RELE"):
-        return "RELE"
-    if token.startswith("REFLET") or token.startswith("HOLOFOTE"):
-        return "REFLETOR"
-    if token.startswith("LAMP"):
-        return "LAMPADA"
-    if token.startswith("DRIVER") or token == "DRIVE" or token.startswith("FONTE"):
-        return "DRIVER/FONTE"
-    if token == "FITA":
-        return "FITA LED"
-    if token.startswith("LUMINARIA") or token in {"LUMI", "LUM", "LUMIN"}:
-        return "LUMINARIA"
-    return None
-
-
-def _normalized_tokens(text: str) -> List[str]:
-    normalized = _normalize_name_for_match(text).upper()
-    normalized = re.sub(r"[^A-Z0-9\s]", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return normalized.split() if normalized else []
-
-
-def _canonical_category(category: str, product_name: str = "") -> str:
-    candidates = [category, product_name]
-    for candidate in candidates:
-        tokens = _normalized_tokens(candidate)
-        if not tokens:
-            continue
-
-        if "ILUMINACAO" in tokens and "PUBLICA" in tokens:
-            return "ILUMINACAO PUBLICA"
-        if "PUBLICA" in tokens and ("LUM" in tokens or "LUMIN" in tokens):
-            return "ILUMINACAO PUBLICA"
-
-        first = _token_to_category(tokens[0], tokens[1] if len(tokens) > 1 else "")
-        if first:
-            return first
-
-        for idx, token in enumerate(tokens[1:], start=1):
-            mapped = _token_to_category(token, tokens[idx + 1] if idx + 1 < len(tokens) else "")
-            if mapped and mapped != "LUMINARIA":
-                return mapped
-
-        if any(
-            _token_to_category(token, tokens[idx + 1] if idx + 1 < len(tokens) else "")
-            == "LUMINARIA"
-            for idx, token in enumerate(tokens)
-        ):
-            return "LUMINARIA"
-
-        if "FITA" in tokens and "LED" in tokens:
-            return "FITA LED"
-
-    return "Sem categoria"
-
-
 def _is_description_title(name: str, code: str) -> bool:
-    normalized = _normalize_name_for_match(name)
+    normalized = normalize_for_match(name)
     for marker in ("descricao", "description", "descri"):
         if marker in normalized:
             return True
@@ -166,7 +71,7 @@ def _is_description_title(name: str, code: str) -> bool:
 
 def _local_file_sort_key(file_info: Dict, code: str) -> tuple:
     name = file_info.get("name", "")
-    normalized = _normalize_name_for_match(name)
+    normalized = normalize_for_match(name)
     if _is_description_title(name, code):
         variant = _match_filename(name, str(code))
         if variant is not None and variant > 0:
@@ -176,7 +81,7 @@ def _local_file_sort_key(file_info: Dict, code: str) -> tuple:
                 name or "",
                 flags=re.IGNORECASE,
             )
-            return (0, _normalize_name_for_match(base_without_variant), variant, normalized)
+            return (0, normalize_for_match(base_without_variant), variant, normalized)
         return (0, normalized)
 
     variant = _match_filename(name, str(code))
@@ -206,6 +111,35 @@ def _pick_distinct_fallback(files: List[Dict], taken: set[str]) -> Dict | None:
     return None
 
 
+def _finalize_photo_record(record: Dict, code: str) -> Dict:
+    """Ordena os arquivos do registro e completa variantes ausentes com fotos distintas."""
+    record["files"].sort(key=lambda item: _local_file_sort_key(item, code))
+    chosen = set()
+
+    white = record["variants"]["white_background"]
+    if white is None and record["files"]:
+        white = record["files"][0]
+        record["variants"]["white_background"] = white
+    if white:
+        chosen.add(white["rel_path"])
+
+    ambient = record["variants"]["ambient"]
+    if ambient:
+        chosen.add(ambient["rel_path"])
+    else:
+        fallback = _pick_distinct_fallback(record["files"], chosen)
+        if fallback:
+            record["variants"]["ambient"] = fallback
+            chosen.add(fallback["rel_path"])
+
+    measures = record["variants"]["measures"]
+    if not measures:
+        fallback = _pick_distinct_fallback(record["files"], chosen)
+        if fallback:
+            record["variants"]["measures"] = fallback
+    return record
+
+
 def _code_sort_key(code_value: str) -> tuple[int, int | str]:
     code_text = str(code_value or "").strip()
     if code_text.isdigit():
@@ -0,0 +1,140 @@
+"""Veredito de destino dos hosts de fotos remotas, com enderecos fixados.
+
+Cada host e resolvido uma vez por `CATALOG_EXPORT_DNS_TTL_SECONDS`: o veredito
+guarda os enderecos conferidos (todos publicos) e a conexao da sessao de
+fotos vai para o primeiro deles, sem nova consulta de DNS. Assim a checagem
+de IP privado vale para o endereco realmente usado, mesmo que o DNS mude
+entre a checagem e a conexao. Hosts recusados ou que falham na resolucao
+ficam guardados por menos tempo (`NEGATIVE_TTL_SECONDS`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import ipaddress
+import os
+import socket
+from threading import Lock
+import time
+from typing import Dict, Tuple
+
+
+DEFAULT_TTL_SECONDS = 300
+NEGATIVE_TTL_SECONDS = 60
+MAX_CACHED_HOSTS = 1024
+
+HostKey = Tuple[str, int]
+
+
+@dataclass(frozen=True)
+class HostVerdict:
+    # Vazio quando o host nao resolve ou algum endereco dele nao e publico.
+    addresses: Tuple[str, ...]
+    expires_at: float
+
+    @property
+    def permitted(self) -> bool:
+        return bool(self.addresses)
+
+
+_VERDICT_LOCK = Lock()
+_VERDICTS: Dict[HostKey, HostVerdict] = {}
+# Uma resolucao por host por vez; as demais threads esperam e leem o veredito.
+_RESOLVING: Dict[HostKey, Lock] = {}
+
+
+def ttl_seconds() -> int:
+    raw_value = os.getenv("CATALOG_EXPORT_DNS_TTL_SECONDS", "").strip()
+    try:
+        parsed = int(raw_value) if raw_value else DEFAULT_TTL_SECONDS
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+    return max(parsed, 0)
+
+
+def is_public_ip_address(value: str) -> bool:
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return not (
+        address.is_private
+        or address.is_loopback
+        or address.is_link_local
+        or address.is_multicast
+        or address.is_reserved
+        or address.is_unspecified
+    )
+
+
+def _resolve_public_addresses(hostname: str, port: int) -> Tuple[str, ...]:
+    try:
+        resolved = socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+    except OSError:
+        return ()
+
+    # Ordem do resolvedor preservada: o primeiro e o endereco que o sistema preferiria.
+    addresses = tuple(dict.fromkeys(item[4][0] for item in resolved if item and len(item) >= 5 and item[4]))
+    if not addresses or not all(is_public_ip_address(address) for address in addresses):
+        return ()
+    return addresses
+
+
+def _cached_verdict(key: HostKey) -> HostVerdict | None:
+    with _VERDICT_LOCK:
+        verdict = _VERDICTS.get(key)
+    if verdict is not None and verdict.expires_at > time.monotonic():
+        return verdict
+    return None
+
+
+def _store_verdict(key: HostKey, verdict: HostVerdict) -> None:
+    with _VERDICT_LOCK:
+        _VERDICTS.pop(key, None)
+        if len(_VERDICTS) >= MAX_CACHED_HOSTS:
+            now = time.monotonic()
+            for stale in [item for item, cached in _VERDICTS.items() if cached.expires_at <= now]:
+                del _VERDICTS[stale]
+        while len(_VERDICTS) >= MAX_CACHED_HOSTS:
+            # Dict em ordem de insercao: sai o veredito mais antigo.
+            del _VERDICTS[next(iter(_VERDICTS))]
+        _VERDICTS[key] = verdict
+
+
+def host_verdict(hostname: str, port: int) -> HostVerdict:
+    """Enderecos publicos conferidos para `hostname`, reaproveitados ate o TTL vencer."""
+    hostname = hostname.strip().lower()
+    if is_public_ip_address(hostname):
+        return HostVerdict((hostname,), float("inf"))
+
+    key = (hostname, port)
+    verdict = _cached_verdict(key)
+    if verdict is not None:
+        return verdict
+
+    with _VERDICT_LOCK:
+        resolving = _RESOLVING.setdefault(key, Lock())
+    with resolving:
+        verdict = _cached_verdict(key)
+        if verdict is not None:
+            return verdict
+        addresses = _resolve_public_addresses(hostname, port)
+        ttl = ttl_seconds() if addresses else min(ttl_seconds(), NEGATIVE_TTL_SECONDS)
+        verdict = HostVerdict(addresses, time.monotonic() + ttl)
+        if ttl:
+            _store_verdict(key, verdict)
+    with _VERDICT_LOCK:
+        _RESOLVING.pop(key, None)
+    return verdict
+
+
+def pinned_address(hostname: str, port: int) -> str | None:
+    """Endereco em que a conexao com `hostname` deve ser aberta; None se o host nao e permitido."""
+    verdict = host_verdict(hostname, port)
+    return verdict.addresses[0] if verdict.permitted else None
+
+
+def clear_host_verdicts() -> None:
+    with _VERDICT_LOCK:
+        _VERDICTS.clear()
+        _RESOLVING.clear()
@@ -1,11 +1,20 @@
 """Camada de servicos da aplicacao."""
 
-from .catalog_service import fetch_sheet_or_local_products, list_catalog_products
+from .catalog_service import (
+    fetch_sheet_or_local_products,
+    get_catalog_snapshot,
+    list_catalog_products,
+    refresh_catalog_products,
+    schedule_catalog_refresh,
+)
 from .media_service import get_product_images_payload, get_product_photos_payload
 
 __all__ = [
     "fetch_sheet_or_local_products",
+    "get_catalog_snapshot",
     "get_product_images_payload",
     "get_product_photos_payload",
     "list_catalog_products",
+    "refresh_catalog_products",
+    "schedule_catalog_refresh",
 ]
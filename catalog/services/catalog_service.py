@@ -11,10 +11,27 @@ from ..spreadsheet import fetch_sheet
 logger = logging.getLogger(__name__)
 
 
+def get_catalog_snapshot():
+    from .. import onedrive
+
+    return onedrive.get_catalog_snapshot()
+
+
 def list_catalog_products() -> List[Dict]:
+    return list(get_catalog_snapshot().products)
+
+
+def refresh_catalog_products() -> List[Dict]:
+    """Remonta o catalogo materializado agora, mesmo sem mudanca nas fontes."""
+    from .. import onedrive
+
+    return list(onedrive.refresh_catalog_snapshot(force=True).products)
+
+
+def schedule_catalog_refresh() -> None:
     from .. import onedrive
 
-    return onedrive.list_local_products()
+    onedrive.schedule_catalog_refresh()
 
 
 def fetch_sheet_or_local_products(url: str) -> List[Dict]:
@@ -0,0 +1,222 @@
+"""Leitura de atalhos .lnk do Windows (formato Shell Link) sem depender do PowerShell."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import os
+import re
+import struct
+from threading import Lock
+from typing import Dict
+
+
+LINK_HEADER_SIZE = 0x4C
+LINK_CLSID = bytes.fromhex("0114020000000000c000000000000046")
+HAS_LINK_TARGET_ID_LIST = 0x01
+HAS_LINK_INFO = 0x02
+HAS_NAME = 0x04
+HAS_RELATIVE_PATH = 0x08
+HAS_WORKING_DIR = 0x10
+HAS_ARGUMENTS = 0x20
+HAS_ICON_LOCATION = 0x40
+IS_UNICODE = 0x80
+VOLUME_ID_AND_LOCAL_BASE_PATH = 0x01
+COMMON_NETWORK_RELATIVE_LINK = 0x02
+ENVIRONMENT_BLOCK_SIGNATURE = 0xA0000001
+ENVIRONMENT_BLOCK_SIZE = 0x314
+MAX_LINK_FILE_BYTES = 1024 * 1024
+# Pagina de codigo ANSI do Windows em portugues.
+ANSI_ENCODING = "cp1252"
+_WINDOWS_SEPARATORS = re.compile(r"[\\/]+")
+
+
+@dataclass(frozen=True)
+class ShellLink:
+    target: str | None
+    relative_path: str | None = None
+    working_dir: str | None = None
+
+
+def _u16(data: bytes, offset: int) -> int:
+    return struct.unpack_from("<H", data, offset)[0]
+
+
+def _u32(data: bytes, offset: int) -> int:
+    return struct.unpack_from("<I", data, offset)[0]
+
+
+def _read_cstring(data: bytes, offset: int, unicode: bool = False) -> str:
+    if offset <= 0 or offset >= len(data):
+        return ""
+    if unicode:
+        end = offset
+        while end + 1 < len(data) and data[end : end + 2] != b"\0\0":
+            end += 2
+        return data[offset:end].decode("utf-16-le", errors="replace")
+    end = data.find(b"\0", offset)
+    return data[offset : end if end >= 0 else len(data)].decode(ANSI_ENCODING, errors="replace")
+
+
+def _join_windows_path(base: str, suffix: str) -> str:
+    if not suffix:
+        return base
+    if not base or base.endswith("\\"):
+        return base + suffix
+    return f"{base}\\{suffix}"
+
+
+def _link_info_path(info: bytes) -> str | None:
+    header_size = _u32(info, 4)
+    flags = _u32(info, 8)
+    unicode = header_size >= 0x24
+    if unicode:
+        suffix = _read_cstring(info, _u32(info, 0x20), unicode=True)
+    else:
+        suffix = _read_cstring(info, _u32(info, 0x18))
+
+    if flags & VOLUME_ID_AND_LOCAL_BASE_PATH:
+        base = _read_cstring(info, _u32(info, 0x1C), unicode=True) if unicode else ""
+        base = base or _read_cstring(info, _u32(info, 0x10))
+        return _join_windows_path(base, suffix) or None
+
+    if flags & COMMON_NETWORK_RELATIVE_LINK:
+        network_offset = _u32(info, 0x14)
+        network = info[network_offset:]
+        name_offset = _u32(network, 8)
+        share = ""
+        if name_offset > 0x14:
+            share = _read_cstring(network, _u32(network, 0x14), unicode=True)
+        share = share or _read_cstring(network, name_offset)
+        return _join_windows_path(share, suffix) or None
+    return None
+
+
+def _read_string_data(data: bytes, offset: int, unicode: bool) -> tuple[str, int]:
+    count = _u16(data, offset)
+    offset += 2
+    size = count * 2 if unicode else count
+    raw = data[offset : offset + size]
+    if len(raw) != size:
+        raise ValueError("truncated string data")
+    value = raw.decode("utf-16-le" if unicode else ANSI_ENCODING, errors="replace")
+    return value, offset + size
+
+
+def _environment_target(data: bytes, offset: int) -> str | None:
+    while offset + 8 <= len(data):
+        block_size = _u32(data, offset)
+        if block_size < 8:
+            return None
+        if _u32(data, offset + 4) == ENVIRONMENT_BLOCK_SIGNATURE and block_size >= ENVIRONMENT_BLOCK_SIZE:
+            block = data[offset : offset + block_size]
+            target = _read_cstring(block, 8 + 260, unicode=True) or _read_cstring(block, 8)
+            return os.path.expandvars(target) if target else None
+        offset += block_size
+    return None
+
+
+def parse_shell_link(data: bytes) -> ShellLink:
+    """Extrai destino absoluto, caminho relativo e pasta de trabalho de um .lnk."""
+    if len(data) < LINK_HEADER_SIZE or _u32(data, 0) != LINK_HEADER_SIZE or data[4:20] != LINK_CLSID:
+        raise ValueError("not a shell link")
+
+    try:
+        flags = _u32(data, 0x14)
+        offset = LINK_HEADER_SIZE
+        if flags & HAS_LINK_TARGET_ID_LIST:
+            offset += 2 + _u16(data, offset)
+
+        target = None
+        if flags & HAS_LINK_INFO:
+            info_size = _u32(data, offset)
+            target = _link_info_path(data[offset : offset + info_size])
+            offset += info_size
+
+        strings: Dict[int, str] = {}
+        for flag in (HAS_NAME, HAS_RELATIVE_PATH, HAS_WORKING_DIR, HAS_ARGUMENTS, HAS_ICON_LOCATION):
+            if flags & flag:
+                strings[flag], offset = _read_string_data(data, offset, bool(flags & IS_UNICODE))
+
+        return ShellLink(
+            target=target or _environment_target(data, offset),
+            relative_path=strings.get(HAS_RELATIVE_PATH) or None,
+            working_dir=strings.get(HAS_WORKING_DIR) or None,
+        )
+    except struct.error as exc:
+        raise ValueError("truncated shell link") from exc
+
+
+_CACHE_LOCK = Lock()
+_CACHE: Dict[str, tuple[int, int, ShellLink | None]] = {}
+
+
+def read_shell_link(path: str) -> ShellLink | None:
+    """Le o atalho reaproveitando o resultado enquanto caminho, tamanho e mtime nao mudam."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = os.path.normcase(os.path.abspath(path))
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    link: ShellLink | None = None
+    if stat.st_size <= MAX_LINK_FILE_BYTES:
+        try:
+            with open(path, "rb") as handle:
+                link = parse_shell_link(handle.read())
+        except (OSError, ValueError):
+            link = None
+    with _CACHE_LOCK:
+        _CACHE[key] = (stat.st_mtime_ns, stat.st_size, link)
+    return link
+
+
+def clear_shell_link_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+def _map_windows_path(target: str, link_dir: str) -> str | None:
+    """Localiza um destino C:\\... numa copia montada, ancorando pelas pastas em comum."""
+    components = [item for item in _WINDOWS_SEPARATORS.split(target) if item]
+    if components and components[0].endswith(":"):
+        components = components[1:]
+    lowered = [item.lower() for item in components]
+
+    ancestor = os.path.abspath(link_dir)
+    while True:
+        name = os.path.basename(ancestor).lower()
+        if name and name in lowered:
+            position = len(lowered) - 1 - lowered[::-1].index(name)
+            candidate = os.path.join(ancestor, *components[position + 1 :])
+            if os.path.exists(candidate):
+                return candidate
+        parent = os.path.dirname(ancestor)
+        if parent == ancestor:
+            return None
+        ancestor = parent
+
+
+def resolve_link_target(link_path: str) -> str | None:
+    """Caminho local do destino do atalho, ou None se ele nao existir nesta maquina."""
+    link = read_shell_link(link_path)
+    if link is None:
+        return None
+
+    link_dir = os.path.dirname(os.path.abspath(link_path))
+    candidates = []
+    if link.target and os.name == "nt":
+        candidates.append(link.target)
+    if link.relative_path:
+        relative = link.relative_path.replace("\\", os.sep)
+        candidates.append(os.path.normpath(os.path.join(link_dir, relative)))
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return os.path.abspath(candidate)
+    if link.target and os.name != "nt":
+        return _map_windows_path(link.target, link_dir)
+    return None
@@ -2,22 +2,28 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass, replace
+from functools import cached_property
 import logging
 import os
 from pathlib import Path
 import re
-from typing import Dict, List
+from stat import S_ISREG
+from threading import Lock
+from typing import Callable, Dict, List
 from urllib.parse import quote
 
+from .category_classifier import canonical_category
+from .photo_index import IncrementalPhotoIndex, get_photo_index, lookup_max_age_seconds
+from .photo_records import PhotoFile, PhotoRecord
 from .product_media import (
     _asset_url,
-    _canonical_category,
     _classify_variant,
     _code_sort_key,
-    _local_file_sort_key,
-    _normalize_name_for_match,
-    _pick_distinct_fallback,
+    _finalize_photo_record,
 )
+from .stock_matcher import StockDescriptionMatcher
+from .xlsx_reader import read_sheet_columns
 
 
 logger = logging.getLogger(__name__)
@@ -28,26 +34,6 @@ NO_PHOTO_THUMB_URL = "https://placehold.co/240x240?text=Sem+foto"
 STOCK_PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff", ".psd")
 FOUR_DIGIT_CODE_PATTERN = re.compile(r"(?<!\d)(?P<code>\d{4})(?!\d)")
 GENERIC_CODE_PATTERN = re.compile(r"\b(?P<code>\d{4,8})\b")
-DESCRIPTION_MODEL_TOKEN_PATTERN = re.compile(
-    r"\b[a-z0-9]+(?:[-_][a-z0-9]+)+\b|\b[a-z]{1,5}\d{2,}[a-z0-9-]*\b",
-    re.IGNORECASE,
-)
-DESCRIPTION_TOKEN_STOPWORDS = {
-    "para",
-    "com",
-    "sem",
-    "de",
-    "da",
-    "do",
-    "das",
-    "dos",
-    "led",
-    "bivolt",
-    "branco",
-    "preto",
-    "und",
-    "kit",
-}
 
 
 def _env_flag(name: str, default: bool = True) -> bool:
@@ -153,126 +139,70 @@ def _extract_four_digit_codes_from_text(text: str) -> List[str]:
     return [match.group("code") for match in FOUR_DIGIT_CODE_PATTERN.finditer(str(text or ""))]
 
 
-def _normalize_stock_search_text(text: str) -> str:
-    normalized = _normalize_name_for_match(text)
-    normalized = re.sub(r"[^a-z0-9\s\-_/]", " ", normalized)
-    normalized = re.sub(r"[\-_/]", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return normalized
-
-
-def _stock_search_tokens(text: str) -> set[str]:
-    normalized = _normalize_stock_search_text(text)
-    return {
-        token
-        for token in normalized.split()
-        if len(token) >= 4 and token not in DESCRIPTION_TOKEN_STOPWORDS
-    }
-
-
-def _stock_model_tokens(text: str) -> set[str]:
-    normalized = _normalize_name_for_match(text)
-    normalized = re.sub(r"[^a-z0-9\s\-_]", " ", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    return {
-        match.group(0)
-        for match in DESCRIPTION_MODEL_TOKEN_PATTERN.finditer(normalized)
-        if len(match.group(0)) >= 4
-    }
-
-
-def _build_stock_description_profiles(
-    description_by_code: Dict[str, List[str]] | None,
-    allowed_codes: set[str] | None,
-) -> tuple[Dict[str, Dict[str, set[str]]], Dict[str, set[str]], Dict[str, set[str]]]:
-    if not description_by_code:
-        return {}, {}, {}
-
-    profiles: Dict[str, Dict[str, set[str]]] = {}
-    token_to_codes: Dict[str, set[str]] = {}
-    model_to_codes: Dict[str, set[str]] = {}
-
-    for code, descriptions in description_by_code.items():
-        normalized_code = str(code or "").strip()
-        if not re.fullmatch(r"\d{4}", normalized_code):
-            continue
-        if allowed_codes is not None and normalized_code not in allowed_codes:
-            continue
-
-        values = descriptions if isinstance(descriptions, list) else [descriptions]
-        token_set: set[str] = set()
-        model_set: set[str] = set()
-        for value in values:
-            token_set.update(_stock_search_tokens(str(value or "")))
-            model_set.update(_stock_model_tokens(str(value or "")))
-
-        if not token_set and not model_set:
-            continue
-
-        profiles[normalized_code] = {"tokens": token_set, "models": model_set}
-
-        for token in token_set:
-            if len(token) < 5:
-                continue
-            token_to_codes.setdefault(token, set()).add(normalized_code)
-        for model in model_set:
-            model_to_codes.setdefault(model, set()).add(normalized_code)
-
-    return profiles, token_to_codes, model_to_codes
-
-
-def _match_stock_code_by_description(
-    search_text: str,
-    allowed_codes: set[str] | None,
-    profiles: Dict[str, Dict[str, set[str]]],
-    token_to_codes: Dict[str, set[str]],
-    model_to_codes: Dict[str, set[str]],
-) -> str | None:
-    if not profiles:
+def _normalize_allowed_stock_codes(allowed_codes: set[str] | None) -> set[str] | None:
+    if not allowed_codes:
         return None
+    return {str(code) for code in allowed_codes if re.fullmatch(r"\d{4}", str(code))}
 
-    text_tokens = _stock_search_tokens(search_text)
-    text_models = _stock_model_tokens(search_text)
-    if not text_tokens and not text_models:
-        return None
-
-    candidates: set[str] = set()
-    for model in text_models:
-        candidates.update(model_to_codes.get(model, set()))
-
-    if not candidates:
-        for token in text_tokens:
-            candidates.update(token_to_codes.get(token, set()))
 
-    if allowed_codes is not None:
-        candidates = {code for code in candidates if code in allowed_codes}
-    if not candidates:
-        return None
-
-    best_code = None
-    best_score = 0
-    tie = False
-    for code in candidates:
-        profile = profiles.get(code)
-        if not profile:
-            continue
-        model_hits = len(text_models & profile.get("models", set()))
-        token_hits = len(text_tokens & profile.get("tokens", set()))
-        score = (model_hits * 3) + token_hits
-        if model_hits == 0 and token_hits < 3:
-            continue
-        if score > best_score:
-            best_code = code
-            best_score = score
-            tie = False
-        elif score == best_score and score > 0:
-            tie = True
-
-    if not best_code or tie:
-        return None
-    if best_score < 4:
-        return None
-    return best_code
+def _stock_file_classifier(
+    normalized_allowed: set[str] | None,
+    description_by_code: Dict[str, List[str]] | None,
+) -> Callable[[List[str], str], tuple | None]:
+    matcher: tuple | None = None
+
+    def description_matcher() -> tuple[StockDescriptionMatcher, object]:
+        # O indice so e consultado se algum arquivo precisar de busca por descricao.
+        nonlocal matcher
+        if matcher is None:
+            matcher = _description_matcher(description_by_code, normalized_allowed)
+        return matcher
+
+    def classify(parts: List[str], full_path: str) -> tuple | None:
+        filename = parts[-1]
+        if os.path.splitext(filename)[1].lower() not in STOCK_PHOTO_EXTENSIONS:
+            return None
+
+        rel_path = os.sep.join(parts)
+        code = _extract_four_digit_code(filename)
+        if code and normalized_allowed is not None and code not in normalized_allowed:
+            code = None
+
+        if not code:
+            for candidate in _extract_four_digit_codes_from_text(rel_path):
+                if normalized_allowed is None or candidate in normalized_allowed:
+                    code = candidate
+                    break
+
+        if not code and description_by_code:
+            index, allowed = description_matcher()
+            code = index.match(parts, allowed)
+        if not code:
+            # Sem codigo da planilha: guarda os numeros do caminho para consultas
+            # por codigos de fora dela (ex.: produtos que so existem no ERP).
+            candidates = tuple(dict.fromkeys(_extract_four_digit_codes_from_text(rel_path)))
+            if not candidates:
+                return None
+            return None, PhotoFile(filename, full_path, rel_path), candidates
+        return code, PhotoFile(filename, full_path, rel_path)
+
+    return classify
+
+
+def _build_stock_record(code: str, entries: List[tuple]) -> PhotoRecord:
+    record = {
+        "code": code,
+        "name": f"Produto {code}",
+        "category": "Sem categoria",
+        "files": [],
+        "variants": {"white_background": None, "ambient": None, "measures": None},
+    }
+    for _, file_info in entries:
+        record["files"].append(file_info)
+        variant = _classify_variant(file_info["name"])
+        if variant in record["variants"] and record["variants"][variant] is None:
+            record["variants"][variant] = file_info
+    return PhotoRecord.from_dict(_finalize_photo_record(record, code))
 
 
 def _scan_stock_photo_index(
@@ -280,128 +210,39 @@ def _scan_stock_photo_index(
     allowed_codes: set[str] | None = None,
     description_by_code: Dict[str, List[str]] | None = None,
 ) -> Dict[str, Dict]:
-    index: Dict[str, Dict] = {}
-    normalized_allowed = (
-        {str(code) for code in allowed_codes if re.fullmatch(r"\d{4}", str(code))}
-        if allowed_codes
-        else None
-    )
-    profiles, token_to_codes, model_to_codes = _build_stock_description_profiles(
-        description_by_code=description_by_code,
-        allowed_codes=normalized_allowed,
+    normalized_allowed = _normalize_allowed_stock_codes(allowed_codes)
+    return IncrementalPhotoIndex(root, STOCK_PHOTO_EXTENSIONS).refresh(
+        _stock_file_classifier(normalized_allowed, description_by_code),
+        _build_stock_record,
     )
 
-    for dirpath, _, filenames in os.walk(root):
-        for filename in filenames:
-            ext = os.path.splitext(filename)[1].lower()
-            if ext not in STOCK_PHOTO_EXTENSIONS:
-                continue
 
-            full_path = os.path.join(dirpath, filename)
-            rel_path = os.path.relpath(full_path, root)
-            search_text = f"{rel_path} {filename}"
-
-            code = _extract_four_digit_code(filename)
-            if code and normalized_allowed is not None and code not in normalized_allowed:
-                code = None
-
-            if not code:
-                for candidate in _extract_four_digit_codes_from_text(rel_path):
-                    if normalized_allowed is None or candidate in normalized_allowed:
-                        code = candidate
-                        break
-
-            if not code:
-                code = _match_stock_code_by_description(
-                    search_text=search_text,
-                    allowed_codes=normalized_allowed,
-                    profiles=profiles,
-                    token_to_codes=token_to_codes,
-                    model_to_codes=model_to_codes,
-                )
-            if not code:
-                continue
+def _get_stock_photo_index() -> Dict[str, Dict]:
+    """Indice de fotos do estoque materializado para a planilha atual.
 
-            record = index.setdefault(
-                code,
-                {
-                    "code": code,
-                    "name": f"Produto {code}",
-                    "category": "Sem categoria",
-                    "files": [],
-                    "variants": {"white_background": None, "ambient": None, "measures": None},
-                },
-            )
-            file_info = {"name": filename, "full_path": full_path, "rel_path": rel_path}
-            record["files"].append(file_info)
-
-            variant = _classify_variant(filename)
-            if variant in record["variants"] and record["variants"][variant] is None:
-                record["variants"][variant] = file_info
-
-    for code, record in index.items():
-        record["files"].sort(key=lambda item: _local_file_sort_key(item, code))
-        chosen = set()
-
-        white = record["variants"]["white_background"]
-        if white is None and record["files"]:
-            white = record["files"][0]
-            record["variants"]["white_background"] = white
-        if white:
-            chosen.add(white["rel_path"])
-
-        ambient = record["variants"]["ambient"]
-        if ambient:
-            chosen.add(ambient["rel_path"])
-        else:
-            fallback = _pick_distinct_fallback(record["files"], chosen)
-            if fallback:
-                record["variants"]["ambient"] = fallback
-                chosen.add(fallback["rel_path"])
-
-        measures = record["variants"]["measures"]
-        if not measures:
-            fallback = _pick_distinct_fallback(record["files"], chosen)
-            if fallback:
-                record["variants"]["measures"] = fallback
-
-    return index
-
-
-def _get_stock_photo_index(
-    allowed_codes: set[str] | None = None,
-    description_by_code: Dict[str, List[str]] | None = None,
-) -> Dict[str, Dict]:
+    Os codigos aceitos e a busca por descricao vem da planilha inteira, entao o
+    mesmo indice atende a listagem e as consultas por codigo. Sem planilha,
+    qualquer codigo de 4 digitos vale. Arquivos sem codigo da planilha guardam
+    os numeros do caminho, que respondem consultas por codigos de fora dela.
+    Os arquivos so sao reclassificados quando a versao da planilha muda.
+    """
     root = _resolve_stock_photos_root()
     if not root:
         return {}
-    return _scan_stock_photo_index(
-        root,
-        allowed_codes=allowed_codes,
-        description_by_code=description_by_code,
+    report = _load_available_stock_report()
+    # Numeros fora da planilha (ex.: anos em nomes de pasta) nao viram codigo.
+    report_codes = _normalize_allowed_stock_codes(
+        {str(item.get("Codigo", "")).strip() for item in report.products}
+    )
+    return get_photo_index(root, STOCK_PHOTO_EXTENSIONS).refresh(
+        _stock_file_classifier(report_codes or None, report.descriptions),
+        _build_stock_record,
+        context_key=report.version,
     )
 
 
 def _enrich_stock_products_with_photos(products: List[Dict]) -> List[Dict]:
-    codes = {
-        str(item.get("Codigo", "")).strip()
-        for item in products
-        if re.fullmatch(r"\d{4}", str(item.get("Codigo", "")).strip())
-    }
-    description_by_code: Dict[str, List[str]] = {}
-    for item in products:
-        code = str(item.get("Codigo", "")).strip()
-        if not re.fullmatch(r"\d{4}", code):
-            continue
-        description = str(item.get("Nome") or item.get("Descricao") or "").strip()
-        if not description:
-            continue
-        description_by_code.setdefault(code, []).append(description)
-
-    photo_index = _get_stock_photo_index(
-        codes,
-        description_by_code=description_by_code,
-    )
+    photo_index = _get_stock_photo_index()
     if not photo_index:
         return products
 
@@ -432,100 +273,237 @@ def _enrich_stock_products_with_photos(products: List[Dict]) -> List[Dict]:
     return enriched
 
 
+def _candidate_records(index: IncrementalPhotoIndex, codes: set[str]) -> Dict[str, Dict]:
+    """Registros de codigos fora da planilha, montados com os numeros guardados nas entradas.
+
+    O mapa numero -> arquivos vem da memoria do indice e so e remontado quando
+    alguma pasta muda ou a versao da planilha muda; nao ha nova varredura.
+    """
+    key = (id(index), index.entries_version, index.context_key)
+    with _CANDIDATE_LOCK:
+        cached = _CANDIDATE_CACHE.get(index.root)
+    if cached is None or cached[0] != key:
+        files: Dict[str, List[tuple]] = {}
+        for _, _, entry in index.entries():
+            if entry[0] is not None or len(entry) < 3:
+                continue
+            for candidate in entry[2]:
+                files.setdefault(candidate, []).append((candidate, entry[1]))
+        cached = (key, files, {})
+        with _CANDIDATE_LOCK:
+            _CANDIDATE_CACHE[index.root] = cached
+
+    _, files, records = cached
+    found: Dict[str, Dict] = {}
+    for code in codes:
+        if code not in files:
+            continue
+        record = records.get(code)
+        if record is None:
+            record = records[code] = _build_stock_record(code, files[code])
+        found[code] = record
+    return found
+
+
 def _get_stock_photo_records_for_codes(codes: set[str]) -> Dict[str, Dict]:
     normalized_codes = {str(code or "").strip() for code in codes if re.fullmatch(r"\d{4}", str(code or "").strip())}
     if not normalized_codes:
         return {}
 
-    description_by_code: Dict[str, List[str]] = {}
-    for item in _load_products_from_available_stock_report():
-        code = str(item.get("Codigo", "")).strip()
-        if code not in normalized_codes:
-            continue
-        description = str(item.get("Nome") or item.get("Descricao") or "").strip()
-        if not description:
-            continue
-        description_by_code.setdefault(code, []).append(description)
-
-    return _get_stock_photo_index(
-        normalized_codes,
-        description_by_code=description_by_code,
-    )
+    photo_index = _get_stock_photo_index()
+    found = {code: photo_index[code] for code in normalized_codes if code in photo_index}
+    missing = normalized_codes.difference(found)
+    root = _resolve_stock_photos_root()
+    if missing and root:
+        found.update(_candidate_records(get_photo_index(root, STOCK_PHOTO_EXTENSIONS), missing))
+    return found
 
 
 def _get_stock_photo_record_for_code(code: str) -> Dict | None:
     normalized_code = str(code or "").strip()
     if not re.fullmatch(r"\d{4}", normalized_code):
         return None
-    return _get_stock_photo_records_for_codes({normalized_code}).get(normalized_code)
-
-
-def _load_products_from_stock_report(report_path: str) -> List[Dict]:
-    if not report_path or not os.path.isfile(report_path):
-        return []
 
+    root = _resolve_stock_photos_root()
+    if not root:
+        return None
+    index = get_photo_index(root, STOCK_PHOTO_EXTENSIONS)
+    records = index.current_records(lookup_max_age_seconds())
+    if records is None:
+        records = _get_stock_photo_index()
+    record = records.get(normalized_code)
+    if record is None:
+        record = _candidate_records(index, {normalized_code}).get(normalized_code)
+    return record
+
+
+@dataclass(frozen=True)
+class _StockReport:
+    products: List[Dict]
+    descriptions: Dict[str, List[str]]
+    # Caminho, mtime e tamanho da planilha lida; identifica o contexto do indice de fotos.
+    version: tuple = ()
+
+    @cached_property
+    def matcher(self) -> StockDescriptionMatcher:
+        # Montado uma vez por versao da planilha e reaproveitado enquanto ela estiver em cache.
+        return StockDescriptionMatcher(self.descriptions)
+
+
+_EMPTY_STOCK_REPORT = _StockReport([], {})
+_STOCK_REPORT_LOCK = Lock()
+_STOCK_REPORT_CACHE: Dict[str, tuple[int, int, _StockReport]] = {}
+# Raiz do indice -> (chave do indice, numero -> arquivos sem codigo da planilha, registros montados).
+_CANDIDATE_LOCK = Lock()
+_CANDIDATE_CACHE: Dict[str, tuple[tuple, Dict[str, List[tuple]], Dict[str, Dict]]] = {}
+
+
+def _read_stock_rows_with_openpyxl(report_path: str) -> List[tuple[int, tuple]] | None:
     try:
         from openpyxl import load_workbook
     except Exception as exc:
         logger.warning("Unable to import openpyxl for stock report: %s", exc)
-        return []
+        return None
 
     try:
         workbook = load_workbook(report_path, read_only=True, data_only=True)
     except Exception as exc:
         logger.warning("Failed to open stock report '%s': %s", report_path, exc)
-        return []
+        return None
 
     try:
         if STOCK_REPORT_SHEET_NAME not in workbook.sheetnames:
-            return []
-
-        worksheet = workbook[STOCK_REPORT_SHEET_NAME]
-        rows: List[tuple[str, int, Dict]] = []
-
-        for row_number, row in enumerate(
-            worksheet.iter_rows(min_row=2, values_only=True),
-            start=2,
-        ):
-            raw_code = row[1] if len(row) > 1 else None
-            code = _normalize_stock_code(raw_code)
-            if not code:
-                continue
-
-            raw_description = row[2] if len(row) > 2 else ""
-            description = re.sub(r"\s+", " ", str(raw_description or "")).strip()
-            if not description:
-                description = f"Produto {code}"
-
-            category = _canonical_category("", description)
-            cover_url, thumb_url = _placeholder_urls_for_code(code)
-            rows.append(
-                (
-                    code,
-                    row_number,
-                    {
-                        "Codigo": code,
-                        "Nome": description,
-                        "Descricao": description,
-                        "Categoria": category,
-                        "URLFoto": cover_url,
-                        "Especificacoes": "",
-                        "FotoBranco": thumb_url,
-                        "FotoAmbient": thumb_url,
-                        "FotoMedidas": thumb_url,
-                    },
-                )
+            return None
+        return [
+            (row_number, (row[1] if len(row) > 1 else None, row[2] if len(row) > 2 else None))
+            for row_number, row in enumerate(
+                workbook[STOCK_REPORT_SHEET_NAME].iter_rows(min_row=2, values_only=True),
+                start=2,
             )
-
-        rows.sort(key=lambda item: (_code_sort_key(item[0]), item[1]))
-        return [item[2] for item in rows]
+        ]
     finally:
         workbook.close()
 
 
-def _load_products_from_available_stock_report() -> List[Dict]:
+def _read_stock_rows(report_path: str) -> List[tuple[int, tuple]] | None:
+    try:
+        return read_sheet_columns(report_path, STOCK_REPORT_SHEET_NAME, ("B", "C"), min_row=2)
+    except ValueError as exc:
+        logger.warning("Streaming read of stock report '%s' failed, using openpyxl: %s", report_path, exc)
+        return _read_stock_rows_with_openpyxl(report_path)
+
+
+def _parse_stock_report(report_path: str) -> _StockReport:
+    stock_rows = _read_stock_rows(report_path)
+    if not stock_rows:
+        return _EMPTY_STOCK_REPORT
+
+    rows: List[tuple[str, int, Dict]] = []
+    for row_number, (raw_code, raw_description) in stock_rows:
+        code = _normalize_stock_code(raw_code)
+        if not code:
+            continue
+
+        description = re.sub(r"\s+", " ", str(raw_description or "")).strip()
+        if not description:
+            description = f"Produto {code}"
+
+        category = canonical_category("", description)
+        cover_url, thumb_url = _placeholder_urls_for_code(code)
+        rows.append(
+            (
+                code,
+                row_number,
+                {
+                    "Codigo": code,
+                    "Nome": description,
+                    "Descricao": description,
+                    "Categoria": category,
+                    "URLFoto": cover_url,
+                    "Especificacoes": "",
+                    "FotoBranco": thumb_url,
+                    "FotoAmbient": thumb_url,
+                    "FotoMedidas": thumb_url,
+                },
+            )
+        )
+
+    rows.sort(key=lambda item: (_code_sort_key(item[0]), item[1]))
+    products = [item[2] for item in rows]
+    descriptions: Dict[str, List[str]] = {}
+    for item in products:
+        descriptions.setdefault(item["Codigo"], []).append(item["Nome"])
+    return _StockReport(products, descriptions)
+
+
+def _load_stock_report(report_path: str) -> _StockReport:
+    """Planilha ja interpretada; so e relida quando caminho, tamanho ou mtime mudam."""
+    if not report_path:
+        return _EMPTY_STOCK_REPORT
+    try:
+        stat = os.stat(report_path)
+    except OSError:
+        return _EMPTY_STOCK_REPORT
+    if not S_ISREG(stat.st_mode):
+        return _EMPTY_STOCK_REPORT
+
+    key = os.path.normcase(os.path.abspath(report_path))
+    with _STOCK_REPORT_LOCK:
+        cached = _STOCK_REPORT_CACHE.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    report = replace(_parse_stock_report(report_path), version=(key, stat.st_mtime_ns, stat.st_size))
+    with _STOCK_REPORT_LOCK:
+        _STOCK_REPORT_CACHE[key] = (stat.st_mtime_ns, stat.st_size, report)
+    return report
+
+
+def clear_stock_report_cache() -> None:
+    with _STOCK_REPORT_LOCK:
+        _STOCK_REPORT_CACHE.clear()
+    with _CANDIDATE_LOCK:
+        _CANDIDATE_CACHE.clear()
+
+
+def _load_available_stock_report() -> _StockReport:
     for candidate in _candidate_stock_report_paths():
-        loaded = _load_products_from_stock_report(candidate)
-        if loaded:
-            return loaded
-    return []
+        report = _load_stock_report(candidate)
+        if report.products:
+            return report
+    return _EMPTY_STOCK_REPORT
+
+
+def get_stock_report_version() -> tuple:
+    """Caminho, mtime e tamanho da planilha de estoque em uso; vazio sem planilha."""
+    return _load_available_stock_report().version
+
+
+def _description_matcher(
+    description_by_code: Dict[str, List[str]],
+    normalized_allowed: set[str] | None,
+) -> tuple[StockDescriptionMatcher, object]:
+    """Indice de descricoes e mascara de codigos permitidos para o classificador."""
+    report = _load_available_stock_report()
+    if description_by_code is report.descriptions:
+        return report.matcher, report.matcher.allowed_mask(normalized_allowed)
+    if all(report.descriptions.get(code) == values for code, values in description_by_code.items()):
+        allowed = set(description_by_code)
+        if normalized_allowed is not None:
+            allowed &= normalized_allowed
+        return report.matcher, report.matcher.allowed_mask(allowed)
+
+    if normalized_allowed is not None:
+        description_by_code = {
+            code: values for code, values in description_by_code.items() if code in normalized_allowed
+        }
+    return StockDescriptionMatcher(description_by_code), None
+
+
+def _load_products_from_stock_report(report_path: str) -> List[Dict]:
+    return list(_load_stock_report(report_path).products)
+
+
+def _load_products_from_available_stock_report() -> List[Dict]:
+    # Lista nova a cada chamada; os dicts sao compartilhados com o cache e nao devem ser alterados.
+    return list(_load_available_stock_report().products)
@@ -0,0 +1,194 @@
+"""Associacao de fotos do estoque a codigos pela descricao dos produtos.
+
+O indice invertido e montado uma vez por versao da planilha: tokens viram
+ids inteiros, cada id aponta para um vetor ordenado com os codigos que o
+contem, e a pontuacao dos candidatos e feita com NumPy.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from .text_normalize import normalize_for_match
+
+
+DESCRIPTION_MODEL_TOKEN_PATTERN = re.compile(
+    r"\b[a-z0-9]+(?:[-_][a-z0-9]+)+\b|\b[a-z]{1,5}\d{2,}[a-z0-9-]*\b",
+    re.IGNORECASE,
+)
+DESCRIPTION_TOKEN_STOPWORDS = {
+    "para",
+    "com",
+    "sem",
+    "de",
+    "da",
+    "do",
+    "das",
+    "dos",
+    "led",
+    "bivolt",
+    "branco",
+    "preto",
+    "und",
+    "kit",
+}
+# Pastas se repetem entre milhares de fotos; cada trecho do caminho e tokenizado uma vez.
+SEGMENT_TOKEN_CACHE_SIZE = 65536
+MODEL_WEIGHT = 3
+MIN_TOKEN_HITS = 3
+MIN_SCORE = 4
+CANDIDATE_TOKEN_MIN_LENGTH = 5
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+
+
+def _normalize_stock_search_text(text: str) -> str:
+    normalized = normalize_for_match(text)
+    normalized = re.sub(r"[^a-z0-9\s\-_/]", " ", normalized)
+    normalized = re.sub(r"[\-_/]", " ", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return normalized
+
+
+def _stock_search_tokens(text: str) -> set[str]:
+    normalized = _normalize_stock_search_text(text)
+    return {
+        token
+        for token in normalized.split()
+        if len(token) >= 4 and token not in DESCRIPTION_TOKEN_STOPWORDS
+    }
+
+
+def _stock_model_tokens(text: str) -> set[str]:
+    normalized = normalize_for_match(text)
+    normalized = re.sub(r"[^a-z0-9\s\-_]", " ", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return {
+        match.group(0)
+        for match in DESCRIPTION_MODEL_TOKEN_PATTERN.finditer(normalized)
+        if len(match.group(0)) >= 4
+    }
+
+
+@lru_cache(maxsize=SEGMENT_TOKEN_CACHE_SIZE)
+def _segment_tokens(segment: str) -> tuple[frozenset[str], frozenset[str]]:
+    # Os tokens nunca atravessam separadores de caminho, entao o texto todo
+    # tem exatamente a uniao dos tokens de cada trecho.
+    return frozenset(_stock_search_tokens(segment)), frozenset(_stock_model_tokens(segment))
+
+
+def _postings(vocabulary: Dict[str, int], members: Dict[int, List[int]]) -> List[np.ndarray]:
+    return [np.asarray(members.get(token_id, ()), dtype=np.int32) for token_id in range(len(vocabulary))]
+
+
+class StockDescriptionMatcher:
+    """Indice invertido das descricoes da planilha de estoque.
+
+    Um arquivo e associado ao codigo de maior pontuacao (3 por modelo em
+    comum, 1 por palavra), desde que ela seja unica e chegue a 4. Os
+    candidatos vem dos modelos citados no caminho ou, na falta deles, das
+    palavras com 5+ letras.
+    """
+
+    def __init__(self, description_by_code: Dict[str, List[str]] | None):
+        self.codes: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self.model_ids: Dict[str, int] = {}
+        token_members: Dict[int, List[int]] = {}
+        model_members: Dict[int, List[int]] = {}
+
+        for code, descriptions in sorted((description_by_code or {}).items()):
+            normalized_code = str(code or "").strip()
+            if not re.fullmatch(r"\d{4}", normalized_code):
+                continue
+            values = descriptions if isinstance(descriptions, list) else [descriptions]
+            tokens: set[str] = set()
+            models: set[str] = set()
+            for value in values:
+                tokens.update(_stock_search_tokens(str(value or "")))
+                models.update(_stock_model_tokens(str(value or "")))
+            if not tokens and not models:
+                continue
+
+            code_id = len(self.codes)
+            self.codes.append(normalized_code)
+            for token in tokens:
+                token_id = self.token_ids.setdefault(token, len(self.token_ids))
+                token_members.setdefault(token_id, []).append(code_id)
+            for model in models:
+                model_id = self.model_ids.setdefault(model, len(self.model_ids))
+                model_members.setdefault(model_id, []).append(code_id)
+
+        self.code_ids = {code: code_id for code_id, code in enumerate(self.codes)}
+        self.token_postings = _postings(self.token_ids, token_members)
+        self.model_postings = _postings(self.model_ids, model_members)
+        self.candidate_tokens = np.array(
+            [len(token) >= CANDIDATE_TOKEN_MIN_LENGTH for token in self.token_ids],
+            dtype=bool,
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def allowed_mask(self, allowed_codes: Iterable[str] | None) -> np.ndarray | None:
+        """Mascara booleana por id de codigo; None libera todos."""
+        if allowed_codes is None:
+            return None
+        mask = np.zeros(len(self.codes), dtype=bool)
+        ids = [self.code_ids[code] for code in allowed_codes if code in self.code_ids]
+        mask[ids] = True
+        return mask
+
+    def _candidates(self, postings: List[np.ndarray], allowed: np.ndarray | None) -> np.ndarray:
+        if not postings:
+            return _EMPTY_IDS
+        candidates = np.unique(np.concatenate(postings))
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        return candidates
+
+    @staticmethod
+    def _hits(postings: List[np.ndarray], candidates: np.ndarray) -> np.ndarray:
+        if not postings:
+            return np.zeros(len(candidates), dtype=np.int32)
+        counts = np.bincount(np.concatenate(postings))
+        inside = candidates < len(counts)
+        hits = np.zeros(len(candidates), dtype=np.int64)
+        hits[inside] = counts[candidates[inside]]
+        return hits
+
+    def match(self, segments: Iterable[str], allowed: np.ndarray | None = None) -> str | None:
+        """Codigo da descricao mais parecida com os trechos de caminho, ou None."""
+        token_ids: set[int] = set()
+        model_ids: set[int] = set()
+        for segment in segments:
+            tokens, models = _segment_tokens(segment)
+            token_ids.update(self.token_ids[token] for token in tokens if token in self.token_ids)
+            model_ids.update(self.model_ids[model] for model in models if model in self.model_ids)
+        if not token_ids and not model_ids:
+            return None
+
+        token_postings = [self.token_postings[token_id] for token_id in token_ids]
+        model_postings = [self.model_postings[model_id] for model_id in model_ids]
+        candidates = self._candidates(model_postings, allowed)
+        if not len(candidates):
+            long_tokens = [self.token_postings[token_id] for token_id in token_ids if self.candidate_tokens[token_id]]
+            candidates = self._candidates(long_tokens, allowed)
+            if not len(candidates):
+                return None
+
+        model_hits = self._hits(model_postings, candidates)
+        token_hits = self._hits(token_postings, candidates)
+        eligible = (model_hits > 0) | (token_hits >= MIN_TOKEN_HITS)
+        if not eligible.any():
+            return None
+        scores = np.where(eligible, model_hits * MODEL_WEIGHT + token_hits, -1)
+        best = scores.argmax()
+        best_score = scores[best]
+        # Empate no topo deixa a foto sem codigo.
+        if best_score < MIN_SCORE or np.count_nonzero(scores == best_score) > 1:
+            return None
+        return self.codes[candidates[best]]
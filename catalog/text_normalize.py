@@ -0,0 +1,59 @@
+"""Remocao de acentos compartilhada por ordenacao, filtros e comparacao de nomes.
+
+O resultado e o mesmo da decomposicao NFD sem marcas combinantes (categoria
+"Mn"), mas a faixa Latin-1/Latin Extended e resolvida por uma tabela de
+`str.translate` montada na importacao; so textos com caracteres alem dela passam
+pela decomposicao completa. Textos ASCII voltam sem copia.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+import re
+from typing import Tuple
+import unicodedata
+
+
+FOLD_CACHE_SIZE = 1 << 14
+# Latin-1, Latin Extended A/B, IPA e marcas combinantes (U+0300-U+036F).
+_TABLE_LIMIT = "\u0370"
+_BEYOND_TABLE = re.compile("[^\\x00-\\u036f]")
+
+
+def _fold_slow(value: str) -> str:
+    normalized = unicodedata.normalize("NFD", value)
+    return "".join(char for char in normalized if unicodedata.category(char) != "Mn")
+
+
+def _build_fold_table() -> Tuple[int | str, ...]:
+    # Indexada pelo codigo do caractere: no `str.translate`, consultar uma tupla e
+    # bem mais rapido que um dict. Caracteres alem do fim da tabela ficam como estao.
+    table: list[int | str] = []
+    for codepoint in range(ord(_TABLE_LIMIT)):
+        char = chr(codepoint)
+        folded = _fold_slow(char)
+        table.append(codepoint if folded == char else folded)
+    return tuple(table)
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+@lru_cache(maxsize=FOLD_CACHE_SIZE)
+def _fold_non_ascii(value: str) -> str:
+    folded = value.translate(_FOLD_TABLE)
+    if folded.isascii() or not _BEYOND_TABLE.search(folded):
+        return folded
+    return _fold_slow(folded)
+
+
+def fold_accents(value: str) -> str:
+    """Texto sem acentos, preservando maiusculas e minusculas."""
+    if value.isascii():
+        return value
+    return _fold_non_ascii(value)
+
+
+def normalize_for_match(value: str) -> str:
+    """Minusculas sem acentos, para comparar e ordenar nomes."""
+    return fold_accents(value or "").lower()
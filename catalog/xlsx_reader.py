@@ -0,0 +1,293 @@
+"""Leitura em fluxo de colunas de uma planilha .xlsx sem carregar o openpyxl.
+
+O XML da aba e descompactado em blocos e so as celulas das colunas pedidas
+sao extraidas por expressao regular. Planilhas fora do formato gravado pelo
+Excel/openpyxl (prefixos de namespace, celulas sem referencia, outra
+codificacao) caem no `iterparse`, mais lento porem generico.
+"""
+
+from __future__ import annotations
+
+import html
+from io import BytesIO
+import posixpath
+import re
+from typing import Dict, Iterator, List
+from xml.etree.ElementTree import ParseError, iterparse
+import zipfile
+
+
+_RELATIONSHIP_NS = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id",
+    "{http://purl.oclc.org/ooxml/officeDocument/relationships}id",
+)
+_MAIN_NAMESPACES = (
+    "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "http://purl.oclc.org/ooxml/spreadsheetml/main",
+)
+_ROW_TAGS = frozenset(f"{{{namespace}}}row" for namespace in _MAIN_NAMESPACES)
+_VALUE_TAGS = frozenset(f"{{{namespace}}}v" for namespace in _MAIN_NAMESPACES)
+_TEXT_TAGS = frozenset(f"{{{namespace}}}t" for namespace in _MAIN_NAMESPACES)
+_DIGITS = "0123456789"
+SCAN_CHUNK_BYTES = 1 << 20
+_XML_ENCODING_PATTERN = re.compile(rb"^\s*<\?xml[^>]*encoding=[\"']([^\"']+)")
+_CELL_TYPE_PATTERN = re.compile(rb'\bt="([^"]*)"')
+_VALUE_PATTERN = re.compile(rb"<v>(.*?)</v>", re.S)
+_TEXT_PATTERN = re.compile(rb"<t(?:\s[^>]*)?>(.*?)</t>", re.S)
+_PHONETIC_PATTERN = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+_SHARED_STRING_PATTERN = re.compile(rb"<si>(.*?)</si>|<si/>", re.S)
+
+
+class _UnsupportedLayout(Exception):
+    pass
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _column_number(letters: str) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _column_letters(number: int) -> str:
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _column_key(letters: str) -> tuple[int, str]:
+    return len(letters), letters
+
+
+def _is_utf8(head: bytes) -> bool:
+    declared = _XML_ENCODING_PATTERN.match(head)
+    return declared is None or declared.group(1).lower() in (b"utf-8", b"utf8")
+
+
+def _decode_text(raw: bytes) -> str:
+    text = raw.decode("utf-8")
+    return html.unescape(text) if "&" in text else text
+
+
+def _sheet_member(archive: zipfile.ZipFile, sheet_name: str) -> str | None:
+    relationship_id = None
+    with archive.open("xl/workbook.xml") as handle:
+        for _, element in iterparse(handle):
+            if _local_name(element.tag) == "sheet" and element.get("name") == sheet_name:
+                relationship_id = next((element.get(key) for key in _RELATIONSHIP_NS if element.get(key)), None)
+                break
+    if relationship_id is None:
+        return None
+
+    with archive.open("xl/_rels/workbook.xml.rels") as handle:
+        for _, element in iterparse(handle):
+            if _local_name(element.tag) == "Relationship" and element.get("Id") == relationship_id:
+                target = element.get("Target", "")
+                if target.startswith("/"):
+                    return target.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl", target))
+    return None
+
+
+def _scan_shared_strings(data: bytes) -> List[str]:
+    if not _is_utf8(data[:200]) or b"<sst" not in data[:500]:
+        raise _UnsupportedLayout()
+    strings: List[str] = []
+    for match in _SHARED_STRING_PATTERN.finditer(data):
+        body = match.group(1) or b""
+        if b"<rPh" in body:
+            # Guias foneticas nao fazem parte do texto da celula.
+            body = _PHONETIC_PATTERN.sub(b"", body)
+        strings.append("".join(_decode_text(part) for part in _TEXT_PATTERN.findall(body)))
+    if len(strings) != data.count(b"<si>") + data.count(b"<si/>"):
+        raise _UnsupportedLayout()
+    return strings
+
+
+def _parse_shared_strings(data: bytes) -> List[str]:
+    strings: List[str] = []
+    parts: List[str] = []
+    phonetic_depth = 0
+    for event, element in iterparse(BytesIO(data), events=("start", "end")):
+        name = _local_name(element.tag)
+        if name == "rPh":
+            phonetic_depth += 1 if event == "start" else -1
+        elif event == "end" and name == "t" and not phonetic_depth:
+            parts.append(element.text or "")
+        elif event == "end" and name == "si":
+            strings.append("".join(parts))
+            parts = []
+            element.clear()
+    return strings
+
+
+def _shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    try:
+        data = archive.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    try:
+        return _scan_shared_strings(data)
+    except _UnsupportedLayout:
+        return _parse_shared_strings(data)
+
+
+def _number(text: str) -> int | float:
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _convert(raw: str, cell_type: str | None, shared: List[str]) -> object:
+    if cell_type == "s":
+        return shared[int(raw)]
+    if cell_type in ("str", "e"):
+        return raw
+    if cell_type == "b":
+        return raw == "1"
+    try:
+        return _number(raw)
+    except ValueError:
+        return raw
+
+
+def _sheet_blocks(handle) -> Iterator[bytes]:
+    """Blocos do XML da aba que sempre terminam no fim de uma linha."""
+    pending = b""
+    while True:
+        chunk = handle.read(SCAN_CHUNK_BYTES)
+        if not chunk:
+            if pending:
+                yield pending
+            return
+        pending += chunk
+        cut = pending.rfind(b"</row>")
+        if cut >= 0:
+            cut += len(b"</row>")
+            yield pending[:cut]
+            pending = pending[cut:]
+
+
+def _scan_sheet(handle, columns: tuple[str, ...], min_row: int, shared: List[str]) -> List[tuple[int, tuple]]:
+    wanted = {letters.encode(): position for position, letters in enumerate(columns)}
+    alternatives = b"|".join(re.escape(letters) for letters in wanted)
+    cell_pattern = re.compile(rb'<c r="(' + alternatives + rb')(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+
+    rows: List[tuple[int, tuple]] = []
+    row_number = 0
+    values: List[object] = []
+    first = True
+    for block in _sheet_blocks(handle):
+        if first and (not _is_utf8(block[:200]) or b"<worksheet" not in block):
+            raise _UnsupportedLayout()
+        first = False
+        # Toda celula precisa comecar pela referencia para o filtro por coluna valer.
+        if block.count(b"<c ") + block.count(b"<c>") != block.count(b'<c r="'):
+            raise _UnsupportedLayout()
+
+        for match in cell_pattern.finditer(block):
+            number = int(match.group(2))
+            if number != row_number:
+                if row_number >= min_row and any(value is not None for value in values):
+                    rows.append((row_number, tuple(values)))
+                row_number = number
+                values = [None] * len(columns)
+            body = match.group(4)
+            if not body:
+                continue
+            type_match = _CELL_TYPE_PATTERN.search(match.group(3))
+            cell_type = type_match.group(1).decode() if type_match else None
+            if cell_type == "inlineStr":
+                value: object = "".join(_decode_text(part) for part in _TEXT_PATTERN.findall(body)) or None
+            else:
+                raw = _VALUE_PATTERN.search(body)
+                value = _convert(_decode_text(raw.group(1)), cell_type, shared) if raw else None
+            values[wanted[match.group(1)]] = value
+
+    if row_number >= min_row and any(value is not None for value in values):
+        rows.append((row_number, tuple(values)))
+    return rows
+
+
+def _cell_value(element, cell_type: str | None, shared: List[str]) -> object:
+    if cell_type == "inlineStr":
+        return "".join(item.text or "" for item in element.iter() if item.tag in _TEXT_TAGS) or None
+    for child in element:
+        if child.tag in _VALUE_TAGS:
+            return _convert(child.text, cell_type, shared) if child.text is not None else None
+    return None
+
+
+def _row_values(row, wanted: Dict[str, int], last_column: tuple[int, str], shared: List[str]) -> tuple | None:
+    values: List[object] = [None] * len(wanted)
+    found = False
+    letters = ""
+    for cell in row:
+        reference = cell.get("r")
+        if reference:
+            letters = reference.rstrip(_DIGITS)
+        else:
+            letters = _column_letters(_column_number(letters) + 1)
+        if _column_key(letters) > last_column:
+            # Celulas vem em ordem de coluna; o resto da linha nao interessa.
+            break
+        position = wanted.get(letters)
+        if position is not None:
+            value = _cell_value(cell, cell.get("t"), shared)
+            if value is not None:
+                values[position] = value
+                found = True
+    return tuple(values) if found else None
+
+
+def _parse_sheet(handle, columns: tuple[str, ...], min_row: int, shared: List[str]) -> List[tuple[int, tuple]]:
+    wanted = {letters: position for position, letters in enumerate(columns)}
+    last_column = max(map(_column_key, columns))
+    rows: List[tuple[int, tuple]] = []
+    row_number = 0
+    # So eventos de fim: cada linha e lida inteira e descartada em seguida.
+    for _, element in iterparse(handle):
+        if element.tag not in _ROW_TAGS:
+            continue
+        row_number = int(element.get("r") or row_number + 1)
+        if row_number >= min_row:
+            values = _row_values(element, wanted, last_column, shared)
+            if values is not None:
+                rows.append((row_number, values))
+        element.clear()
+    return rows
+
+
+def read_sheet_columns(
+    path: str,
+    sheet_name: str,
+    columns: tuple[str, ...],
+    min_row: int = 1,
+) -> List[tuple[int, tuple]] | None:
+    """Retorna `(linha, valores)` das colunas pedidas, ou None se a aba nao existir.
+
+    Linhas sem nenhum valor nas colunas pedidas sao omitidas. Os valores seguem
+    as regras do openpyxl para texto, numero e booleano (datas continuam
+    numericas). Arquivos corrompidos geram ValueError.
+    """
+    columns = tuple(letters.upper() for letters in columns)
+    try:
+        with zipfile.ZipFile(path) as archive:
+            member = _sheet_member(archive, sheet_name)
+            if member is None:
+                return None
+            shared = _shared_strings(archive)
+            try:
+                with archive.open(member) as handle:
+                    return _scan_sheet(handle, columns, min_row, shared)
+            except _UnsupportedLayout:
+                with archive.open(member) as handle:
+                    return _parse_sheet(handle, columns, min_row, shared)
+    except (zipfile.BadZipFile, KeyError, IndexError, ParseError, UnicodeDecodeError, OSError) as exc:
+        raise ValueError(f"unreadable workbook: {exc}") from exc
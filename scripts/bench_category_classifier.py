@@ -0,0 +1,162 @@
+"""Compara a classificacao de categorias antiga (por produto) com o classificador em lote."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import random
+import re
+import sys
+import time
+import unicodedata
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import category_classifier  # noqa: E402
+from catalog.category_classifier import (  # noqa: E402
+    BUSINESS_CATEGORY_MAP,
+    NAME_KEYWORD_PRIORITY,
+    _build_dept_category,
+    classify_many,
+    infer_erp_category,
+)
+
+
+FAMILIES = ("Luminária", "PENDENTE", "ARANDELA", "PLAFON", "SPOT", "REFLETOR", "PAINEL", "TRILHO", "RELÉ", "CADEIRA")
+WORDS = ("REDONDO", "QUADRADO", "EMBUTIR", "SOBREPOR", "ORIENTÁVEL", "DIMERIZÁVEL", "SLIM", "DUPLO", "Ação")
+
+
+def legacy_normalize_text(value: str) -> str:
+    normalized = unicodedata.normalize("NFD", value or "")
+    return "".join(char for char in normalized if unicodedata.category(char) != "Mn").lower()
+
+
+def legacy_tokens(text: str) -> List[str]:
+    normalized = re.sub(r"[^a-z0-9\s]", " ", legacy_normalize_text(text or ""))
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return normalized.split() if normalized else []
+
+
+def legacy_token_to_category(token: str, next_token: str = "") -> str | None:
+    token, next_token = token.upper(), next_token.upper()
+    prefixes = (
+        ("ARANDEL", "ARANDELA"), ("ABAJUR", "ABAJUR"), ("PENDENTE", "PENDENTE"), ("LUSTRE", "LUSTRE"),
+        ("PAINEL", "PAINEL"), ("PLAFON", "PLAFON"),
+    )
+    for prefix, category in prefixes:
+        if token.startswith(prefix):
+            return category
+    if token == "MINI" and next_token.startswith("TRILHO"):
+        return "TRILHO"
+    prefixes = (
+        ("TRILHO", "TRILHO"), ("PERFIL", "PERFIL"), ("SENSOR", "SENSOR"), ("BOCAL", "BOCAL"),
+        ("ESPETO", "ESPETO"), ("BALIZADOR", "BALIZADOR"), ("ESPELHO", "ESPELHO"), ("REFLET", "REFLETOR"),
+        ("HOLOFOTE", "REFLETOR"), ("LAMP", "LAMPADA"), ("DRIVER", "DRIVER/FONTE"), ("FONTE", "DRIVER/FONTE"),
+    )
+    for prefix, category in prefixes:
+        if token.startswith(prefix):
+            return category
+    if token == "FITA":
+        return "FITA LED"
+    if token.startswith("LUMINARIA") or token in {"LUMI", "LUM", "LUMIN"}:
+        return "LUMINARIA"
+    return None
+
+
+def legacy_infer(name: str, description: str, fallback: str, dept: str, sec: str) -> str:
+    if fallback and fallback.lower() != "sem categoria" and not re.fullmatch(r"\d+(?:[.,]\d+)?", fallback):
+        return fallback
+    for candidate in (name, description):
+        tokens = legacy_tokens(candidate)
+        if not tokens:
+            continue
+        if "iluminacao" in tokens and "publica" in tokens:
+            return "ILUMINACAO PUBLICA"
+        if "fita" in tokens and "led" in tokens:
+            return "FITA LED"
+        for idx, token in enumerate(tokens):
+            mapped = legacy_token_to_category(token, tokens[idx + 1] if idx + 1 < len(tokens) else "")
+            if mapped:
+                return mapped
+    return _build_dept_category(dept, sec)
+
+
+def legacy_business(category: str, name: str = "", description: str = "") -> str:
+    normalized = legacy_normalize_text(category).strip()
+    name_desc_tokens = set(legacy_tokens(f"{name} {description}"))
+    for mapped_category, keywords in NAME_KEYWORD_PRIORITY:
+        if any(token in name_desc_tokens for token in keywords):
+            return mapped_category
+    if normalized in BUSINESS_CATEGORY_MAP and normalized != "sem categoria":
+        return BUSINESS_CATEGORY_MAP[normalized]
+    tokens = set(legacy_tokens(f"{category} {name} {description}"))
+    for mapped_category, keywords in NAME_KEYWORD_PRIORITY:
+        if any(token in tokens for token in keywords):
+            return mapped_category
+    return "OUTROS ITENS ERP"
+
+
+def build_products(count: int, rng: random.Random) -> List[tuple[str, str, str, str, str]]:
+    products = []
+    for position in range(count):
+        name = f"{rng.choice(FAMILIES)} {' '.join(rng.sample(WORDS, 2))} MOD-{position} {rng.choice((3000, 6500))}K"
+        description = rng.choice(("", f"{name} ACABAMENTO {rng.choice(WORDS)}"))
+        category = rng.choice(("", "Sem categoria", "12", "GRUPO X"))
+        products.append((name, description, category, rng.choice(("101", "104", "")), rng.choice(("107", "5", ""))))
+    return products
+
+
+def legacy_run(products) -> List[str]:
+    # Fluxo anterior do merge: inferencia + categoria de negocio no produto e de novo ao final.
+    categories = []
+    for name, description, category, dept, sec in products:
+        inferred = legacy_infer(name, description, category, dept, sec)
+        categories.append(legacy_business(legacy_business(inferred, name, description), name, description))
+    return categories
+
+
+def batch_run(products) -> List[str]:
+    return classify_many(
+        (infer_erp_category(name, description, category, dept, sec), name, description)
+        for name, description, category, dept, sec in products
+    )
+
+
+def clear_caches() -> None:
+    for function in (
+        category_classifier._tokens,
+        category_classifier._token_category,
+        category_classifier.infer_erp_category,
+        category_classifier.business_category,
+    ):
+        function.cache_clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    args = parser.parse_args()
+    products = build_products(args.products, random.Random(7))
+
+    started = time.perf_counter()
+    expected = legacy_run(products)
+    legacy = time.perf_counter() - started
+
+    clear_caches()
+    started = time.perf_counter()
+    cold_result = batch_run(products)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    warm_result = batch_run(products)
+    warm = time.perf_counter() - started
+
+    assert cold_result == expected and warm_result == expected
+    print(f"produtos={len(products)}")
+    print(f"antigo        {legacy:8.3f}s")
+    print(f"lote (frio)   {cold:8.3f}s  {legacy / cold:6.1f}x")
+    print(f"lote (quente) {warm:8.3f}s  {legacy / warm:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
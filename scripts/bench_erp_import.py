@@ -0,0 +1,82 @@
+"""Compara pico de memoria e tempo da importacao do ERP em memoria e em fluxo."""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import erp_catalog  # noqa: E402
+
+
+def build_payload(path: Path, products: int) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write('{"exportado_em": "2026-01-01", "produtos": [')
+        for position in range(products):
+            if position:
+                handle.write(",")
+            handle.write(
+                json.dumps(
+                    {
+                        "CODPROD": 100000 + position,
+                        "DESCRICAO": f"LUMINARIA PENDENTE MODELO {position} 3000K BIVOLT",
+                        "CODEPTO": 10 + position % 7,
+                        "CODSEC": 100 + position % 13,
+                        "EMBALAGEM": "UN",
+                        "PRECO": round(10 + position * 0.37, 2),
+                        "ESTOQUE": position % 97,
+                        "OBS": "ITEM SINCRONIZADO PELO ERP",
+                    }
+                )
+            )
+        handle.write("]}")
+
+
+def legacy_import(source: Path) -> int:
+    """Fluxo anterior: bytes inteiros, arvore JSON inteira e espelho num unico dumps."""
+    index = erp_catalog._build_index(erp_catalog._parse_json_bytes(source.read_bytes()))
+    stored = {"imported_at": datetime.now(timezone.utc).isoformat(), "products": list(index.values())}
+    target = erp_catalog._resolve_json_target_path()
+    target.write_text(json.dumps(stored, ensure_ascii=False, indent=2), encoding="utf-8")
+    return len(index)
+
+
+def measured(label: str, func, source: Path) -> None:
+    # Tempo sem tracemalloc (que deixa tudo varias vezes mais lento); pico numa segunda execucao.
+    started = time.perf_counter()
+    imported = func(source)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        func(source)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    print(f"{label:<10} {elapsed:8.2f}s  pico {peak / 2**20:8.1f} MB  produtos={imported}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as temp_dir:
+        source = Path(temp_dir) / "pcprodut.json"
+        build_payload(source, args.products)
+        os.environ["CATALOG_ERP_JSON_PATH"] = str(Path(temp_dir) / "erp_products.json")
+        print(f"payload {source.stat().st_size / 2**20:.1f} MB")
+
+        measured("memoria", legacy_import, source)
+        measured("fluxo", lambda path: erp_catalog._import_erp_source(path)["products_imported"], source)
+
+
+if __name__ == "__main__":
+    main()
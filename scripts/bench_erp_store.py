@@ -0,0 +1,66 @@
+"""Compara a carga do indice ERP pelo espelho JSON e pelo espelho binario mapeado."""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import erp_catalog  # noqa: E402
+
+
+def timed(label: str, func) -> None:
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {time.perf_counter() - started:8.3f}s  {result}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as temp_dir:
+        target = Path(temp_dir) / "erp_products.json"
+        os.environ["CATALOG_ERP_JSON_PATH"] = str(target)
+        os.environ["CATALOG_CACHE_DIR"] = str(Path(temp_dir) / "cache")
+        erp_catalog.import_erp_payload(
+            {
+                "products": [
+                    {
+                        "codigo": 100000 + position,
+                        "nome": f"LUMINARIA PENDENTE MODELO {position} 3000K BIVOLT",
+                        "codepto": 10 + position % 7,
+                        "preco": round(10 + position * 0.37, 2),
+                        "obs": "ITEM SINCRONIZADO PELO ERP",
+                    }
+                    for position in range(args.products)
+                ]
+            }
+        )
+        # Tira o espelho da janela de mtime ambiguo para que o binario seja gravado.
+        stamp = target.stat().st_mtime_ns - 5_000_000_000
+        os.utime(target, ns=(stamp, stamp))
+
+        def json_load():
+            index = erp_catalog._build_index(erp_catalog._load_json_file(target))
+            return f"produtos={len(index)}"
+
+        def cold_store(action):
+            erp_catalog.clear_erp_cache()
+            return action(erp_catalog.load_erp_index())
+
+        timed("json (antes)", json_load)
+        timed("grava binario", lambda: cold_store(len))
+        timed("binario: status", lambda: cold_store(len))
+        timed("binario: 1 produto", lambda: cold_store(lambda index: index["100123"]["Codigo"]))
+        timed("binario: todos os produtos", lambda: cold_store(lambda index: sum(1 for _ in index.values())))
+
+
+if __name__ == "__main__":
+    main()
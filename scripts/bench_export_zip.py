@@ -0,0 +1,94 @@
+"""Compara pico de memoria, tempo ate o primeiro bloco e tamanho do ZIP de fotos em memoria e em fluxo."""
+
+from __future__ import annotations
+
+import argparse
+from io import BytesIO
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+from zipfile import ZIP_DEFLATED, ZipFile
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import exporter  # noqa: E402
+
+
+def build_tree(root: Path, products: int, photo_bytes: int) -> None:
+    for position in range(products):
+        code = 1000 + position
+        folder = root / "PENDENTE" / f"{code} - PENDENTE {position}"
+        folder.mkdir(parents=True)
+        (folder / f"{code}_branco.jpg").write_bytes(b"\xff\xd8" + os.urandom(photo_bytes))
+        (folder / f"{code}_ambient.jpg").write_bytes(b"\xff\xd8" + os.urandom(photo_bytes))
+
+
+def legacy_zip(products) -> tuple[int, float]:
+    """Fluxo anterior: ZIP inteiro num BytesIO, fotos lidas inteiras e sempre comprimidas."""
+    started = time.perf_counter()
+    find_images = exporter.onedrive.snapshot_local_images()
+    output = BytesIO()
+    with ZipFile(output, mode="w", compression=ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("catalogo.csv", exporter._build_csv_bytes(products))
+        for product in products:
+            for index, reference in enumerate(exporter._photo_references(product, find_images), start=1):
+                payload, extension = exporter._resolve_photo_bytes(reference["url"])
+                if payload:
+                    zip_file.writestr(f"fotos/{product['Codigo']}/{index:02d}{extension}", payload)
+    payload = output.getvalue()
+    # Nada chega ao cliente antes do fim.
+    return len(payload), time.perf_counter() - started
+
+
+def streamed_zip(products) -> tuple[int, float]:
+    started = time.perf_counter()
+    first_chunk_at = None
+    size = 0
+    for chunk in exporter._iter_zip_chunks(products, query="", category="", code="", base_name="catalogo"):
+        if first_chunk_at is None and chunk:
+            first_chunk_at = time.perf_counter() - started
+        size += len(chunk)
+    return size, first_chunk_at or 0.0
+
+
+def measured(label: str, func, products) -> None:
+    started = time.perf_counter()
+    size, first_byte = func(products)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    try:
+        func(products)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    print(
+        f"{label:<10} {elapsed:7.2f}s  primeiro bloco {first_byte:7.3f}s  "
+        f"pico {peak / 2**20:8.1f} MB  zip {size / 2**20:8.1f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--photo-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as temp_dir:
+        root = Path(temp_dir) / "produtos"
+        build_tree(root, args.products, args.photo_kb * 1024)
+        os.environ["CATALOG_LOCAL_PRODUCTS_PATH"] = str(root)
+        os.environ["CATALOG_ERP_JSON_PATH"] = str(Path(temp_dir) / "erp_products.json")
+        os.environ["CATALOG_ERP_AUTO_DISCOVERY"] = "false"
+        os.environ["CATALOG_STOCK_REPORT_AUTO_DISCOVERY"] = "false"
+        products = list(exporter._load_products())
+        print(f"produtos {len(products)}  fotos {2 * len(products)} x {args.photo_kb} KB")
+
+        measured("memoria", legacy_zip, products)
+        measured("fluxo", streamed_zip, products)
+
+
+if __name__ == "__main__":
+    main()
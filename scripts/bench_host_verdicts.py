@@ -0,0 +1,54 @@
+"""Compara a checagem de destino das fotos remotas resolvendo o DNS a cada URL e com o veredito por host.
+
+O resolvedor e simulado com uma latencia fixa por consulta, sem sair da maquina.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import socket
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import exporter, remote_hosts  # noqa: E402
+
+
+def run(label: str, urls: list[str], calls: list[str]) -> None:
+    calls.clear()
+    remote_hosts.clear_host_verdicts()
+    started = time.perf_counter()
+    permitted = sum(exporter._is_permitted_remote_image_url(url) for url in urls)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {elapsed:7.3f}s  consultas DNS {len(calls):<5} permitidas {permitted}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=400)
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    calls: list[str] = []
+
+    def simulated_getaddrinfo(host, port, type=0):
+        calls.append(host)
+        time.sleep(args.latency_ms / 1000)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", port))]
+
+    remote_hosts.socket.getaddrinfo = simulated_getaddrinfo
+    urls = [f"https://cdn{position % args.hosts}.example.com/{position}.jpg" for position in range(args.urls)]
+    print(f"{len(urls)} URLs em {args.hosts} hosts, latencia de DNS {args.latency_ms:.0f} ms")
+
+    os.environ["CATALOG_EXPORT_DNS_TTL_SECONDS"] = "0"
+    run("por URL", urls, calls)
+    os.environ.pop("CATALOG_EXPORT_DNS_TTL_SECONDS")
+    run("por host", urls, calls)
+
+
+if __name__ == "__main__":
+    main()
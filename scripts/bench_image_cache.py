@@ -0,0 +1,71 @@
+"""Compara a exportacao ZIP de fotos remotas com o cache de imagens vazio e ja preenchido.
+
+A rede e simulada com uma latencia fixa por foto; o cache fica num diretorio temporario.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import exporter, image_cache  # noqa: E402
+from catalog.image_cache import RemoteImage  # noqa: E402
+
+
+def build_products(products: int) -> list[dict]:
+    return [
+        {
+            "Codigo": str(1000 + position),
+            "Nome": f"Produto {position}",
+            "FotoBranco": f"https://cdn.example.com/{position}.jpg",
+            "FotoAmbient": f"https://cdn.example.com/{position}-ambient.jpg",
+        }
+        for position in range(products)
+    ]
+
+
+def run(label: str, products: list[dict], calls: list[str]) -> None:
+    calls.clear()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in exporter._iter_zip_chunks(products, query="", category="", code="", base_name="bench"))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed:7.2f}s  downloads {len(calls):<4} zip {size / 2**20:6.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--photo-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    payloads = {}
+    calls: list[str] = []
+
+    def simulated_fetch(url: str, max_bytes: int, validators: dict) -> RemoteImage:
+        calls.append(url)
+        time.sleep(args.latency_ms / 1000)
+        payload = payloads.setdefault(url, b"\xff\xd8" + os.urandom(args.photo_kb * 1024))
+        return RemoteImage(payload, ".jpg", etag=f'"{len(url)}"')
+
+    exporter._is_permitted_remote_image_url = lambda url: True
+    exporter._fetch_remote_image = simulated_fetch
+    exporter.onedrive.snapshot_local_images = lambda: (lambda code: [])
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as temp_dir:
+        os.environ["CATALOG_CACHE_DIR"] = temp_dir
+        products = build_products(args.products)
+        print(f"{2 * len(products)} fotos remotas de {args.photo_kb} KB, latencia {args.latency_ms:.0f} ms")
+        run("frio", products, calls)
+        run("quente", products, calls)
+        image_cache.clear_image_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compara o ZIP de fotos remotas baixadas uma a uma e pelo estagio de busca concorrente.
+
+A rede e simulada com uma latencia fixa por foto, sem sair da maquina.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import exporter, photo_fetch  # noqa: E402
+from catalog.image_cache import RemoteImage  # noqa: E402
+
+
+def build_products(products: int, hosts: int) -> list[dict]:
+    return [
+        {
+            "Codigo": str(1000 + position),
+            "Nome": f"Produto {position}",
+            "FotoBranco": f"https://cdn{position % hosts}.example.com/{position}.jpg",
+            "FotoAmbient": f"https://cdn{position % hosts}.example.com/{position}-ambient.jpg",
+        }
+        for position in range(products)
+    ]
+
+
+def run(label: str, products: list[dict], workers: int) -> None:
+    os.environ["CATALOG_EXPORT_FETCH_WORKERS"] = str(workers)
+    photo_fetch.reset_photo_fetch()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in exporter._iter_zip_chunks(products, query="", category="", code="", base_name="bench"))
+    print(f"{label:<12} workers={workers:<3} {time.perf_counter() - started:7.2f}s  zip {size / 2**20:6.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--workers", type=int, default=photo_fetch.DEFAULT_FETCH_WORKERS)
+    args = parser.parse_args()
+
+    payload = b"\xff\xd8" + os.urandom(64 * 1024)
+
+    def simulated_fetch(url: str, max_bytes: int, validators: dict) -> RemoteImage:
+        time.sleep(args.latency_ms / 1000)
+        return RemoteImage(payload, ".jpg")
+
+    exporter._is_permitted_remote_image_url = lambda url: True
+    exporter._fetch_remote_image = simulated_fetch
+    exporter.onedrive.snapshot_local_images = lambda: (lambda code: [])
+    os.environ["CATALOG_EXPORT_FETCH_PER_HOST"] = str(max(args.workers, 1))
+    # Mede a rede simulada, nao o cache de imagens em disco.
+    os.environ["CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES"] = "0"
+
+    products = build_products(args.products, args.hosts)
+    print(f"{2 * len(products)} fotos remotas em {args.hosts} hosts, latencia {args.latency_ms:.0f} ms")
+    run("sequencial", products, 1)
+    run("concorrente", products, args.workers)
+
+
+if __name__ == "__main__":
+    main()
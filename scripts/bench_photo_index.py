@@ -0,0 +1,85 @@
+"""Mede a varredura fria do indice de fotos numa arvore sintetica."""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog.local_catalog import scan_local_photo_index  # noqa: E402
+
+
+CATEGORIES = ("ABAJUR", "ARANDELA", "PENDENTE", "PLAFON", "SPOT", "LUMINARIA", "FITA LED", "REFLETOR")
+VARIANTS = ("", "_branco", "_ambientada", "_medidas", "-2", "-3", " (1)", "-4", "-5", "-6")
+
+
+def build_tree(root: Path, total_files: int) -> int:
+    files_per_product = len(VARIANTS)
+    products = max(total_files // files_per_product, 1)
+    created = 0
+    for position in range(products):
+        code = 1000 + position
+        category = CATEGORIES[position % len(CATEGORIES)]
+        product_dir = root / category / f"{code} - {category} MODELO {position}"
+        product_dir.mkdir(parents=True, exist_ok=True)
+        for variant in VARIANTS:
+            (product_dir / f"{code}{variant}.jpg").touch()
+            created += 1
+    return created
+
+
+def run(root: Path, workers: int, repeat: int) -> tuple[float, dict]:
+    best = float("inf")
+    result: dict = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = scan_local_photo_index(str(root), workers=workers)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--root", help="arvore existente; quando omitido, uma temporaria e criada")
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.root:
+        root = Path(args.root)
+    else:
+        temp_dir = tempfile.mkdtemp(prefix="catalog-bench-")
+        root = Path(temp_dir)
+        started = time.perf_counter()
+        created = build_tree(root, args.files)
+        print(f"arvore sintetica: {created} arquivos em {time.perf_counter() - started:.1f}s")
+
+    try:
+        baseline = None
+        reference = None
+        for workers in args.workers:
+            elapsed, result = run(root, workers, args.repeat)
+            if reference is None:
+                reference = result
+            elif result != reference:
+                raise SystemExit(f"resultado divergente com workers={workers}")
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers:<3} {elapsed:8.3f}s  codigos={len(result):<6} "
+                f"speedup={baseline / elapsed:5.2f}x"
+            )
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compara a memoria retida pelo indice de fotos em dicts e na forma compacta."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_photo_index import build_tree  # noqa: E402
+from catalog.local_catalog import scan_local_photo_index  # noqa: E402
+from catalog.photo_records import VARIANT_NAMES, PhotoFile, PhotoRecord  # noqa: E402
+
+
+def _dict_layout(records: dict) -> tuple[list, dict]:
+    """Mesmo conteudo no formato antigo: um dict com caminhos completos por arquivo."""
+    entries = []
+    result = {}
+    for code, record in records.items():
+        files = [
+            {"name": item.name, "full_path": item.full_path, "rel_path": item.rel_path}
+            for item in record.files
+        ]
+        by_name = {id(item): files[position] for position, item in enumerate(record.files)}
+        entries.extend((code, record.name, record.category, item) for item in files)
+        result[code] = {
+            "code": code,
+            "name": record.name,
+            "category": record.category,
+            "files": files,
+            "variants": {
+                variant: by_name[id(chosen)] if chosen is not None else None
+                for variant, chosen in record.variants.items()
+            },
+        }
+    return entries, result
+
+
+def _compact_layout(records: dict) -> tuple[list, dict]:
+    entries = []
+    result = {}
+    for code, record in records.items():
+        files = tuple(PhotoFile(item.name, item.full_path, item.rel_path) for item in record.files)
+        entries.extend((code, record.name, record.category, item) for item in files)
+        slots = tuple(
+            record.files.index(chosen) if chosen is not None else -1
+            for chosen in (record.variants[variant] for variant in VARIANT_NAMES)
+        )
+        result[code] = PhotoRecord(code, record.name, record.category, files, slots)
+    return entries, result
+
+
+def _retained(build, records: dict) -> tuple[int, object]:
+    tracemalloc.start()
+    try:
+        value = build(records)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--root", help="arvore existente; quando omitido, uma temporaria e criada")
+    args = parser.parse_args()
+
+    temp_dir = None
+    if args.root:
+        root = Path(args.root)
+    else:
+        temp_dir = tempfile.mkdtemp(prefix="catalog-bench-")
+        root = Path(temp_dir)
+        build_tree(root, args.files)
+
+    try:
+        records = scan_local_photo_index(str(root))
+        total_files = sum(len(record.files) for record in records.values())
+        legacy_bytes, _ = _retained(_dict_layout, records)
+        compact_bytes, _ = _retained(_compact_layout, records)
+        print(f"codigos={len(records)} arquivos={total_files}")
+        print(f"dicts     {legacy_bytes / 2**20:8.1f} MB")
+        print(f"compacto  {compact_bytes / 2**20:8.1f} MB")
+        print(f"reducao   {legacy_bytes / compact_bytes:8.2f}x")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compara o custo por arquivo do parser de segmentos com e sem memoizacao."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import local_catalog  # noqa: E402
+
+
+CATEGORIES = ("ABAJUR", "ARANDELA", "PENDENTE", "PLAFON", "SPOT", "LUMINARIA", "FITA LED", "REFLETOR")
+VARIANTS = ("", "_branco", "_ambientada", "_medidas", "-2", "-3", " (1)", "-4", "-5", "-6")
+CACHED_FUNCTIONS = (
+    local_catalog._parse_segment,
+    local_catalog._parse_directory_parts,
+    local_catalog._category_for_product,
+    local_catalog._category_for_segment,
+)
+
+
+def build_parts(total_files: int) -> list[list[str]]:
+    parts: list[list[str]] = []
+    products = max(total_files // len(VARIANTS), 1)
+    for position in range(products):
+        code = 1000 + position
+        category = CATEGORIES[position % len(CATEGORIES)]
+        product_dir = f"{code} - {category} MODELO {position} E27X1"
+        for variant in VARIANTS:
+            parts.append([category, product_dir, "FOTOS", f"{code}{variant}.jpg"])
+    return parts
+
+
+def clear_caches() -> None:
+    for function in CACHED_FUNCTIONS:
+        function.cache_clear()
+
+
+def run(parts: list[list[str]], memoized: bool) -> float:
+    clear_caches()
+    started = time.perf_counter()
+    for item in parts:
+        if not memoized:
+            clear_caches()
+        local_catalog._extract_code_from_parts(item)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    parts = build_parts(args.files)
+    uncached = min(run(parts, memoized=False) for _ in range(args.repeat))
+    cached = min(run(parts, memoized=True) for _ in range(args.repeat))
+    per_file = 1_000_000 / len(parts)
+    print(f"arquivos={len(parts)}")
+    print(f"sem cache   {uncached:7.3f}s  {uncached * per_file:6.2f} us/arquivo")
+    print(f"memoizado   {cached:7.3f}s  {cached * per_file:6.2f} us/arquivo  speedup={uncached / cached:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compara a busca de codigo por descricao antiga (perfis em sets) com o indice invertido."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog.stock_matcher import (  # noqa: E402
+    StockDescriptionMatcher,
+    _segment_tokens,
+    _stock_model_tokens,
+    _stock_search_tokens,
+)
+
+
+FAMILIES = ("LUMINARIA", "PENDENTE", "ARANDELA", "PLAFON", "SPOT", "REFLETOR", "PAINEL", "TRILHO")
+FINISHES = ("DOURADO", "CROMADO", "FENDI", "CINZA", "COBRE", "NATURAL")
+WORDS = ("REDONDO", "QUADRADO", "EMBUTIR", "SOBREPOR", "ORIENTAVEL", "DIMERIZAVEL", "SLIM", "DUPLO")
+
+
+def build_descriptions(count: int, rng: random.Random) -> Dict[str, List[str]]:
+    descriptions: Dict[str, List[str]] = {}
+    for position in range(count):
+        code = f"{1000 + position % 9000:04d}"
+        family = rng.choice(FAMILIES)
+        model = f"{family[:2]}-{rng.randint(1, 999):03d}"
+        words = " ".join(rng.sample(WORDS, 2))
+        text = f"{family} {words} {model} {rng.choice(FINISHES)} {rng.choice((3000, 4000, 6500))}K"
+        descriptions.setdefault(code, []).append(text)
+    return descriptions
+
+
+def build_paths(descriptions: Dict[str, List[str]], count: int, rng: random.Random) -> List[List[str]]:
+    codes = sorted(descriptions)
+    paths = []
+    for position in range(count):
+        description = rng.choice(descriptions[rng.choice(codes)])
+        words = description.split()
+        rng.shuffle(words)
+        folder = ["FOTOS", words[0].title(), f"LOTE {position % 300}"]
+        paths.append([*folder, f"{' '.join(words[: rng.randint(2, 5)])} {position}.jpg"])
+    return paths
+
+
+def legacy_profiles(description_by_code: Dict[str, List[str]]):
+    profiles: Dict[str, Dict[str, set[str]]] = {}
+    token_to_codes: Dict[str, set[str]] = {}
+    model_to_codes: Dict[str, set[str]] = {}
+    for code, values in description_by_code.items():
+        tokens: set[str] = set()
+        models: set[str] = set()
+        for value in values:
+            tokens.update(_stock_search_tokens(value))
+            models.update(_stock_model_tokens(value))
+        if not tokens and not models:
+            continue
+        profiles[code] = {"tokens": tokens, "models": models}
+        for token in tokens:
+            if len(token) >= 5:
+                token_to_codes.setdefault(token, set()).add(code)
+        for model in models:
+            model_to_codes.setdefault(model, set()).add(code)
+    return profiles, token_to_codes, model_to_codes
+
+
+def legacy_match(search_text: str, profiles, token_to_codes, model_to_codes) -> str | None:
+    text_tokens = _stock_search_tokens(search_text)
+    text_models = _stock_model_tokens(search_text)
+    candidates: set[str] = set()
+    for model in text_models:
+        candidates.update(model_to_codes.get(model, set()))
+    if not candidates:
+        for token in text_tokens:
+            candidates.update(token_to_codes.get(token, set()))
+    best_code, best_score, tie = None, 0, False
+    for code in candidates:
+        profile = profiles[code]
+        model_hits = len(text_models & profile["models"])
+        token_hits = len(text_tokens & profile["tokens"])
+        score = model_hits * 3 + token_hits
+        if model_hits == 0 and token_hits < 3:
+            continue
+        if score > best_score:
+            best_code, best_score, tie = code, score, False
+        elif score == best_score and score > 0:
+            tie = True
+    if not best_code or tie or best_score < 4:
+        return None
+    return best_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--descriptions", type=int, default=20_000)
+    parser.add_argument("--files", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    descriptions = build_descriptions(args.descriptions, rng)
+    paths = build_paths(descriptions, args.files, rng)
+
+    started = time.perf_counter()
+    maps = legacy_profiles(descriptions)
+    legacy = [legacy_match(f"{'/'.join(parts)} {parts[-1]}", *maps) for parts in paths]
+    legacy_elapsed = time.perf_counter() - started
+
+    _segment_tokens.cache_clear()
+    started = time.perf_counter()
+    matcher = StockDescriptionMatcher(descriptions)
+    built = time.perf_counter() - started
+    current = [matcher.match(parts) for parts in paths]
+    elapsed = time.perf_counter() - started
+
+    if current != legacy:
+        mismatches = sum(1 for old, new in zip(legacy, current) if old != new)
+        raise SystemExit(f"{mismatches} resultados divergentes")
+    matched = sum(1 for code in current if code)
+    print(f"descricoes={args.descriptions} arquivos={args.files} associados={matched}")
+    print(f"sets       {legacy_elapsed:8.2f}s")
+    print(f"invertido  {elapsed:8.2f}s (montagem {built:.2f}s)  {legacy_elapsed / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compara a leitura da planilha de estoque via openpyxl, leitor em fluxo e cache."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import stock_catalog  # noqa: E402
+
+
+def build_report(path: Path, rows: int) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(stock_catalog.STOCK_REPORT_SHEET_NAME)
+    worksheet.append(["FILIAL", "CODIGO", "DESCRICAO", "EMB", "QTD", "CUSTO", "PRECO", "MARCA", "NCM", "OBS"])
+    for position in range(rows):
+        code = 1000 + position % 9000
+        worksheet.append(
+            [2, code, f"LUMINARIA MODELO {position} 3000K", "UND", position % 97, 10.5, 19.9, "MARCA", "9405", ""]
+        )
+    workbook.save(path)
+
+
+def timed(label: str, func, repeat: int, baseline: float | None = None) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    ratio = f"  {baseline / best:8.1f}x" if baseline else ""
+    print(f"{label:<12} {best * 1000:10.2f} ms{ratio}")
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=40_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--report", help="planilha existente; quando omitida, uma sintetica e criada")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as temp_dir:
+        report = Path(args.report) if args.report else Path(temp_dir) / "estoque.xlsx"
+        if not args.report:
+            build_report(report, args.rows)
+
+        path = str(report)
+        baseline, reference = timed(
+            "openpyxl", lambda: stock_catalog._read_stock_rows_with_openpyxl(path), args.repeat
+        )
+        _, streamed = timed("fluxo", lambda: stock_catalog._read_stock_rows(path), args.repeat, baseline)
+        reference = [row for row in reference or [] if any(value is not None for value in row[1])]
+        if streamed != reference:
+            raise SystemExit("leitor em fluxo divergiu do openpyxl")
+
+        stock_catalog.clear_stock_report_cache()
+        stock_catalog._load_stock_report(path)
+        timed("cache", lambda: stock_catalog._load_stock_report(path), args.repeat, baseline)
+
+
+if __name__ == "__main__":
+    main()
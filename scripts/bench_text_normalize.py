@@ -0,0 +1,74 @@
+"""Compara a remocao de acentos antiga (NFD caractere a caractere) com a tabela de translate.
+
+Mede os caminhos que chamam o normalizador por produto: ordenacao do catalogo
+mesclado com o ERP e filtro por busca/categoria da exportacao.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+import unicodedata
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import erp_catalog, exporter, text_normalize  # noqa: E402
+
+
+FAMILIES = ("Luminária", "Pendente", "Arandela", "Plafon", "Spot", "Refletor", "Relé", "Cadeira")
+WORDS = ("Redondo", "Orientável", "Dimerizável", "Ação", "Nº 2", "Slim", "Cristal", "Fumê")
+CATEGORIES = ("ILUMINAÇÃO DECORATIVA", "ILUMINAÇÃO TÉCNICA", "LÂMPADAS E FITAS", "Sem categoria")
+
+
+def legacy_normalize_for_match(value: str) -> str:
+    normalized = unicodedata.normalize("NFD", value or "")
+    return "".join(char for char in normalized if unicodedata.category(char) != "Mn").lower()
+
+
+def build_products(count: int, rng: random.Random):
+    return [
+        {
+            "Codigo": str(1000 + position),
+            "Nome": f"{rng.choice(FAMILIES)} {' '.join(rng.sample(WORDS, 2))} {position}",
+            "Descricao": f"{rng.choice(FAMILIES)} {rng.choice(WORDS)} acabamento {rng.choice(WORDS)}",
+            "Categoria": rng.choice(CATEGORIES),
+        }
+        for position in range(count)
+    ]
+
+
+def timed(function) -> float:
+    text_normalize._fold_non_ascii.cache_clear()
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    args = parser.parse_args()
+    products = build_products(args.products, random.Random(7))
+
+    paths = {
+        "ordenacao": lambda: erp_catalog.sort_products_by_category(products),
+        "filtro": lambda: exporter._filter_products(products, query="orientavel", category="Iluminação técnica"),
+    }
+    print(f"produtos={len(products)}")
+    for label, function in paths.items():
+        expected = function()
+        with mock.patch.object(erp_catalog, "normalize_for_match", legacy_normalize_for_match), mock.patch.object(
+            exporter, "normalize_for_match", legacy_normalize_for_match
+        ):
+            assert function() == expected
+            legacy = timed(function)
+        current = timed(function)
+        print(f"{label:<10} antigo {legacy:7.3f}s  tabela {current:7.3f}s  {legacy / current:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
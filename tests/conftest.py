@@ -35,6 +35,7 @@ def tmp_path():
 def isolate_runtime_environment(monkeypatch):
     for env_key in (
         "CATALOG_LOCAL_PRODUCTS_PATH",
+        "CATALOG_LOCAL_MERGE_ROOTS",
         "CATALOG_CADASTRO_HTML",
         "CATALOG_STOCK_REPORT_PATH",
         "CATALOG_STOCK_PHOTOS_ROOT",
@@ -45,6 +46,15 @@ def isolate_runtime_environment(monkeypatch):
         "CATALOG_ERP_MAX_UPLOAD_BYTES",
         "CATALOG_ENABLE_API_DOCS",
         "CATALOG_EXPORT_MAX_REMOTE_IMAGE_BYTES",
+        "CATALOG_PRODUCTS_MAX_AGE_SECONDS",
+        "CATALOG_EXPORT_ZIP_DELIVERY",
+        "CATALOG_EXPORT_FETCH_WORKERS",
+        "CATALOG_EXPORT_FETCH_PER_HOST",
+        "CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES",
+        "CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS",
+        "CATALOG_EXPORT_IMAGE_CACHE_MAX_AGE_SECONDS",
+        "CATALOG_EXPORT_IMAGE_CACHE_NEGATIVE_SECONDS",
+        "CATALOG_EXPORT_DNS_TTL_SECONDS",
         "OneDrive",
         "OneDriveCommercial",
         "OneDriveConsumer",
@@ -59,9 +69,37 @@ def isolate_runtime_environment(monkeypatch):
         "CATALOG_ERP_JSON_PATH",
         str(LOCAL_TMP_ROOT / "disabled-erp.json"),
     )
+    # Cache proprio por teste: espelhos do ERP e imagens nao se acumulam entre execucoes.
+    cache_dir = LOCAL_TMP_ROOT / f"catalog-cache-{uuid4().hex[:8]}"
+    monkeypatch.setenv("CATALOG_CACHE_DIR", str(cache_dir))
 
     from catalog.cache import cache
+    from catalog.catalog_snapshot import clear_catalog_snapshot
+    from catalog.erp_catalog import clear_erp_cache
+    from catalog.image_cache import clear_image_cache
+    from catalog.photo_fetch import reset_photo_fetch
+    from catalog.photo_index import reset_photo_indexes
+    from catalog.remote_hosts import clear_host_verdicts
+    from catalog.shell_link import clear_shell_link_cache
+    from catalog.stock_catalog import clear_stock_report_cache
 
     cache.store.clear()
+    reset_photo_indexes()
+    clear_shell_link_cache()
+    clear_stock_report_cache()
+    clear_erp_cache()
+    clear_catalog_snapshot()
+    reset_photo_fetch()
+    clear_image_cache()
+    clear_host_verdicts()
     yield
     cache.store.clear()
+    reset_photo_indexes()
+    clear_shell_link_cache()
+    clear_stock_report_cache()
+    clear_erp_cache()
+    clear_catalog_snapshot()
+    reset_photo_fetch()
+    clear_image_cache()
+    clear_host_verdicts()
+    shutil.rmtree(cache_dir, ignore_errors=True)
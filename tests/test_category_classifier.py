@@ -0,0 +1,40 @@
+from catalog.category_classifier import (
+    business_category,
+    canonical_category,
+    classify_many,
+    infer_erp_category,
+)
+
+
+def test_erp_inference_prefers_explicit_category_then_name_then_department():
+    assert infer_erp_category('Qualquer', '', 'PAINEL SLIM', '101', '107') == 'PAINEL SLIM'
+    assert infer_erp_category('Mini trilho eletrificado', '', '12', '', '') == 'TRILHO'
+    assert infer_erp_category('Refletor ação 50W', '', 'Sem categoria', '', '') == 'REFLETOR'
+    assert infer_erp_category('Fita de LED 5m', '', '', '', '') == 'FITA LED'
+    # Rele so e tipo reconhecido nas pastas e no estoque.
+    assert infer_erp_category('Relé fotocélula', '', '', '102', '120') == 'RELES E SENSORES'
+    assert infer_erp_category('Item', '', '', '999', '') == 'DEPTO 999'
+
+
+def test_business_and_canonical_categories():
+    assert business_category('LUMINARIA', 'Pendente cristal', '') == 'ILUMINACAO DECORATIVA'
+    assert business_category('Iluminação Pública', 'Item', '') == 'ILUMINACAO EXTERNA E PUBLICA'
+    assert business_category('GRUPO X', 'Cadeira giratória', '') == 'UTILIDADES E OPERACAO'
+    assert business_category('GRUPO X', 'Item', '') == 'OUTROS ITENS ERP'
+
+    assert canonical_category('LUM PUBLICA', '') == 'ILUMINACAO PUBLICA'
+    assert canonical_category('Sem categoria', 'SUPORTE LUMI PERFIL') == 'PERFIL'
+    assert canonical_category('RELE FOTOCELULA', '') == 'RELE'
+    assert canonical_category('', '') == 'Sem categoria'
+
+
+def test_classify_many_keeps_order_and_matches_single_calls():
+    rows = [
+        ('Sem categoria', 'Abajur touch', ''),
+        ('ACESSORIOS ELETRICOS', 'Item', ''),
+        ('Sem categoria', 'Abajur touch', ''),
+        ('GRUPO X', 'Item', 'Lâmpada bulbo'),
+    ]
+    assert classify_many(rows) == [business_category(*row) for row in rows]
+    assert classify_many(rows)[:2] == ['ILUMINACAO DECORATIVA', 'COMPONENTES E ACESSORIOS']
+    assert classify_many([]) == []
@@ -1,4 +1,5 @@
 import os
+import pytest
 
 from catalog.erp_catalog import import_erp_payload, merge_products_with_erp
 
@@ -110,3 +111,159 @@ def test_merge_products_maps_to_business_categories(monkeypatch):
 
     if os.path.exists(target_path):
         os.remove(target_path)
+
+
+def test_erp_index_and_discovery_are_cached_until_files_change(monkeypatch, tmp_path):
+    import json
+
+    from catalog import erp_catalog
+
+    source_dir = tmp_path / 'erp'
+    source_dir.mkdir()
+    source = source_dir / 'pcprodut_1.json'
+    source.write_text(json.dumps({'products': [{'codigo': '1001', 'nome': 'Produto 1001'}]}), encoding='utf-8')
+    stamp = os.stat(source_dir).st_mtime - 60
+    os.utime(source, (stamp, stamp))
+    os.utime(source_dir, (stamp, stamp))
+
+    monkeypatch.setenv('CATALOG_ERP_AUTO_DISCOVERY', 'true')
+    monkeypatch.setenv('CATALOG_ERP_SOURCE_DIRS', str(source_dir))
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(tmp_path / 'missing.json'))
+
+    parses = []
+    globs = []
+    real_build = erp_catalog._build_index
+    real_glob = erp_catalog.Path.glob
+    monkeypatch.setattr(erp_catalog, '_build_index', lambda payload: parses.append(1) or real_build(payload))
+    monkeypatch.setattr(
+        erp_catalog.Path,
+        'glob',
+        lambda self, pattern: globs.append(str(self)) or real_glob(self, pattern),
+    )
+
+    first = erp_catalog.load_erp_index()
+    assert erp_catalog.load_erp_index() is first
+    assert erp_catalog.get_erp_status()['products_loaded'] == 1
+    assert len(parses) == 1
+    assert globs.count(str(source_dir)) == len(erp_catalog.DISCOVERY_PATTERNS)
+
+    newer = source_dir / 'pcprodut_2.json'
+    newer.write_text(json.dumps({'products': [{'codigo': '2002', 'nome': 'Produto 2002'}]}), encoding='utf-8')
+    assert set(erp_catalog.load_erp_index()) == {'2002'}
+    assert len(parses) == 2
+    assert globs.count(str(source_dir)) == 2 * len(erp_catalog.DISCOVERY_PATTERNS)
+
+
+def test_streamed_erp_import_matches_in_memory_mirror(monkeypatch, tmp_path):
+    import json
+
+    from catalog import erp_catalog, json_stream
+
+    monkeypatch.setattr(json_stream, 'READ_CHUNK_CHARS', 5)
+    products = [
+        {'codigo': '1001', 'nome': 'Pendente água', 'preco': 10.5},
+        {'codigo': '2002', 'nome': 'Spot'},
+        'ignorado',
+        {'nome': 'Sem codigo'},
+        {'codigo': '1001', 'nome': 'Pendente revisado', 'estoque': 3},
+    ]
+    source = tmp_path / 'pcprodut.json'
+    source.write_text(json.dumps({'total': 5, 'produtos': products}), encoding='latin-1')
+    target = tmp_path / 'mirror.json'
+    monkeypatch.setenv('CATALOG_ERP_SOURCE_DIRS', str(tmp_path))
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(target))
+
+    result = erp_catalog.import_erp_file(str(source))
+    assert result['products_imported'] == 2
+    streamed = target.read_text(encoding='utf-8')
+    index = erp_catalog._build_index({'produtos': products})
+    assert result['version'] == 1
+    expected = {'imported_at': result['imported_at'], 'version': 1, 'products': list(index.values())}
+    assert streamed == json.dumps(expected, ensure_ascii=False, indent=2)
+    assert erp_catalog.load_erp_index()['1001']['Nome'] == 'Pendente revisado'
+
+    # Objeto codigo -> produto nao tem lista de registros e cai na leitura completa.
+    source.write_text(json.dumps({'3003': {'nome': 'Painel'}}), encoding='utf-8')
+    assert erp_catalog.import_erp_file(str(source))['products_imported'] == 1
+    assert set(erp_catalog.load_erp_index()) == {'3003'}
+
+    source.write_text('{"produtos": [{"codigo": "4004"},', encoding='utf-8')
+    with pytest.raises(ValueError, match='invalid ERP JSON content'):
+        erp_catalog.import_erp_file(str(source))
+    assert set(erp_catalog.load_erp_index()) == {'3003'}
+
+
+def test_erp_delta_patches_index_and_tracks_changed_codes(monkeypatch, tmp_path):
+    from catalog import erp_catalog
+
+    target = tmp_path / 'mirror.json'
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(target))
+    import_erp_payload({'products': [{'codigo': str(code), 'nome': f'Produto {code}'} for code in range(1000, 1300)]})
+    assert erp_catalog.get_erp_version() == 1
+
+    result = erp_catalog.apply_erp_delta(
+        {
+            'upserts': [{'codigo': str(code), 'nome': f'Revisado {code}'} for code in range(1250, 1400)]
+            + [{'nome': 'Sem codigo'}],
+            'deletes': [str(code) for code in range(1000, 1050)] + [{'codigo': 1299}],
+        }
+    )
+    assert (result['version'], result['upserted'], result['deleted'], result['ignored']) == (2, 150, 51, 1)
+    log_path = tmp_path / 'mirror.changes.jsonl'
+    assert log_path.is_file()
+
+    index = erp_catalog.load_erp_index()
+    assert len(index) == 300 - 50 + 100 - 1
+    assert index['1250']['Nome'] == 'Revisado 1250' and '1299' not in index
+    assert erp_catalog.erp_changes_since(1) == {str(code) for code in range(1000, 1050)} | {
+        str(code) for code in range(1250, 1400)
+    }
+    assert erp_catalog.erp_changes_since(2) == set()
+    assert erp_catalog.erp_changes_since(0) is None
+
+    erp_catalog.apply_erp_delta({'deletes': ['1100']})
+    assert erp_catalog.erp_changes_since(2) == {'1100'}
+
+    # Outro processo (cache vazio) reconstroi o mesmo estado a partir de espelho + log.
+    erp_catalog.clear_erp_cache()
+    assert erp_catalog.load_erp_index() == {code: record for code, record in index.items() if code != '1100'}
+    assert erp_catalog.get_erp_status()['pending_changes'] == 2
+
+    assert erp_catalog.compact_erp_changes() is True
+    assert not log_path.exists()
+    assert erp_catalog.get_erp_version() == 3
+    assert erp_catalog.erp_changes_since(2) == {'1100'}
+    erp_catalog.clear_erp_cache()
+    assert '1100' not in erp_catalog.load_erp_index()
+    assert erp_catalog.get_erp_status()['version'] == 3
+
+    with pytest.raises(ValueError):
+        erp_catalog.apply_erp_delta({'upserts': [{'nome': 'Sem codigo'}]})
+
+
+def test_erp_index_is_served_from_binary_store_with_lazy_records(monkeypatch, tmp_path):
+    from catalog import erp_catalog, erp_store
+
+    target = tmp_path / 'mirror.json'
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(target))
+    import_erp_payload({'products': [{'codigo': str(code), 'nome': f'Produto {code}', 'extra': [code]} for code in range(900, 1100)]})
+    expected = dict(erp_catalog.load_erp_index())
+    # Fora da janela de mtime ambiguo, a proxima carga grava o espelho binario.
+    os.utime(target, ns=(target.stat().st_mtime_ns - 5_000_000_000,) * 2)
+    erp_catalog.clear_erp_cache()
+    assert isinstance(erp_catalog.load_erp_index(), erp_store.ErpIndex)
+
+    # Outro processo: le o binario sem decodificar o JSON nem os produtos nao acessados.
+    erp_catalog.clear_erp_cache()
+    monkeypatch.setattr(erp_catalog, '_load_json_file', lambda path: pytest.fail('JSON mirror decoded'))
+    index = erp_catalog.load_erp_index()
+    assert erp_catalog.get_erp_status()['products_loaded'] == 200
+    assert index['1050'] == expected['1050'] and index.get('5') is None
+    assert len(index._store._decoded) == 1
+    assert dict(index) == expected
+
+    erp_catalog.apply_erp_delta({'upserts': [{'codigo': '5', 'nome': 'Novo'}], 'deletes': ['900', '404']})
+    patched = erp_catalog.load_erp_index()
+    assert isinstance(patched, erp_store.ErpIndex)
+    assert len(patched) == 200 and '900' not in patched and patched['5']['Nome'] == 'Novo'
+    assert list(patched)[-1] == '5' and len(list(patched)) == 200
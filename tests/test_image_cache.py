@@ -0,0 +1,153 @@
+import os
+import time
+
+from catalog import image_cache
+from catalog.image_cache import RemoteImage, cached_remote_image, sweep_image_cache
+
+
+URL = 'https://img.example.com/1000.jpg'
+
+
+class RecordingFetch:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, url, max_bytes, validators):
+        self.calls.append((url, max_bytes, dict(validators)))
+        return self.responses.pop(0)
+
+
+def _age_entry(url, seconds):
+    path = image_cache._entry_path(image_cache._cache_root(), url)
+    entry = image_cache._read_entry(path)
+    entry['validated_at'] -= seconds
+    image_cache._write_entry(path, entry)
+    return path
+
+
+def test_repeat_download_is_served_from_disk():
+    fetch = RecordingFetch(RemoteImage(b'foto', '.jpg', etag='"v1"'))
+
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+    assert len(fetch.calls) == 1
+
+
+def test_urls_with_same_content_share_one_blob():
+    fetch = RecordingFetch(RemoteImage(b'foto', '.jpg'), RemoteImage(b'foto', '.png'))
+
+    cached_remote_image(URL, 1024, fetch)
+    assert cached_remote_image('https://cdn.example.com/1000.png', 1024, fetch) == (b'foto', '.png')
+    blobs = list((image_cache._cache_root() / 'blobs').glob('*/*'))
+    assert len(blobs) == 1
+
+
+def test_stale_entry_is_revalidated_with_validators(monkeypatch):
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS', '60')
+    fetch = RecordingFetch(
+        RemoteImage(b'foto', '.jpg', etag='"v1"', last_modified='Wed, 01 Jan 2025 00:00:00 GMT'),
+        RemoteImage(None, not_modified=True),
+    )
+    cached_remote_image(URL, 1024, fetch)
+    _age_entry(URL, 120)
+
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+    assert fetch.calls[1][2] == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT',
+    }
+    # 304 renova a validacao: a proxima chamada nao vai a rede.
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+    assert len(fetch.calls) == 2
+
+
+def test_changed_image_replaces_cached_copy(monkeypatch):
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS', '60')
+    fetch = RecordingFetch(RemoteImage(b'antiga', '.jpg', etag='"v1"'), RemoteImage(b'nova', '.jpg', etag='"v2"'))
+    cached_remote_image(URL, 1024, fetch)
+    _age_entry(URL, 120)
+
+    assert cached_remote_image(URL, 1024, fetch) == (b'nova', '.jpg')
+    assert cached_remote_image(URL, 1024, fetch) == (b'nova', '.jpg')
+    assert len(fetch.calls) == 2
+
+
+def test_failed_revalidation_serves_stale_copy(monkeypatch):
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_REVALIDATE_SECONDS', '60')
+    fetch = RecordingFetch(RemoteImage(b'foto', '.jpg'), RemoteImage(None))
+    cached_remote_image(URL, 1024, fetch)
+    _age_entry(URL, 120)
+
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+
+
+def test_blocked_and_failed_urls_are_negatively_cached(monkeypatch):
+    fetch = RecordingFetch(None, RemoteImage(None))
+
+    assert cached_remote_image('http://127.0.0.1/x.jpg', 1024, fetch) == (None, '')
+    assert cached_remote_image('http://127.0.0.1/x.jpg', 1024, fetch) == (None, '')
+    assert cached_remote_image(URL, 1024, fetch) == (None, '')
+    assert cached_remote_image(URL, 1024, fetch) == (None, '')
+    assert len(fetch.calls) == 2
+
+    # Expirado o registro negativo, a URL e tentada de novo.
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_NEGATIVE_SECONDS', '60')
+    _age_entry(URL, 120)
+    fetch.responses.append(RemoteImage(b'foto', '.jpg'))
+    assert cached_remote_image(URL, 1024, fetch) == (b'foto', '.jpg')
+
+
+def test_size_limit_still_applies_to_cached_images():
+    fetch = RecordingFetch(RemoteImage(b'x' * 100, '.jpg'), RemoteImage(None))
+    cached_remote_image(URL, 1024, fetch)
+
+    assert cached_remote_image(URL, 50, fetch) == (None, '')
+    assert len(fetch.calls) == 1
+
+    # Falha por limite nao bloqueia a URL quando o limite sobe depois.
+    other = 'https://img.example.com/2000.jpg'
+    assert cached_remote_image(other, 50, fetch) == (None, '')
+    fetch.responses.append(RemoteImage(b'y' * 100, '.jpg'))
+    assert cached_remote_image(other, 1024, fetch) == (b'y' * 100, '.jpg')
+
+
+def test_disabled_cache_always_fetches(monkeypatch):
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES', '0')
+    fetch = RecordingFetch(RemoteImage(b'foto', '.jpg'), RemoteImage(b'foto', '.jpg'))
+
+    cached_remote_image(URL, 1024, fetch)
+    cached_remote_image(URL, 1024, fetch)
+    assert len(fetch.calls) == 2
+    assert not image_cache._cache_root().exists()
+
+
+def test_sweep_evicts_least_recently_used_entries(monkeypatch):
+    urls = [f'https://img.example.com/{position}.jpg' for position in range(3)]
+    fetch = RecordingFetch(*(RemoteImage(bytes([position]) * 100, '.jpg') for position in range(3)))
+    root = image_cache._cache_root()
+    for position, url in enumerate(urls):
+        cached_remote_image(url, 1024, fetch)
+        stamp = time.time() - 100 + position
+        os.utime(image_cache._entry_path(root, url), (stamp, stamp))
+    # Uso recente tira a primeira URL do fim da fila.
+    cached_remote_image(urls[0], 1024, fetch)
+
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_MAX_BYTES', '200')
+    assert sweep_image_cache() == 100
+    assert not image_cache._entry_path(root, urls[1]).exists()
+    assert image_cache._entry_path(root, urls[0]).exists()
+    assert image_cache._entry_path(root, urls[2]).exists()
+    assert len(list((root / 'blobs').glob('*/*'))) == 2
+
+
+def test_sweep_drops_entries_unused_past_max_age(monkeypatch):
+    fetch = RecordingFetch(RemoteImage(b'foto', '.jpg'))
+    cached_remote_image(URL, 1024, fetch)
+    root = image_cache._cache_root()
+    stamp = time.time() - 7200
+    os.utime(image_cache._entry_path(root, URL), (stamp, stamp))
+
+    monkeypatch.setenv('CATALOG_EXPORT_IMAGE_CACHE_MAX_AGE_SECONDS', '3600')
+    assert sweep_image_cache() == 4
+    assert not list((root / 'blobs').glob('*/*'))
@@ -0,0 +1,77 @@
+import marshal
+
+from catalog import index_snapshot
+from catalog.local_catalog import INDEX_EXTENSIONS, refresh_local_photo_index
+from catalog.photo_index import get_photo_index, reset_photo_indexes, verification
+
+
+def _build_root(tmp_path):
+    root = tmp_path / "Catalogo"
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    product_dir.mkdir(parents=True)
+    (product_dir / "5989-1.jpg").write_bytes(b"a")
+    (product_dir / "5989_branco.jpg").write_bytes(b"b")
+    return root, product_dir
+
+
+def test_snapshot_restores_index_and_background_verification_refreshes_it(tmp_path):
+    root, product_dir = _build_root(tmp_path)
+    built = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    snapshot = tmp_path / "cache" / "index_snapshot.bin"
+    assert index_snapshot.save_snapshot(snapshot)
+
+    reset_photo_indexes()
+    assert index_snapshot.load_snapshot(snapshot) == 1
+    index = get_photo_index(str(root), INDEX_EXTENSIONS)
+    assert index.restored
+
+    (product_dir / "5989_branco.jpg").unlink()
+    # Servido direto do snapshot, sem tocar no disco.
+    assert refresh_local_photo_index(str(root), allowed_roots=[str(root)]) == built
+
+    thread = index_snapshot.verify_snapshot_in_background(
+        lambda: refresh_local_photo_index(str(root), allowed_roots=[str(root)]),
+        save=False,
+    )
+    thread.join(5)
+    assert not index.restored
+    refreshed = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    assert [item["name"] for item in refreshed["5989"]["files"]] == ["5989-1.jpg"]
+
+
+def test_verification_bypasses_restored_snapshot(tmp_path):
+    root, product_dir = _build_root(tmp_path)
+    refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    snapshot = tmp_path / "index_snapshot.bin"
+    index_snapshot.save_snapshot(snapshot)
+
+    reset_photo_indexes()
+    index_snapshot.load_snapshot(snapshot)
+    (product_dir / "5989-1.jpg").unlink()
+    with verification():
+        refreshed = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    assert [item["name"] for item in refreshed["5989"]["files"]] == ["5989_branco.jpg"]
+
+
+def test_snapshot_from_other_version_is_ignored(tmp_path):
+    root, _ = _build_root(tmp_path)
+    refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    snapshot = tmp_path / "index_snapshot.bin"
+    snapshot.write_bytes(
+        index_snapshot.SNAPSHOT_MAGIC
+        + marshal.dumps(((0,), index_snapshot.build_snapshot()))
+    )
+    reset_photo_indexes()
+
+    assert index_snapshot.load_snapshot(snapshot) == 0
+    assert index_snapshot.load_snapshot(tmp_path / "missing.bin") == 0
+    snapshot.write_bytes(index_snapshot.SNAPSHOT_MAGIC + b"\x00broken")
+    assert index_snapshot.load_snapshot(snapshot) == 0
+
+
+def test_snapshot_header_covers_modules_imported_by_classifiers():
+    modules = index_snapshot._classifier_modules()
+    for name in ("category_classifier.py", "stock_catalog.py", "stock_matcher.py", "text_normalize.py", "shell_link.py"):
+        assert name in modules
+    assert "exporter.py" not in modules
+    assert [item[0] for item in index_snapshot._snapshot_header()[2]] == list(modules)
@@ -0,0 +1,37 @@
+import io
+import json
+
+import pytest
+
+from catalog import json_stream
+from catalog.json_stream import UnsupportedJsonShape, iter_json_records
+
+
+KEYS = ("products", "items")
+
+
+@pytest.fixture(autouse=True)
+def tiny_chunks(monkeypatch):
+    # Blocos minusculos forcam valores, numeros e separadores a cruzar o limite do buffer.
+    monkeypatch.setattr(json_stream, "READ_CHUNK_CHARS", 3)
+
+
+def test_stream_yields_records_from_array_or_first_container_key():
+    records = [{"codigo": 123456, "nome": "Pendente água"}, 98765.25, [1, {"a": None}], "x"]
+
+    assert list(iter_json_records(io.StringIO(json.dumps(records, indent=2)), KEYS)) == records
+
+    document = {"meta": {"products": "nao e lista"}, "total": 12345, "items": records, "products": []}
+    assert list(iter_json_records(io.StringIO(json.dumps(document)), KEYS)) == records
+    assert list(iter_json_records(io.StringIO(' { "products" : [ ] } '), KEYS)) == []
+
+
+def test_stream_rejects_unknown_shapes_and_invalid_json():
+    with pytest.raises(UnsupportedJsonShape):
+        list(iter_json_records(io.StringIO('{"1001": {"nome": "A"}}'), KEYS))
+    with pytest.raises(UnsupportedJsonShape):
+        list(iter_json_records(io.StringIO("42"), KEYS))
+
+    for broken in ('[{"a": 1} {"b": 2}]', '{"products": [1, 2', '[1, 2] [3]', '{"products": [1,]}'):
+        with pytest.raises(ValueError):
+            list(iter_json_records(io.StringIO(broken), KEYS))
@@ -6,6 +6,7 @@ from catalog.onedrive import (
     list_local_products,
     categorize_local_photos,
     find_local_images_for_code,
+    lookup_photo_record,
     resolve_local_asset_path,
     resolve_local_products_root,
 )
@@ -243,6 +244,40 @@ def test_local_products_fallbacks_to_stock_report(monkeypatch, tmp_path):
     assert products[0]["FotoBranco"].startswith("/catalog/local/asset?path=")
 
 
+def test_stock_report_is_parsed_once_until_file_changes(monkeypatch, tmp_path):
+    from openpyxl import Workbook
+
+    from catalog import stock_catalog
+
+    stock_report = tmp_path / "stock.xlsx"
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "POSICAO_ESTOQUE"
+    worksheet.append(["FILIAL", "CODIGO", "DESCRICAO"])
+    worksheet.append([2, 1181, "FITA LED 2835"])
+    workbook.save(stock_report)
+    workbook.close()
+    monkeypatch.setenv("CATALOG_STOCK_REPORT_PATH", str(stock_report))
+
+    reads = []
+    real_read = stock_catalog.read_sheet_columns
+    monkeypatch.setattr(
+        "catalog.stock_catalog.read_sheet_columns",
+        lambda *args, **kwargs: reads.append(args[0]) or real_read(*args, **kwargs),
+    )
+
+    first = stock_catalog._load_products_from_available_stock_report()
+    second = stock_catalog._load_products_from_available_stock_report()
+    assert [item["Codigo"] for item in first] == ["1181"]
+    assert second == first and second is not first
+    assert len(reads) == 1
+
+    stamp = os.stat(stock_report).st_mtime + 5
+    os.utime(stock_report, (stamp, stamp))
+    stock_catalog._load_products_from_available_stock_report()
+    assert len(reads) == 2
+
+
 def test_stock_report_gallery_uses_stock_photos(monkeypatch, tmp_path):
     from openpyxl import Workbook
 
@@ -276,6 +311,79 @@ def test_stock_report_gallery_uses_stock_photos(monkeypatch, tmp_path):
     assert photos["white_background"].startswith("/catalog/local/asset?path=")
 
 
+def test_stock_photo_ignores_numbers_outside_the_report(monkeypatch, tmp_path):
+    from openpyxl import Workbook
+
+    stock_report = tmp_path / "stock.xlsx"
+    stock_photos = tmp_path / "stock-photos"
+    (stock_photos / "1181 FITA LED").mkdir(parents=True)
+    (stock_photos / "1181 FITA LED" / "2024 foto.png").write_bytes(b"img")
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "POSICAO_ESTOQUE"
+    worksheet.append(["FILIAL", "CODIGO", "DESCRICAO", "EMB"])
+    worksheet.append([2, 1181, "FITA LED 2835 3000K 12V 5M", "UND"])
+    worksheet.append([2, 1182, "FITA LED 2835 6500K 12V 5M", "UND"])
+    workbook.save(stock_report)
+    workbook.close()
+
+    monkeypatch.setenv("CATALOG_STOCK_REPORT_PATH", str(stock_report))
+    monkeypatch.setenv("CATALOG_STOCK_PHOTOS_ROOT", str(stock_photos))
+    monkeypatch.delenv("CATALOG_LOCAL_PRODUCTS_PATH", raising=False)
+    monkeypatch.delenv("OneDrive", raising=False)
+    monkeypatch.delenv("OneDriveCommercial", raising=False)
+    monkeypatch.delenv("OneDriveConsumer", raising=False)
+    monkeypatch.setenv("USERPROFILE", str(tmp_path / "user"))
+
+    by_code = {item["Codigo"]: item for item in list_local_products()}
+    assert by_code["1181"]["URLFoto"] == "/catalog/local/asset?path=1181%20FITA%20LED%2F2024%20foto.png"
+    assert [image["name"] for image in find_local_images_for_code("1181")] == ["2024 foto.png"]
+    assert find_local_images_for_code("2024") == []
+
+
+def test_stock_photo_matches_erp_codes_missing_from_the_report(monkeypatch, tmp_path):
+    from openpyxl import Workbook
+
+    from catalog import erp_catalog
+
+    stock_report = tmp_path / "stock.xlsx"
+    stock_photos = tmp_path / "stock-photos"
+    stock_photos.mkdir()
+    (stock_photos / "2222 pendente.jpg").write_bytes(b"img")
+    (stock_photos / "3333 arandela.jpg").write_bytes(b"img")
+    local_root = tmp_path / "produtos" / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    local_root.mkdir(parents=True)
+    (local_root / "5989_branco.jpg").write_bytes(b"img")
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "POSICAO_ESTOQUE"
+    worksheet.append(["FILIAL", "CODIGO", "DESCRICAO", "EMB"])
+    worksheet.append([2, 3333, "ARANDELA", "UND"])
+    workbook.save(stock_report)
+    workbook.close()
+
+    monkeypatch.setenv("CATALOG_STOCK_REPORT_PATH", str(stock_report))
+    monkeypatch.setenv("CATALOG_STOCK_PHOTOS_ROOT", str(stock_photos))
+    monkeypatch.setenv("CATALOG_ERP_JSON_PATH", str(tmp_path / "erp.json"))
+    monkeypatch.setenv("CATALOG_LOCAL_PRODUCTS_PATH", str(tmp_path / "produtos"))
+    erp_catalog.import_erp_payload(
+        {"products": [{"codigo": "1111", "nome": "SO ERP"}, {"codigo": "2222", "nome": "PENDENTE"}]}
+    )
+
+    by_code = {item["Codigo"]: item for item in list_local_products()}
+    assert by_code["2222"]["URLFoto"] == "/catalog/local/asset?path=2222%20pendente.jpg"
+    assert by_code["1111"]["URLFoto"].startswith("https://placehold.co/")
+    assert categorize_local_photos("2222")["white_background"] == "/catalog/local/asset?path=2222%20pendente.jpg"
+    assert [image["name"] for image in find_local_images_for_code("2222")] == ["2222 pendente.jpg"]
+
+    # Foto nova de um codigo fora da planilha aparece sem reiniciar o indice.
+    monkeypatch.setenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "0")
+    (stock_photos / "2222 pendente (2).jpg").write_bytes(b"img")
+    assert len(find_local_images_for_code("2222")) == 2
+
+
 def test_stock_report_matches_photo_by_description(monkeypatch, tmp_path):
     from openpyxl import Workbook
 
@@ -406,6 +514,47 @@ def test_local_index_ignores_empty_explicit_root(monkeypatch, tmp_path):
     assert products[0]["Codigo"] == "5989"
 
 
+def test_merged_mode_combines_roots_and_relists_only_changed_root(monkeypatch, tmp_path):
+    explicit_root = tmp_path / "explicit"
+    (explicit_root / "ABAJUR" / "5989 - ABAJUR TOUCH").mkdir(parents=True)
+    (explicit_root / "ABAJUR" / "5989 - ABAJUR TOUCH" / "5989_branco.jpg").write_bytes(b"a")
+    one_drive_products = tmp_path / "OneDrive" / "MARKETING" / "01_PRODUTOS"
+    (one_drive_products / "ABAJUR" / "5989 - ABAJUR ANTIGO").mkdir(parents=True)
+    (one_drive_products / "ABAJUR" / "5989 - ABAJUR ANTIGO" / "5989-2.jpg").write_bytes(b"b")
+    (one_drive_products / "PENDENTE" / "6001 - PENDENTE GOTA").mkdir(parents=True)
+    (one_drive_products / "PENDENTE" / "6001 - PENDENTE GOTA" / "6001-1.jpg").write_bytes(b"c")
+
+    # Pastas antigas saem da janela de mtime recente e nao sao relistadas a cada chamada.
+    stamp = os.stat(tmp_path).st_mtime - 60
+    for dirpath, _, filenames in os.walk(tmp_path):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+        os.utime(dirpath, (stamp, stamp))
+
+    monkeypatch.setenv("CATALOG_LOCAL_PRODUCTS_PATH", str(explicit_root))
+    monkeypatch.setenv("OneDrive", str(tmp_path / "OneDrive"))
+    assert [item["Codigo"] for item in list_local_products()] == ["5989"]
+
+    monkeypatch.setenv("CATALOG_LOCAL_MERGE_ROOTS", "true")
+    assert [item["Codigo"] for item in list_local_products()] == ["5989", "6001"]
+    # A raiz explicita vem antes e prevalece para codigos repetidos.
+    assert [item["name"] for item in find_local_images_for_code("5989")] == ["5989_branco.jpg"]
+    assert [item["name"] for item in find_local_images_for_code("6001")] == ["6001-1.jpg"]
+
+    from catalog.local_catalog import get_local_index
+
+    assert get_local_index() is get_local_index()
+
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr("catalog.photo_index.os.scandir", lambda path: listed.append(path) or real_scandir(path))
+    new_dir = one_drive_products / "PLAFON" / "7001 - PLAFON REDONDO"
+    new_dir.mkdir(parents=True)
+    (new_dir / "7001-1.jpg").write_bytes(b"d")
+    assert sorted(get_local_index()) == ["5989", "6001", "7001"]
+    assert listed and not any(str(path).startswith(str(explicit_root)) for path in listed)
+
+
 def test_resolve_local_root_prefers_fotos_produtos(monkeypatch, tmp_path):
     one_drive_root = tmp_path / "OneDrive"
     fotos_root = one_drive_root / "FOTOS_PRODUTOS"
@@ -601,3 +750,249 @@ def test_shortcut_target_image_is_used(monkeypatch, tmp_path):
     assert len(images) == 1
     assert images[0]["name"] == "6001 - ABAJUR DROP-001B E27X1"
 
+
+
+def test_photo_lookup_reuses_recently_validated_index(monkeypatch, tmp_path):
+    root = tmp_path / "Catalogo"
+    category = root / "ABAJUR"
+    category.mkdir(parents=True)
+    (category / "5989-ABAJUR TOUCH.jpg").write_bytes(b"a")
+    monkeypatch.setenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "60")
+
+    assert [item["Codigo"] for item in list_local_products(str(root))] == ["5989"]
+    (category / "5989_branco.jpg").write_bytes(b"b")
+
+    # Consulta por codigo responde do indice ja validado, sem revarrer a pasta.
+    record = lookup_photo_record("5989", str(root))
+    assert [item["name"] for item in record["files"]] == ["5989-ABAJUR TOUCH.jpg"]
+
+    monkeypatch.setenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "0")
+    images = find_local_images_for_code("5989", str(root))
+    assert sorted(image["name"] for image in images) == ["5989-ABAJUR TOUCH.jpg", "5989_branco.jpg"]
+
+
+def test_stock_photo_lookup_skips_report_reload_when_index_is_current(monkeypatch, tmp_path):
+    from openpyxl import Workbook
+
+    from catalog import stock_catalog
+
+    stock_report = tmp_path / "stock.xlsx"
+    stock_photos = tmp_path / "stock-photos"
+    stock_photos.mkdir(parents=True)
+    (stock_photos / "1181 - FITA LED.png").write_bytes(b"img")
+
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "POSICAO_ESTOQUE"
+    worksheet.append(["FILIAL", "CODIGO", "DESCRICAO", "EMB"])
+    worksheet.append([2, 1181, "FITA LED 2835 3000K 12V 5M", "UND"])
+    worksheet.append([2, 1182, "FITA LED 2835 6500K 12V 5M", "UND"])
+    workbook.save(stock_report)
+    workbook.close()
+
+    monkeypatch.setenv("CATALOG_STOCK_REPORT_PATH", str(stock_report))
+    monkeypatch.setenv("CATALOG_STOCK_PHOTOS_ROOT", str(stock_photos))
+    monkeypatch.setenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "60")
+
+    assert [item["Codigo"] for item in list_local_products()] == ["1181", "1182"]
+
+    def fail_reload():
+        raise AssertionError("stock report reloaded")
+
+    monkeypatch.setattr(stock_catalog, "_load_products_from_available_stock_report", fail_reload)
+    assert lookup_photo_record("1181")["files"][0]["name"] == "1181 - FITA LED.png"
+    assert lookup_photo_record("1182") is None
+    assert categorize_local_photos("1181")["white_background"].startswith("/catalog/local/asset?path=")
+
+
+def test_stock_photo_index_is_shared_and_reclassified_only_when_report_changes(monkeypatch, tmp_path):
+    from openpyxl import Workbook
+
+    from catalog import stock_catalog
+
+    stock_report = tmp_path / "stock.xlsx"
+    stock_photos = tmp_path / "stock-photos"
+    stock_photos.mkdir(parents=True)
+    (stock_photos / "1181 - FITA LED.png").write_bytes(b"img")
+    (stock_photos / "pendente cristal redondo dourado.jpg").write_bytes(b"img")
+    stamp = os.stat(stock_photos).st_mtime - 60
+    for path in (*stock_photos.iterdir(), stock_photos):
+        os.utime(path, (stamp, stamp))
+
+    def save_report(code):
+        workbook = Workbook()
+        worksheet = workbook.active
+        worksheet.title = "POSICAO_ESTOQUE"
+        worksheet.append(["FILIAL", "CODIGO", "DESCRICAO"])
+        worksheet.append([2, 1181, "FITA LED 2835"])
+        worksheet.append([2, code, "PENDENTE CRISTAL REDONDO DOURADO"])
+        workbook.save(stock_report)
+        workbook.close()
+
+    save_report(2004)
+    monkeypatch.setenv("CATALOG_STOCK_REPORT_PATH", str(stock_report))
+    monkeypatch.setenv("CATALOG_STOCK_PHOTOS_ROOT", str(stock_photos))
+    monkeypatch.setenv("CATALOG_PHOTO_LOOKUP_MAX_AGE_SECONDS", "0")
+
+    classified = []
+    real_classifier = stock_catalog._stock_file_classifier
+
+    def counting_classifier(*args):
+        classify = real_classifier(*args)
+        return lambda parts, full_path: classified.append(parts[-1]) or classify(parts, full_path)
+
+    monkeypatch.setattr(stock_catalog, "_stock_file_classifier", counting_classifier)
+
+    products = {item["Codigo"]: item for item in list_local_products()}
+    assert products["2004"]["URLFoto"].startswith("/catalog/local/asset?path=")
+    assert len(classified) == 2
+
+    # Consultas restritas reaproveitam o indice materializado, sem reclassificar.
+    assert set(stock_catalog._get_stock_photo_records_for_codes({"1181", "2004", "9999"})) == {"1181", "2004"}
+    assert lookup_photo_record("2004")["files"][0]["name"] == "pendente cristal redondo dourado.jpg"
+    list_local_products()
+    assert len(classified) == 2
+
+    save_report(2005)
+    stamp = os.stat(stock_report).st_mtime + 5
+    os.utime(stock_report, (stamp, stamp))
+    assert lookup_photo_record("2004") is None
+    assert lookup_photo_record("2005")["files"][0]["name"] == "pendente cristal redondo dourado.jpg"
+    assert len(classified) == 4
+
+
+def test_catalog_snapshot_is_rebuilt_only_when_sources_change(monkeypatch, tmp_path):
+    from catalog import onedrive
+
+    root = tmp_path / "produtos"
+    (root / "ABAJUR" / "5989 - ABAJUR TOUCH").mkdir(parents=True)
+    (root / "ABAJUR" / "5989 - ABAJUR TOUCH" / "5989_branco.jpg").write_bytes(b"a")
+    stamp = os.stat(tmp_path).st_mtime - 60
+    for dirpath, _, filenames in os.walk(tmp_path):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+        os.utime(dirpath, (stamp, stamp))
+    monkeypatch.setenv("CATALOG_LOCAL_PRODUCTS_PATH", str(root))
+
+    builds = []
+
+    def counting_build():
+        builds.append(1)
+        return list_local_products()
+
+    monkeypatch.setattr(onedrive, "list_local_products", counting_build)
+    first = onedrive.get_catalog_snapshot()
+    assert [item["Codigo"] for item in first.products] == ["5989"]
+    assert isinstance(first.products, tuple)
+    # Dentro da idade maxima nem confere as fontes; depois, so remonta se o carimbo mudou.
+    assert onedrive.get_catalog_snapshot() is first
+    assert onedrive.refresh_catalog_snapshot() is first
+    assert len(builds) == 1
+
+    (root / "ABAJUR" / "6001 - ABAJUR BOLA").mkdir()
+    (root / "ABAJUR" / "6001 - ABAJUR BOLA" / "6001_branco.jpg").write_bytes(b"b")
+    second = onedrive.refresh_catalog_snapshot()
+    assert second.version > first.version
+    assert [item["Codigo"] for item in second.products] == ["5989", "6001"]
+    assert onedrive.get_catalog_snapshot() is second
+
+    cadastro = tmp_path / "CADASTRO.html"
+    cadastro.write_text("<table></table>", encoding="utf-8")
+    monkeypatch.setenv("CATALOG_CADASTRO_HTML", str(cadastro))
+    assert onedrive.refresh_catalog_snapshot().version > second.version
+    assert len(builds) == 3
+
+
+def test_erp_write_remerges_snapshot_without_revalidating_photo_trees(monkeypatch, tmp_path):
+    from catalog import catalog_snapshot, erp_catalog, onedrive
+
+    folder = tmp_path / "produtos" / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    folder.mkdir(parents=True)
+    (folder / "5989_branco.jpg").write_bytes(b"a")
+    stamp = os.stat(tmp_path).st_mtime - 60
+    for dirpath, _, filenames in os.walk(tmp_path):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+        os.utime(dirpath, (stamp, stamp))
+    monkeypatch.setenv("CATALOG_LOCAL_PRODUCTS_PATH", str(tmp_path / "produtos"))
+    monkeypatch.setenv("CATALOG_ERP_JSON_PATH", str(tmp_path / "erp.json"))
+    erp_catalog.import_erp_payload({"products": [{"codigo": "5989", "nome": "ERP 5989"}]})
+    first = onedrive.get_catalog_snapshot()
+
+    revalidations = []
+    original_revalidate = catalog_snapshot._revalidated_generations
+
+    def counting_revalidate():
+        revalidations.append(1)
+        return original_revalidate()
+
+    monkeypatch.setattr(catalog_snapshot, "_revalidated_generations", counting_revalidate)
+    erp_catalog.apply_erp_delta({"upserts": [{"codigo": "7000", "nome": "SO ERP"}]})
+    assert revalidations == []
+
+    # O leitor recebe a versao remesclada; a conferencia das pastas roda em segundo plano.
+    builds = []
+    monkeypatch.setattr(onedrive, "list_local_products", lambda: builds.append(1) or [])
+    second = onedrive.get_catalog_snapshot()
+    assert second.version > first.version
+    assert [item["Codigo"] for item in second.products] == ["5989", "7000"]
+    catalog_snapshot._REFRESH_THREAD.join(5)
+    assert revalidations == [1]
+    assert builds == []
+    assert onedrive.get_catalog_snapshot() is second
+
+
+def test_catalog_snapshot_remerges_only_codes_changed_by_erp_delta(monkeypatch, tmp_path):
+    from catalog import erp_catalog, onedrive
+
+    root = tmp_path / "produtos"
+    for code in ("5989", "6001", "6002"):
+        folder = root / "ABAJUR" / f"{code} - ABAJUR {code}"
+        folder.mkdir(parents=True)
+        (folder / f"{code}_branco.jpg").write_bytes(b"a")
+    stamp = os.stat(tmp_path).st_mtime - 60
+    for dirpath, _, filenames in os.walk(tmp_path):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+        os.utime(dirpath, (stamp, stamp))
+    monkeypatch.setenv("CATALOG_LOCAL_PRODUCTS_PATH", str(root))
+    monkeypatch.setenv("CATALOG_ERP_JSON_PATH", str(tmp_path / "erp.json"))
+    erp_catalog.import_erp_payload(
+        {"products": [{"codigo": code, "nome": f"ERP {code}"} for code in ("5989", "6001", "6002", "7000")]}
+    )
+
+    builds = []
+
+    def counting_build():
+        builds.append(1)
+        return list_local_products()
+
+    merged = []
+    original_merge = erp_catalog.merge_changed_products_with_erp
+
+    def recording_merge(products, codes, erp_index):
+        merged.append(set(codes))
+        return original_merge(products, codes, erp_index)
+
+    monkeypatch.setattr(onedrive, "list_local_products", counting_build)
+    monkeypatch.setattr(erp_catalog, "merge_changed_products_with_erp", recording_merge)
+    first = onedrive.refresh_catalog_snapshot()
+    assert [item["Codigo"] for item in first.products] == ["5989", "6001", "6002", "7000"]
+
+    erp_catalog.apply_erp_delta(
+        {"upserts": [{"codigo": "6001", "nome": "ERP NOVO"}, {"codigo": "7100", "nome": "SO ERP"}], "deletes": ["6002"]}
+    )
+    second = onedrive.refresh_catalog_snapshot()
+    assert len(builds) == 1
+    assert merged == [{"6001", "6002", "7100"}]
+    assert list(second.products) == list_local_products()
+    by_code = {item["Codigo"]: item for item in second.products}
+    assert by_code["6001"]["Nome"] == "ERP NOVO" and "6002" not in by_code and "7100" in by_code
+    # Produtos nao tocados pelo delta sao os mesmos objetos do snapshot anterior.
+    assert by_code["5989"] is next(item for item in first.products if item["Codigo"] == "5989")
+
+    # Importacao completa substitui o indice: monta tudo de novo.
+    erp_catalog.import_erp_payload({"products": [{"codigo": "5989", "nome": "ERP 5989"}]})
+    third = onedrive.refresh_catalog_snapshot()
+    assert len(builds) == 2
+    assert [item["Codigo"] for item in third.products] == ["5989"]
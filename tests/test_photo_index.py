@@ -0,0 +1,193 @@
+import marshal
+import os
+
+from catalog.local_catalog import (
+    INDEX_EXTENSIONS,
+    _build_local_record,
+    refresh_local_photo_index,
+    scan_local_photo_index,
+)
+from catalog.photo_index import IncrementalPhotoIndex, get_photo_index
+
+
+def _age_tree(root, seconds=60):
+    # Evita a janela de mtime recente, que forca nova listagem da pasta.
+    stamp = os.stat(root).st_mtime - seconds
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (stamp, stamp))
+        os.utime(dirpath, (stamp, stamp))
+
+
+def test_refresh_relists_only_changed_directories(tmp_path):
+    root = tmp_path / "Catalogo"
+    (root / "ABAJUR" / "5989 - ABAJUR TOUCH").mkdir(parents=True)
+    (root / "PENDENTE" / "6001 - PENDENTE GOTA").mkdir(parents=True)
+    (root / "ABAJUR" / "5989 - ABAJUR TOUCH" / "5989-1.jpg").write_bytes(b"a")
+    (root / "PENDENTE" / "6001 - PENDENTE GOTA" / "6001-1.jpg").write_bytes(b"b")
+    _age_tree(root)
+
+    classified = []
+
+    def classify(parts, full_path):
+        classified.append(parts[-1])
+        return (parts[-1][:4], parts[-1])
+
+    index = IncrementalPhotoIndex(str(root), INDEX_EXTENSIONS)
+    build = lambda code, entries: {"code": code, "files": [entry[1] for entry in entries]}
+    first = index.refresh(classify, build)
+    assert sorted(first) == ["5989", "6001"]
+    assert sorted(classified) == ["5989-1.jpg", "6001-1.jpg"]
+
+    classified.clear()
+    again = index.refresh(classify, build)
+    assert again is first
+    assert classified == []
+
+    (root / "PENDENTE" / "6001 - PENDENTE GOTA" / "6001-2.jpg").write_bytes(b"c")
+    updated = index.refresh(classify, build)
+    assert classified == ["6001-2.jpg"]
+    assert updated["6001"]["files"] == ["6001-1.jpg", "6001-2.jpg"]
+    assert updated["5989"] is first["5989"]
+
+
+def test_persistent_index_matches_full_scan_after_changes(tmp_path):
+    root = tmp_path / "Catalogo"
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    product_dir.mkdir(parents=True)
+    (product_dir / "5989-2.jpg").write_bytes(b"2")
+    (product_dir / "5989 - ABAJUR TOUCH (1).png").write_bytes(b"1")
+
+    first = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    assert first == scan_local_photo_index(str(root), allowed_roots=[str(root)])
+
+    new_dir = root / "PENDENTE" / "6001 - PENDENTE GOTA"
+    new_dir.mkdir(parents=True)
+    (new_dir / "6001_branco.jpg").write_bytes(b"w")
+    os.remove(product_dir / "5989-2.jpg")
+
+    second = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    assert sorted(second) == ["5989", "6001"]
+    assert [item["name"] for item in second["5989"]["files"]] == ["5989 - ABAJUR TOUCH (1).png"]
+    assert second == scan_local_photo_index(str(root), allowed_roots=[str(root)])
+
+    for path in (new_dir / "6001_branco.jpg",):
+        os.remove(path)
+    os.rmdir(new_dir)
+    third = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    assert sorted(third) == ["5989"]
+
+
+def test_build_local_record_prefers_named_entries():
+    record = _build_local_record(
+        "5989",
+        [
+            ("5989", "", "Sem categoria", None),
+            ("5989", "ABAJUR TOUCH", "ABAJUR", {"name": "a.jpg", "full_path": "a", "rel_path": "a.jpg"}),
+        ],
+    )
+    assert record["name"] == "ABAJUR TOUCH"
+    assert record["category"] == "ABAJUR"
+    assert record["variants"]["white_background"]["rel_path"] == "a.jpg"
+
+
+def test_parallel_walk_matches_sequential_scan(tmp_path):
+    root = tmp_path / "Catalogo"
+    for position, category in enumerate(("ABAJUR", "PENDENTE", "PLAFON", "SPOT")):
+        code = 5000 + position
+        product_dir = root / category / f"{code} - {category} MODELO" / "FOTOS"
+        product_dir.mkdir(parents=True)
+        (product_dir / f"{code}-1.jpg").write_bytes(b"1")
+        (product_dir / f"{code}_branco.png").write_bytes(b"2")
+    (root / "5999 solto.jpg").write_bytes(b"3")
+
+    sequential = scan_local_photo_index(str(root), allowed_roots=[str(root)], workers=1)
+    parallel = scan_local_photo_index(str(root), allowed_roots=[str(root)], workers=4)
+    assert sorted(parallel) == ["5000", "5001", "5002", "5003", "5999"]
+    assert parallel == sequential
+    assert list(parallel) == list(sequential)
+
+
+def test_overlapping_indexes_share_directory_listings(monkeypatch, tmp_path):
+    root = tmp_path / "MARKETING"
+    stock_dir = root / "01_PRODUTOS" / "ABAJUR"
+    stock_dir.mkdir(parents=True)
+    (stock_dir / "5989-1.jpg").write_bytes(b"a")
+    (stock_dir / "5989 camada.psd").write_bytes(b"b")
+    (root / "Catalogo" / "6001 - PENDENTE").mkdir(parents=True)
+    (root / "Catalogo" / "6001 - PENDENTE" / "6001.png").write_bytes(b"c")
+    _age_tree(root)
+
+    listed = []
+    real_scandir = os.scandir
+    monkeypatch.setattr("catalog.photo_index.os.scandir", lambda path: listed.append(path) or real_scandir(path))
+    classify = lambda parts, full_path: (parts[-1][:4], parts[-1])
+    build = lambda code, entries: {"files": [entry[1] for entry in entries]}
+
+    local = IncrementalPhotoIndex(str(root), (".jpg", ".png")).refresh(classify, build)
+    stock = IncrementalPhotoIndex(str(root / "01_PRODUTOS"), (".jpg", ".psd")).refresh(classify, build)
+
+    assert local == {"5989": {"files": ["5989-1.jpg"]}, "6001": {"files": ["6001.png"]}}
+    assert stock == {"5989": {"files": ["5989 camada.psd", "5989-1.jpg"]}}
+    assert len(listed) == len(set(listed)) == 5
+
+
+def test_shared_listings_do_not_hide_files_added_to_subdirectories(tmp_path):
+    root = tmp_path / "Catalogo"
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    product_dir.mkdir(parents=True)
+    (product_dir / "5989-1.jpg").write_bytes(b"a")
+    _age_tree(root)
+
+    classify = lambda parts, full_path: (parts[-1][:4], parts[-1])
+    build = lambda code, entries: {"files": [entry[1] for entry in entries]}
+    first = IncrementalPhotoIndex(str(root), INDEX_EXTENSIONS)
+    assert first.refresh(classify, build) == {"5989": {"files": ["5989-1.jpg"]}}
+
+    # Arquivo novo muda o mtime da pasta do produto, mas nao o de ABAJUR.
+    (product_dir / "5989-2.jpg").write_bytes(b"b")
+    second = IncrementalPhotoIndex(str(root), INDEX_EXTENSIONS)
+    assert second.refresh(classify, build) == {"5989": {"files": ["5989-1.jpg", "5989-2.jpg"]}}
+    assert first.refresh(classify, build) == {"5989": {"files": ["5989-1.jpg", "5989-2.jpg"]}}
+
+
+def test_directory_segments_are_parsed_once_per_folder():
+    from catalog.local_catalog import _extract_code_from_parts, _parse_directory_parts
+
+    _parse_directory_parts.cache_clear()
+    folder = ["ABAJUR", "5989 - ABAJUR TOUCH (2)", "FOTOS"]
+    results = [_extract_code_from_parts([*folder, name]) for name in ("a.jpg", "b_branco.jpg", "6001 x.jpg")]
+
+    assert results[0] == ("5989", "ABAJUR TOUCH", "ABAJUR")
+    assert results[1] == ("5989", "ABAJUR TOUCH", "ABAJUR")
+    assert results[2] == ("6001", "x", "ABAJUR")
+    info = _parse_directory_parts.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
+
+
+def test_compact_records_share_folder_and_survive_export(tmp_path):
+    root = tmp_path / "Catalogo"
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    product_dir.mkdir(parents=True)
+    for name in ("5989-1.jpg", "5989_branco.jpg", "5989_medidas.jpg"):
+        (product_dir / name).write_bytes(b"a")
+
+    records = refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    record = records["5989"]
+    first, second = record["files"][:2]
+    assert first._full_dir is second._full_dir
+    assert record["variants"]["white_background"] is record["files"][0]
+    assert record["variants"]["measures"]["rel_path"] == os.path.join("ABAJUR", "5989 - ABAJUR TOUCH", "5989_medidas.jpg")
+    assert dict(first) == {
+        "name": first["name"],
+        "full_path": str(product_dir / first["name"]),
+        "rel_path": os.path.join("ABAJUR", "5989 - ABAJUR TOUCH", first["name"]),
+    }
+
+    index = get_photo_index(str(root), INDEX_EXTENSIONS)
+    state = marshal.loads(marshal.dumps(index.export_state()))
+    restored = IncrementalPhotoIndex(str(root), INDEX_EXTENSIONS)
+    assert restored.restore_state(state)
+    assert restored.records == records
+    entry_files = [entry[3] for state in restored._dirs.values() for entry in state.entries.values()]
+    assert {id(item) for item in entry_files} == {id(item) for item in restored.records["5989"]["files"]}
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+
+import pytest
+
+from catalog.local_catalog import INDEX_EXTENSIONS, refresh_local_photo_index
+from catalog.photo_index import get_photo_index, mark_path_dirty, set_live_root
+from catalog.photo_watcher import PhotoTreeWatcher
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def _build_root(tmp_path):
+    root = tmp_path / "Catalogo"
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    product_dir.mkdir(parents=True)
+    (product_dir / "5989-1.jpg").write_bytes(b"a")
+    return root
+
+
+def test_live_index_only_relists_directories_marked_dirty(tmp_path):
+    root = _build_root(tmp_path)
+    set_live_root(str(root), True)
+    assert sorted(refresh_local_photo_index(str(root), allowed_roots=[str(root)])) == ["5989"]
+
+    new_dir = root / "PENDENTE" / "6001 - PENDENTE GOTA"
+    new_dir.mkdir(parents=True)
+    (new_dir / "6001-1.jpg").write_bytes(b"b")
+    # Sem evento do observador, o indice vivo nao revarre o disco.
+    assert sorted(refresh_local_photo_index(str(root), allowed_roots=[str(root)])) == ["5989"]
+
+    touched = mark_path_dirty(str(root / "PENDENTE"))
+    assert touched == [get_photo_index(str(root), INDEX_EXTENSIONS)]
+    assert sorted(refresh_local_photo_index(str(root), allowed_roots=[str(root)])) == ["5989", "6001"]
+
+
+def test_polling_marks_only_directories_whose_mtime_changed(tmp_path, monkeypatch):
+    root = _build_root(tmp_path)
+    old_ns = time.time_ns() - 60_000_000_000
+    for directory in [root, *[path for path in root.rglob("*") if path.is_dir()]]:
+        os.utime(directory, ns=(old_ns, old_ns))
+    refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    index = get_photo_index(str(root), INDEX_EXTENSIONS)
+    set_live_root(str(root), True)
+
+    marked = []
+    original_mark_dirty = index.mark_dirty
+
+    def record_mark_dirty(rel_dirs=None):
+        marked.append(None if rel_dirs is None else list(rel_dirs))
+        original_mark_dirty(rel_dirs)
+
+    monkeypatch.setattr(index, "mark_dirty", record_mark_dirty)
+    watcher = PhotoTreeWatcher([str(root)], use_inotify=False)
+    watcher.polled_roots.append(str(root))
+
+    watcher._poll()
+    assert marked == [None]
+
+    marked.clear()
+    watcher._poll()
+    assert marked == []
+
+    product_dir = root / "ABAJUR" / "5989 - ABAJUR TOUCH"
+    (product_dir / "5989-2.jpg").write_bytes(b"b")
+    watcher._poll()
+    assert marked == [[os.path.join("ABAJUR", "5989 - ABAJUR TOUCH")]]
+    assert len(index.records["5989"]["files"]) == 2
+
+
+@pytest.mark.parametrize(
+    "use_inotify",
+    [
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify only on Linux"),
+        ),
+        False,
+    ],
+)
+def test_watcher_applies_batched_changes_in_background(tmp_path, use_inotify):
+    root = _build_root(tmp_path)
+    refresh_local_photo_index(str(root), allowed_roots=[str(root)])
+    index = get_photo_index(str(root), INDEX_EXTENSIONS)
+    batches = []
+
+    watcher = PhotoTreeWatcher(
+        [str(root)],
+        debounce_seconds=0.05,
+        poll_seconds=0.1,
+        use_inotify=use_inotify,
+    )
+    watcher.add_listener(batches.append)
+    watcher.start()
+    try:
+        assert watcher.wait_ready(5)
+        assert index.live
+        assert (watcher.polled_roots == []) is use_inotify
+
+        new_dir = root / "PENDENTE" / "6001 - PENDENTE GOTA"
+        new_dir.mkdir(parents=True)
+        for position in range(1, 6):
+            (new_dir / f"6001-{position}.jpg").write_bytes(b"b")
+
+        assert _wait_for(lambda: len(index.records.get("6001", {}).get("files", [])) == 5)
+        assert batches and batches[-1] == [index]
+
+        (root / "ABAJUR" / "5989 - ABAJUR TOUCH" / "5989-1.jpg").unlink()
+        assert _wait_for(lambda: "5989" not in index.records)
+    finally:
+        watcher.stop()
+
+    assert not index.live
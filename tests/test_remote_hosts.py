@@ -0,0 +1,88 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import socket
+import threading
+
+import pytest
+from requests.exceptions import InvalidURL
+
+from catalog import remote_hosts
+from catalog.exporter import _is_permitted_remote_image_url
+from catalog.photo_fetch import http_session
+
+
+def _fake_resolver(monkeypatch, answers):
+    calls = []
+
+    def getaddrinfo(host, port, type=0):
+        calls.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port)) for address in answers[host]]
+
+    monkeypatch.setattr('catalog.remote_hosts.socket.getaddrinfo', getaddrinfo)
+    return calls
+
+
+def test_host_verdict_is_resolved_once_per_ttl(monkeypatch):
+    calls = _fake_resolver(monkeypatch, {'cdn.example.com': ['93.184.216.34', '93.184.216.35']})
+
+    for position in range(5):
+        assert _is_permitted_remote_image_url(f'https://cdn.example.com/{position}.jpg')
+    assert calls == ['cdn.example.com']
+    assert remote_hosts.pinned_address('cdn.example.com', 443) == '93.184.216.34'
+
+
+def test_private_answer_blocks_host_and_expires(monkeypatch):
+    answers = {'cdn.example.com': ['93.184.216.34', '10.0.0.5']}
+    calls = _fake_resolver(monkeypatch, answers)
+
+    assert not _is_permitted_remote_image_url('https://cdn.example.com/1.jpg')
+    assert not _is_permitted_remote_image_url('https://cdn.example.com/2.jpg')
+    assert remote_hosts.pinned_address('cdn.example.com', 443) is None
+    assert calls == ['cdn.example.com']
+
+    # Com TTL zero nada fica guardado: cada checagem resolve de novo.
+    monkeypatch.setenv('CATALOG_EXPORT_DNS_TTL_SECONDS', '0')
+    remote_hosts.clear_host_verdicts()
+    answers['cdn.example.com'] = ['93.184.216.34']
+    assert _is_permitted_remote_image_url('https://cdn.example.com/1.jpg')
+    assert _is_permitted_remote_image_url('https://cdn.example.com/2.jpg')
+    assert calls == ['cdn.example.com'] * 3
+
+
+def test_photo_session_connects_to_pinned_address(monkeypatch):
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.headers['Host'])
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', '4')
+            self.end_headers()
+            self.wfile.write(b'foto')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    # O nome nao resolve para a maquina local: a conexao so chega ao servidor pelo endereco fixado.
+    monkeypatch.setattr('catalog.photo_fetch.pinned_address', lambda host, _: '127.0.0.1' if host == 'img.invalid' else None)
+    monkeypatch.setenv('NO_PROXY', '*')
+    try:
+        response = http_session().get(f'http://img.invalid:{port}/1.jpg', timeout=5)
+        assert response.content == b'foto'
+        with pytest.raises(InvalidURL):
+            http_session().get(f'http://other.invalid:{port}/1.jpg', timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert seen == [f'img.invalid:{port}']
+
+
+def test_photo_session_refuses_unpinned_legacy_connection_path():
+    # requests antigos chamam `get_connection`, que nao passa pelo endereco fixado.
+    adapter = http_session().get_adapter('https://cdn.example.com/1.jpg')
+    with pytest.raises(InvalidURL):
+        adapter.get_connection('https://cdn.example.com/1.jpg', {})
@@ -1,5 +1,6 @@
 import pytest
 import os
+import time
 from io import BytesIO
 from zipfile import ZipFile
 from fastapi.testclient import TestClient
@@ -189,6 +190,20 @@ def test_erp_import_and_status(monkeypatch):
         os.remove(target_path)
 
 
+def test_erp_delta_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(tmp_path / 'erp_products.json'))
+    client = TestClient(app)
+    client.post('/catalog/erp/import', json={'products': [{'codigo': '1', 'nome': 'A'}, {'codigo': '2', 'nome': 'B'}]})
+
+    rv = client.post('/catalog/erp/delta', json={'upserts': [{'codigo': '3', 'nome': 'C'}], 'deletes': ['1']})
+    assert rv.status_code == 200
+    assert rv.json()['version'] == 2
+
+    status = client.get('/catalog/erp/status').json()
+    assert (status['products_loaded'], status['version']) == (2, 2)
+    assert client.post('/catalog/erp/delta', json={'deletes': []}).status_code == 400
+
+
 def test_photos_prefers_local(monkeypatch):
     monkeypatch.setattr(
         'catalog.onedrive.categorize_local_photos',
@@ -259,6 +274,31 @@ def test_erp_upload_raw_json(monkeypatch):
         os.rmdir(inbox_dir)
 
 
+def test_erp_upload_imports_outside_the_event_loop(monkeypatch, tmp_path):
+    import asyncio
+
+    from catalog import erp_catalog
+
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(tmp_path / 'mirror.json'))
+    monkeypatch.setenv('CATALOG_ERP_INBOX_DIR', str(tmp_path / 'inbox'))
+    original_import = erp_catalog.import_received_erp_file
+    loops = []
+
+    def recording_import(path):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return original_import(path)
+
+    monkeypatch.setattr(erp_catalog, 'import_received_erp_file', recording_import)
+    client = TestClient(app)
+    rv = client.post('/catalog/erp/upload', content=b'{"products":[{"codigo":"8877"}]}')
+    assert rv.status_code == 200
+    assert rv.json()['products_imported'] == 1
+    assert loops == [None]
+
+
 def test_erp_upload_rejects_large_payload(monkeypatch):
     monkeypatch.setenv('CATALOG_ERP_MAX_UPLOAD_BYTES', '16')
     client = TestClient(app)
@@ -272,6 +312,33 @@ def test_erp_upload_rejects_large_payload(monkeypatch):
     assert rv.json()['error'] == 'ERP upload too large'
 
 
+def test_erp_upload_streams_chunked_body_and_discards_rejected_files(monkeypatch, tmp_path):
+    inbox_dir = tmp_path / 'inbox'
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(tmp_path / 'mirror.json'))
+    monkeypatch.setenv('CATALOG_ERP_INBOX_DIR', str(inbox_dir))
+    monkeypatch.setenv('CATALOG_ERP_MAX_UPLOAD_BYTES', '64')
+    client = TestClient(app)
+
+    def chunks(*parts):
+        # Sem Content-Length: o limite so pode ser aplicado durante a leitura do corpo.
+        yield from parts
+
+    rv = client.post(
+        '/catalog/erp/upload',
+        params={'filename': 'pcprodut_stream.json'},
+        content=chunks(b'{"products":[{"codigo":', b'"8877","nome":"Produto"}]}'),
+    )
+    assert rv.status_code == 200
+    assert rv.json()['products_imported'] == 1
+    assert [path.name for path in inbox_dir.iterdir()] == ['pcprodut_stream.json']
+
+    rv = client.post('/catalog/erp/upload', content=chunks(b'{"products":[', b'{"codigo":"1"}' * 8, b']}'))
+    assert rv.status_code == 413
+    rv = client.post('/catalog/erp/upload', content=chunks(b'{"products":[{"codigo":', b'"8877"'))
+    assert rv.status_code == 400
+    assert [path.name for path in inbox_dir.iterdir()] == ['pcprodut_stream.json']
+
+
 def test_erp_import_file_endpoint(monkeypatch):
     source_path = os.path.join(os.getcwd(), 'reports', '_test_erp_source.json')
     target_path = os.path.join(os.getcwd(), 'reports', '_test_erp_target_from_file.json')
@@ -409,6 +476,71 @@ def test_catalog_export_zip_includes_photos(monkeypatch):
         os.remove(photo_path)
 
 
+@pytest.mark.parametrize('buffer_bytes', [4, 1024])
+def test_catalog_export_zip_leaves_out_local_photos_that_fail_to_read(monkeypatch, tmp_path, buffer_bytes):
+    from pathlib import Path
+
+    from catalog import exporter
+
+    broken = tmp_path / '9911_branco.jpg'
+    broken.write_bytes(b'0123456789')
+    ambient = tmp_path / '9911_ambiente.jpg'
+    ambient.write_bytes(b'ambient-bytes')
+    monkeypatch.setattr(
+        'catalog.onedrive.list_local_products',
+        lambda: [
+            {
+                'Codigo': '9911',
+                'Nome': 'Produto Exportavel',
+                'FotoBranco': '/catalog/local/asset?path=9911_branco.jpg',
+                'FotoAmbient': '/catalog/local/asset?path=9911_ambiente.jpg',
+            }
+        ]
+    )
+    monkeypatch.setattr('catalog.onedrive.find_local_images_for_code', lambda code: [])
+    monkeypatch.setattr('catalog.onedrive.resolve_local_asset_path', lambda rel_path: str(tmp_path / rel_path))
+    monkeypatch.setattr(exporter, 'LOCAL_PHOTO_BUFFER_BYTES', buffer_bytes)
+    monkeypatch.setattr(exporter, 'ZIP_CHUNK_BYTES', 4)
+
+    class FailingReader:
+        def __init__(self, handle):
+            self._handle = handle
+            self._reads = 0
+
+        def read(self, size=-1):
+            self._reads += 1
+            if self._reads > 1 or size < 0:
+                raise OSError(5, 'Input/output error')
+            return self._handle.read(size)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            self._handle.close()
+
+    real_open = Path.open
+
+    def open_with_failure(self, *args, **kwargs):
+        handle = real_open(self, *args, **kwargs)
+        return FailingReader(handle) if self.name == broken.name else handle
+
+    monkeypatch.setattr(Path, 'open', open_with_failure)
+    client = TestClient(app)
+    rv = client.get('/catalog/export', params={'format': 'zip', 'code': '9911'})
+    assert rv.status_code == 200
+
+    with ZipFile(BytesIO(rv.content)) as archive:
+        photos = [name for name in archive.namelist() if name.startswith('fotos/')]
+        assert len(photos) == 1 and 'ambientada' in photos[0]
+        assert archive.read(photos[0]) == b'ambient-bytes'
+        assert archive.testzip() is None
+        manifest = archive.read('manifesto_fotos.csv').decode('utf-8-sig')
+    rows = {row.split(',')[2]: row for row in manifest.splitlines()[1:]}
+    assert rows['Fundo branco'].endswith(',falha ao ler a foto local: Input/output error')
+    assert rows['Ambientada'].endswith(f',{photos[0]},')
+
+
 def test_catalog_export_zip_blocks_private_remote_photo_urls(monkeypatch):
     monkeypatch.setattr(
         'catalog.onedrive.list_local_products',
@@ -451,3 +583,223 @@ def test_internal_errors_are_sanitized(monkeypatch):
     rv = client.get('/catalog/local/produtos')
     assert rv.status_code == 500
     assert rv.json() == {'error': 'internal server error'}
+
+
+def test_local_products_route_serves_snapshot_with_etag(monkeypatch):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return [{'Codigo': '5989', 'Nome': 'Produto', 'Categoria': 'ABAJUR', 'PRECO': 12.5}]
+
+    monkeypatch.setattr('catalog.onedrive.list_local_products', build)
+    client = TestClient(app)
+    rv = client.get('/catalog/local/produtos')
+    assert rv.status_code == 200
+    assert rv.json()[0]['PRECO'] == 12.5
+    assert rv.json()[0]['URLFoto'] == ''
+    etag = rv.headers['etag']
+
+    again = client.get('/catalog/local/produtos', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert client.get('/catalog/local/produtos').content == rv.content
+    assert len(calls) == 1
+
+
+def test_local_products_route_reflects_erp_writes_immediately(monkeypatch, tmp_path):
+    folder = tmp_path / 'produtos' / 'ABAJUR' / '5989 - ABAJUR TOUCH'
+    folder.mkdir(parents=True)
+    (folder / '5989_branco.jpg').write_bytes(b'a')
+    monkeypatch.setenv('CATALOG_LOCAL_PRODUCTS_PATH', str(tmp_path / 'produtos'))
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(tmp_path / 'erp_products.json'))
+    client = TestClient(app)
+
+    def names():
+        rv = client.get('/catalog/local/produtos')
+        assert rv.status_code == 200
+        return {item['Codigo']: item['Nome'] for item in rv.json()}
+
+    assert client.post('/catalog/erp/import', json={'products': [{'codigo': '5989', 'nome': 'Nome antigo'}]}).status_code == 200
+    assert names() == {'5989': 'Nome antigo'}
+
+    assert client.post('/catalog/erp/import', json={'products': [{'codigo': '5989', 'nome': 'Nome NOVO'}]}).status_code == 200
+    assert names() == {'5989': 'Nome NOVO'}
+
+    rv = client.post('/catalog/erp/delta', json={'upserts': [{'codigo': '7000', 'nome': 'So no ERP'}]})
+    assert rv.status_code == 200
+    assert names() == {'5989': 'Nome NOVO', '7000': 'So no ERP'}
+
+
+def test_local_products_route_rebuilds_in_background_when_source_files_change(monkeypatch, tmp_path):
+    folder = tmp_path / 'produtos' / 'ABAJUR' / '5989 - ABAJUR TOUCH'
+    folder.mkdir(parents=True)
+    (folder / '5989_branco.jpg').write_bytes(b'a')
+    erp_json = tmp_path / 'erp_products.json'
+    erp_json.write_text('{"products": [{"codigo": "5989", "nome": "Externo 1"}]}', encoding='utf-8')
+    monkeypatch.setenv('CATALOG_LOCAL_PRODUCTS_PATH', str(tmp_path / 'produtos'))
+    monkeypatch.setenv('CATALOG_ERP_JSON_PATH', str(erp_json))
+    monkeypatch.setenv('CATALOG_PRODUCTS_MAX_AGE_SECONDS', '0')
+    client = TestClient(app)
+    assert client.get('/catalog/local/produtos').json()[0]['Nome'] == 'Externo 1'
+
+    # Arquivo trocado por fora do app: a requisicao responde com a versao atual
+    # e a remontagem roda em segundo plano.
+    erp_json.write_text('{"products": [{"codigo": "5989", "nome": "Externo dois"}]}', encoding='utf-8')
+    assert client.get('/catalog/local/produtos').json()[0]['Nome'] == 'Externo 1'
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if client.get('/catalog/local/produtos').json()[0]['Nome'] == 'Externo dois':
+            break
+        time.sleep(0.02)
+    assert client.get('/catalog/local/produtos').json()[0]['Nome'] == 'Externo dois'
+
+
+def test_catalog_export_zip_resolves_photos_from_one_index_snapshot(monkeypatch, tmp_path):
+    from catalog import onedrive
+
+    root = tmp_path / 'produtos'
+    for code in ('5989', '6001', '6002'):
+        folder = root / 'ABAJUR' / f'{code} - ABAJUR'
+        folder.mkdir(parents=True)
+        (folder / f'{code}_branco.jpg').write_bytes(b'white')
+        (folder / f'{code}_ambient.jpg').write_bytes(b'ambient')
+    monkeypatch.setenv('CATALOG_LOCAL_PRODUCTS_PATH', str(root))
+
+    index_reads = []
+    original_get_local_index = onedrive._get_local_index
+
+    def counting_get_local_index(path_override=None):
+        index_reads.append(path_override)
+        return original_get_local_index(path_override)
+
+    monkeypatch.setattr(onedrive, '_get_local_index', counting_get_local_index)
+    per_product_lookups = []
+    monkeypatch.setattr(
+        onedrive,
+        '_lookup_local_photo_record',
+        lambda code, path_override=None: per_product_lookups.append(code),
+    )
+
+    client = TestClient(app)
+    rv = client.get('/catalog/export', params={'format': 'zip'})
+    assert rv.status_code == 200
+    with ZipFile(BytesIO(rv.content)) as archive:
+        names = archive.namelist()
+    for code in ('5989', '6001', '6002'):
+        assert sum(name.startswith(f'fotos/{code}/') for name in names) == 2
+    # Uma leitura para montar o catalogo e outra para as fotos da exportacao inteira.
+    assert len(index_reads) == 2
+    assert per_product_lookups == []
+
+
+@pytest.mark.parametrize('delivery', ['stream', 'spool'])
+def test_catalog_export_zip_streams_and_stores_compressed_photos(monkeypatch, tmp_path, delivery):
+    root = tmp_path / 'produtos'
+    folder = root / 'ABAJUR' / '5989 - ABAJUR'
+    folder.mkdir(parents=True)
+    (folder / '5989_branco.jpg').write_bytes(b'\xff\xd8' + os.urandom(200_000))
+    (folder / '5989_medidas.bmp').write_bytes(b'BM' + bytes(100_000))
+    monkeypatch.setenv('CATALOG_LOCAL_PRODUCTS_PATH', str(root))
+    monkeypatch.setenv('CATALOG_EXPORT_ZIP_DELIVERY', delivery)
+    spooled = []
+    original_mkstemp = __import__('tempfile').mkstemp
+
+    def tracking_mkstemp(*args, **kwargs):
+        handle, name = original_mkstemp(*args, **kwargs)
+        spooled.append(name)
+        return handle, name
+
+    monkeypatch.setattr('catalog.exporter.tempfile.mkstemp', tracking_mkstemp)
+
+    client = TestClient(app)
+    rv = client.get('/catalog/export', params={'format': 'zip'})
+    assert rv.status_code == 200
+    assert ('content-length' in rv.headers) == (delivery == 'spool')
+
+    with ZipFile(BytesIO(rv.content)) as archive:
+        assert archive.testzip() is None
+        infos = {info.filename: info for info in archive.infolist()}
+    photos = [info for name, info in infos.items() if name.startswith('fotos/5989/')]
+    assert {info.compress_type for info in photos if info.filename.endswith('.jpg')} == {0}
+    assert {info.compress_type for info in photos if info.filename.endswith('.bmp')} == {8}
+    assert infos['catalogo-produtos.csv'].compress_type == 8
+    # Escrito sem seek: tamanhos e CRC vem no descritor de dados de cada entrada.
+    assert all(info.flag_bits & 0x08 for info in infos.values())
+    assert len(spooled) == (1 if delivery == 'spool' else 0)
+    assert not any(os.path.exists(name) for name in spooled)
+
+
+def test_catalog_export_zip_fetches_remote_photos_concurrently_in_product_order(monkeypatch):
+    import threading
+    import time
+
+    from catalog.image_cache import RemoteImage
+
+    products = [
+        {
+            'Codigo': str(1000 + position),
+            'Nome': f'Produto {position}',
+            'FotoBranco': f'https://img{position % 2}.example.com/{position}.jpg',
+            'FotoAmbient': f'https://img{position % 2}.example.com/{position}-amb.jpg',
+        }
+        for position in range(6)
+    ]
+    monkeypatch.setattr('catalog.onedrive.list_local_products', lambda: products)
+    monkeypatch.setattr('catalog.exporter._is_permitted_remote_image_url', lambda url: True)
+    monkeypatch.setenv('CATALOG_EXPORT_FETCH_PER_HOST', '2')
+
+    lock = threading.Lock()
+    active = {}
+    peaks = {}
+
+    def fake_fetch(url, max_bytes, validators):
+        host = url.split('/')[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peaks[host] = max(peaks.get(host, 0), active[host])
+        # Ordem de conclusao invertida em relacao a ordem dos produtos.
+        time.sleep(0.05 if url.endswith('0.jpg') else 0.01)
+        with lock:
+            active[host] -= 1
+        return RemoteImage(url.encode('utf-8'), '.jpg')
+
+    monkeypatch.setattr('catalog.exporter._fetch_remote_image', fake_fetch)
+
+    client = TestClient(app)
+    rv = client.get('/catalog/export', params={'format': 'zip'})
+    assert rv.status_code == 200
+    with ZipFile(BytesIO(rv.content)) as archive:
+        photos = [name for name in archive.namelist() if name.startswith('fotos/')]
+        contents = [archive.read(name).decode('utf-8') for name in photos]
+    expected = [url for item in products for url in (item['FotoBranco'], item['FotoAmbient'])]
+    assert contents == expected
+    assert set(peaks) == {'img0.example.com', 'img1.example.com'}
+    assert all(peak <= 2 for peak in peaks.values())
+    assert sum(peaks.values()) > 2
+
+
+def test_catalog_export_repeat_reads_remote_photos_from_disk_cache(monkeypatch):
+    from catalog.image_cache import RemoteImage
+
+    products = [{'Codigo': '1000', 'Nome': 'Produto', 'FotoBranco': 'https://img.example.com/1000.jpg'}]
+    monkeypatch.setattr('catalog.onedrive.list_local_products', lambda: products)
+    checked = []
+    fetched = []
+    monkeypatch.setattr('catalog.exporter._is_permitted_remote_image_url', lambda url: checked.append(url) or True)
+
+    def fake_fetch(url, max_bytes, validators):
+        fetched.append(url)
+        return RemoteImage(b'foto', '.jpg')
+
+    monkeypatch.setattr('catalog.exporter._fetch_remote_image', fake_fetch)
+
+    client = TestClient(app)
+    for _ in range(2):
+        rv = client.get('/catalog/export', params={'format': 'zip'})
+        assert rv.status_code == 200
+        with ZipFile(BytesIO(rv.content)) as archive:
+            photos = [name for name in archive.namelist() if name.startswith('fotos/')]
+            assert [archive.read(name) for name in photos] == [b'foto']
+    assert fetched == ['https://img.example.com/1000.jpg']
+    assert checked == ['https://img.example.com/1000.jpg']
@@ -0,0 +1,90 @@
+import os
+import struct
+
+from catalog import shell_link
+from catalog.local_catalog import resolve_shortcut_targets
+from catalog.onedrive import find_local_images_for_code, list_local_products
+from catalog.shell_link import (
+    HAS_LINK_INFO,
+    HAS_RELATIVE_PATH,
+    IS_UNICODE,
+    LINK_CLSID,
+    parse_shell_link,
+    read_shell_link,
+)
+
+
+def _build_shell_link(local_base_path, relative_path=None):
+    flags = HAS_LINK_INFO | IS_UNICODE | (HAS_RELATIVE_PATH if relative_path else 0)
+    header = struct.pack(
+        "<I16sIIQQQIiIHHII",
+        0x4C, LINK_CLSID, flags, 0x20, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0,
+    )
+    volume_id = struct.pack("<IIII", 0x11, 3, 0, 0x10) + b"\0"
+    base_path = local_base_path.encode("cp1252") + b"\0"
+    base_offset = 0x1C + len(volume_id)
+    suffix_offset = base_offset + len(base_path)
+    body = volume_id + base_path + b"\0"
+    link_info = struct.pack("<IIIIIII", 0x1C + len(body), 0x1C, 1, 0x1C, base_offset, 0, suffix_offset) + body
+
+    string_data = b""
+    if relative_path:
+        string_data = struct.pack("<H", len(relative_path)) + relative_path.encode("utf-16-le")
+    return header + link_info + string_data + b"\0\0\0\0"
+
+
+def test_parse_shell_link_reads_target_and_relative_path():
+    data = _build_shell_link(
+        "C:\\Users\\João\\OneDrive\\MARKETING\\01_PRODUTOS\\ABAJUR\\6001 (1).jpg",
+        relative_path="..\\..\\01_PRODUTOS\\ABAJUR\\6001 (1).jpg",
+    )
+    link = parse_shell_link(data)
+    assert link.target == "C:\\Users\\João\\OneDrive\\MARKETING\\01_PRODUTOS\\ABAJUR\\6001 (1).jpg"
+    assert link.relative_path == "..\\..\\01_PRODUTOS\\ABAJUR\\6001 (1).jpg"
+
+
+def test_read_shell_link_caches_by_mtime_and_rejects_garbage(monkeypatch, tmp_path):
+    link_path = tmp_path / "atalho.lnk"
+    link_path.write_bytes(_build_shell_link("C:\\fotos\\1.jpg"))
+    calls = []
+    original = shell_link.parse_shell_link
+    monkeypatch.setattr(shell_link, "parse_shell_link", lambda data: calls.append(1) or original(data))
+
+    assert read_shell_link(str(link_path)).target == "C:\\fotos\\1.jpg"
+    assert read_shell_link(str(link_path)).target == "C:\\fotos\\1.jpg"
+    assert len(calls) == 1
+
+    link_path.write_bytes(b"lnk")
+    os.utime(link_path, ns=(1, 1))
+    assert read_shell_link(str(link_path)) is None
+    assert len(calls) == 2
+
+
+def test_shortcut_targets_map_windows_paths_onto_mounted_copy(monkeypatch, tmp_path):
+    drive_root = tmp_path / "drive"
+    category = drive_root / "MARKETING" / "Catalogo" / "ABAJUR"
+    category.mkdir(parents=True)
+    legacy_dir = drive_root / "MARKETING" / "01_PRODUTOS" / "ABAJUR" / "6001 - ABAJUR DROP-001B E27X1"
+    legacy_dir.mkdir(parents=True)
+    target_image = legacy_dir / "6001 - ABAJUR DROP-001B E27X1 (1).jpg"
+    target_image.write_bytes(b"img")
+    windows_target = (
+        "C:\\Users\\joao\\OneDrive\\MARKETING\\01_PRODUTOS\\ABAJUR\\"
+        "6001 - ABAJUR DROP-001B E27X1\\6001 - ABAJUR DROP-001B E27X1 (1).jpg"
+    )
+    shortcut_path = category / "6001 - ABAJUR DROP-001B E27X1.lnk"
+    shortcut_path.write_bytes(_build_shell_link(windows_target))
+    relative_link = category / "6002 - ABAJUR RELATIVO.lnk"
+    relative_path = "..\\..\\01_PRODUTOS\\ABAJUR\\" + legacy_dir.name + "\\" + target_image.name
+    relative_link.write_bytes(_build_shell_link("D:\\outro\\x.jpg", relative_path=relative_path))
+
+    targets = resolve_shortcut_targets(str(drive_root / "MARKETING" / "Catalogo"))
+    if os.name != "nt":
+        assert targets.get(str(shortcut_path)) == str(target_image)
+    assert targets.get(str(relative_link)) == str(target_image)
+    assert targets.get(str(drive_root / "fora.lnk")) is None
+
+    monkeypatch.setenv("OneDrive", str(drive_root))
+    products = {item["Codigo"]: item for item in list_local_products()}
+    assert products["6002"]["URLFoto"].startswith("/catalog/local/asset?path=")
+    assert [image["name"] for image in find_local_images_for_code("6002")] == ["6002 - ABAJUR RELATIVO"]
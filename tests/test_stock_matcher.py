@@ -0,0 +1,32 @@
+from catalog.stock_matcher import StockDescriptionMatcher
+
+
+DESCRIPTIONS = {
+    "2002": ["LUMINARIA SPOT LS-001 DOURADO"],
+    "2003": ["LUMINARIA SPOT LS-002 DOURADO"],
+    "2004": ["PENDENTE CRISTAL REDONDO DOURADO"],
+    "2005": ["PENDENTE CRISTAL REDONDO CROMADO"],
+    "abc": ["LUMINARIA SPOT LS-001"],
+}
+
+
+def test_matcher_picks_unique_best_code_across_path_segments():
+    matcher = StockDescriptionMatcher(DESCRIPTIONS)
+
+    assert len(matcher) == 4
+    assert matcher.match(["FOTOS", "Spot LS-001", "ambientada.jpg"]) == "2002"
+    assert matcher.match(["Pendente Cristal", "redondo cromado.png"]) == "2005"
+
+
+def test_matcher_rejects_ties_weak_matches_and_disallowed_codes():
+    matcher = StockDescriptionMatcher(DESCRIPTIONS)
+
+    # Mesmas palavras nos dois pendentes: empate no topo.
+    assert matcher.match(["pendente cristal redondo", "vista 1.jpg"]) is None
+    # O modelo sozinho vale 3 e nao chega ao minimo de 4.
+    assert matcher.match(["LS-001.jpg"]) is None
+    # Duas palavras sem modelo nao chegam ao minimo.
+    assert matcher.match(["spot dourado.jpg"]) is None
+    assert matcher.match(["spot LS-001.jpg"], matcher.allowed_mask({"2003"})) is None
+    assert matcher.match(["pendente cristal redondo vista.jpg"], matcher.allowed_mask({"2004"})) is None
+    assert matcher.match(["pendente cristal redondo dourado.jpg"], matcher.allowed_mask({"2004"})) == "2004"
@@ -0,0 +1,30 @@
+import unicodedata
+
+from catalog.text_normalize import fold_accents, normalize_for_match
+
+
+def _reference(value):
+    normalized = unicodedata.normalize("NFD", value)
+    return "".join(char for char in normalized if unicodedata.category(char) != "Mn")
+
+
+def test_fold_matches_nfd_reference_inside_and_beyond_the_table():
+    samples = [
+        "Luminária Orientável Ação",
+        "ÇÃÕÉÊÍÓÚÜ çãõéêíóúü",
+        "Nº 2 ºª ß Æ ø",
+        "é decomposto",
+        "Ŧŧ ǅ ǰ Ș",
+        "Ḁ ẞ Ệ grego αβγ ά",
+        "ASCII puro 123",
+        "",
+    ]
+    for sample in samples:
+        assert fold_accents(sample) == _reference(sample)
+        assert normalize_for_match(sample) == _reference(sample).lower()
+
+
+def test_ascii_text_is_returned_without_copy():
+    text = "LUMINARIA PENDENTE"
+    assert fold_accents(text) is text
+    assert normalize_for_match(None) == ""
@@ -0,0 +1,95 @@
+import zipfile
+
+import pytest
+
+from catalog.xlsx_reader import read_sheet_columns
+
+
+def _write_workbook(path, rows, title="POSICAO_ESTOQUE"):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.title = "Outra"
+    worksheet = workbook.create_sheet(title)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+    workbook.close()
+
+
+def _openpyxl_columns(path, title):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = []
+        for number, row in enumerate(workbook[title].iter_rows(min_row=2, values_only=True), start=2):
+            values = (row[1] if len(row) > 1 else None, row[2] if len(row) > 2 else None)
+            if any(value is not None for value in values):
+                rows.append((number, values))
+        return rows
+    finally:
+        workbook.close()
+
+
+def test_streaming_reader_matches_openpyxl(monkeypatch, tmp_path):
+    path = tmp_path / "estoque.xlsx"
+    _write_workbook(
+        path,
+        [
+            ["FILIAL", "CODIGO", "DESCRICAO", "EMB"],
+            [2, 2002, "LUMINARIA SPOT LS-001", "UND"],
+            [2, "1181", "FITA LED <5M> & \"12V\"", "UND"],
+            [2, 3003.0, None, "UND"],
+            [None, None, None, "so na coluna D"],
+            [2, 4004.5, "  espacos  ", True],
+            [2, True, "Pendente ção", None],
+        ],
+    )
+
+    # Planilhas gravadas pelo openpyxl/Excel nunca precisam do parser generico.
+    monkeypatch.setattr("catalog.xlsx_reader._parse_sheet", None)
+    rows = read_sheet_columns(str(path), "POSICAO_ESTOQUE", ("B", "C"), min_row=2)
+    assert rows == _openpyxl_columns(path, "POSICAO_ESTOQUE")
+    assert rows[1] == (3, ("1181", 'FITA LED <5M> & "12V"'))
+    assert read_sheet_columns(str(path), "INEXISTENTE", ("B", "C")) is None
+
+
+def test_generic_parser_handles_prefixed_sheet_without_references(tmp_path):
+    path = tmp_path / "prefixado.xlsx"
+    main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    relations = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "xl/workbook.xml",
+            f'<x:workbook xmlns:x="{main}" xmlns:r="{relations}"><x:sheets>'
+            '<x:sheet name="POSICAO_ESTOQUE" sheetId="1" r:id="rId1"/></x:sheets></x:workbook>',
+        )
+        archive.writestr(
+            "xl/_rels/workbook.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>',
+        )
+        archive.writestr(
+            "xl/sharedStrings.xml",
+            f'<x:sst xmlns:x="{main}"><x:si><x:r><x:t>ABAJUR </x:t></x:r><x:r><x:t>TOUCH</x:t></x:r>'
+            "<x:rPh><x:t>fonetico</x:t></x:rPh></x:si></x:sst>",
+        )
+        archive.writestr(
+            "xl/worksheets/sheet1.xml",
+            f'<x:worksheet xmlns:x="{main}"><x:sheetData>'
+            "<x:row><x:c><x:v>1</x:v></x:c><x:c><x:v>CODIGO</x:v></x:c></x:row>"
+            '<x:row><x:c><x:v>2</x:v></x:c><x:c><x:v>5989</x:v></x:c><x:c t="s"><x:v>0</x:v></x:c></x:row>'
+            "</x:sheetData></x:worksheet>",
+        )
+
+    assert read_sheet_columns(str(path), "POSICAO_ESTOQUE", ("B", "C"), min_row=2) == [
+        (2, (5989, "ABAJUR TOUCH")),
+    ]
+
+
+def test_corrupted_workbook_raises_value_error(tmp_path):
+    path = tmp_path / "quebrado.xlsx"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(ValueError):
+        read_sheet_columns(str(path), "POSICAO_ESTOQUE", ("B", "C"))